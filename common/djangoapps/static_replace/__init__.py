@@ -1,9 +1,14 @@
+import hashlib
 import logging
 import re
+from collections import OrderedDict
 
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.contrib.staticfiles import finders
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from static_replace.models import AssetBaseUrlConfig
 from xmodule.modulestore.django import modulestore
@@ -14,6 +19,17 @@ from opaque_keys.edx.locator import AssetLocator
 
 log = logging.getLogger(__name__)
 
+# Compiled _url_replace_regex patterns, keyed by prefix
+_URL_REPLACE_PATTERNS = {}
+
+# Memoized staticfiles_storage lookups, least recently used first. The collected
+# static files don't change while the process is running, so these are only
+# cleared when the static files settings change.
+_STATICFILES_LOOKUPS = {'exists': OrderedDict(), 'url': OrderedDict()}
+
+# The most staticfiles_storage lookups of each kind to memoize
+STATICFILES_LOOKUPS_MAX_ENTRIES = 10000
+
 
 def _url_replace_regex(prefix):
     """
@@ -31,13 +47,78 @@ def _url_replace_regex(prefix):
         """.format(prefix=prefix)
 
 
+def _url_replace_pattern(prefix):
+    """
+    Return the compiled _url_replace_regex for `prefix`, compiling it the
+    first time it is needed.
+    """
+    pattern = _URL_REPLACE_PATTERNS.get(prefix)
+    if pattern is None:
+        pattern = _URL_REPLACE_PATTERNS[prefix] = re.compile(_url_replace_regex(prefix))
+    return pattern
+
+
+def clear_staticfiles_lookups():
+    """
+    Forget the memoized staticfiles_storage lookups.
+    """
+    for lookups in _STATICFILES_LOOKUPS.values():
+        lookups.clear()
+
+
+@receiver(setting_changed)
+def _static_settings_changed(setting, **kwargs):  # pylint: disable=unused-argument
+    """
+    Forget the memoized lookups when staticfiles_storage is reset.
+    """
+    if setting in ('STATICFILES_STORAGE', 'STATIC_ROOT', 'STATIC_URL'):
+        clear_staticfiles_lookups()
+
+
+def _memoized_lookup(kind, lookup, path):
+    """
+    Return lookup(path), memoized as the given kind ('exists' or 'url') of
+    staticfiles_storage lookup, keeping at most STATICFILES_LOOKUPS_MAX_ENTRIES
+    of each kind.
+
+    Lookups aren't memoized in DEBUG mode, where the static files may change
+    under a running process.
+    """
+    if settings.DEBUG:
+        return lookup(path)
+
+    lookups = _STATICFILES_LOOKUPS[kind]
+    try:
+        value = lookups.pop(path)
+    except KeyError:
+        value = lookup(path)
+        if len(lookups) >= STATICFILES_LOOKUPS_MAX_ENTRIES:
+            lookups.popitem(last=False)
+    lookups[path] = value
+    return value
+
+
+def _staticfiles_exists(path):
+    """
+    Memoized staticfiles_storage.exists(path).
+    """
+    return _memoized_lookup('exists', staticfiles_storage.exists, path)
+
+
+def _staticfiles_url(path):
+    """
+    Memoized staticfiles_storage.url(path).
+    """
+    return _memoized_lookup('url', staticfiles_storage.url, path)
+
+
 def try_staticfiles_lookup(path):
     """
     Try to lookup a path in staticfiles_storage.  If it fails, return
     a dead link instead of raising an exception.
     """
     try:
-        url = staticfiles_storage.url(path)
+        url = _staticfiles_url(path)
     except Exception as err:
         log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
             path, str(err)))
@@ -72,7 +153,7 @@ def replace_jump_to_id_urls(text, course_id, jump_to_id_base_url):
         rest = match.group('rest')
         return "".join([quote, jump_to_id_base_url + rest, quote])
 
-    return re.sub(_url_replace_regex('/jump_to_id/'), replace_jump_to_id_url, text)
+    return _url_replace_pattern('/jump_to_id/').sub(replace_jump_to_id_url, text)
 
 
 def replace_course_urls(text, course_key):
@@ -92,7 +173,7 @@ def replace_course_urls(text, course_key):
         rest = match.group('rest')
         return "".join([quote, '/courses/' + course_id + '/', rest, quote])
 
-    return re.sub(_url_replace_regex('/course/'), replace_course_url, text)
+    return _url_replace_pattern('/course/').sub(replace_course_url, text)
 
 
 def process_static_urls(text, replacement_function, data_dir=None):
@@ -111,14 +192,10 @@ def process_static_urls(text, replacement_function, data_dir=None):
         rest = match.group('rest')
         return replacement_function(original, prefix, quote, rest)
 
-    return re.sub(
-        _url_replace_regex(u'(?:{static_url}|/static/)(?!{data_dir})'.format(
-            static_url=settings.STATIC_URL,
-            data_dir=data_dir
-        )),
-        wrap_part_extraction,
-        text
-    )
+    return _url_replace_pattern(u'(?:{static_url}|/static/)(?!{data_dir})'.format(
+        static_url=settings.STATIC_URL,
+        data_dir=data_dir
+    )).sub(wrap_part_extraction, text)
 
 
 def make_static_urls_absolute(request, html):
@@ -149,6 +226,37 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
     data_directory: The directory in which course data is stored
     course_id: The course identifier used to distinguish static content for this course in studio
     static_asset_path: Path for static assets, which overrides data_directory and course_namespace, if nonempty
+
+    If settings.STATIC_REPLACE_CACHE_TIMEOUT is set, the rewritten text is cached
+    for that many seconds, keyed on the text and the arguments. The rewritten urls
+    also depend on whether course assets are locked, so this is how long it can
+    take for locking or unlocking an asset to be reflected in rewritten content.
+    """
+    # Nothing to rewrite, so don't bother with the regex or the cache.
+    static_url = settings.STATIC_URL
+    if '/static/' not in text and not (isinstance(static_url, basestring) and static_url in text):
+        return text
+
+    cache_timeout = getattr(settings, 'STATIC_REPLACE_CACHE_TIMEOUT', None)
+    if cache_timeout is None or settings.DEBUG:
+        return _replace_static_urls(text, data_directory, course_id, static_asset_path)
+
+    cache_key = u'static_replace.{}'.format(hashlib.md5(repr((
+        hashlib.md5(text.encode('utf-8') if isinstance(text, unicode) else text).hexdigest(),
+        unicode(course_id),
+        static_asset_path,
+        data_directory,
+    ))).hexdigest())
+    replaced_text = cache.get(cache_key)
+    if replaced_text is None:
+        replaced_text = _replace_static_urls(text, data_directory, course_id, static_asset_path)
+        cache.set(cache_key, replaced_text, cache_timeout)
+    return replaced_text
+
+
+def _replace_static_urls(text, data_directory, course_id, static_asset_path):
+    """
+    Does the work of replace_static_urls, without caching.
     """
 
     def replace_static_url(original, prefix, quote, rest):
@@ -171,13 +279,13 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
 
             exists_in_staticfiles_storage = False
             try:
-                exists_in_staticfiles_storage = staticfiles_storage.exists(rest)
+                exists_in_staticfiles_storage = _staticfiles_exists(rest)
             except Exception as err:
                 log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
                     rest, str(err)))
 
             if exists_in_staticfiles_storage:
-                url = staticfiles_storage.url(rest)
+                url = _staticfiles_url(rest)
             else:
                 # if not, then assume it's courseware specific content and then look in the
                 # Mongo-backed database
@@ -192,10 +300,10 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
             course_path = "/".join((static_asset_path or data_directory, rest))
 
             try:
-                if staticfiles_storage.exists(rest):
-                    url = staticfiles_storage.url(rest)
+                if _staticfiles_exists(rest):
+                    url = _staticfiles_url(rest)
                 else:
-                    url = staticfiles_storage.url(course_path)
+                    url = _staticfiles_url(course_path)
             # And if that fails, assume that it's course content, and add manually data directory
             except Exception as err:
                 log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
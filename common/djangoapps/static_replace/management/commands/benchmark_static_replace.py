@@ -0,0 +1,100 @@
+"""A command to benchmark rewriting the static urls in a course's HTML blocks.
+
+It rewrites every HTML block in the course `--page-views` times, as repeated
+views of its pages do, three ways: compiling the url regexes and looking up
+static files anew for each block, as replace_static_urls used to; with the
+compiled regexes and memoized lookups but no cache of the rewritten text; and
+with the rewritten text cached for STATIC_REPLACE_CACHE_TIMEOUT seconds, or a
+minute if that isn't set.
+
+"""
+
+import optparse
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+import static_replace
+from xmodule.modulestore.django import modulestore
+
+
+class Command(BaseCommand):
+    """The actual benchmark_static_replace command."""
+
+    args = "<course_id>"
+    help = "Benchmarks rewriting the static urls in a course's HTML blocks, with and without caching."
+
+    option_list = BaseCommand.option_list + (
+        optparse.make_option(
+            '--page-views',
+            type='int',
+            default=10,
+            help="How many times to rewrite each HTML block each way.",
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("course_id not specified")
+        try:
+            course_key = CourseKey.from_string(args[0])
+        except InvalidKeyError:
+            raise CommandError("Invalid course_id")
+        course = modulestore().get_course(course_key)
+        if course is None:
+            raise CommandError("Invalid course_id")
+
+        page_views = options['page_views']
+        blocks = [
+            (block.data, getattr(block, 'data_dir', None))
+            for block in modulestore().get_items(course_key, qualifiers={'category': 'html'})
+        ]
+        num_rewrites = page_views * len(blocks)
+        if not num_rewrites:
+            raise CommandError("The course has no HTML blocks")
+
+        with override_settings(STATIC_REPLACE_CACHE_TIMEOUT=None):
+            start = time.time()
+            unmemoized_results = rewrite_blocks(blocks, course, page_views, memoized=False)
+            unmemoized_secs = time.time() - start
+
+            start = time.time()
+            memoized_results = rewrite_blocks(blocks, course, page_views)
+            memoized_secs = time.time() - start
+
+        cache_timeout = getattr(settings, 'STATIC_REPLACE_CACHE_TIMEOUT', None) or 60
+        with override_settings(STATIC_REPLACE_CACHE_TIMEOUT=cache_timeout):
+            start = time.time()
+            cached_results = rewrite_blocks(blocks, course, page_views)
+            cached_secs = time.time() - start
+
+        if not unmemoized_results == memoized_results == cached_results:
+            self.stderr.write("The rewritten blocks differ between the ways of rewriting them\n")
+        self.stdout.write(
+            "Rewriting {} HTML blocks {} times: {:.0f}/s unmemoized, {:.0f}/s memoized, {:.0f}/s cached\n".format(
+                len(blocks), page_views,
+                num_rewrites / unmemoized_secs, num_rewrites / memoized_secs, num_rewrites / cached_secs,
+            )
+        )
+
+
+def rewrite_blocks(blocks, course, page_views, memoized=True):
+    """
+    Rewrite the static urls in each of `blocks`, (data, data_dir) pairs,
+    `page_views` times, and return the rewritten data. Unless `memoized`, the
+    compiled regexes and memoized lookups are forgotten before each block.
+    """
+    results = []
+    for __ in xrange(page_views):
+        for data, data_dir in blocks:
+            if not memoized:
+                static_replace._URL_REPLACE_PATTERNS.clear()  # pylint: disable=protected-access
+                static_replace.clear_staticfiles_lookups()
+            results.append(static_replace.replace_static_urls(
+                data, data_dir, course_id=course.id, static_asset_path=course.static_asset_path
+            ))
+    return results
@@ -4,11 +4,13 @@ from urllib import quote_plus
 
 import ddt
 import re
+from functools import wraps
 from PIL import Image
 from cStringIO import StringIO
 
 from nose.tools import assert_equals, assert_true, assert_false  # pylint: disable=no-name-in-module
 from static_replace import (
+    clear_staticfiles_lookups,
     replace_static_urls,
     replace_course_urls,
     _url_replace_regex,
@@ -17,6 +19,11 @@ from static_replace import (
 )
 from mock import patch, Mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from xmodule.contentstore.content import StaticContent
 from xmodule.contentstore.django import contentstore
@@ -31,6 +38,21 @@ COURSE_KEY = SlashSeparatedCourseKey('org', 'course', 'run')
 STATIC_SOURCE = '"/static/file.png"'
 
 
+def patch_staticfiles_storage(test):
+    """
+    Patch static_replace.staticfiles_storage for `test`, without any lookups
+    memoized before or left memoized after.
+    """
+    @wraps(test)
+    def wrapper(*args, **kwargs):  # pylint: disable=missing-docstring
+        clear_staticfiles_lookups()
+        try:
+            return test(*args, **kwargs)
+        finally:
+            clear_staticfiles_lookups()
+    return patch('static_replace.staticfiles_storage', autospec=True)(wrapper)
+
+
 def test_multi_replace():
     course_source = '"/course/file.png"'
 
@@ -75,7 +97,7 @@ def test_static_urls(mock_request):
     assert_equals(result, '\"http:///static/file.png\"')
 
 
-@patch('static_replace.staticfiles_storage', autospec=True)
+@patch_staticfiles_storage
 def test_storage_url_exists(mock_storage):
     mock_storage.exists.return_value = True
     mock_storage.url.return_value = '/static/file.png'
@@ -85,7 +107,7 @@ def test_storage_url_exists(mock_storage):
     mock_storage.url.assert_called_once_with('file.png')
 
 
-@patch('static_replace.staticfiles_storage', autospec=True)
+@patch_staticfiles_storage
 def test_storage_url_not_exists(mock_storage):
     mock_storage.exists.return_value = False
     mock_storage.url.return_value = '/static/data_dir/file.png'
@@ -118,7 +140,7 @@ def test_mongo_filestore(mock_get_base_url, mock_modulestore, mock_static_conten
 
 @patch('static_replace.settings', autospec=True)
 @patch('static_replace.modulestore', autospec=True)
-@patch('static_replace.staticfiles_storage', autospec=True)
+@patch_staticfiles_storage
 def test_data_dir_fallback(mock_storage, mock_modulestore, mock_settings):
     mock_modulestore.return_value = Mock(XMLModuleStore)
     mock_storage.url.side_effect = Exception
@@ -130,6 +152,57 @@ def test_data_dir_fallback(mock_storage, mock_modulestore, mock_settings):
     assert_equals('"/static/data_dir/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
 
 
+@patch_staticfiles_storage
+def test_storage_lookups_memoized(mock_storage):
+    mock_storage.exists.return_value = True
+    mock_storage.url.return_value = '/static/file.png'
+
+    for text in (STATIC_SOURCE, "'/static/file.png'"):
+        replace_static_urls(text, DATA_DIRECTORY)
+    mock_storage.exists.assert_called_once_with('file.png')
+    mock_storage.url.assert_called_once_with('file.png')
+
+
+@patch('static_replace.STATICFILES_LOOKUPS_MAX_ENTRIES', 2)
+@patch_staticfiles_storage
+def test_storage_lookups_bounded(mock_storage):
+    mock_storage.exists.return_value = True
+    mock_storage.url.side_effect = lambda path: '/static/' + path
+
+    for name in ('a.png', 'b.png', 'a.png', 'c.png', 'a.png', 'b.png'):
+        replace_static_urls('"/static/{}"'.format(name), DATA_DIRECTORY)
+    # a.png stays memoized as it's used, and b.png is looked up again
+    # after c.png displaces it
+    assert_equals(
+        [call[0][0] for call in mock_storage.url.call_args_list],
+        ['a.png', 'b.png', 'c.png', 'b.png']
+    )
+
+
+@patch_staticfiles_storage
+def test_no_static_urls(mock_storage):
+    text = '<p>Nothing "/course/file.png" to see here</p>'
+    assert_equals(text, replace_static_urls(text, DATA_DIRECTORY))
+    assert_false(mock_storage.exists.called)
+
+
+@override_settings(STATIC_REPLACE_CACHE_TIMEOUT=60)
+@patch_staticfiles_storage
+def test_replaced_text_cached(mock_storage):
+    cache.clear()
+    mock_storage.exists.return_value = False
+    mock_storage.url.return_value = '/static/data_dir/file.png'
+
+    assert_equals('"/static/data_dir/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
+
+    # The cached text is used, even though the storage now gives a different url
+    mock_storage.url.return_value = '/static/other_dir/file.png'
+    assert_equals('"/static/data_dir/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
+
+    # But not for a different data directory
+    assert_equals('"/static/other_dir/file.png"', replace_static_urls(STATIC_SOURCE, 'other_dir'))
+
+
 def test_raw_static_check():
     """
     Make sure replace_static_urls leaves alone things that end in '.raw'
@@ -141,7 +214,7 @@ def test_raw_static_check():
     assert_equals(path, replace_static_urls(path, text))
 
 
-@patch('static_replace.staticfiles_storage', autospec=True)
+@patch_staticfiles_storage
 @patch('static_replace.modulestore', autospec=True)
 def test_static_url_with_query(mock_modulestore, mock_storage):
     """
@@ -446,3 +519,31 @@ class CanonicalContentTest(SharedModuleStoreTestCase):
         with check_mongo_calls(mongo_calls):
             asset_path = StaticContent.get_canonicalized_asset_path(self.courses[prefix].id, start, base_url)
             self.assertEqual(asset_path, expected)
+
+
+class StaticReplaceCacheTest(TestCase):
+    """
+    Checks that caching the rewritten text of a course's HTML blocks doesn't
+    change the results of rewriting them, as on repeated page views.
+    """
+    PAGE_VIEWS = 3
+
+    def setUp(self):
+        super(StaticReplaceCacheTest, self).setUp()
+        html_dir = settings.COMMON_TEST_DATA_ROOT / 'toy' / 'html'
+        self.html_blocks = [path.text(encoding='utf-8') for path in html_dir.files('*.html')]
+        cache.clear()
+
+    def rewrite_all(self, replace):
+        """
+        Rewrite every HTML block PAGE_VIEWS times with `replace`, returning the
+        results of each pass.
+        """
+        return [[replace(html, 'toy') for html in self.html_blocks] for __ in range(self.PAGE_VIEWS)]
+
+    def test_cached_results(self):
+        with override_settings(STATIC_REPLACE_CACHE_TIMEOUT=None):
+            uncached_results = self.rewrite_all(replace_static_urls)
+        with override_settings(STATIC_REPLACE_CACHE_TIMEOUT=60):
+            cached_results = self.rewrite_all(replace_static_urls)
+        self.assertEqual(cached_results, uncached_results)
@@ -8,6 +8,7 @@ from abc import ABCMeta, abstractmethod
 from django.contrib.auth.models import User
 import logging
 
+import request_cache
 from student.models import CourseAccessRole
 from xmodule_django.models import CourseKeyField
 
@@ -55,6 +56,39 @@ class RoleCache(object):
         )
 
 
+# Name of the request cache holding each user's RoleCache
+ROLE_CACHE_REQUEST_CACHE = 'student.roles.role_cache'
+
+
+def get_role_cache(user):
+    """
+    Return the RoleCache for `user`, an authenticated django user.
+
+    The RoleCache is kept on the user object, and, during a request, shared
+    between all of the user objects for the same user, so that the user's
+    CourseAccessRoles are loaded at most once per request.
+    """
+    # pylint: disable=protected-access
+    if not hasattr(user, '_roles'):
+        if request_cache.get_request() is None:
+            user._roles = RoleCache(user)
+        else:
+            role_caches = request_cache.get_cache(ROLE_CACHE_REQUEST_CACHE)
+            if user.id not in role_caches:
+                role_caches[user.id] = RoleCache(user)
+            user._roles = role_caches[user.id]
+    return user._roles
+
+
+def clear_role_cache(user):
+    """
+    Discard the cached roles of `user`, after they have been changed.
+    """
+    if hasattr(user, '_roles'):
+        del user._roles  # pylint: disable=protected-access
+    request_cache.get_cache(ROLE_CACHE_REQUEST_CACHE).pop(user.id, None)
+
+
 class AccessRole(object):
     """
     Object representing a role with particular access to a resource
@@ -137,13 +171,7 @@ class RoleBase(AccessRole):
         if not (user.is_authenticated() and user.is_active):
             return False
 
-        # pylint: disable=protected-access
-        if not hasattr(user, '_roles'):
-            # Cache a list of tuples identifying the particular roles that a user has
-            # Stored as tuples, rather than django models, to make it cheaper to construct objects for comparison
-            user._roles = RoleCache(user)
-
-        return user._roles.has_role(self._role_name, self.course_key, self.org)
+        return get_role_cache(user).has_role(self._role_name, self.course_key, self.org)
 
     def add_users(self, *users):
         """
@@ -156,8 +184,7 @@ class RoleBase(AccessRole):
             if user.is_authenticated and user.is_active and not self.has_user(user):
                 entry = CourseAccessRole(user=user, role=self._role_name, course_id=self.course_key, org=self.org)
                 entry.save()
-                if hasattr(user, '_roles'):
-                    del user._roles
+                clear_role_cache(user)
 
     def remove_users(self, *users):
         """
@@ -168,8 +195,7 @@ class RoleBase(AccessRole):
         )
         entries.delete()
         for user in users:
-            if hasattr(user, '_roles'):
-                del user._roles
+            clear_role_cache(user)
 
     def users_with_role(self):
         """
@@ -339,11 +365,7 @@ class UserBasedRole(object):
         if not (self.user.is_authenticated() and self.user.is_active):
             return False
 
-        # pylint: disable=protected-access
-        if not hasattr(self.user, '_roles'):
-            self.user._roles = RoleCache(self.user)
-
-        return self.user._roles.has_role(self.role, course_key, course_key.org)
+        return get_role_cache(self.user).has_role(self.role, course_key, course_key.org)
 
     def add_course(self, *course_keys):
         """
@@ -353,8 +375,7 @@ class UserBasedRole(object):
             for course_key in course_keys:
                 entry = CourseAccessRole(user=self.user, role=self.role, course_id=course_key, org=course_key.org)
                 entry.save()
-            if hasattr(self.user, '_roles'):
-                del self.user._roles
+            clear_role_cache(self.user)
         else:
             raise ValueError("user is not active. Cannot grant access to courses")
 
@@ -364,8 +385,7 @@ class UserBasedRole(object):
         """
         entries = CourseAccessRole.objects.filter(user=self.user, role=self.role, course_id__in=course_keys)
         entries.delete()
-        if hasattr(self.user, '_roles'):
-            del self.user._roles
+        clear_role_cache(self.user)
 
     def courses_with_role(self):
         """
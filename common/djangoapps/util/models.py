@@ -2,7 +2,9 @@
 import cStringIO
 import gzip
 import logging
+import zlib
 
+from django.conf import settings
 from django.db import models
 from django.utils.text import compress_string
 
@@ -62,3 +64,79 @@ class CompressedTextField(models.TextField):
             value = decompress_string(value)
 
         return value
+
+
+class ThresholdCompressedTextField(models.TextField):
+    """
+    TextField that transparently compresses values longer than a configurable threshold.
+
+    Compressed values are stored as ``COMPRESSED_PREFIX`` followed by the base64 encoding
+    of the zlib-compressed, utf8-encoded text. Values without the prefix are returned
+    unchanged, so rows written before compression was enabled (or below the threshold)
+    keep working.
+
+    The threshold (in characters) is read from the Django setting named by
+    ``threshold_setting`` each time a value is saved. If the setting is missing
+    or ``None``, values are never compressed.
+
+    Note that compressed values can't be searched with database lookups such as
+    ``__contains``.
+    """
+
+    __metaclass__ = models.SubfieldBase
+
+    COMPRESSED_PREFIX = u'zlib:'
+
+    def __init__(self, *args, **kwargs):
+        self.threshold_setting = kwargs.pop('threshold_setting', None)
+        super(ThresholdCompressedTextField, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(ThresholdCompressedTextField, self).deconstruct()
+        if self.threshold_setting is not None:
+            kwargs['threshold_setting'] = self.threshold_setting
+        return name, path, args, kwargs
+
+    @property
+    def threshold(self):
+        """ The length above which values are compressed, or None if compression is disabled. """
+        if self.threshold_setting is None:
+            return None
+        return getattr(settings, self.threshold_setting, None)
+
+    @classmethod
+    def is_compressed(cls, value):
+        """ Return True if `value` is a compressed database value. """
+        return isinstance(value, basestring) and value.startswith(cls.COMPRESSED_PREFIX)
+
+    @classmethod
+    def compress(cls, value):
+        """ Return the compressed database representation of the text `value`. """
+        if isinstance(value, unicode):
+            value = value.encode('utf8')
+        return cls.COMPRESSED_PREFIX + zlib.compress(value).encode('base64').replace('\n', '').decode('utf8')
+
+    @classmethod
+    def decompress(cls, value):
+        """ Reverse :meth:`compress`. Values without the compression prefix are returned unchanged. """
+        if not cls.is_compressed(value):
+            return value
+        try:
+            return zlib.decompress(value[len(cls.COMPRESSED_PREFIX):].encode('utf8').decode('base64')).decode('utf8')
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error('String decompression failed. There may be corrupted data in the database: %s', e)
+            return value
+
+    def get_prep_value(self, value):
+        """ Compress the text data if it is longer than the threshold. """
+        if value is None or self.is_compressed(value):
+            return value
+        value = super(ThresholdCompressedTextField, self).get_prep_value(value)
+        threshold = self.threshold
+        if threshold is not None and len(value) > threshold:
+            value = self.compress(value)
+        return value
+
+    def to_python(self, value):
+        """ Decompresses the value from the database. """
+        return self.decompress(value)
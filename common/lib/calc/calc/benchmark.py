@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Commandline tool to benchmark evaluating a formula at many samples.
+
+It compares evaluating the formula at each sample in turn with `evaluator`,
+as formularesponse's sample checks used to, with evaluating it at all of them
+at once with a `CompiledExpression`.  Run it with `python -m calc.benchmark`.
+"""
+import argparse
+import sys
+import time
+
+from calc import CompiledExpression, evaluator
+
+DEFAULT_FORMULA = "(x^2 + 3*x*y - sin(y)) / (1 + x^2) + sqrt(y^2 + 1) || 5k"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark evaluating a formula at many samples')
+    parser.add_argument("--formula", default=DEFAULT_FORMULA, help="The formula, in the variables x and y")
+    parser.add_argument("--samples", type=int, default=200, help="How many samples to evaluate the formula at")
+    parser.add_argument("--repeat", type=int, default=10, help="How many times to evaluate the samples each way")
+    args = parser.parse_args()
+
+    samples = [{'x': 1.0 + index, 'y': 2.0 * index} for index in range(args.samples)]
+
+    start = time.time()
+    for _ in range(args.repeat):
+        expected = [evaluator(sample, {}, args.formula) for sample in samples]
+    evaluator_secs = (time.time() - start) / args.repeat
+
+    start = time.time()
+    for _ in range(args.repeat):
+        results = CompiledExpression(args.formula).evaluate_samples(samples, {})
+    compiled_secs = (time.time() - start) / args.repeat
+
+    if results != expected:
+        sys.stderr.write("The compiled results differ from those of evaluator\n")
+        return 1
+    print "Evaluating at {} samples: {:.2f} ms with evaluator, {:.2f} ms compiled".format(
+        args.samples, 1000 * evaluator_secs, 1000 * compiled_secs
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
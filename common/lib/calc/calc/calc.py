@@ -7,6 +7,9 @@ Uses pyparsing to parse. Main function as of now is evaluator().
 import math
 import operator
 import numbers
+import threading
+from collections import OrderedDict
+
 import numpy
 import scipy.constants
 import functions
@@ -72,6 +75,9 @@ SUFFIXES = {
     'c': 1e-2, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12
 }
 
+# How many parsed expressions to keep in the parse cache.
+PARSE_CACHE_SIZE = 1024
+
 
 class UndefinedVariable(Exception):
     """
@@ -232,6 +238,16 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     math_interpreter = ParseAugmenter(math_expr, case_sensitive)
     math_interpreter.parse_algebra()
 
+    return evaluate_tree(math_interpreter, variables, functions)
+
+
+def evaluate_tree(math_interpreter, variables, functions):
+    """
+    Evaluate the tree of a ParseAugmenter which has already parsed its
+    expression, with the given variables and functions, as `evaluator` does.
+    """
+    case_sensitive = math_interpreter.case_sensitive
+
     # Get our variables together.
     all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
 
@@ -258,6 +274,337 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     return math_interpreter.reduce_tree(evaluate_actions)
 
 
+class VectorizeError(Exception):
+    """
+    Indicate that an expression can't be evaluated over arrays of samples
+    with the same results as evaluating it at each sample.
+    """
+    pass
+
+
+# The following few functions compile the nodes of a parse tree into functions
+# of the variables and functions, which evaluate that node over NumPy arrays.
+# They are the array counterparts of the evaluation actions above, with the
+# operators looked up once, when compiling.
+
+def compile_number(parse_result):
+    """
+    Compile a number into a constant.
+    """
+    value = eval_number(parse_result)
+    return lambda variables, functions: value
+
+
+def compile_atom(parse_result):
+    """
+    Compile the node wrapped by the atom, ignoring any parentheses.
+    """
+    return next(k for k in parse_result if callable(k))
+
+
+def compile_power(parse_result):
+    """
+    Compile a chain of exponentiations, which are evaluated right to left.
+    """
+    operands = [k for k in parse_result if callable(k)]  # Ignore the '^' marks.
+
+    def power(variables, functions):
+        """
+        Raise the operands to the powers of the ones to their right.
+        """
+        values = [operand(variables, functions) for operand in reversed(operands)]
+        return reduce(lambda a, b: b ** a, values)
+    return power
+
+
+def compile_parallel(parse_result):
+    """
+    Compile a parallel resistors operation.
+
+    It is NaN wherever an input is zero, which isn't vectorized: those samples
+    are evaluated one at a time instead.
+    """
+    operands = [k for k in parse_result if callable(k)]
+    if len(operands) == 1:
+        return operands[0]
+
+    def parallel(variables, functions):
+        """
+        Compute 1 / (1/in1 + 1/in2 + ...)
+        """
+        values = [operand(variables, functions) for operand in operands]
+        if any(numpy.any(value == 0) for value in values):
+            raise VectorizeError("zero input to the parallel operator")
+        return 1. / sum(1. / value for value in values)
+    return parallel
+
+
+def compile_operations(parse_result, operators, identity):
+    """
+    Compile a sum or product, given the operators its tokens stand for.
+    """
+    operations = []
+    current_op = operators[None]
+    for token in parse_result:
+        if callable(token):
+            operations.append((current_op, token))
+        else:
+            current_op = operators[token]
+
+    def operate(variables, functions):
+        """
+        Apply the operations in turn, from left to right.
+        """
+        total = identity
+        for current_op, operand in operations:
+            total = current_op(total, operand(variables, functions))
+        return total
+    return operate
+
+
+def compile_sum(parse_result):
+    """
+    Compile a sum, allowing a leading + or -.
+    """
+    operators = {None: operator.add, '+': operator.add, '-': operator.sub}
+    return compile_operations(parse_result, operators, 0.0)
+
+
+def compile_product(parse_result):
+    """
+    Compile a product.
+    """
+    operators = {None: operator.mul, '*': operator.mul, '/': operator.truediv}
+    return compile_operations(parse_result, operators, 1.0)
+
+
+class CompiledExpression(object):
+    """
+    A math expression, parsed once so it can be evaluated many times.
+
+    `evaluate` gives the same results as `evaluator`, without parsing the
+    expression again. `evaluate_samples` evaluates it at many sample points at
+    once, over NumPy arrays of the values of the variables at each sample.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        """
+        Parse `math_expr`, raising the same errors as `evaluator` if it can't
+        be parsed.
+        """
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+        self.math_interpreter = None
+        self.vectorized = None
+
+        # An empty expression is NaN.
+        if math_expr.strip() == "":
+            return
+
+        self.math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+        self.math_interpreter.parse_algebra()
+
+        if case_sensitive:
+            casify = lambda x: x
+        else:
+            casify = lambda x: x.lower()  # Lowercase for case insens.
+
+        def compile_variable(parse_result):
+            """
+            Compile a lookup of the variable.
+            """
+            name = casify(parse_result[0])
+            return lambda variables, functions: variables[name]
+
+        def compile_function(parse_result):
+            """
+            Compile a call of the function on its compiled argument.
+            """
+            name, argument = casify(parse_result[0]), parse_result[1]
+            return lambda variables, functions: functions[name](argument(variables, functions))
+
+        compile_actions = {
+            'number': compile_number,
+            'variable': compile_variable,
+            'function': compile_function,
+            'atom': compile_atom,
+            'power': compile_power,
+            'parallel': compile_parallel,
+            'product': compile_product,
+            'sum': compile_sum
+        }
+        self.vectorized = self.math_interpreter.reduce_tree(compile_actions)
+
+    def evaluate(self, variables, functions):
+        """
+        Evaluate the expression with the given variables and functions.
+        """
+        if self.math_interpreter is None:
+            return float('nan')
+        return evaluate_tree(self.math_interpreter, variables, functions)
+
+    def evaluate_samples(self, samples, functions):
+        """
+        Evaluate the expression at each of `samples`, dictionaries of the
+        variables' values, and return the list of results.
+
+        The results are the same as evaluating the expression at each sample
+        in turn. That is done instead whenever the samples can't be evaluated
+        together with the same results: when a floating point error, such as
+        division by zero, happens for any sample (which may or may not raise
+        an error at that sample alone), or when the functions don't accept
+        arrays.
+        """
+        if self.math_interpreter is None:
+            return [float('nan')] * len(samples)
+        if not samples:
+            return []
+
+        names = set(samples[0])
+        if any(set(sample) != names for sample in samples):
+            return [self.evaluate(sample, functions) for sample in samples]
+
+        arrays = {name: numpy.array([sample[name] for sample in samples]) for name in names}
+        all_variables, all_functions = add_defaults(arrays, functions, self.case_sensitive)
+        self.math_interpreter.check_variables(all_variables, all_functions)
+
+        try:
+            with numpy.errstate(all='raise', under='ignore'):
+                results = self.vectorized(all_variables, all_functions)
+            if numpy.shape(results) == ():
+                # The expression doesn't depend on the samples.
+                return [results] * len(samples)
+            if numpy.shape(results) != (len(samples),):
+                raise VectorizeError("results don't match the samples")
+            return results.tolist()
+        except Exception:  # pylint: disable=broad-except
+            return [self.evaluate(sample, functions) for sample in samples]
+
+
+class ParseCache(object):
+    """
+    A least recently used cache of parsed expressions.
+
+    Counts its hits and misses, so its effectiveness can be checked with
+    `info()`.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the entry for `key`, or None, marking it as most recently used.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        """
+        Store the entry for `key`, evicting the least recently used entry if
+        the cache is full.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the entries, and reset the counters.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Return a dict of the hits, misses, current size and maximum size.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'max_size': self.max_size,
+        }
+
+
+# The parse trees of recently parsed expressions, with the variables and
+# functions they use, keyed by the expression and whether it's case sensitive.
+PARSE_CACHE = ParseCache(PARSE_CACHE_SIZE)
+
+
+def build_algebra_grammar():
+    """
+    Build the pyparsing grammar for algebraic expressions.
+
+    The grammar is the same for every expression, so it's built once, as
+    ALGEBRA_GRAMMAR.
+    """
+    # 0.33 or 7 or .34 or 16.
+    number_part = Word(nums)
+    inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
+    # pyparsing allows spaces between tokens--`Combine` prevents that.
+    inner_number = Combine(inner_number)
+
+    # SI suffixes and percent.
+    number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
+
+    # 0.33k or 17
+    plus_minus = Literal('+') | Literal('-')
+    number = Group(
+        Optional(plus_minus) +
+        inner_number +
+        Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
+        Optional(number_suffix)
+    )
+    number = number("number")
+
+    # Predefine recursive variables.
+    expr = Forward()
+
+    # Handle variables passed in. They must start with letters/underscores
+    # and may contain numbers afterward.
+    inner_varname = Word(alphas + "_", alphanums + "_")
+    varname = Group(inner_varname)("variable")
+
+    # Same thing for functions.
+    function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
+
+    atom = number | function | varname | "(" + expr + ")"
+    atom = Group(atom)("atom")
+
+    # Do the following in the correct order to preserve order of operation.
+    pow_term = atom + ZeroOrMore("^" + atom)
+    pow_term = Group(pow_term)("power")
+
+    par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
+    par_term = Group(par_term)("parallel")
+
+    prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
+    prod_term = Group(prod_term)("product")
+
+    sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
+    sum_term = Group(sum_term)("sum")
+
+    # Finish the recursion.
+    expr << sum_term  # pylint: disable=pointless-statement
+    return expr + stringEnd
+
+
+ALGEBRA_GRAMMAR = build_algebra_grammar()
+
+
 class ParseAugmenter(object):
     """
     Holds the data for a particular parse.
@@ -278,23 +625,6 @@ class ParseAugmenter(object):
         self.variables_used = set()
         self.functions_used = set()
 
-        def vpa(tokens):
-            """
-            When a variable is recognized, store it in `variables_used`.
-            """
-            varname = tokens[0][0]
-            self.variables_used.add(varname)
-
-        def fpa(tokens):
-            """
-            When a function is recognized, store it in `functions_used`.
-            """
-            varname = tokens[0][0]
-            self.functions_used.add(varname)
-
-        self.variable_parse_action = vpa
-        self.function_parse_action = fpa
-
     def parse_algebra(self):
         """
         Parse an algebraic expression into a tree.
@@ -303,61 +633,40 @@ class ParseAugmenter(object):
         reflect parenthesis and order of operations. Leave all operators in the
         tree and do not parse any strings of numbers into their float versions.
 
+        Recently parsed expressions are taken from PARSE_CACHE. The trees in
+        it are shared, so they must not be modified.
+
         Adding the groups and result names makes the `repr()` of the result
         really gross. For debugging, use something like
           print OBJ.tree.asXML()
         """
-        # 0.33 or 7 or .34 or 16.
-        number_part = Word(nums)
-        inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
-        # pyparsing allows spaces between tokens--`Combine` prevents that.
-        inner_number = Combine(inner_number)
-
-        # SI suffixes and percent.
-        number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
-
-        # 0.33k or 17
-        plus_minus = Literal('+') | Literal('-')
-        number = Group(
-            Optional(plus_minus) +
-            inner_number +
-            Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
-            Optional(number_suffix)
-        )
-        number = number("number")
-
-        # Predefine recursive variables.
-        expr = Forward()
-
-        # Handle variables passed in. They must start with letters/underscores
-        # and may contain numbers afterward.
-        inner_varname = Word(alphas + "_", alphanums + "_")
-        varname = Group(inner_varname)("variable")
-        varname.setParseAction(self.variable_parse_action)
-
-        # Same thing for functions.
-        function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
-        function.setParseAction(self.function_parse_action)
-
-        atom = number | function | varname | "(" + expr + ")"
-        atom = Group(atom)("atom")
-
-        # Do the following in the correct order to preserve order of operation.
-        pow_term = atom + ZeroOrMore("^" + atom)
-        pow_term = Group(pow_term)("power")
-
-        par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
-        par_term = Group(par_term)("parallel")
-
-        prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
-        prod_term = Group(prod_term)("product")
-
-        sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
-        sum_term = Group(sum_term)("sum")
-
-        # Finish the recursion.
-        expr << sum_term  # pylint: disable=pointless-statement
-        self.tree = (expr + stringEnd).parseString(self.math_expr)[0]
+        key = (self.math_expr, self.case_sensitive)
+        cached = PARSE_CACHE.get(key)
+        if cached is None:
+            tree = ALGEBRA_GRAMMAR.parseString(self.math_expr)[0]
+            variables_used, functions_used = set(), set()
+            self.collect_names(tree, variables_used, functions_used)
+            cached = (tree, frozenset(variables_used), frozenset(functions_used))
+            PARSE_CACHE.set(key, cached)
+
+        self.tree = cached[0]
+        self.variables_used = set(cached[1])
+        self.functions_used = set(cached[2])
+
+    @classmethod
+    def collect_names(cls, node, variables_used, functions_used):
+        """
+        Add the names of the variables and functions used in the tree `node`
+        to `variables_used` and `functions_used`.
+        """
+        if not isinstance(node, ParseResults):
+            return
+        if node.getName() == 'variable':
+            variables_used.add(node[0])
+        elif node.getName() == 'function':
+            functions_used.add(node[0])
+        for child in node:
+            cls.collect_names(child, variables_used, functions_used)
 
     def reduce_tree(self, handle_actions, terminal_converter=None):
         """
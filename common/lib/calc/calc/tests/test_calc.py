@@ -5,6 +5,7 @@ Unit tests for calc.py
 import unittest
 import numpy
 import calc
+from calc.preview import latex_preview
 from pyparsing import ParseException
 
 # numpy's default behavior when it evaluates a function outside its domain
@@ -559,3 +560,131 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class CompiledExpressionTest(unittest.TestCase):
+    """
+    Check that calc.CompiledExpression gives the same results as evaluating
+    an expression with calc.evaluator at each sample.
+    """
+    samples = [{'x': x, 'y': y} for x, y in ((0.5, 2.0), (-1.5, 3.0), (0.0, -2.0), (4.0, 0.25))]
+
+    def assert_same_results(self, math_expr, samples=None, functions=None, case_sensitive=False):
+        """
+        Assert that evaluating `math_expr` over `samples` at once gives the
+        results of calc.evaluator at each sample.
+        """
+        samples = samples or self.samples
+        functions = functions or {}
+        compiled = calc.CompiledExpression(math_expr, case_sensitive)
+        expected = [calc.evaluator(sample, functions, math_expr, case_sensitive) for sample in samples]
+        results = compiled.evaluate_samples(samples, functions)
+        results.append(compiled.evaluate(samples[0], functions))
+        expected.append(expected[0])
+        self.assertEqual(len(results), len(expected))
+        for result, expect in zip(results, expected):
+            if numpy.isnan(expect):
+                self.assertTrue(numpy.isnan(result), (math_expr, results, expected))
+            else:
+                self.assertEqual(result, expect, (math_expr, results, expected))
+
+    def test_operators(self):
+        for math_expr in ("x + y", "-x - y + 1", "x * y / 3", "2^x^2", "(x + 1)^2 - y", "3.5k * x", "5%*y"):
+            self.assert_same_results(math_expr)
+
+    def test_parallel(self):
+        self.assert_same_results("x || y")
+        # One of the samples has x = 0, which makes it NaN
+        self.assert_same_results("1 + x || y || 2")
+
+    def test_functions(self):
+        for math_expr in ("sin(x) + cos(y)", "sqrt(y^2)", "exp(x) * ln(y^2)", "arccot(x + 0.1)", "fact(3) * x"):
+            self.assert_same_results(math_expr)
+
+    def test_complex(self):
+        self.assert_same_results("x + i*y")
+        self.assert_same_results("sqrt(x - 2 + j)")
+
+    def test_constant(self):
+        self.assert_same_results("pi * 2")
+        self.assert_same_results("")
+
+    def test_user_functions(self):
+        # A function that doesn't accept arrays
+        functions = {'f': lambda value: 2 * value if value > 0 else -value}
+        self.assert_same_results("f(x) + y", functions=functions)
+
+    def test_case_sensitivity(self):
+        samples = [{'x': 1.0, 'X': 2.0}, {'x': 3.0, 'X': 5.0}]
+        self.assert_same_results("x + 2*X", samples, case_sensitive=True)
+        self.assert_same_results("x", [{'X': 2.0}, {'X': 3.0}])
+        with self.assertRaises(calc.UndefinedVariable):
+            calc.CompiledExpression("x", case_sensitive=True).evaluate_samples([{'X': 2.0}], {})
+
+    def test_errors(self):
+        with self.assertRaises(ZeroDivisionError):
+            calc.CompiledExpression("y / x").evaluate_samples(self.samples, {})
+        with self.assertRaisesRegexp(ValueError, 'factorial'):
+            calc.CompiledExpression("fact(y)").evaluate_samples(self.samples, {})
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'z'):
+            calc.CompiledExpression("x + z").evaluate_samples(self.samples, {})
+
+    def test_many_samples(self):
+        """
+        Check that evaluating a formula at many samples with a compiled
+        expression gives the same results as calc.evaluator.
+        """
+        math_expr = "(x^2 + 3*x*y - sin(y)) / (1 + x^2) + sqrt(y^2 + 1) || 5k"
+        samples = [{'x': 1.0 + index, 'y': 2.0 * index} for index in range(200)]
+
+        expected = [calc.evaluator(sample, {}, math_expr) for sample in samples]
+        results = calc.CompiledExpression(math_expr).evaluate_samples(samples, {})
+        self.assertEqual(results, expected)
+
+
+class ParseCacheTest(unittest.TestCase):
+    """
+    Check that parsed expressions are cached, and the cache is kept to size.
+    """
+    def setUp(self):
+        super(ParseCacheTest, self).setUp()
+        calc.PARSE_CACHE.clear()
+        self.addCleanup(calc.PARSE_CACHE.clear)
+
+    def test_hits_and_misses(self):
+        self.assertEqual(calc.evaluator({'x': 2.0}, {}, "x^2 + sin(x)"), 4.0 + numpy.sin(2.0))
+        self.assertEqual(calc.evaluator({'x': 3.0}, {}, "x^2 + sin(x)"), 9.0 + numpy.sin(3.0))
+        self.assertEqual(latex_preview("x^2 + sin(x)"), r"x^{2}+\text{sin}(x)")
+        info = calc.PARSE_CACHE.info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (2, 1, 1))
+
+    def test_case_sensitivity_in_key(self):
+        calc.evaluator({'x': 2.0}, {}, "x")
+        calc.evaluator({'x': 2.0}, {}, "x", case_sensitive=True)
+        self.assertEqual(calc.PARSE_CACHE.info()['misses'], 2)
+
+    def test_names_used_not_shared(self):
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            calc.evaluator({'x': 2.0}, {}, "x + y")
+        # The cached tree still knows which variables it uses
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            calc.evaluator({'x': 2.0}, {}, "x + y")
+        self.assertEqual(calc.evaluator({'x': 2.0, 'y': 1.0}, {}, "x + y"), 3.0)
+        self.assertEqual(calc.PARSE_CACHE.info()['hits'], 2)
+
+    def test_parse_errors_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ParseException):
+                calc.evaluator({}, {}, "1 +")
+        self.assertEqual(calc.PARSE_CACHE.info()['size'], 0)
+
+    def test_least_recently_used_evicted(self):
+        cache = calc.ParseCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.info(), {'hits': 3, 'misses': 1, 'size': 2, 'max_size': 2})
@@ -15,6 +15,7 @@ This is used by capa_module.
 
 from copy import deepcopy
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
@@ -58,6 +59,10 @@ html_problem_semantics = [
 
 log = logging.getLogger(__name__)
 
+# Change this whenever a change to the parsing of problems would make the
+# parsed problems cached by earlier code wrong.
+PARSED_PROBLEM_CACHE_VERSION = 1
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -161,16 +166,9 @@ class LoncapaProblem(object):
         problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
         self.problem_text = problem_text
 
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        self.make_xml_compatible(self.tree)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
-
-        # construct script processor context (eg for customresponse problems)
-        self.context = self._extract_context(self.tree)
+        # parse problem XML file into an element tree, and construct script
+        # processor context (eg for customresponse problems)
+        self._parse_problem()
 
         # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
         # transformations.  This also creates the dict (self.responders) of Response
@@ -195,6 +193,102 @@ class LoncapaProblem(object):
 
         self.extracted_tree = self._extract_html(self.tree)
 
+    def _parse_problem(self):
+        """
+        Parse the problem text into `self.tree`, and run its scripts to
+        construct `self.context`.
+
+        Both only depend on the problem text, id and seed, and on the course's
+        python_lib.zip, so they are cached in `capa_system.cache`, and rebuilt
+        from the cache when the problem is loaded again, e.g. in the next
+        request.
+
+        safe_exec also caches the results of running the scripts, but looking
+        them up means copying and hashing the context and a cache read for
+        each run, which a hit here skips along with the parsing.
+
+        The responders and input types aren't cached: they're built around
+        the live tree, the capa system and the module, so they're built again
+        from the cached tree, which is taken before _preprocess_problem.
+        """
+        cache_key = self._parsed_problem_cache_key()
+        if cache_key is not None and self._load_parsed_problem(cache_key):
+            return
+
+        self.tree = etree.XML(self.problem_text)
+
+        self.make_xml_compatible(self.tree)
+
+        # handle any <include file="foo"> tags
+        self._process_includes()
+
+        self.context = self._extract_context(self.tree)
+
+        if cache_key is not None:
+            extra_files = self.context['extra_files']
+            context = dict(self.context, extra_files=None)
+            self.capa_system.cache.set(cache_key, {
+                'tree': etree.tostring(self.tree),
+                'context': deepcopy(context),
+                'python_lib_md5': hashlib.md5(extra_files[0][1]).hexdigest() if extra_files else None,
+            })
+
+    def _parsed_problem_cache_key(self):
+        """
+        Return the key to cache the parsed problem under, or None if it can't
+        be cached.
+
+        Problems with <include> tags aren't cached, as the key doesn't cover
+        the included files.  The student's anonymous id is only part of the
+        key if the problem uses it, so that students who get the same seed
+        share the cached problem otherwise.
+        """
+        if not self.capa_system.cache or '<include' in self.problem_text:
+            return None
+
+        anonymous_student_id = None
+        if 'anonymous_student_id' in self.problem_text:
+            anonymous_student_id = self.capa_system.anonymous_student_id
+
+        md5er = hashlib.md5()
+        md5er.update(repr((
+            PARSED_PROBLEM_CACHE_VERSION,
+            self.problem_text,
+            self.problem_id,
+            self.seed,
+            anonymous_student_id,
+            bool(self.capa_system.can_execute_unsafe_code()),
+        )))
+        return "capa.parsed_problem.%s" % md5er.hexdigest()
+
+    def _load_parsed_problem(self, cache_key):
+        """
+        Set `self.tree` and `self.context` from the parsed problem cached under
+        `cache_key`.  Return False if it isn't cached, or it was cached with a
+        python_lib.zip that has since changed.
+
+        The cached context is copied, as responses add to their context.  It
+        may have been cached for another student, so it's given this student's
+        anonymous id.
+        """
+        cached = self.capa_system.cache.get(cache_key)
+        if not isinstance(cached, dict):
+            return False
+
+        context = deepcopy(cached['context'])
+        context['anonymous_student_id'] = self.capa_system.anonymous_student_id
+        if context['script_code']:
+            zip_lib = self.capa_system.get_python_lib_zip()
+            python_lib_md5 = hashlib.md5(zip_lib).hexdigest() if zip_lib is not None else None
+            if python_lib_md5 != cached['python_lib_md5']:
+                return False
+            if zip_lib is not None:
+                context['extra_files'] = [("python_lib.zip", zip_lib)]
+
+        self.tree = etree.XML(cached['tree'])
+        self.context = context
+        return True
+
     def make_xml_compatible(self, tree):
         """
         Adjust tree xml in-place for compatibility before creating
@@ -4,6 +4,7 @@ from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from .worker_pool import get_worker_pool
 from dogapi import dog_stats_api
 
 import hashlib
@@ -70,6 +71,27 @@ def update_hash(hasher, obj):
         hasher.update(repr(obj))
 
 
+def _cache_get(cache, key, slug):
+    """
+    Get the result cached for `key` from `cache`, telling it the `slug` if it
+    wants to know.
+    """
+    if hasattr(cache, 'get_result'):
+        return cache.get_result(key, slug)
+    return cache.get(key)
+
+
+def _cache_set(cache, key, value, slug):
+    """
+    Cache the result `value` for `key` in `cache`, telling it the `slug` if it
+    wants to know.
+    """
+    if hasattr(cache, 'set_result'):
+        cache.set_result(key, value, slug)
+    else:
+        cache.set(key, value)
+
+
 @dog_stats_api.timed('capa.safe_exec.time')
 def safe_exec(
     code,
@@ -99,12 +121,16 @@ def safe_exec(
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    the contents of `extra_files`, and the random seed.  If it also has .get_result(key, slug) and
+    .set_result(key, value, slug) methods, those are used instead, so that it can
+    tell which problem each result is for.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
 
     If `unsafely` is true, then the code will actually be executed without sandboxing.
+    Otherwise it is run in a pre-started sandbox worker if a worker pool has been
+    configured (see `worker_pool.configure`).
 
     """
     # Check the cache for a previous result.
@@ -113,8 +139,12 @@ def safe_exec(
         md5er = hashlib.md5()
         md5er.update(repr(code))
         update_hash(md5er, safe_globals)
+        # The code can import from the extra files, such as a course's python_lib.zip
+        for filename, contents in extra_files or ():
+            md5er.update(repr(filename))
+            md5er.update(contents)
         key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
-        cached = cache.get(key)
+        cached = _cache_get(cache, key, slug)
         if cached is not None:
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
@@ -128,8 +158,11 @@ def safe_exec(
     code_prolog = CODE_PROLOG % random_seed
 
     # Decide which code executor to use.
+    worker_pool = get_worker_pool()
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif worker_pool is not None:
+        exec_fn = worker_pool.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
@@ -148,7 +181,7 @@ def safe_exec(
     # the globals dict might not be entirely serializable.
     if cache:
         cleaned_results = json_safe(globals_dict)
-        cache.set(key, (emsg, cleaned_results))
+        _cache_set(cache, key, (emsg, cleaned_results), slug)
 
     # If an exception happened, raise it now.
     if emsg:
@@ -127,6 +127,14 @@ class TestSafeExecCaching(unittest.TestCase):
         safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
         self.assertEqual(g['a'], 17)
 
+    def test_cache_extra_files(self):
+        # The same code with different extra files, such as a changed
+        # python_lib.zip, is a cache miss.
+        cache = {}
+        for contents in ("a", "b", "a"):
+            safe_exec("a = 1", {}, extra_files=[("extra.txt", contents)], cache=DictCache(cache))
+        self.assertEqual(len(cache), 2)
+
     def test_cache_large_code_chunk(self):
         # Caching used to die on memcache with more than 250 bytes of code.
         # Check that it doesn't any more.
@@ -0,0 +1,131 @@
+"""Test the pool of pre-started sandbox workers, in its local mode."""
+
+import sys
+import textwrap
+import unittest
+import zipfile
+from cStringIO import StringIO
+
+from mock import patch
+
+from capa.safe_exec import safe_exec, worker_pool
+from codejail.safe_exec import SafeExecException
+
+# The module, rather than the function the package exports under its name
+SAFE_EXEC_MODULE = sys.modules['capa.safe_exec.safe_exec']
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Test that safe_exec runs code in the worker pool when there is one."""
+
+    def setUp(self):
+        super(TestWorkerPool, self).setUp()
+        worker_pool.configure(2, local=True, max_uses=1, exec_timeout=5, queue_timeout=30)
+        self.addCleanup(worker_pool.configure, 0)
+
+        patcher = patch.object(SAFE_EXEC_MODULE, 'codejail_safe_exec')
+        self.codejail_safe_exec = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_set_values(self):
+        g = {'b': 3}
+        safe_exec("a = b / 2", g)
+        self.assertEqual(g['a'], 1.5)
+        self.assertFalse(self.codejail_safe_exec.called)
+
+    def test_random_seeding(self):
+        g = {}
+        code = "rnums = [random.randint(0, 999) for _ in xrange(100)]"
+        safe_exec(code, g, random_seed=17)
+        first = g['rnums']
+        safe_exec(code, g, random_seed=17)
+        self.assertEqual(g['rnums'], first)
+
+    def test_python_path(self):
+        g = {}
+        pylib = textwrap.dedent("""\
+            def constant():
+                return 42
+            """)
+        safe_exec(
+            "import pylib\nanswer = pylib.constant()",
+            g,
+            python_path=["python_lib.zip"],
+            extra_files=[("python_lib.zip", make_zip({"pylib.py": pylib}))],
+        )
+        self.assertEqual(g['answer'], 42)
+
+    def test_raising_exceptions(self):
+        with self.assertRaises(SafeExecException) as cm:
+            safe_exec("1/0", {})
+        self.assertIn("ZeroDivisionError", cm.exception.message)
+
+    def test_writing_to_stdout(self):
+        g = {}
+        safe_exec("import sys\nsys.__stdout__.write('not a result\\n')\na = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_temporary_files(self):
+        g = {}
+        code = textwrap.dedent("""\
+            import os, tempfile
+            with tempfile.NamedTemporaryFile() as tmp:
+                tmp_dir = os.path.dirname(tmp.name)
+            """)
+        safe_exec(code, g)
+        # Each execution has its own temporary directory
+        first = g['tmp_dir']
+        safe_exec(code, g)
+        self.assertNotEqual(g['tmp_dir'], first)
+        self.assertTrue(first.endswith("/tmp"))
+
+    def test_unreadable_result(self):
+        worker = worker_pool.SandboxWorker(
+            [sys.executable, "-c", "import sys; sys.stdin.readline(); print 'not a result'"], {}, max_uses=2
+        )
+        self.addCleanup(worker.close)
+        with self.assertRaisesRegexp(SafeExecException, "unreadable"):
+            worker.run("a = 1", {}, None, None, timeout=5)
+        self.assertFalse(worker.usable)
+
+    def test_workers_recycled(self):
+        pool = worker_pool.get_worker_pool()
+        pids = set()
+        for _ in range(3):
+            g = {}
+            # Each execution is forked from its worker
+            safe_exec("import os\npid = os.getppid()", g)
+            pids.add(g['pid'])
+        self.assertEqual(len(pids), 3)
+        self.assertIs(worker_pool.get_worker_pool(), pool)
+
+    def test_timeout(self):
+        worker_pool.configure(1, local=True, exec_timeout=0.5)
+        with self.assertRaises(SafeExecException):
+            safe_exec("while True: pass", {})
+        # The pool recovers from the stopped worker
+        g = {}
+        safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_no_worker_available(self):
+        worker_pool.configure(1, local=True, queue_timeout=0)
+        with patch('capa.safe_exec.worker_pool.SandboxWorker', side_effect=OSError):
+            with patch('capa.safe_exec.worker_pool.codejail_safe_exec') as fallback:
+                safe_exec("a = 1", {})
+        self.assertTrue(fallback.called)
+
+    def test_not_configured(self):
+        worker_pool.configure(0)
+        self.assertIsNone(worker_pool.get_worker_pool())
+        safe_exec("a = 1", {})
+        self.assertTrue(self.codejail_safe_exec.called)
+
+
+def make_zip(files):
+    """Return the bytes of a zip file containing `files`, a dict of names and contents."""
+    buf = StringIO()
+    with zipfile.ZipFile(buf, "w") as zip_file:
+        for name, contents in files.items():
+            zip_file.writestr(name, contents)
+    return buf.getvalue()
@@ -0,0 +1,430 @@
+"""
+A pool of pre-started sandbox workers for safe_exec.
+
+codejail starts a new sandboxed Python for every execution, so the start-up
+of the interpreter and the imports problem code makes are paid on every check
+of a problem.  The workers in this pool are started ahead of time, import the
+modules problem code commonly uses, and then wait for code to run.  Each
+execution is run in a process forked from its worker, with codejail's
+resource limits and a writable temporary directory of its own, as codejail
+gives it.
+
+A forked execution runs as the same user as its worker, so it could tamper
+with the worker, and through it with the executions the worker runs after it.
+So sandboxed workers each run a single execution before they are replaced,
+and only the local mode allows more.
+
+The pool is off unless `configure` is called.  In "local" mode the workers
+are plain, unsandboxed subprocesses of this Python, which is only meant for
+testing.
+"""
+import atexit
+import json
+import logging
+import os
+import os.path
+import Queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from codejail import jail_code
+from codejail.safe_exec import json_safe, safe_exec as codejail_safe_exec, SafeExecException
+from dogapi import dog_stats_api
+
+log = logging.getLogger(__name__)
+
+# Modules that are imported by the workers before they are given any code to
+# run, as problem code so often uses them.
+PREIMPORTS = ("numpy", "math", "random", "scipy")
+
+# The program each worker runs.  It takes the resource limits, the modules to
+# import and the number of uses as arguments, and then reads one job per line
+# from stdin, writing the result of each as a line to stdout.  Each job is run
+# in a child forked for it, with the resource limits codejail sets, so that
+# nothing the code does outlives it, and it can't write to the worker's stdout.
+WORKER_CODE = r"""
+import json
+import os
+import resource
+import signal
+import sys
+import traceback
+
+limits = json.loads(sys.argv[1])
+for module_name in sys.argv[2].split(","):
+    try:
+        __import__(module_name)
+    except Exception:
+        pass
+
+
+def json_safe(d):
+    safe = {}
+    for key, value in d.iteritems():
+        if key == "__builtins__":
+            continue
+        try:
+            safe[key] = json.loads(json.dumps(value))
+        except Exception:
+            continue
+    return safe
+
+
+def set_limits():
+    # No subprocesses, and the CPU seconds, memory and file sizes of one job,
+    # as codejail sets.  The wall-clock REALTIME limit is the pool's timeout.
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    if limits.get("CPU"):
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["CPU"], limits["CPU"] + 1))
+    if limits.get("VMEM"):
+        resource.setrlimit(resource.RLIMIT_AS, (limits["VMEM"], limits["VMEM"]))
+    if limits.get("FSIZE") is not None:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limits["FSIZE"], limits["FSIZE"]))
+
+
+def run_job(job, result_fd):
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.chdir(job["dir"])
+    # The job's own writable temporary directory, as codejail sets TMPDIR
+    os.environ["TMPDIR"] = job["tmp_dir"]
+    if "tempfile" in sys.modules:
+        sys.modules["tempfile"].tempdir = None
+    sys.path.extend(job["python_path"])
+    set_limits()
+
+    globals_dict = job["globals"]
+    try:
+        exec compile(job["code"], "jailed_code", "exec") in globals_dict
+    except BaseException:
+        result = {"error": traceback.format_exc()}
+    else:
+        result = {"globals": json_safe(globals_dict)}
+    with os.fdopen(result_fd, "w") as result_file:
+        result_file.write(json.dumps(result))
+
+
+child = {"pid": None}
+
+
+def stop(signum, frame):
+    if child["pid"]:
+        try:
+            os.kill(child["pid"], signal.SIGKILL)
+        except OSError:
+            pass
+    os._exit(1)
+
+signal.signal(signal.SIGTERM, stop)
+
+stdout = sys.stdout
+for _ in range(int(sys.argv[3])):
+    line = sys.stdin.readline()
+    if not line:
+        break
+    job = json.loads(line)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.close(read_fd)
+        try:
+            run_job(job, write_fd)
+        finally:
+            os._exit(0)
+
+    child["pid"] = pid
+    os.close(write_fd)
+    with os.fdopen(read_fd) as result_file:
+        output = result_file.read()
+    _, status = os.waitpid(pid, 0)
+    child["pid"] = None
+
+    try:
+        result = json.loads(output)
+    except ValueError:
+        if os.WIFSIGNALED(status):
+            error = "The code was killed by signal {}".format(os.WTERMSIG(status))
+        else:
+            error = "The code stopped without a result"
+        result = {"error": error}
+    stdout.write(json.dumps(result) + "\n")
+    stdout.flush()
+"""
+
+
+class SandboxWorker(object):
+    """
+    A pre-started Python process that runs code it is sent.
+    """
+    def __init__(self, command, limits, max_uses, preimports=PREIMPORTS):
+        self.uses = 0
+        self.stopped = False
+        self.max_uses = max_uses
+        self.dir = tempfile.mkdtemp(prefix="codejail-")
+        os.chmod(self.dir, 0755)
+        with open(os.path.join(self.dir, "worker.py"), "w") as worker_file:
+            worker_file.write(WORKER_CODE)
+
+        with open(os.devnull, "w") as devnull:
+            self.process = subprocess.Popen(
+                command + ["-E", "-B", "worker.py", json.dumps(limits), ",".join(preimports), str(max_uses)],
+                cwd=self.dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+            )
+
+    @property
+    def usable(self):
+        """
+        Can this worker run any more code?
+        """
+        return not self.stopped and self.uses < self.max_uses and self.process.poll() is None
+
+    def run(self, code, globals_dict, python_path, extra_files, timeout):
+        """
+        Run `code` with `globals_dict` as its globals, updating them with the
+        resulting globals, as codejail's safe_exec does.
+
+        Raises SafeExecException if the code raises an exception, or doesn't
+        finish within `timeout` seconds.
+        """
+        self.uses += 1
+        job_dir = os.path.join(self.dir, "job-{}".format(self.uses))
+        os.mkdir(job_dir)
+        os.chmod(job_dir, 0755)
+        # The sandbox user can only write to this, as codejail arranges
+        tmp_dir = os.path.join(job_dir, "tmp")
+        os.mkdir(tmp_dir)
+        os.chmod(tmp_dir, 0777)
+
+        extra_names = set()
+        for name, contents in extra_files or ():
+            extra_names.add(name)
+            with open(os.path.join(job_dir, name), "wb") as extra_file:
+                extra_file.write(contents)
+
+        job_python_path = []
+        for path in python_path or ():
+            name = os.path.basename(path)
+            if name not in extra_names:
+                if os.path.isdir(path):
+                    shutil.copytree(path, os.path.join(job_dir, name))
+                else:
+                    shutil.copy(path, job_dir)
+            job_python_path.append(os.path.join(job_dir, name))
+
+        job = {
+            "code": code,
+            "globals": json_safe(globals_dict),
+            "python_path": job_python_path,
+            "dir": job_dir,
+            "tmp_dir": tmp_dir,
+        }
+
+        timer = threading.Timer(timeout, self.close)
+        timer.start()
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except IOError:
+            line = None
+        finally:
+            timer.cancel()
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+        if not line:
+            self.close()
+            raise SafeExecException("Couldn't execute jailed code: the sandbox worker stopped")
+
+        try:
+            result = json.loads(line)
+        except ValueError:
+            # The worker can't be trusted to run anything else
+            self.close()
+            raise SafeExecException("Couldn't execute jailed code: the sandbox worker's result was unreadable")
+        if "error" in result:
+            raise SafeExecException("Couldn't execute jailed code: {}".format(result["error"]))
+        globals_dict.update(result["globals"])
+
+    def close(self):
+        """
+        Stop the worker and remove its files.
+        """
+        self.stopped = True
+        if self.process.poll() is None:
+            try:
+                self.process.terminate()
+            except OSError:
+                pass
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class WorkerPool(object):
+    """
+    Keeps `size` idle workers started, and runs code in them.
+    """
+    def __init__(
+            self, size, command, limits=None, max_uses=1, exec_timeout=10, queue_timeout=1, preimports=PREIMPORTS
+    ):
+        self.size = size
+        self.command = command
+        self.limits = limits or {}
+        self.max_uses = max_uses
+        self.exec_timeout = exec_timeout
+        self.queue_timeout = queue_timeout
+        self.preimports = preimports
+        self.idle = Queue.Queue()
+        self.starting = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def start_workers(self):
+        """
+        Start enough workers, in the background, to bring the pool back up to
+        its size.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            needed = self.size - self.idle.qsize() - self.starting
+            self.starting += max(needed, 0)
+        for _ in range(needed):
+            thread = threading.Thread(target=self._start_worker)
+            thread.daemon = True
+            thread.start()
+
+    def _start_worker(self):
+        """
+        Start a worker and add it to the idle workers.
+        """
+        try:
+            worker = SandboxWorker(self.command, self.limits, self.max_uses, self.preimports)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Couldn't start a sandbox worker")
+        else:
+            self.idle.put(worker)
+        finally:
+            with self.lock:
+                self.starting -= 1
+
+        # The pool may have been closed while the worker was starting
+        if self.closed:
+            self.close()
+
+    def safe_exec(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        """
+        A drop-in replacement for codejail's safe_exec that runs the code in
+        one of the pool's workers.
+
+        If no worker becomes idle within `queue_timeout` seconds, the code is
+        run by codejail instead.
+        """
+        self.start_workers()
+        start = time.time()
+        try:
+            worker = self.idle.get(timeout=self.queue_timeout)
+        except Queue.Empty:
+            dog_stats_api.increment("capa.safe_exec.pool.queue_timeout")
+            log.warning("No sandbox worker was available to run %s", slug)
+            return codejail_safe_exec(
+                code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug
+            )
+        dog_stats_api.histogram("capa.safe_exec.pool.queue_wait", time.time() - start)
+
+        timeout = self.exec_timeout
+        if self.limits.get("REALTIME"):
+            timeout = min(timeout, self.limits["REALTIME"])
+        try:
+            with dog_stats_api.timer("capa.safe_exec.pool.exec_time"):
+                worker.run(code, globals_dict, python_path, extra_files, timeout)
+        finally:
+            if worker.usable and not self.closed:
+                self.idle.put(worker)
+            else:
+                worker.close()
+                self.start_workers()
+
+    def close(self):
+        """
+        Stop all of the idle workers, and don't start any more.
+        """
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Queue.Empty:
+                break
+
+
+_CONFIG = None
+_POOL = None
+_POOL_PID = None
+
+
+def _close_pool():
+    """
+    Stop the workers of this process's pool, if it has one.
+    """
+    if _POOL is not None and _POOL_PID == os.getpid():
+        _POOL.close()
+
+
+atexit.register(_close_pool)
+
+
+def configure(size=0, python_bin=None, user=None, limits=None, local=False, **options):
+    """
+    Configure a pool of `size` workers for safe_exec to use.
+
+    `python_bin` and `user` are the sandboxed Python and the user to run it
+    as, and `limits` the limits to override codejail's with, as configured for
+    codejail.  If `local` is true, the workers are instead unsandboxed
+    subprocesses of this Python.  The other `options` are those of WorkerPool,
+    except that sandboxed workers always have a `max_uses` of 1.
+
+    codejail's PROXY limit isn't used: it runs codejail's sandboxed Pythons
+    through a proxy process so that they aren't forked from this large one
+    while it handles a request, and the workers are started ahead of time.
+    """
+    global _CONFIG, _POOL  # pylint: disable=global-statement
+    _close_pool()
+    _POOL = None
+
+    if local:
+        command = [sys.executable]
+        limits = {}
+    elif python_bin:
+        command = ["sudo", "-u", user, python_bin] if user else [python_bin]
+        limits = dict(jail_code.LIMITS, **(limits or {}))
+        options["max_uses"] = 1
+    else:
+        command = None
+
+    _CONFIG = None
+    if size and command:
+        _CONFIG = dict(options, size=size, command=command, limits=limits)
+
+
+def get_worker_pool():
+    """
+    Return this process's worker pool, or None if there isn't one configured.
+
+    Pools are started lazily in each process, so that the workers aren't
+    shared by processes forked after `configure` is called.
+    """
+    global _POOL, _POOL_PID  # pylint: disable=global-statement
+    if _CONFIG is None:
+        return None
+    if _POOL is None or _POOL_PID != os.getpid():
+        _POOL = WorkerPool(**_CONFIG)
+        _POOL_PID = os.getpid()
+    return _POOL
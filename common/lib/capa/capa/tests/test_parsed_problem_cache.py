@@ -0,0 +1,94 @@
+"""
+Tests of the caching of parsed problems by LoncapaProblem.
+"""
+import textwrap
+import unittest
+
+import mock
+
+from capa.safe_exec import safe_exec
+from capa.safe_exec.tests.test_safe_exec import DictCache
+from . import new_loncapa_problem, test_capa_system
+
+
+class ParsedProblemCacheTest(unittest.TestCase):
+    """
+    Tests that parsed problems are cached, and only reused when that's safe.
+    """
+    xml = textwrap.dedent("""
+        <problem>
+            <script type="loncapa/python">
+        x = random.randint(0, 1000)
+        answers = [x, x + 1]
+            </script>
+            <p>What is $x?</p>
+            <stringresponse answer="$x">
+                <textline size="20"/>
+            </stringresponse>
+        </problem>
+    """)
+
+    def setUp(self):
+        super(ParsedProblemCacheTest, self).setUp()
+        self.cache = DictCache({})
+        patcher = mock.patch('capa.capa_problem.safe_exec', wraps=safe_exec)
+        self.safe_exec = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_problem(self, xml=None, seed=723, python_lib_zip=None, anonymous_student_id='student'):
+        """
+        Create a problem with its own capa system, sharing the test's cache.
+        """
+        capa_system = test_capa_system()
+        capa_system.anonymous_student_id = anonymous_student_id
+        capa_system.cache = self.cache
+        capa_system.get_python_lib_zip = lambda: python_lib_zip
+        return new_loncapa_problem(xml or self.xml, capa_system=capa_system, seed=seed)
+
+    def test_parsed_problem_reused(self):
+        problem = self.new_problem()
+        cached_problem = self.new_problem()
+
+        self.assertEqual(self.safe_exec.call_count, 1)
+        self.assertEqual(cached_problem.context['x'], problem.context['x'])
+        self.assertEqual(cached_problem.get_html(), problem.get_html())
+        self.assertEqual(cached_problem.get_question_answers(), problem.get_question_answers())
+
+    def test_cached_context_copied(self):
+        problem = self.new_problem()
+        problem.context['answers'].append(0)
+
+        cached_problem = self.new_problem()
+        self.assertEqual(len(cached_problem.context['answers']), 2)
+
+    def test_anonymous_student_id_not_shared(self):
+        self.new_problem(anonymous_student_id='first')
+        cached_problem = self.new_problem(anonymous_student_id='second')
+        self.assertEqual(self.safe_exec.call_count, 1)
+        self.assertEqual(cached_problem.context['anonymous_student_id'], 'second')
+
+    def test_seed_not_shared(self):
+        self.new_problem(seed=1)
+        self.new_problem(seed=2)
+        self.assertEqual(self.safe_exec.call_count, 2)
+
+    def test_python_lib_changed(self):
+        problem = self.new_problem(python_lib_zip='zip one')
+        self.new_problem(python_lib_zip='zip one')
+        self.assertEqual(self.safe_exec.call_count, 1)
+
+        changed_problem = self.new_problem(python_lib_zip='zip two')
+        self.assertEqual(self.safe_exec.call_count, 2)
+        self.assertEqual(problem.context['extra_files'], [('python_lib.zip', 'zip one')])
+        self.assertEqual(changed_problem.context['extra_files'], [('python_lib.zip', 'zip two')])
+
+    def test_includes_not_cached(self):
+        xml = textwrap.dedent("""
+            <problem>
+                <include file="test_include.xml"/>
+            </problem>
+        """)
+        with mock.patch.object(self.cache, 'get') as cache_get:
+            self.new_problem(xml)
+        self.assertFalse(cache_get.called)
+        self.assertEqual(self.cache.cache, {})
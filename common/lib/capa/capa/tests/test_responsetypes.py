@@ -591,6 +591,22 @@ class FormulaResponseTest(ResponseTest):
         self.assertTrue(problem.responders.values()[0].validate_answer('14*x'))
         self.assertFalse(problem.responders.values()[0].validate_answer('3*y+2*x'))
 
+    def test_answers_parsed_once(self):
+        """
+        Test that the answers are parsed once, rather than once per sample.
+        """
+        sample_dict = {'x': (-10, 10), 'y': (-10, 10)}
+        problem = self.build_problem(sample_dict=sample_dict,
+                                     num_samples=10,
+                                     tolerance=0.01,
+                                     answer="x+2*y")
+
+        with mock.patch('calc.calc.ParseAugmenter.parse_algebra', autospec=True,
+                        side_effect=calc.ParseAugmenter.parse_algebra) as mock_parse:
+            self.assert_grade(problem, "2*x - x + y + y", "correct")
+        # The student's answer and the instructor's
+        self.assertEqual(mock_parse.call_count, 2)
+
 
 class StringResponseTest(ResponseTest):  # pylint: disable=missing-docstring
     xml_factory_class = StringResponseXMLFactory
@@ -212,10 +212,20 @@ class SequenceModule(SequenceFields, ProctoringFields, XModule):
                 return fragment
 
         display_items = self.get_display_items()
-        for child in display_items:
+
+        # When deferring, only the active child is rendered; the others are
+        # fetched by the client from the xblock_view endpoint when selected.
+        defer_inactive_children = context.get('defer_inactive_children', False)
+        active_index = self.position - 1 if 0 < self.position <= len(display_items) else 0
+
+        for index, child in enumerate(display_items):
             is_bookmarked = bookmarks_service.is_bookmarked(usage_key=child.scope_ids.usage_id)
             context["bookmarked"] = is_bookmarked
 
+            if defer_inactive_children and index != active_index:
+                contents.append(self._deferred_child_info(child, is_bookmarked, display_names))
+                continue
+
             progress = child.get_progress()
             rendered_child = child.render(STUDENT_VIEW, context)
             fragment.add_frag_resources(rendered_child)
@@ -245,16 +255,44 @@ class SequenceModule(SequenceFields, ProctoringFields, XModule):
             'position': self.position,
             'tag': self.location.category,
             'ajax_url': self.system.ajax_url,
+            'course_id': self.location.course_key.to_deprecated_string(),
         }
 
         fragment.add_content(self.system.render_template("seq_module.html", params))
 
-        self._capture_full_seq_item_metrics(display_items)
+        self._capture_full_seq_item_metrics(display_items, count_items=not defer_inactive_children)
         self._capture_current_unit_metrics(display_items)
 
         # Get all descendant XBlock types and counts
         return fragment
 
+    def _deferred_child_info(self, child, is_bookmarked, display_names):
+        """
+        Returns the tab metadata for a child whose content is not rendered
+        with the sequence.
+
+        Everything here comes from the child itself and the usage keys of its
+        children, so none of the child's descendants are loaded or bound.
+        """
+        child_types = set(usage_key.block_type for usage_key in getattr(child, 'children', []))
+        icon_class = 'other'
+        for higher_class in class_priority:
+            if higher_class in child_types:
+                icon_class = higher_class
+
+        return {
+            'content': '',
+            'deferred': True,
+            'title': child.display_name_with_default_escaped,
+            'page_title': child.display_name_with_default,
+            'progress_status': Progress.to_js_status_str(None),
+            'progress_detail': Progress.to_js_detail_str(None),
+            'type': icon_class,
+            'id': child.scope_ids.usage_id.to_deprecated_string(),
+            'bookmarked': is_bookmarked,
+            'path': " > ".join(display_names + [child.display_name_with_default]),
+        }
+
     def _locations_in_subtree(self, node):
         """
         The usage keys for all descendants of an XBlock/XModule as a flat list.
@@ -281,15 +319,21 @@ class SequenceModule(SequenceFields, ProctoringFields, XModule):
         newrelic.agent.add_custom_parameter('seq.position', self.position)
         newrelic.agent.add_custom_parameter('seq.is_time_limited', self.is_time_limited)
 
-    def _capture_full_seq_item_metrics(self, display_items):
+    def _capture_full_seq_item_metrics(self, display_items, count_items=True):
         """
         Capture information about the number and types of XBlock content in
         the sequence as a whole. We send this information to New Relic so that
         we can do better performance analysis of courseware.
+
+        Counting the items requires loading every descendant of the sequence,
+        so it is skipped (`count_items` is False) when the inactive units are
+        not being rendered.
         """
         # Basic count of the number of Units (a.k.a. VerticalBlocks) we have in
         # this learning sequence
         newrelic.agent.add_custom_parameter('seq.num_units', len(display_items))
+        if not count_items:
+            return
 
         # Count of all modules (leaf nodes) in this sequence (e.g. videos,
         # problems, etc.) The units (verticals) themselves are not counted.
@@ -1194,19 +1194,43 @@ class ConfigurableFragmentWrapper(object):
     """
     Runtime mixin that allows for composition of many `wrap_xblock` wrappers
     """
-    def __init__(self, wrappers=None, **kwargs):
+    def __init__(self, wrappers=None, render_wrappers=None, **kwargs):
         """
         :param wrappers: A list of wrappers, where each wrapper is:
 
             def wrapper(block, view, frag, context):
                 ...
                 return wrapped_frag
+
+        :param render_wrappers: A list of wrappers around the rendering of a view,
+            which may choose not to render it at all, where each wrapper is:
+
+            def render_wrapper(render, block, view, context):
+                ...
+                return frag
+
+            and `render(block, view, context)` renders the view, including applying `wrappers`.
+            The first render wrapper in the list is the outermost one.
         """
         super(ConfigurableFragmentWrapper, self).__init__(**kwargs)
         if wrappers is not None:
             self.wrappers = wrappers
         else:
             self.wrappers = []
+        if render_wrappers is not None:
+            self.render_wrappers = render_wrappers
+        else:
+            self.render_wrappers = []
+
+    def render(self, block, view_name, context=None):
+        """
+        See :func:`Runtime.render`
+        """
+        render = super(ConfigurableFragmentWrapper, self).render
+        for render_wrapper in reversed(self.render_wrappers):
+            render = partial(render_wrapper, render)
+
+        return render(block, view_name, context)
 
     def wrap_xblock(self, block, view, frag, context):
         """
@@ -0,0 +1,128 @@
+"""
+Reuse of connections to the email backend by bulk email subtasks.
+
+Each send_course_email subtask used to open its own connection to the email
+backend and close it again once its batch was sent, so that every batch of
+BULK_EMAIL_EMAILS_PER_TASK emails paid for connecting, and for the greeting,
+EHLO, STARTTLS and login that follow.  Subtasks now take a connection from
+their process's pool, and give it back when they've finished with it, so one
+connection is kept open across the batches the process sends.
+
+Each process keeps up to BULK_EMAIL_CONNECTION_POOL_SIZE idle connections.  A
+connection that has been idle for longer than BULK_EMAIL_CONNECTION_MAX_IDLE
+seconds is checked with NOOP before it's reused, as the server may have closed
+it in the meantime.
+"""
+import logging
+import os
+import Queue
+import socket
+import time
+from smtplib import SMTPException
+
+from django.conf import settings
+
+import dogstats_wrapper as dog_stats_api
+
+log = logging.getLogger(__name__)
+
+
+def is_connection_usable(connection):
+    """
+    Is the email backend `connection` still open?
+
+    Only SMTP connections can be checked:  connections of other backends are
+    assumed to still be usable.
+    """
+    if not hasattr(connection, 'connection'):
+        return True
+    server = connection.connection
+    if server is None:
+        return False
+    if not hasattr(server, 'noop'):
+        return True
+    try:
+        return server.noop()[0] == 250
+    except (SMTPException, socket.error):
+        return False
+
+
+def close_connection(connection):
+    """
+    Close the email backend `connection`, ignoring any error in doing so.
+    """
+    try:
+        connection.close()
+    except Exception:  # pylint: disable=broad-except
+        log.warning("Error closing a bulk email connection", exc_info=True)
+
+
+class EmailConnectionPool(object):
+    """
+    Keeps open connections to the email backend that have been given back, for
+    the next subtasks to use.  New connections are made with `connection_factory`.
+    """
+    def __init__(self, connection_factory):
+        self.connection_factory = connection_factory
+        # The most recently used connection is the most likely to still be open
+        self.idle = Queue.LifoQueue()
+
+    def get(self):
+        """
+        Return an open connection:  an idle one, if there's one that is still
+        usable, or else a new one.
+        """
+        while True:
+            try:
+                connection, last_used = self.idle.get_nowait()
+            except Queue.Empty:
+                break
+            if time.time() - last_used < settings.BULK_EMAIL_CONNECTION_MAX_IDLE or is_connection_usable(connection):
+                dog_stats_api.increment('course_email.connection.reused')
+                return connection
+            close_connection(connection)
+
+        dog_stats_api.increment('course_email.connection.opened')
+        connection = self.connection_factory()
+        connection.open()
+        return connection
+
+    def put(self, connection):
+        """
+        Give back a `connection` that is still usable, to be kept open if there's
+        room for it in the pool, or else closed.
+        """
+        if self.idle.qsize() < settings.BULK_EMAIL_CONNECTION_POOL_SIZE:
+            self.idle.put((connection, time.time()))
+        else:
+            close_connection(connection)
+
+    def close(self):
+        """
+        Close all of the idle connections.
+        """
+        while True:
+            try:
+                connection, _last_used = self.idle.get_nowait()
+            except Queue.Empty:
+                break
+            close_connection(connection)
+
+
+_POOL = None
+_POOL_PID = None
+
+
+def get_connection_pool(connection_factory):
+    """
+    Return this process's pool of connections.
+
+    The pool is made, to make new connections with `connection_factory`, the
+    first time this is called in each process, so that connections aren't
+    shared by processes forked after one was opened.
+    """
+    global _POOL, _POOL_PID  # pylint: disable=global-statement
+    if _POOL is None or _POOL_PID != os.getpid():
+        _POOL = EmailConnectionPool(connection_factory)
+        _POOL_PID = os.getpid()
+    return _POOL
@@ -0,0 +1,197 @@
+"""A command to benchmark sending batches of bulk email.
+
+It compares sending them as send_course_email subtasks used to, on a new
+connection for each batch with each message rendered from the template, with
+sending them as they do now, on pooled connections with compiled templates.
+The messages are sent to an SMTP server that the command runs locally, which
+discards them, so that the rates are those of the sending alone.
+
+Batches are sent `--concurrency` at a time, by that many threads sharing a
+connection pool, as the subtasks of a threaded or eventlet worker share their
+process's pool.  BULK_EMAIL_CONNECTION_POOL_SIZE should be at least the
+concurrency for every connection to be reused.
+
+"""
+
+import asyncore
+import optparse
+import smtpd
+import threading
+import time
+from functools import partial
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import NoArgsCommand
+
+from bulk_email.connections import EmailConnectionPool
+from bulk_email.models import CourseEmailTemplate
+
+BENCHMARK_CONTEXT = {
+    'course_title': "Benchmark Course",
+    'course_url': "/courses/benchmark/course/run/",
+    'course_image_url': "/c4x/benchmark/course/asset/images_course_image.jpg",
+    'email_settings_url': "/dashboard",
+    'platform_name': "edX",
+    'course_end_date': "never",
+    'course_id': "benchmark/course/run",
+}
+BENCHMARK_MESSAGE = (
+    u"<p>Dear %%USER_FULLNAME%%,</p><p>%%COURSE_DISPLAY_NAME%% ends %%COURSE_END_DATE%%.</p>" * 20
+)
+
+
+class Command(NoArgsCommand):
+    """The actual benchmark_bulk_email_sending command."""
+
+    help = "Benchmarks sending batches of bulk email to a local SMTP server, with and without pooled connections."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--batches',
+            type='int',
+            default=50,
+            help="How many batches of email to send each way.",
+        ),
+        optparse.make_option(
+            '--batch-size',
+            type='int',
+            default=100,
+            help="How many emails are in each batch, as BULK_EMAIL_EMAILS_PER_TASK sets.",
+        ),
+        optparse.make_option(
+            '--concurrency',
+            type='int',
+            default=1,
+            help="How many batches to send at once.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        num_batches = options['batches']
+        batch_size = options['batch_size']
+        concurrency = options['concurrency']
+        num_messages = num_batches * batch_size
+        template = CourseEmailTemplate.get_template()
+        recipients = [
+            {'name': u'Student {}'.format(index), 'email': u'student{}@example.com'.format(index), 'user_id': index}
+            for index in xrange(batch_size)
+        ]
+
+        server = CountingSMTPServer()
+        thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.05})
+        thread.daemon = True
+        thread.start()
+        connection_factory = partial(
+            get_connection,
+            'django.core.mail.backends.smtp.EmailBackend',
+            host=server.host,
+            port=server.port,
+            username='',
+            password='',
+            use_tls=False,
+            use_ssl=False,
+        )
+
+        try:
+            start = time.time()
+            send_concurrently(concurrency, num_batches, send_unpooled, connection_factory, template, recipients)
+            unpooled_secs = time.time() - start
+            unpooled_connections = server.connections
+
+            pool = EmailConnectionPool(connection_factory)
+            start = time.time()
+            send_concurrently(concurrency, num_batches, send_pooled, pool, template, recipients)
+            pooled_secs = time.time() - start
+            pooled_connections = server.connections - unpooled_connections
+            pool.close()
+        finally:
+            server.close()
+            # The server's thread stops once the connections to it are closed too
+            thread.join(1)
+
+        if server.messages != 2 * num_messages:
+            self.stderr.write("The server received {} of {} messages\n".format(server.messages, 2 * num_messages))
+        self.stdout.write(
+            "Sending {} emails in batches of {}, {} at a time: {:.0f}/s on {} connections unpooled, "
+            "{:.0f}/s on {} connections pooled\n".format(
+                num_messages, batch_size, concurrency,
+                num_messages / unpooled_secs, unpooled_connections,
+                num_messages / pooled_secs, pooled_connections,
+            )
+        )
+
+
+class CountingSMTPServer(smtpd.SMTPServer):
+    """
+    A local SMTP server that counts the connections made to it and the
+    messages it receives, and discards the messages.
+    """
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.host, self.port = self.socket.getsockname()
+        self.connections = 0
+        self.messages = 0
+
+    def handle_accept(self):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages += 1
+
+
+def send_concurrently(concurrency, num_batches, send_batch, *args):
+    """
+    Call `send_batch(*args)` `num_batches` times, from `concurrency` threads.
+    """
+    def send_batches(count):
+        """
+        Send `count` batches.
+        """
+        for _ in xrange(count):
+            send_batch(*args)
+
+    threads = [
+        threading.Thread(target=send_batches, args=(num_batches // concurrency + (index < num_batches % concurrency),))
+        for index in xrange(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def send_message(connection, plaintext, html, email):
+    """
+    Send one email on `connection`.
+    """
+    message = EmailMultiAlternatives("Benchmark", plaintext, 'benchmark@example.com', [email], connection=connection)
+    message.attach_alternative(html, 'text/html')
+    connection.send_messages([message])
+
+
+def send_unpooled(connection_factory, template, recipients):
+    """
+    Send a batch on a new connection, rendering each message from the template.
+    """
+    connection = connection_factory()
+    connection.open()
+    for recipient in recipients:
+        context = dict(BENCHMARK_CONTEXT, **recipient)
+        plaintext = template.render_plaintext(BENCHMARK_MESSAGE, context)
+        html = template.render_htmltext(BENCHMARK_MESSAGE, context)
+        send_message(connection, plaintext, html, recipient['email'])
+    connection.close()
+
+
+def send_pooled(pool, template, recipients):
+    """
+    Send a batch on a pooled connection, rendering each message from compiled templates.
+    """
+    connection = pool.get()
+    plaintext_template = template.compile_plaintext(BENCHMARK_MESSAGE, BENCHMARK_CONTEXT)
+    html_template = template.compile_htmltext(BENCHMARK_MESSAGE, BENCHMARK_CONTEXT)
+    for recipient in recipients:
+        context = dict(BENCHMARK_CONTEXT, **recipient)
+        send_message(connection, plaintext_template.render(context), html_template.render(context), recipient['email'])
+    pool.put(connection)
@@ -12,6 +12,8 @@ file and check it in at the same time as your model changes. To do that,
 
 """
 import logging
+import re
+
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models, transaction
@@ -20,7 +22,7 @@ from openedx.core.lib.html_to_text import html_to_text
 from openedx.core.lib.mail_utils import wrap_message
 
 from xmodule_django.models import CourseKeyField
-from util.keyword_substitution import substitute_keywords_with_data
+from util.keyword_substitution import anonymous_id_from_user_id, substitute_keywords_with_data
 
 log = logging.getLogger(__name__)
 
@@ -217,6 +219,69 @@ class CourseEmailTemplate(models.Model):
         """
         return CourseEmailTemplate._render(self.html_template, htmltext, context)
 
+    def compile_plaintext(self, plaintext, context):
+        """
+        Returns a CompiledEmailTemplate of the plain text message for
+        `plaintext`, for all of the recipients of an email with `context`.
+        """
+        return CompiledEmailTemplate(self.plain_template, plaintext, context)
+
+    def compile_htmltext(self, htmltext, context):
+        """
+        Returns a CompiledEmailTemplate of the HTML message for `htmltext`,
+        for all of the recipients of an email with `context`.
+        """
+        return CompiledEmailTemplate(self.html_template, htmltext, context)
+
+
+class CompiledEmailTemplate(object):
+    """
+    A message body inserted into a template, with everything that is the same
+    for all of an email's recipients already rendered, so that only the values
+    of each recipient are left to fill in.
+
+    Rendering it for a recipient gives the same message as rendering the
+    template with CourseEmailTemplate, with the recipient's values in the
+    context.
+    """
+    # The values of the context that are particular to each recipient
+    RECIPIENT_KEYS = ('name', 'email', 'user_id')
+
+    # Stands in for the values to fill in, until the message is rendered
+    SLOT_FORMAT = u'\x00{}\x00'
+    SLOT_PATTERN = re.compile(u'\x00(\\w+)\x00')
+
+    def __init__(self, format_string, message_body, context):
+        context = dict(context)
+        for key in self.RECIPIENT_KEYS:
+            context[key] = self.SLOT_FORMAT.format(key)
+
+        # The keywords in the message body are substituted, as they are by
+        # CourseEmailTemplate, except for the recipient's anonymous user id.
+        if 'course_id' in context:
+            message_body = message_body.replace('%%USER_ID%%', self.SLOT_FORMAT.format('anonymous_user_id'))
+            message_body = substitute_keywords_with_data(message_body, context)
+
+        result = format_string.format(**context)
+        result = result.replace(COURSE_EMAIL_MESSAGE_BODY_TAG.format(), message_body, 1)
+
+        # The parts at odd indexes are the keys of the values to fill in
+        self.parts = self.SLOT_PATTERN.split(result)
+
+    def render(self, recipient_context):
+        """
+        Returns the message for the recipient with `recipient_context`, which
+        should have a value for each of RECIPIENT_KEYS.
+        """
+        values = {key: unicode(recipient_context[key]) for key in self.RECIPIENT_KEYS}
+        parts = list(self.parts)
+        for index in xrange(1, len(parts), 2):
+            key = parts[index]
+            if key == 'anonymous_user_id' and key not in values:
+                values[key] = anonymous_id_from_user_id(recipient_context['user_id'])
+            parts[index] = values[key]
+        return wrap_message(u''.join(parts))
+
 
 class CourseAuthorization(models.Model):
     """
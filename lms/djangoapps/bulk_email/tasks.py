@@ -6,7 +6,7 @@ to a course.
 import re
 import random
 import json
-from time import sleep
+from time import sleep, time
 from collections import Counter
 import logging
 
@@ -34,6 +34,7 @@ from django.contrib.auth.models import User
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.urlresolvers import reverse
 
+from bulk_email.connections import get_connection_pool
 from bulk_email.models import (
     CourseEmail, Optout,
     SEND_TO_MYSELF, SEND_TO_ALL, TO_OPTIONS,
@@ -326,6 +327,7 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
     # To deal with that, we need to confirm that the task has not already been completed.
     check_subtask_is_valid(entry_id, current_task_id, subtask_status)
 
+    start_time = time()
     send_exception = None
     new_subtask_status = None
     try:
@@ -344,10 +346,12 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
         # We got here for really unexpected reasons.  Since we don't know how far
         # the task got in emailing, we count all recipients as having failed.
         # It at least keeps the counts consistent.
-        subtask_status.increment(failed=num_to_send, state=FAILURE)
+        subtask_status.increment(failed=num_to_send, state=FAILURE, duration_ms=_duration_ms(start_time))
         update_subtask_status(entry_id, current_task_id, subtask_status)
         raise
 
+    # Record how long this attempt took, for sizing the subtasks of later emails.
+    new_subtask_status.increment(duration_ms=_duration_ms(start_time))
     if send_exception is None:
         # Update the InstructorTask object that is storing its progress.
         log.info("Send-email task %s for email %s: succeeded", current_task_id, email_id)
@@ -369,24 +373,44 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
     return new_subtask_status.to_dict()
 
 
-def _filter_optouts_from_recipients(to_list, course_id):
+# The ids of the users who have opted out of email from the course of the last
+# task this process sent email for, so that its other subtasks needn't load them again
+# for OPTOUTS_TTL seconds.
+OPTOUTS_TTL = 60
+_OPTOUTS = {'task_id': None, 'loaded': 0, 'user_ids': frozenset()}
+
+
+def _get_optout_user_ids(parent_task_id, course_id):
+    """
+    Returns the set of ids of the users who have opted out of email from
+    `course_id`, loaded at most once every OPTOUTS_TTL seconds for each
+    parent task in each process, so that opting out takes effect on the
+    rest of a long-running task.
     """
-    Filters a recipient list based on student opt-outs for a given course.
+    now = time()
+    if _OPTOUTS['task_id'] != parent_task_id or now - _OPTOUTS['loaded'] >= OPTOUTS_TTL:
+        _OPTOUTS['user_ids'] = frozenset(
+            Optout.objects.filter(course_id=course_id).values_list('user_id', flat=True)
+        )
+        _OPTOUTS['task_id'] = parent_task_id
+        _OPTOUTS['loaded'] = now
+    return _OPTOUTS['user_ids']
+
+
+def _filter_optouts_from_recipients(to_list, optout_user_ids):
+    """
+    Filters a recipient list based on the set of ids of the users who have
+    opted out of email from the course.
 
     Returns the filtered recipient list, as well as the number of optouts
     removed from the list.
     """
-    optouts = Optout.objects.filter(
-        course_id=course_id,
-        user__in=[i['pk'] for i in to_list]
-    ).values_list('user__email', flat=True)
-    optouts = set(optouts)
+    filtered_list = [recipient for recipient in to_list if recipient['pk'] not in optout_user_ids]
     # Only count the num_optout for the first time the optouts are calculated.
     # We assume that the number will not change on retries, and so we don't need
     # to calculate it each time.
-    num_optout = len(optouts)
-    to_list = [recipient for recipient in to_list if recipient['email'] not in optouts]
-    return to_list, num_optout
+    num_optout = len(to_list) - len(filtered_list)
+    return filtered_list, num_optout
 
 
 def _get_source_address(course_id, course_title):
@@ -474,7 +498,8 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
     # that existed at that time, and we don't need to keep checking for changes
     # in the Optout list.
     if subtask_status.get_retry_count() == 0:
-        to_list, num_optout = _filter_optouts_from_recipients(to_list, course_email.course_id)
+        optout_user_ids = _get_optout_user_ids(parent_task_id, course_email.course_id)
+        to_list, num_optout = _filter_optouts_from_recipients(to_list, optout_user_ids)
         subtask_status.increment(skipped=num_optout)
 
     course_title = global_email_context['course_title']
@@ -485,13 +510,22 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
 
     # use the CourseEmailTemplate that was associated with the CourseEmail
     course_email_template = course_email.get_template()
+    # A connection taken from the pool is given back at the end if the subtask completes,
+    # to be reused by the next subtask, and otherwise closed.
+    connection_pool = get_connection_pool(lambda: get_connection())  # pylint: disable=unnecessary-lambda
+    connection = None
+    connection_reusable = False
     try:
-        connection = get_connection()
-        connection.open()
+        connection = connection_pool.get()
 
         # Define context values to use in all course emails:
         email_context = {'name': '', 'email': ''}
         email_context.update(global_email_context)
+        email_context['course_id'] = course_email.course_id
+
+        # Render everything but the recipient's values into the messages once for all recipients:
+        plaintext_template = course_email_template.compile_plaintext(course_email.text_message, email_context)
+        html_template = course_email_template.compile_htmltext(course_email.html_message, email_context)
 
         while to_list:
             # Update context with user-specific values from the user at the end of the list.
@@ -505,11 +539,10 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             email_context['email'] = email
             email_context['name'] = current_recipient['profile__name']
             email_context['user_id'] = current_recipient['pk']
-            email_context['course_id'] = course_email.course_id
 
             # Construct message content using templates and context:
-            plaintext_msg = course_email_template.render_plaintext(course_email.text_message, email_context)
-            html_msg = course_email_template.render_htmltext(course_email.html_message, email_context)
+            plaintext_msg = plaintext_template.render(email_context)
+            html_msg = html_template.render(email_context)
 
             # Create email:
             email_msg = EmailMultiAlternatives(
@@ -693,11 +726,21 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # All went well.  Update counters with progress to date,
         # and set the state to SUCCESS:
         subtask_status.increment(state=SUCCESS)
+        connection_reusable = True
         # Successful completion is marked by an exception value of None.
         return subtask_status, None
     finally:
         # Clean up at the end.
-        connection.close()
+        if connection is not None:
+            if connection_reusable:
+                connection_pool.put(connection)
+            else:
+                connection.close()
+
+
+def _duration_ms(start_time):
+    """Returns the number of milliseconds since `start_time`."""
+    return int((time() - start_time) * 1000)
 
 
 def _get_current_task():
@@ -0,0 +1,199 @@
+"""
+Unit tests for the pool of bulk email connections, and of sending through it
+to a local SMTP server.
+"""
+import asyncore
+import smtpd
+import threading
+import time
+from smtplib import SMTPServerDisconnected
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from mock import Mock
+from nose.plugins.attrib import attr
+
+from bulk_email.connections import EmailConnectionPool, is_connection_usable
+from bulk_email.models import CourseEmailTemplate
+
+
+@attr('shard_1')
+@override_settings(BULK_EMAIL_CONNECTION_POOL_SIZE=2, BULK_EMAIL_CONNECTION_MAX_IDLE=60)
+class EmailConnectionPoolTest(TestCase):
+    """Tests of EmailConnectionPool."""
+
+    def setUp(self):
+        super(EmailConnectionPoolTest, self).setUp()
+        self.connection_factory = Mock(side_effect=lambda: Mock(spec=['open', 'close', 'send_messages']))
+        self.pool = EmailConnectionPool(self.connection_factory)
+
+    def test_new_connections_opened(self):
+        connection = self.pool.get()
+        connection.open.assert_called_once_with()
+        self.assertIsNot(self.pool.get(), connection)
+        self.assertEqual(self.connection_factory.call_count, 2)
+
+    def test_connection_reused(self):
+        connection = self.pool.get()
+        self.pool.put(connection)
+        self.assertIs(self.pool.get(), connection)
+        self.assertEqual(self.connection_factory.call_count, 1)
+        self.assertFalse(connection.close.called)
+
+    def test_pool_size(self):
+        connections = [self.pool.get() for _ in range(3)]
+        for connection in connections:
+            self.pool.put(connection)
+        # Only the first two are kept
+        self.assertTrue(connections[2].close.called)
+        self.assertEqual(set([self.pool.get(), self.pool.get()]), set(connections[:2]))
+
+        with override_settings(BULK_EMAIL_CONNECTION_POOL_SIZE=0):
+            self.pool.put(connections[0])
+        self.assertTrue(connections[0].close.called)
+
+    def test_close(self):
+        connection = self.pool.get()
+        self.pool.put(connection)
+        self.pool.close()
+        self.assertTrue(connection.close.called)
+        self.assertIsNot(self.pool.get(), connection)
+
+    @override_settings(BULK_EMAIL_CONNECTION_MAX_IDLE=0)
+    def test_idle_connections_checked(self):
+        usable = Mock(connection=Mock(**{'noop.return_value': (250, 'OK')}))
+        disconnected = Mock(connection=Mock(**{'noop.side_effect': SMTPServerDisconnected}))
+        for connection in (usable, disconnected):
+            self.pool.put(connection)
+
+        # The most recently returned connection is tried first
+        self.assertIs(self.pool.get(), usable)
+        self.assertTrue(disconnected.close.called)
+        self.assertFalse(usable.close.called)
+
+    def test_is_connection_usable(self):
+        self.assertTrue(is_connection_usable(Mock(spec=['open', 'close', 'send_messages'])))
+        self.assertTrue(is_connection_usable(Mock(connection=Mock(spec=[]))))
+        self.assertFalse(is_connection_usable(Mock(connection=None)))
+
+
+class CountingSMTPServer(smtpd.SMTPServer):
+    """
+    A local SMTP server that just counts the connections made to it and the
+    messages it receives.
+    """
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.connections = 0
+        self.messages = 0
+
+    def handle_accept(self):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages += 1
+
+
+@attr('shard_1')
+class EmailConnectionSMTPTest(TestCase):
+    """
+    Compare sending batches of bulk email to a local SMTP server with a
+    connection for each batch and each message rendered from the template,
+    and with pooled connections and compiled templates.
+    """
+    NUM_BATCHES = 10
+    BATCH_SIZE = 20
+
+    def setUp(self):
+        super(EmailConnectionSMTPTest, self).setUp()
+        call_command("loaddata", "course_email_template.json")
+        self.template = CourseEmailTemplate.get_template()
+        self.context = {
+            'course_title': "Bogus Course Title",
+            'course_url': "/location/of/course/url",
+            'course_image_url': "/location/of/course/image/url",
+            'email_settings_url': "/location/of/email/settings/url",
+            'platform_name': 'edX',
+            'course_end_date': 'never',
+            'course_id': 'abc/123/doremi',
+        }
+        self.message = u"<p>Dear %%USER_FULLNAME%%,</p><p>%%COURSE_DISPLAY_NAME%% ends %%COURSE_END_DATE%%.</p>" * 20
+        self.recipients = [
+            {'name': u'Student {}'.format(index), 'email': 'student{}@example.com'.format(index), 'user_id': index}
+            for index in range(self.BATCH_SIZE)
+        ]
+
+        self.server = CountingSMTPServer()
+        thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.05})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.close)
+
+        smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.port,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            BULK_EMAIL_CONNECTION_POOL_SIZE=1,
+        )
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+
+    def _send(self, connection, plaintext, html, email):
+        """Send one message on `connection`."""
+        message = EmailMultiAlternatives("Subject", plaintext, 'from@example.com', [email], connection=connection)
+        message.attach_alternative(html, 'text/html')
+        connection.send_messages([message])
+
+    def _send_unpooled(self):
+        """Send each batch on its own connection, rendering each message from the template."""
+        for _ in range(self.NUM_BATCHES):
+            connection = get_connection()
+            connection.open()
+            for recipient in self.recipients:
+                context = dict(self.context, **recipient)
+                plaintext = self.template.render_plaintext(self.message, context)
+                html = self.template.render_htmltext(self.message, context)
+                self._send(connection, plaintext, html, recipient['email'])
+            connection.close()
+
+    def _send_pooled(self):
+        """Send the batches on pooled connections, rendering each message from compiled templates."""
+        pool = EmailConnectionPool(get_connection)
+        for _ in range(self.NUM_BATCHES):
+            connection = pool.get()
+            plaintext_template = self.template.compile_plaintext(self.message, self.context)
+            html_template = self.template.compile_htmltext(self.message, self.context)
+            for recipient in self.recipients:
+                context = dict(self.context, **recipient)
+                plaintext = plaintext_template.render(context)
+                html = html_template.render(context)
+                self._send(connection, plaintext, html, recipient['email'])
+            pool.put(connection)
+        pool.close()
+
+    def _wait_for_messages(self, count):
+        """Wait for the server to have received `count` messages."""
+        deadline = time.time() + 10
+        while self.server.messages < count and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.messages, count)
+
+    def test_pooled_connection_reused(self):
+        num_messages = self.NUM_BATCHES * self.BATCH_SIZE
+
+        self._send_unpooled()
+        self._wait_for_messages(num_messages)
+        self.assertEqual(self.server.connections, self.NUM_BATCHES)
+
+        # Every batch is sent on the one pooled connection
+        self._send_pooled()
+        self._wait_for_messages(2 * num_messages)
+        self.assertEqual(self.server.connections, self.NUM_BATCHES + 1)
@@ -139,6 +139,22 @@ class CourseEmailTemplateTest(TestCase):
         context = self._get_sample_plain_context()
         template.render_plaintext("My new plain text.", context)
 
+    @patch('util.keyword_substitution.anonymous_id_from_user_id', Mock(side_effect='anon{}'.format))
+    @patch('bulk_email.models.anonymous_id_from_user_id', Mock(side_effect='anon{}'.format))
+    def test_compiled_templates(self):
+        template = CourseEmailTemplate.get_template()
+        context = self._get_sample_html_context()
+        context.update({'name': '', 'course_id': 'abc/123/doremi', 'course_end_date': 'never'})
+        message = u"Dear %%USER_FULLNAME%% (%%USER_ID%%), %%COURSE_DISPLAY_NAME%% ends %%COURSE_END_DATE%%."
+        compiled_plaintext = template.compile_plaintext(message, context)
+        compiled_htmltext = template.compile_htmltext(message, context)
+
+        for user_id, name, email in ((1, u'Ann {0}', 'ann@test.com'), (2, u'B\xf6b', 'bob@test.com')):
+            context.update({'user_id': user_id, 'name': name, 'email': email})
+            self.assertEqual(compiled_plaintext.render(context), template.render_plaintext(message, context))
+            self.assertEqual(compiled_htmltext.render(context), template.render_htmltext(message, context))
+            self.assertIn(u'{} (anon{})'.format(name, user_id), compiled_plaintext.render(context))
+
 
 @attr('shard_1')
 class CourseAuthorizationTest(TestCase):
@@ -29,10 +29,13 @@ from celery.states import SUCCESS, FAILURE  # pylint: disable=no-name-in-module,
 
 from django.conf import settings
 from django.core.management import call_command
+from django.test.utils import override_settings
 
 from xmodule.modulestore.tests.factories import CourseFactory
 
+from bulk_email.connections import get_connection_pool
 from bulk_email.models import CourseEmail, Optout, SEND_TO_ALL
+from bulk_email.tasks import OPTOUTS_TTL, _get_optout_user_ids
 
 from instructor_task.tasks import send_bulk_course_email
 from instructor_task.subtasks import update_subtask_status, SubtaskStatus
@@ -199,6 +202,52 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
             get_conn.return_value.send_messages.side_effect = cycle([None])
             self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
 
+    @override_settings(BULK_EMAIL_EMAILS_PER_TASK=3, BULK_EMAIL_CONNECTION_POOL_SIZE=1)
+    @patch('bulk_email.connections._POOL', None)
+    def test_connection_reused_between_subtasks(self):
+        # We also send email to the instructor, for three subtasks in all:
+        self._create_students(8)
+        task_entry = self._create_input_entry()
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            self._run_task_with_mock_celery(send_bulk_course_email, task_entry.id, task_entry.task_id)
+        get_connection_pool(None).close()
+
+        self.assertEquals(get_conn.call_count, 1)
+        self.assertEquals(get_conn.return_value.send_messages.call_count, 9)
+        self.assertEquals(json.loads(InstructorTask.objects.get(id=task_entry.id).subtasks).get('succeeded'), 3)
+
+    @override_settings(BULK_EMAIL_EMAILS_PER_TASK=3)
+    def test_optouts_loaded_once(self):
+        # We also send email to the instructor, for three subtasks in all:
+        students = self._create_students(8)
+        for student in students[1::3]:
+            Optout.objects.create(user=student, course_id=self.course.id)
+        task_entry = self._create_input_entry()
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            with patch.object(Optout.objects, 'filter', wraps=Optout.objects.filter) as optout_filter:
+                self._run_task_with_mock_celery(send_bulk_course_email, task_entry.id, task_entry.task_id)
+
+        self.assertEquals(optout_filter.call_count, 1)
+        self.assertEquals(get_conn.return_value.send_messages.call_count, 6)
+        status = json.loads(InstructorTask.objects.get(id=task_entry.id).task_output)
+        self.assertEquals(status.get('skipped'), 3)
+        self.assertEquals(status.get('succeeded'), 6)
+
+    def test_optouts_reloaded_after_ttl(self):
+        student = self._create_students(1)[0]
+        parent_task_id = str(uuid4())
+        with patch('bulk_email.tasks.time', return_value=1000.0):
+            self.assertEquals(_get_optout_user_ids(parent_task_id, self.course.id), frozenset())
+        Optout.objects.create(user=student, course_id=self.course.id)
+
+        # The opt-out only takes effect once the loaded opt-outs expire
+        with patch('bulk_email.tasks.time', return_value=1000.0 + OPTOUTS_TTL - 1):
+            self.assertEquals(_get_optout_user_ids(parent_task_id, self.course.id), frozenset())
+        with patch('bulk_email.tasks.time', return_value=1000.0 + OPTOUTS_TTL):
+            self.assertEquals(_get_optout_user_ids(parent_task_id, self.course.id), frozenset([student.id]))
+
     def test_successful_twice(self):
         # Select number of emails to fit into a single subtask.
         num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
@@ -0,0 +1,19 @@
+"""
+Middleware for custom courses.
+"""
+from lms.djangoapps.ccx.overrides import change_committed_overrides_versions
+
+
+class CcxOverridesVersionMiddleware(object):
+    """
+    Changes the versions of the overrides of the ccxs changed by a request
+    once the request's transaction has been committed, so that no other
+    request caches the overrides it read before the commit under the new
+    version.
+    """
+    def process_response(self, request, response):  # pylint: disable=unused-argument
+        """
+        Change the versions, after the view's transaction has ended.
+        """
+        change_committed_overrides_versions()
+        return response
@@ -4,12 +4,15 @@ by the individual custom courses feature.
 """
 import json
 import logging
+from uuid import uuid4
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction, IntegrityError
 
 import request_cache
 
-from courseware.field_overrides import FieldOverrideProvider
+from courseware.field_overrides import FieldOverrideProvider, clear_override_maps
 from opaque_keys.edx.keys import CourseKey, UsageKey
 from ccx_keys.locator import CCXLocator, CCXBlockUsageLocator
 
@@ -18,6 +21,13 @@ from lms.djangoapps.ccx.models import CcxFieldOverride, CustomCourseForEdX
 
 log = logging.getLogger(__name__)
 
+CCX_OVERRIDES_CACHE_KEY = u"ccx.overrides.{ccx_id}.{version}"
+CCX_OVERRIDES_VERSION_KEY = u"ccx.overrides.version.{ccx_id}"
+# The request cache of the ids of the ccxs whose overrides have been changed
+# in the request's transaction
+CHANGED_CCX_IDS_CACHE = "ccx.overrides.changed"
+VERSION_MIDDLEWARE = 'lms.djangoapps.ccx.middleware.CcxOverridesVersionMiddleware'
+
 
 class CustomCoursesForEdxOverrideProvider(FieldOverrideProvider):
     """
@@ -49,6 +59,27 @@ class CustomCoursesForEdxOverrideProvider(FieldOverrideProvider):
             return get_override_for_ccx(ccx, block, name, default)
         return default
 
+    def get_bulk_overrides(self, course):
+        """
+        Returns all of the overrides of the current ccx, which are loaded with
+        a single query, or None if the course isn't known.
+        """
+        if course is None:
+            return None
+        ccx = get_current_ccx(course.id)
+        if ccx:
+            return _get_overrides_for_ccx(ccx)
+        return {}
+
+    def get_bulk_override_location(self, block):
+        """
+        The overrides of the ccx are keyed on the locations of the blocks in
+        the course the ccx is based on.
+        """
+        if isinstance(block.location, CCXBlockUsageLocator):
+            return block.location.to_block_locator()
+        return block.location
+
     @classmethod
     def enabled_for(cls, course):
         """CCX field overrides are enabled per-course
@@ -109,29 +140,135 @@ def _get_overrides_for_ccx(ccx):
     overrides_cache = request_cache.get_cache('ccx-overrides')
 
     if ccx not in overrides_cache:
-        overrides = {}
-        query = CcxFieldOverride.objects.filter(
-            ccx=ccx,
-        )
+        overrides_cache[ccx] = _load_overrides_for_ccx(ccx)
 
-        for override in query:
-            block_overrides = overrides.setdefault(override.location, {})
-            block_overrides[override.field] = json.loads(override.value)
-            block_overrides[override.field + "_id"] = override.id
-            block_overrides[override.field + "_instance"] = override
+    return overrides_cache[ccx]
 
-        overrides_cache[ccx] = overrides
 
-    return overrides_cache[ccx]
+def _load_overrides_for_ccx(ccx):
+    """
+    Loads the overrides of the `ccx`, from the cache shared between requests
+    if they are there, and otherwise from the database, caching them.
+
+    The cached overrides are keyed on a version of the ccx's overrides, which
+    is changed whenever they are, so they never go stale.  They don't include
+    the CcxFieldOverride instances, so overriding a field that was loaded from
+    the cache takes an extra query to fetch its instance.
+    """
+    timeout = getattr(settings, 'CCX_OVERRIDES_CACHE_TIMEOUT', None)
+    if timeout is None:
+        return _query_overrides_for_ccx(ccx)[0]
+
+    # The key must be read before the overrides are, so that a change made
+    # while they are being read causes them to be cached under a stale key
+    cache_key = CCX_OVERRIDES_CACHE_KEY.format(ccx_id=ccx.id, version=_overrides_version(ccx))
+    overrides = cache.get(cache_key)
+    if overrides is None:
+        overrides, cacheable_overrides = _query_overrides_for_ccx(ccx)
+        cache.set(cache_key, cacheable_overrides, timeout)
+    return overrides
+
+
+def _query_overrides_for_ccx(ccx):
+    """
+    Reads all of the overrides of the `ccx` from the database with a single
+    query.  Returns the overrides, and a copy of them that leaves out the
+    CcxFieldOverride instances, to be cached.
+    """
+    overrides = {}
+    cacheable_overrides = {}
+    query = CcxFieldOverride.objects.filter(
+        ccx=ccx,
+    )
+
+    for override in query:
+        block_overrides = cacheable_overrides.setdefault(override.location, {})
+        block_overrides[override.field] = json.loads(override.value)
+        block_overrides[override.field + "_id"] = override.id
+
+        block_overrides = overrides.setdefault(override.location, {})
+        block_overrides[override.field] = cacheable_overrides[override.location][override.field]
+        block_overrides[override.field + "_id"] = override.id
+        block_overrides[override.field + "_instance"] = override
+
+    return overrides, cacheable_overrides
+
+
+def _overrides_version(ccx):
+    """
+    Returns the current version of the overrides of the `ccx`.
+    """
+    version_key = CCX_OVERRIDES_VERSION_KEY.format(ccx_id=ccx.id)
+    version = cache.get(version_key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def _overrides_changed(ccx):
+    """
+    Records that the overrides of the `ccx` have changed, so that other
+    requests don't use the previously cached overrides and the override maps
+    of this request are rebuilt.
+
+    The version of the overrides is only changed once the change has been
+    committed:  changed any earlier, another request could cache the overrides
+    it read before the commit under the new version.  Inside the transaction
+    of a request, that's left to CcxOverridesVersionMiddleware.
+    """
+    clear_override_maps()
+    if transaction.get_connection().in_atomic_block and _versions_changed_after_request():
+        request_cache.get_cache(CHANGED_CCX_IDS_CACHE)[ccx.id] = True
+    else:
+        _change_overrides_version(ccx.id)
+
+
+def _versions_changed_after_request():
+    """
+    Is this a request whose transaction CcxOverridesVersionMiddleware will
+    change the versions of changed overrides after?
+    """
+    return (
+        request_cache.get_request() is not None and
+        VERSION_MIDDLEWARE in settings.MIDDLEWARE_CLASSES
+    )
+
+
+def _change_overrides_version(ccx_id):
+    """
+    Changes the version of the overrides of the ccx with id `ccx_id`.
+    """
+    cache.set(CCX_OVERRIDES_VERSION_KEY.format(ccx_id=ccx_id), uuid4().hex, None)
+
+
+def change_committed_overrides_versions():
+    """
+    Changes the versions of the overrides of the ccxs whose overrides were
+    changed in this request's transaction, once it has been committed.
+    """
+    changed_ccx_ids = request_cache.get_cache(CHANGED_CCX_IDS_CACHE)
+    for ccx_id in changed_ccx_ids:
+        _change_overrides_version(ccx_id)
+    changed_ccx_ids.clear()
 
 
-@transaction.atomic
 def override_field_for_ccx(ccx, block, name, value):
     """
     Overrides a field for the `ccx`.  `block` and `name` specify the block
     and the name of the field on that block to override.  `value` is the
     value to set for the given field.
     """
+    with transaction.atomic():
+        _override_field_for_ccx(ccx, block, name, value)
+    _overrides_changed(ccx)
+
+
+def _override_field_for_ccx(ccx, block, name, value):
+    """
+    Stores the override of `override_field_for_ccx`.
+    """
     field = block.fields[name]
     value_json = field.to_json(value)
     serialized_value = json.dumps(value_json)
@@ -161,6 +298,64 @@ def override_field_for_ccx(ccx, block, name, value):
     _get_overrides_for_ccx(ccx).setdefault(block.location, {})[name + "_instance"] = override
 
 
+def override_field_for_ccx_in_bulk(ccx, blocks, name, value):
+    """
+    Overrides a field of each of `blocks` for the `ccx`, setting them all to
+    `value`.  This takes a fixed number of queries no matter how many blocks
+    there are, rather than a few for each block, as calling
+    `override_field_for_ccx` for each would.
+    """
+    with transaction.atomic():
+        changed = _override_field_for_ccx_in_bulk(ccx, blocks, name, value)
+    if changed:
+        _overrides_changed(ccx)
+
+
+def _override_field_for_ccx_in_bulk(ccx, blocks, name, value):
+    """
+    Stores the overrides of `override_field_for_ccx_in_bulk`, returning
+    whether any of them changed.
+    """
+    blocks = list(blocks)
+    if not blocks:
+        return False
+
+    serialized_value = json.dumps(blocks[0].fields[name].to_json(value))
+    locations = set(block.location for block in blocks)
+    existing = {
+        override.location: override
+        for override in CcxFieldOverride.objects.filter(ccx=ccx, field=name, location__in=locations)
+    }
+
+    changed_ids = [override.id for override in existing.itervalues() if override.value != serialized_value]
+    new_locations = locations.difference(existing)
+    if not changed_ids and not new_locations:
+        return False
+
+    if changed_ids:
+        CcxFieldOverride.objects.filter(id__in=changed_ids).update(value=serialized_value)
+    if new_locations:
+        CcxFieldOverride.objects.bulk_create([
+            CcxFieldOverride(ccx=ccx, location=location, field=name, value=serialized_value)
+            for location in new_locations
+        ])
+        # bulk_create doesn't set the ids of the overrides it creates
+        existing = {
+            override.location: override
+            for override in CcxFieldOverride.objects.filter(ccx=ccx, field=name, location__in=locations)
+        }
+
+    value_json = json.loads(serialized_value)
+    overrides = _get_overrides_for_ccx(ccx)
+    for location, override in existing.iteritems():
+        override.value = serialized_value
+        block_overrides = overrides.setdefault(location, {})
+        block_overrides[name] = value_json
+        block_overrides[name + "_id"] = override.id
+        block_overrides[name + "_instance"] = override
+    return True
+
+
 def clear_override_for_ccx(ccx, block, name):
     """
     Clears a previously set field override for the `ccx`.  `block` and `name`
@@ -175,6 +370,7 @@ def clear_override_for_ccx(ccx, block, name):
             field=name).delete()
 
         clear_ccx_field_info_from_ccx_map(ccx, block, name)
+        _overrides_changed(ccx)
 
     except CcxFieldOverride.DoesNotExist:
         pass
@@ -201,3 +397,4 @@ def bulk_delete_ccx_override_fields(ccx, ids):
     ids = list(set(ids))
     if ids:
         CcxFieldOverride.objects.filter(ccx=ccx, id__in=ids).delete()
+        _overrides_changed(ccx)
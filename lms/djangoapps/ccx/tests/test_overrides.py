@@ -8,7 +8,10 @@ import pytz
 from nose.plugins.attrib import attr
 
 from courseware.field_overrides import OverrideFieldData
-from django.test.utils import override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
 from lms.djangoapps.courseware.tests.test_field_overrides import inject_field_overrides
 from request_cache.middleware import RequestCache
 from student.tests.factories import AdminFactory
@@ -17,8 +20,15 @@ from xmodule.modulestore.tests.django_utils import (
     TEST_DATA_SPLIT_MODULESTORE)
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 
+from lms.djangoapps.ccx.middleware import CcxOverridesVersionMiddleware
 from lms.djangoapps.ccx.models import CustomCourseForEdX
-from lms.djangoapps.ccx.overrides import override_field_for_ccx
+from lms.djangoapps.ccx.overrides import (
+    _overrides_version,
+    clear_override_for_ccx,
+    get_override_for_ccx,
+    override_field_for_ccx,
+    override_field_for_ccx_in_bulk,
+)
 
 from lms.djangoapps.ccx.tests.test_views import flatten, iter_blocks
 
@@ -160,3 +170,91 @@ class TestFieldOverrides(ModuleStoreTestCase):
         override_field_for_ccx(self.ccx, chapter, 'due', ccx_due)
         vertical = chapter.get_children()[0].get_children()[0]
         self.assertEqual(vertical.due, ccx_due)
+
+    @override_settings(CCX_OVERRIDES_CACHE_TIMEOUT=60)
+    def test_overrides_cached_between_requests(self):
+        """
+        Test that the overrides of a ccx are only read from the database once
+        until they change.
+        """
+        cache.clear()
+        ccx_start = datetime.datetime(2014, 12, 25, 00, 00, tzinfo=pytz.UTC)
+        chapter = self.ccx.course.get_children()[0]
+        override_field_for_ccx(self.ccx, chapter, 'start', ccx_start)
+
+        RequestCache.clear_request_cache()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_override_for_ccx(self.ccx, chapter, 'start'), ccx_start)
+
+        RequestCache.clear_request_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_override_for_ccx(self.ccx, chapter, 'start'), ccx_start)
+
+    @override_settings(CCX_OVERRIDES_CACHE_TIMEOUT=60)
+    def test_cached_overrides_invalidated(self):
+        """
+        Test that changing or clearing an override replaces the cached
+        overrides of the ccx.
+        """
+        cache.clear()
+        ccx_start = datetime.datetime(2014, 12, 25, 00, 00, tzinfo=pytz.UTC)
+        new_ccx_start = datetime.datetime(2015, 12, 25, 00, 00, tzinfo=pytz.UTC)
+        chapter = self.ccx.course.get_children()[0]
+        override_field_for_ccx(self.ccx, chapter, 'start', ccx_start)
+        RequestCache.clear_request_cache()
+        get_override_for_ccx(self.ccx, chapter, 'start')
+
+        RequestCache.clear_request_cache()
+        override_field_for_ccx(self.ccx, chapter, 'start', new_ccx_start)
+        RequestCache.clear_request_cache()
+        self.assertEqual(get_override_for_ccx(self.ccx, chapter, 'start'), new_ccx_start)
+
+        clear_override_for_ccx(self.ccx, chapter, 'start')
+        RequestCache.clear_request_cache()
+        self.assertIsNone(get_override_for_ccx(self.ccx, chapter, 'start'))
+
+    @override_settings(CCX_OVERRIDES_CACHE_TIMEOUT=60)
+    def test_version_changed_after_commit(self):
+        """
+        Test that a change made in the transaction of a request only changes
+        the version of the cached overrides once the transaction has ended.
+        """
+        cache.clear()
+        ccx_start = datetime.datetime(2014, 12, 25, 00, 00, tzinfo=pytz.UTC)
+        chapter = self.ccx.course.get_children()[0]
+        version = _overrides_version(self.ccx)
+
+        RequestCache.get_request_cache().request = RequestFactory().get('/')
+        override_field_for_ccx(self.ccx, chapter, 'start', ccx_start)
+        self.assertEqual(_overrides_version(self.ccx), version)
+
+        CcxOverridesVersionMiddleware().process_response(None, None)
+        self.assertNotEqual(_overrides_version(self.ccx), version)
+
+    def test_override_field_in_bulk(self):
+        """
+        Test that overriding a field of many blocks at once takes as many
+        queries as overriding it for a single block, and updates the blocks.
+        """
+        ccx_due = datetime.datetime(2015, 1, 1, 00, 00, tzinfo=pytz.UTC)
+        new_ccx_due = datetime.datetime(2016, 1, 1, 00, 00, tzinfo=pytz.UTC)
+        chapter, other_chapter = self.ccx.course.get_children()
+        verticals = flatten([sequential.get_children() for sequential in chapter.get_children()])
+        other_verticals = flatten([sequential.get_children() for sequential in other_chapter.get_children()])
+
+        # Update some overrides and create others
+        override_field_for_ccx(self.ccx, verticals[0], 'due', ccx_due)
+        override_field_for_ccx(self.ccx, other_verticals[0], 'due', ccx_due)
+        with CaptureQueriesContext(connection) as one_block_queries:
+            override_field_for_ccx_in_bulk(self.ccx, verticals[:2], 'due', new_ccx_due)
+        with CaptureQueriesContext(connection) as many_blocks_queries:
+            override_field_for_ccx_in_bulk(self.ccx, other_verticals, 'due', new_ccx_due)
+
+        self.assertEqual(len(one_block_queries), len(many_blocks_queries))
+        for vertical in verticals[:2] + other_verticals:
+            self.assertEqual(vertical.due, new_ccx_due)
+            self.assertEqual(get_override_for_ccx(self.ccx, vertical, 'due'), new_ccx_due)
+
+        # The overrides can still be cleared
+        clear_override_for_ccx(self.ccx, other_verticals[-1], 'due')
+        self.assertIsNone(get_override_for_ccx(self.ccx, other_verticals[-1], 'due'))
@@ -48,6 +48,7 @@ from lms.djangoapps.ccx.models import CustomCourseForEdX
 from lms.djangoapps.ccx.overrides import (
     get_override_for_ccx,
     override_field_for_ccx,
+    override_field_for_ccx_in_bulk,
     clear_ccx_field_info_from_ccx_map,
     bulk_delete_ccx_override_fields,
 )
@@ -186,12 +187,13 @@ def create_ccx(request, course, ccx=None):
 
     # Hide anything that can show up in the schedule
     hidden = 'visible_to_staff_only'
+    blocks_to_hide = []
     for chapter in course.get_children():
-        override_field_for_ccx(ccx, chapter, hidden, True)
+        blocks_to_hide.append(chapter)
         for sequential in chapter.get_children():
-            override_field_for_ccx(ccx, sequential, hidden, True)
-            for vertical in sequential.get_children():
-                override_field_for_ccx(ccx, vertical, hidden, True)
+            blocks_to_hide.append(sequential)
+            blocks_to_hide.extend(sequential.get_children())
+    override_field_for_ccx_in_bulk(ccx, blocks_to_hide, hidden, True)
 
     ccx_id = CCXLocator.from_course_locator(course.id, ccx.id)
 
@@ -267,13 +269,13 @@ def save_ccx(request, course, ccx=None):
             children = unit.get('children', None)
             # For a vertical, override start and due dates of all its problems.
             if unit.get('category', None) == u'vertical':
-                for component in block.get_children():
-                    # override start and due date of problem (Copy dates of vertical into problems)
-                    if start:
-                        override_field_for_ccx(ccx, component, 'start', start)
+                # override start and due date of problem (Copy dates of vertical into problems)
+                components = block.get_children()
+                if start:
+                    override_field_for_ccx_in_bulk(ccx, components, 'start', start)
 
-                    if due:
-                        override_field_for_ccx(ccx, component, 'due', due)
+                if due:
+                    override_field_for_ccx_in_bulk(ccx, components, 'due', due)
 
             if children:
                 override_fields(block, children, graded, earliest, ccx_ids_to_delete)
@@ -0,0 +1,146 @@
+"""
+Keeps the StudentModuleAggregates that the metrics of the instructor dashboard
+are drawn from up to date.
+
+Counting the StudentModules of every problem and sequential of a course takes
+GROUP BY queries over all of the course's StudentModules, which used to be run
+each time the metrics were loaded.  The counts are now stored.  They are first
+computed by a task, the first time the metrics of a course are loaded, and
+then brought up to date when they are more than
+CLASS_DASHBOARD_AGGREGATES_MAX_AGE seconds old, or by the
+refresh_class_dashboard_aggregates command.
+
+Only the modules with StudentModules modified since the last refresh are
+counted again.  StudentModules that have been deleted, as when a student's
+attempts are reset, are only taken off the counts once their module is counted
+again, or the course's counts are recomputed in full.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from class_dashboard.models import StudentModuleAggregate, StudentModuleAggregateRefresh
+from courseware.models import StudentModule
+
+log = logging.getLogger(__name__)
+
+# The kinds of module whose StudentModules are counted
+AGGREGATED_MODULE_TYPES = ('problem', 'sequential')
+
+# The modules changed since the last refresh are counted again this many at a time
+MODULES_PER_REFRESH_QUERY = 100
+
+# StudentModules modified this long before the last refresh are counted again,
+# in case the clocks of the servers that saved them were behind.
+MODIFIED_MARGIN = datetime.timedelta(minutes=1)
+
+
+def get_aggregates_refreshed(course_id):
+    """
+    Returns when the aggregates of `course_id` were last refreshed, having first
+    refreshed them if they are more than CLASS_DASHBOARD_AGGREGATES_MAX_AGE
+    seconds old.
+
+    Returns None if the aggregates are still being computed for the first time:
+    that's left to a task, rather than done while the request waits.
+    """
+    row = StudentModuleAggregateRefresh.objects.filter(course_id=course_id).values_list('refreshed').first()
+    if row is None:
+        if _create_refresh(course_id):
+            # Imported here, since the task computes the aggregates with this module
+            from class_dashboard.tasks import compute_course_aggregates
+            compute_course_aggregates.delay(unicode(course_id))
+        return None
+
+    refreshed = row[0]
+    max_age = datetime.timedelta(seconds=settings.CLASS_DASHBOARD_AGGREGATES_MAX_AGE)
+    if refreshed is not None and timezone.now() - refreshed > max_age:
+        refreshed = refresh_course_aggregates(course_id, max_age=max_age)
+    return refreshed
+
+
+def _create_refresh(course_id):
+    """
+    Creates the StudentModuleAggregateRefresh of `course_id`, if there isn't one
+    yet.  Returns whether it was created, rather than by another process.
+    """
+    try:
+        with transaction.atomic():
+            StudentModuleAggregateRefresh.objects.create(course_id=course_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def refresh_course_aggregates(course_id, full=False, max_age=None):
+    """
+    Brings the aggregates of `course_id` up to date, by counting the StudentModules
+    of the modules that have changed since they were last refreshed, or of all of
+    the course's modules if `full` or if they have never been computed.
+
+    If `max_age` is given, aggregates that were refreshed less than `max_age` ago,
+    as by another process while this one waited for its turn, are left as they are.
+
+    Returns the time they were refreshed at.
+    """
+    _create_refresh(course_id)
+    with transaction.atomic():
+        # Refreshes of the same course take turns
+        refresh = StudentModuleAggregateRefresh.objects.select_for_update().get(course_id=course_id)
+        if max_age is not None and refresh.refreshed is not None and timezone.now() - refresh.refreshed <= max_age:
+            return refresh.refreshed
+
+        started = timezone.now()
+        student_modules = StudentModule.objects.filter(
+            course_id=course_id,
+            module_type__in=AGGREGATED_MODULE_TYPES,
+        )
+
+        if full or refresh.refreshed is None:
+            StudentModuleAggregate.objects.filter(course_id=course_id).delete()
+            _create_aggregates(course_id, student_modules)
+            log.info(u"Computed the class dashboard aggregates of %s", course_id)
+        else:
+            changed_modules = list(student_modules.filter(
+                modified__gte=refresh.refreshed - MODIFIED_MARGIN,
+            ).order_by().values_list('module_state_key', flat=True).distinct())
+            for start in xrange(0, len(changed_modules), MODULES_PER_REFRESH_QUERY):
+                module_state_keys = changed_modules[start:start + MODULES_PER_REFRESH_QUERY]
+                StudentModuleAggregate.objects.filter(
+                    course_id=course_id,
+                    module_state_key__in=module_state_keys,
+                ).delete()
+                _create_aggregates(course_id, student_modules.filter(module_state_key__in=module_state_keys))
+            log.info(
+                u"Refreshed the class dashboard aggregates of %d modules of %s", len(changed_modules), course_id
+            )
+
+        # Anything modified while this refresh was running is counted by the next one.
+        refresh.refreshed = started
+        refresh.save()
+    return refresh.refreshed
+
+
+def _create_aggregates(course_id, student_modules):
+    """
+    Stores the aggregates of the problem and sequential `student_modules` of `course_id`.
+    """
+    problem_counts = student_modules.filter(
+        module_type='problem',
+        grade__isnull=False,
+    ).order_by().values('module_state_key', 'grade', 'max_grade').annotate(student_count=Count('grade'))
+    sequential_counts = student_modules.filter(
+        module_type='sequential',
+    ).order_by().values('module_state_key').annotate(student_count=Count('module_state_key'))
+
+    aggregates = [
+        StudentModuleAggregate(course_id=course_id, module_type='problem', **row) for row in problem_counts
+    ]
+    aggregates.extend(
+        StudentModuleAggregate(course_id=course_id, module_type='sequential', **row) for row in sequential_counts
+    )
+    StudentModuleAggregate.objects.bulk_create(aggregates, batch_size=1000)
@@ -5,12 +5,13 @@ from util.json_request import JsonResponse
 import json
 
 from courseware import models
-from django.db.models import Count
 from django.utils.translation import ugettext as _
 
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.inheritance import own_metadata
 from instructor_analytics.csvs import create_csv_response
+from class_dashboard.aggregates import get_aggregates_refreshed
+from class_dashboard.models import StudentModuleAggregate
 
 from opaque_keys.edx.locations import Location
 
@@ -30,14 +31,16 @@ def get_problem_grade_distribution(course_id):
         'grade_distrib' - array of tuples (`grade`,`count`).
       'total_student_count' where the key is problem 'module_id' and the value is number of students
         attempting the problem
+
+    The counts are read from the course's StudentModuleAggregates, refreshed first if they are stale.
     """
 
-    # Aggregate query on studentmodule table for grade data for all problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-    ).values('module_state_key', 'grade', 'max_grade').annotate(count_grade=Count('grade'))
+    # Precomputed grade data for all problems in course
+    get_aggregates_refreshed(course_id)
+    db_query = StudentModuleAggregate.objects.filter(
+        course_id=course_id,
+        module_type="problem",
+    ).values('module_state_key', 'grade', 'max_grade', 'student_count')
 
     prob_grade_distrib = {}
     total_student_count = {}
@@ -48,7 +51,7 @@ def get_problem_grade_distribution(course_id):
 
         # Build set of grade distributions for each problem that has student responses
         if curr_problem in prob_grade_distrib:
-            prob_grade_distrib[curr_problem]['grade_distrib'].append((row['grade'], row['count_grade']))
+            prob_grade_distrib[curr_problem]['grade_distrib'].append((row['grade'], row['student_count']))
 
             if (prob_grade_distrib[curr_problem]['max_grade'] != row['max_grade']) and \
                     (prob_grade_distrib[curr_problem]['max_grade'] < row['max_grade']):
@@ -57,11 +60,11 @@ def get_problem_grade_distribution(course_id):
         else:
             prob_grade_distrib[curr_problem] = {
                 'max_grade': row['max_grade'],
-                'grade_distrib': [(row['grade'], row['count_grade'])]
+                'grade_distrib': [(row['grade'], row['student_count'])]
             }
 
         # Build set of total students attempting each problem
-        total_student_count[curr_problem] = total_student_count.get(curr_problem, 0) + row['count_grade']
+        total_student_count[curr_problem] = total_student_count.get(curr_problem, 0) + row['student_count']
 
     return prob_grade_distrib, total_student_count
 
@@ -73,19 +76,22 @@ def get_sequential_open_distrib(course_id):
     `course_id` the course ID for the course interested in
 
     Outputs a dict mapping the 'module_id' to the number of students that have opened that subsection/sequential.
+
+    The counts are read from the course's StudentModuleAggregates, refreshed first if they are stale.
     """
 
-    # Aggregate query on studentmodule table for "opening a subsection" data
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        module_type__exact="sequential",
-    ).values('module_state_key').annotate(count_sequential=Count('module_state_key'))
+    # Precomputed "opening a subsection" data
+    get_aggregates_refreshed(course_id)
+    db_query = StudentModuleAggregate.objects.filter(
+        course_id=course_id,
+        module_type="sequential",
+    ).values('module_state_key', 'student_count')
 
     # Build set of "opened" data for each subsection that has "opened" data
     sequential_open_distrib = {}
     for row in db_query:
         row_loc = course_id.make_usage_key_from_deprecated_string(row['module_state_key'])
-        sequential_open_distrib[row_loc] = row['count_sequential']
+        sequential_open_distrib[row_loc] = row['student_count']
 
     return sequential_open_distrib
 
@@ -98,24 +104,26 @@ def get_problem_set_grade_distrib(course_id, problem_set):
 
     `problem_set` an array of UsageKeys representing problem module_id's.
 
-    Requests from the database the a count of each grade for each problem in the `problem_set`.
+    Reads the count of each grade for each problem in the `problem_set` from the course's
+    StudentModuleAggregates, refreshed first if they are stale.
 
     Returns a dict, where the key is the problem 'module_id' and the value is a dict with two parts:
       'max_grade' - the maximum grade possible for the course
       'grade_distrib' - array of tuples (`grade`,`count`) ordered by `grade`
     """
 
-    # Aggregate query on studentmodule table for grade data for set of problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
+    # Precomputed grade data for set of problems in course
+    get_aggregates_refreshed(course_id)
+    db_query = StudentModuleAggregate.objects.filter(
+        course_id=course_id,
+        module_type="problem",
         module_state_key__in=problem_set,
     ).values(
         'module_state_key',
         'grade',
         'max_grade',
-    ).annotate(count_grade=Count('grade')).order_by('module_state_key', 'grade')
+        'student_count',
+    ).order_by('module_state_key', 'grade')
 
     prob_grade_distrib = {}
 
@@ -129,7 +137,7 @@ def get_problem_set_grade_distrib(course_id, problem_set):
             }
 
         curr_grade_distrib = prob_grade_distrib[row_loc]
-        curr_grade_distrib['grade_distrib'].append((row['grade'], row['count_grade']))
+        curr_grade_distrib['grade_distrib'].append((row['grade'], row['student_count']))
 
         if curr_grade_distrib['max_grade'] < row['max_grade']:
             curr_grade_distrib['max_grade'] = row['max_grade']
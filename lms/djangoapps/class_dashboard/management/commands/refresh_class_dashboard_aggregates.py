@@ -0,0 +1,45 @@
+"""A command to bring the aggregates of the instructor dashboard's metrics up to date.
+
+Run periodically, it keeps the metrics of the courses whose instructors have
+looked at them fresh, so that they don't have to wait for the aggregates to be
+refreshed when they look again.
+
+"""
+
+import optparse
+
+from django.core.management.base import NoArgsCommand
+from opaque_keys.edx.keys import CourseKey
+
+from class_dashboard.aggregates import refresh_course_aggregates
+from class_dashboard.models import StudentModuleAggregateRefresh
+
+
+class Command(NoArgsCommand):
+    """The actual refresh_class_dashboard_aggregates command."""
+
+    help = "Refreshes the aggregates of StudentModules that the instructor dashboard's metrics are drawn from."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--course',
+            default=None,
+            help="Only refresh the aggregates of this course, rather than of every course they have been computed for.",
+        ),
+        optparse.make_option(
+            '--full',
+            action='store_true',
+            default=False,
+            help="Count all of the StudentModules again, not just those of modules changed since the last refresh.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        if options['course']:
+            course_ids = [CourseKey.from_string(options['course'])]
+        else:
+            course_ids = list(StudentModuleAggregateRefresh.objects.values_list('course_id', flat=True))
+
+        for course_id in course_ids:
+            refreshed = refresh_course_aggregates(course_id, full=options['full'])
+            self.stdout.write(u"Refreshed {} at {}\n".format(course_id, refreshed))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import xmodule_django.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentModuleAggregate',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', xmodule_django.models.CourseKeyField(max_length=255)),
+                ('module_state_key', xmodule_django.models.LocationKeyField(max_length=255, db_column='module_id')),
+                ('module_type', models.CharField(max_length=32)),
+                ('grade', models.FloatField(null=True)),
+                ('max_grade', models.FloatField(null=True)),
+                ('student_count', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentModuleAggregateRefresh',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', xmodule_django.models.CourseKeyField(unique=True, max_length=255)),
+                ('refreshed', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='studentmoduleaggregate',
+            index_together=set([('course_id', 'module_state_key')]),
+        ),
+    ]
@@ -0,0 +1,48 @@
+"""
+Precomputed aggregates of StudentModules, for the metrics of the instructor dashboard.
+
+See `class_dashboard.aggregates` for how they are kept up to date.
+"""
+from django.db import models
+
+from xmodule_django.models import CourseKeyField, LocationKeyField
+
+
+class StudentModuleAggregate(models.Model):
+    """
+    The number of students with a StudentModule for a problem or a sequential.
+
+    For a problem, there is a row for each grade and max_grade the students'
+    StudentModules have, counting those with that grade.  For a sequential, there
+    is one row, with no grade, counting the students who have opened it.
+    """
+    class Meta(object):
+        app_label = "class_dashboard"
+        index_together = (('course_id', 'module_state_key'),)
+
+    course_id = CourseKeyField(max_length=255)
+    module_state_key = LocationKeyField(max_length=255, db_column='module_id')
+    module_type = models.CharField(max_length=32)
+    grade = models.FloatField(null=True)
+    max_grade = models.FloatField(null=True)
+    student_count = models.IntegerField()
+
+    def __unicode__(self):
+        return u"[StudentModuleAggregate] {}: {}/{} x {}".format(
+            self.module_state_key, self.grade, self.max_grade, self.student_count
+        )
+
+
+class StudentModuleAggregateRefresh(models.Model):
+    """
+    When the StudentModuleAggregates of a course were last brought up to date.
+    """
+    class Meta(object):
+        app_label = "class_dashboard"
+
+    course_id = CourseKeyField(max_length=255, unique=True)
+    # None until the aggregates have first been computed.
+    refreshed = models.DateTimeField(null=True)
+
+    def __unicode__(self):
+        return u"[StudentModuleAggregateRefresh] {}: {}".format(self.course_id, self.refreshed)
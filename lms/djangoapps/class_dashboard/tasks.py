@@ -0,0 +1,15 @@
+"""
+Asynchronous tasks for the class dashboard app.
+"""
+from opaque_keys.edx.keys import CourseKey
+
+from class_dashboard.aggregates import refresh_course_aggregates
+from lms import CELERY_APP
+
+
+@CELERY_APP.task
+def compute_course_aggregates(course_id):
+    """
+    Compute the StudentModuleAggregates of a course for the first time.
+    """
+    refresh_course_aggregates(CourseKey.from_string(course_id))
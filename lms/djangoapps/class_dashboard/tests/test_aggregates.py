@@ -0,0 +1,144 @@
+"""
+Tests of the aggregates of StudentModules for the Metrics tab of the instructor dashboard
+"""
+import datetime
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from mock import patch
+from nose.plugins.attrib import attr
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+from class_dashboard.aggregates import get_aggregates_refreshed, refresh_course_aggregates
+from class_dashboard.dashboard_data import get_problem_grade_distribution, get_sequential_open_distrib
+from class_dashboard.models import StudentModuleAggregate, StudentModuleAggregateRefresh
+from class_dashboard.tasks import compute_course_aggregates
+from courseware.models import StudentModule
+from courseware.tests.factories import StudentModuleFactory
+
+COURSE_ID = SlashSeparatedCourseKey('MITx', '999', 'Robot_Super_Course')
+OTHER_COURSE_ID = SlashSeparatedCourseKey('MITx', '999', 'Other_Course')
+
+
+@attr('shard_1')
+@override_settings(CLASS_DASHBOARD_AGGREGATES_MAX_AGE=15 * 60)
+class TestAggregates(TestCase):
+    """
+    Tests of refreshing the StudentModuleAggregates of a course.
+    """
+    def setUp(self):
+        super(TestAggregates, self).setUp()
+        self.problem = COURSE_ID.make_usage_key('problem', 'p1')
+        self.other_problem = COURSE_ID.make_usage_key('problem', 'p2')
+        self.sequential = COURSE_ID.make_usage_key('sequential', 's1')
+        for grade in (0, 1, 1):
+            self._create_problem_module(self.problem, grade)
+        self._create_problem_module(self.other_problem, 1)
+        self._create_problem_module(self.other_problem, None)
+        for _ in range(2):
+            StudentModuleFactory.create(course_id=COURSE_ID, module_type='sequential', module_state_key=self.sequential)
+        # StudentModules of other courses aren't counted
+        StudentModuleFactory.create(
+            course_id=OTHER_COURSE_ID,
+            module_type='sequential',
+            module_state_key=OTHER_COURSE_ID.make_usage_key('sequential', 's1'),
+        )
+
+    def _create_problem_module(self, problem, grade):
+        """Create a StudentModule for `problem` with `grade` out of 1."""
+        return StudentModuleFactory.create(
+            course_id=COURSE_ID,
+            module_state_key=problem,
+            grade=grade,
+            max_grade=1 if grade is not None else None,
+        )
+
+    def _get_counts(self):
+        """Returns the problem grade distributions and the sequential counts, as read from the aggregates."""
+        prob_grade_distrib, _total_student_count = get_problem_grade_distribution(COURSE_ID)
+        grade_counts = {
+            problem: sorted(distrib['grade_distrib']) for problem, distrib in prob_grade_distrib.items()
+        }
+        return grade_counts, get_sequential_open_distrib(COURSE_ID)
+
+    def _age_everything(self):
+        """Make the StudentModules and the last refresh look as if they happened a while ago."""
+        now = timezone.now()
+        StudentModule.objects.update(modified=now - datetime.timedelta(days=1))
+        StudentModuleAggregateRefresh.objects.update(refreshed=now - datetime.timedelta(minutes=5))
+
+    def test_computed_by_task_when_first_read(self):
+        with patch('class_dashboard.tasks.compute_course_aggregates.delay') as mock_delay:
+            self.assertIsNone(get_aggregates_refreshed(COURSE_ID))
+            # Only the first read starts the task
+            self.assertIsNone(get_aggregates_refreshed(COURSE_ID))
+        mock_delay.assert_called_once_with(unicode(COURSE_ID))
+        self.assertFalse(StudentModuleAggregate.objects.exists())
+
+        compute_course_aggregates(unicode(COURSE_ID))
+        grade_counts, sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts, {self.problem: [(0, 1), (1, 2)], self.other_problem: [(1, 1)]})
+        self.assertEqual(sequential_counts, {self.sequential: 2})
+        self.assertIsNotNone(get_aggregates_refreshed(COURSE_ID))
+        self.assertFalse(StudentModuleAggregate.objects.filter(course_id=OTHER_COURSE_ID).exists())
+
+    def test_fresh_aggregates_read(self):
+        refresh_course_aggregates(COURSE_ID)
+        self._create_problem_module(self.problem, 0)
+        # Each distribution checks when the aggregates were refreshed, then reads them
+        with self.assertNumQueries(4):
+            grade_counts, _sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts[self.problem], [(0, 1), (1, 2)])
+
+    def test_stale_aggregates_refreshed(self):
+        refreshed = refresh_course_aggregates(COURSE_ID)
+        self._create_problem_module(self.problem, 0)
+        with override_settings(CLASS_DASHBOARD_AGGREGATES_MAX_AGE=0):
+            grade_counts, _sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts[self.problem], [(0, 2), (1, 2)])
+        self.assertGreaterEqual(get_aggregates_refreshed(COURSE_ID), refreshed)
+
+    def test_refreshed_while_waiting(self):
+        refreshed = refresh_course_aggregates(COURSE_ID)
+        self._create_problem_module(self.problem, 0)
+        # Another process refreshed the aggregates while this one waited for the lock
+        self.assertEqual(
+            refresh_course_aggregates(COURSE_ID, max_age=datetime.timedelta(minutes=15)), refreshed
+        )
+        grade_counts, _sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts[self.problem], [(0, 1), (1, 2)])
+
+    def test_only_changed_modules_counted_again(self):
+        refresh_course_aggregates(COURSE_ID)
+        self._age_everything()
+        self._create_problem_module(self.problem, 1)
+        # Deleting a StudentModule doesn't change the modules modified since the last refresh
+        StudentModule.objects.filter(module_state_key=self.other_problem, grade=1).delete()
+
+        refresh_course_aggregates(COURSE_ID)
+        grade_counts, sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts, {self.problem: [(0, 1), (1, 3)], self.other_problem: [(1, 1)]})
+        self.assertEqual(sequential_counts, {self.sequential: 2})
+
+        refresh_course_aggregates(COURSE_ID, full=True)
+        grade_counts, _sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts, {self.problem: [(0, 1), (1, 3)]})
+
+    def test_command(self):
+        refresh_course_aggregates(COURSE_ID)
+        self._age_everything()
+        self._create_problem_module(self.problem, 0)
+
+        out = StringIO()
+        call_command('refresh_class_dashboard_aggregates', stdout=out)
+        self.assertIn(u"Refreshed {}".format(COURSE_ID), out.getvalue())
+        # Only the courses whose aggregates have been computed are refreshed
+        self.assertNotIn(unicode(OTHER_COURSE_ID), out.getvalue())
+        grade_counts, _sequential_counts = self._get_counts()
+        self.assertEqual(grade_counts[self.problem], [(0, 2), (1, 2)])
+
+        call_command('refresh_class_dashboard_aggregates', course=unicode(OTHER_COURSE_ID), stdout=StringIO())
+        self.assertTrue(StudentModuleAggregate.objects.filter(course_id=OTHER_COURSE_ID).exists())
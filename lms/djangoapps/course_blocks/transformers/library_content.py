@@ -2,7 +2,7 @@
 Content Library Transformer.
 """
 import json
-from courseware.models import StudentModule
+from courseware.models import StudentModule, state_contains
 from openedx.core.lib.block_cache.transformer import BlockStructureTransformer
 from xmodule.library_content_module import LibraryContentModule
 from xmodule.modulestore.django import modulestore
@@ -83,7 +83,7 @@ class ContentLibraryTransformer(BlockStructureTransformer):
                     state_dict = json.loads(module.state)
                     # Add all selected entries for this user for this
                     # library module to the selected list.
-                    for state in state_dict['selected']:
+                    for state in state_dict.get('selected', []):
                         usage_key = usage_info.course_key.make_usage_key(state[0], state[1])
                         if usage_key in library_children:
                             selected.append((state[0], state[1]))
@@ -131,10 +131,10 @@ class ContentLibraryTransformer(BlockStructureTransformer):
         """
         try:
             return StudentModule.objects.get(
+                state_contains('"selected": [['),
                 student=user,
                 course_id=course_key,
                 module_state_key=block_key,
-                state__contains='"selected": [['
             )
         except StudentModule.DoesNotExist:
             return None
@@ -38,6 +38,7 @@ from openedx.core.djangoapps.content.course_overviews.models import CourseOvervi
 from student import auth
 from student.models import CourseEnrollmentAllowed
 from student.roles import (
+    get_role_cache,
     CourseBetaTesterRole,
     CourseCcxCoachRole,
     CourseInstructorRole,
@@ -55,6 +56,7 @@ from util.milestones_helpers import (
 from ccx_keys.locator import CCXLocator
 
 import dogstats_wrapper as dog_stats_api
+import request_cache
 
 from courseware.access_response import (
     MilestoneError,
@@ -68,6 +70,9 @@ from lms.djangoapps.ccx.models import CustomCourseForEdX
 
 log = logging.getLogger(__name__)
 
+# Name of the request cache memoizing has_access results
+HAS_ACCESS_REQUEST_CACHE = 'courseware.access.has_access'
+
 
 def has_ccx_coach_role(user, course_key):
     """
@@ -135,6 +140,56 @@ def has_access(user, action, obj, course_key=None):
     if isinstance(course_key, CCXLocator):
         course_key = course_key.to_course_locator()
 
+    cache_key = _has_access_cache_key(user, action, obj, course_key)
+    if cache_key is None:
+        return _has_access(user, action, obj, course_key)
+
+    access_cache = request_cache.get_cache(HAS_ACCESS_REQUEST_CACHE)
+    if cache_key not in access_cache:
+        # The object is kept alive along with the result, so that its id in
+        # the cache key can't be reused.
+        access_cache[cache_key] = (obj, _has_access(user, action, obj, course_key))
+    return access_cache[cache_key][1]
+
+
+def _has_access_cache_key(user, action, obj, course_key):
+    """
+    Returns the key to memoize has_access(user, action, obj, course_key) by
+    for the rest of the current request, or None if it shouldn't be memoized.
+
+    Blocks and course overviews are identified by their location or id and
+    by the object itself, because access depends on their fields, which may
+    differ between (say) a descriptor and the same descriptor bound to the
+    user. The user's roles are identified by their RoleCache (see
+    student.roles.get_role_cache), which is replaced whenever they change.
+
+    Access isn't memoized outside of requests, where nothing clears the
+    memo, or for users who are masquerading.
+    """
+    if request_cache.get_request() is None:
+        return None
+    if getattr(user, 'masquerade_settings', None) or hasattr(user, 'real_user'):
+        return None
+
+    if isinstance(obj, (XBlock, XModule)):
+        obj_key = (obj.location, id(obj))
+    elif isinstance(obj, CourseOverview):
+        obj_key = (obj.id, id(obj))
+    elif isinstance(obj, (CourseKey, UsageKey, basestring)):
+        obj_key = obj
+    else:
+        return None
+
+    # Loading the user's roles here prefetches all of their CourseAccessRoles,
+    # once per request, for the role checks in _has_access.
+    role_cache = get_role_cache(user) if user.is_authenticated() else None
+    return (user.id, action, type(obj).__name__, obj_key, course_key, role_cache)
+
+
+def _has_access(user, action, obj, course_key):
+    """
+    Does the work of has_access, without memoization.
+    """
     # delegate the work to type-specific functions.
     # (start with more specific types, then get more general)
     if isinstance(obj, CourseDescriptor):
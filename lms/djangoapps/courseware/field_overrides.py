@@ -25,6 +25,11 @@ from xmodule.modulestore.inheritance import InheritanceMixin
 
 NOTSET = object()
 ENABLED_OVERRIDE_PROVIDERS_KEY = "courseware.field_overrides.enabled_providers.{course_id}"
+OVERRIDE_MAPS_CACHE = "courseware.field_overrides.override_maps"
+
+# Incremented by `clear_override_maps`, so that field data outside of a
+# request knows to reload the override maps it holds.
+_override_maps_generation = 0
 
 
 def resolve_dotted(name):
@@ -71,18 +76,13 @@ class OverrideFieldData(FieldData):
         any performance impact of this feature if no override providers are
         configured.
         """
-        if cls.provider_classes is None:
-            cls.provider_classes = tuple(
-                (resolve_dotted(name) for name in
-                 settings.FIELD_OVERRIDE_PROVIDERS))
-
         enabled_providers = cls._providers_for_course(course)
         if enabled_providers:
             # TODO: we might not actually want to return here.  Might be better
             # to check for instance.providers after the instance is built. This
             # would allow for the case where we have registered providers but
             # none are enabled for the provided course
-            return cls(user, wrapped, enabled_providers)
+            return cls(user, wrapped, enabled_providers, course=course)
 
         return wrapped
 
@@ -96,6 +96,11 @@ class OverrideFieldData(FieldData):
         Arguments:
             course: The course XBlock
         """
+        if cls.provider_classes is None:
+            cls.provider_classes = tuple(
+                (resolve_dotted(name) for name in
+                 settings.FIELD_OVERRIDE_PROVIDERS))
+
         request_cache = RequestCache.get_request_cache()
         if course is None:
             cache_key = ENABLED_OVERRIDE_PROVIDERS_KEY.format(course_id='None')
@@ -110,9 +115,74 @@ class OverrideFieldData(FieldData):
 
         return enabled_providers
 
-    def __init__(self, user, fallback, providers):
+    @classmethod
+    def providers_enabled_for(cls, course):
+        """
+        Returns True if any override providers are enabled for the given
+        course, in which case field values read without going through
+        :class:`OverrideFieldData` (e.g. from the block cache) may be wrong.
+        """
+        return bool(cls._providers_for_course(course))
+
+    def __init__(self, user, fallback, providers, course=None):
         self.fallback = fallback
         self.providers = tuple(provider(user) for provider in providers)
+        self.course = course
+        self._override_maps = None
+        self._override_maps_generation = None
+
+        # Identifies the user and course the override maps are loaded for
+        self._override_maps_key = (
+            getattr(user, 'id', user),
+            unicode(course.id) if course is not None else None,
+            tuple(providers),
+        )
+
+    def override_maps(self):
+        """
+        Returns the override maps of this user and course.
+
+        This is a dict containing
+            maps: a list with an entry for each provider, either the provider's
+                bulk overrides, or None if the provider doesn't support bulk
+                loading.
+            fields: the names of the fields that are overridden by any of the
+                bulk overrides.
+            inherited: a memo of the inherited overrides that have been
+                looked up, keyed on (location, field name), if all of the
+                providers support bulk loading; otherwise None.
+
+        Within a request the maps are shared by all of the blocks bound for
+        the user, for the rest of the request or until `clear_override_maps`
+        is called, so each provider's bulk overrides are only loaded once per
+        (user, course).  Outside of a request, e.g. in celery tasks, where
+        nothing clears the request cache, they are only kept for the life of
+        this field data, or until `clear_override_maps` is called.
+        """
+        if RequestCache.get_current_request() is None:
+            maps_cache = {}
+            if self._override_maps is not None and self._override_maps_generation == _override_maps_generation:
+                maps_cache[self._override_maps_key] = self._override_maps
+        else:
+            maps_cache = RequestCache.get_request_cache(OVERRIDE_MAPS_CACHE)
+
+        override_maps = maps_cache.get(self._override_maps_key)
+        if override_maps is None:
+            maps = [provider.get_bulk_overrides(self.course) for provider in self.providers]
+            override_maps = {
+                'maps': maps,
+                'fields': set(
+                    field_name
+                    for bulk_overrides in maps if bulk_overrides is not None
+                    for block_overrides in bulk_overrides.itervalues()
+                    for field_name in block_overrides
+                ),
+                'inherited': {} if None not in maps else None,
+            }
+            maps_cache[self._override_maps_key] = override_maps
+        self._override_maps = override_maps
+        self._override_maps_generation = _override_maps_generation
+        return override_maps
 
     def get_override(self, block, name):
         """
@@ -120,12 +190,49 @@ class OverrideFieldData(FieldData):
         Returns the overridden value or `NOTSET` if no override is found.
         """
         if not overrides_disabled():
-            for provider in self.providers:
-                value = provider.get(block, name, NOTSET)
+            maps = self.override_maps()['maps']
+            for provider, bulk_overrides in zip(self.providers, maps):
+                if bulk_overrides is None:
+                    value = provider.get(block, name, NOTSET)
+                else:
+                    value = _bulk_override(provider, bulk_overrides, block, name)
                 if value is not NOTSET:
                     return value
         return NOTSET
 
+    def get_inherited_override(self, block, name):
+        """
+        Checks for an override for the inheritable field identified by `name`
+        on the ancestors of `block`, returning the override of the closest
+        ancestor, or `NOTSET` if there is none.
+
+        When all of the providers support bulk loading, fields that aren't
+        overridden anywhere are answered without walking the ancestors, and
+        the answers for the others are memoized.
+        """
+        override_maps = self.override_maps()
+        inherited = override_maps['inherited']
+        if inherited is None:
+            for ancestor in _lineage(block):
+                value = self.get_override(ancestor, name)
+                if value is not NOTSET:
+                    return value
+            return NOTSET
+
+        if name not in override_maps['fields']:
+            return NOTSET
+
+        key = (block.location, name)
+        if key not in inherited:
+            value = NOTSET
+            parent = block.get_parent()
+            if parent is not None:
+                value = self.get_override(parent, name)
+                if value is NOTSET:
+                    value = self.get_inherited_override(parent, name)
+            inherited[key] = value
+        return inherited[key]
+
     def get(self, block, name):
         value = self.get_override(block, name)
         if value is not NOTSET:
@@ -147,11 +254,9 @@ class OverrideFieldData(FieldData):
             # If this is an inheritable field and an override is set above,
             # then we want to return False here, so the field_data uses the
             # override and not the original value for this block.
-            inheritable = InheritanceMixin.fields.keys()
-            if name in inheritable:
-                for ancestor in _lineage(block):
-                    if self.get_override(ancestor, name) is not NOTSET:
-                        return False
+            if name in InheritanceMixin.fields and not overrides_disabled():
+                if self.get_inherited_override(block, name) is not NOTSET:
+                    return False
 
         return has is not NOTSET or self.fallback.has(block, name)
 
@@ -162,15 +267,39 @@ class OverrideFieldData(FieldData):
         # The `default` method is overloaded by the field storage system to
         # also handle inheritance.
         if self.providers and not overrides_disabled():
-            inheritable = InheritanceMixin.fields.keys()
-            if name in inheritable:
-                for ancestor in _lineage(block):
-                    value = self.get_override(ancestor, name)
-                    if value is not NOTSET:
-                        return value
+            if name in InheritanceMixin.fields:
+                value = self.get_inherited_override(block, name)
+                if value is not NOTSET:
+                    return value
         return self.fallback.default(block, name)
 
 
+def clear_override_maps():
+    """
+    Discards the override maps loaded in this request, and those held by
+    field data outside of a request, so that they are reloaded with any
+    overrides that have since been set or cleared.  Providers that support
+    bulk loading should call this whenever their overrides are changed.
+    """
+    global _override_maps_generation  # pylint: disable=global-statement
+    _override_maps_generation += 1
+    RequestCache.get_request_cache(OVERRIDE_MAPS_CACHE).clear()
+
+
+def _bulk_override(provider, bulk_overrides, block, name):
+    """
+    Looks up the override of the field `name` of `block` in the bulk overrides
+    of `provider`, returning the overridden value or `NOTSET`.
+    """
+    block_overrides = bulk_overrides.get(provider.get_bulk_override_location(block))
+    if not block_overrides or name not in block_overrides:
+        return NOTSET
+    try:
+        return block.fields[name].from_json(block_overrides[name])
+    except KeyError:
+        return block_overrides[name]
+
+
 class _OverridesDisabled(threading.local):
     """
     A thread local used to manage state of overrides being disabled or not.
@@ -225,6 +354,25 @@ class FieldOverrideProvider(object):
         """
         raise NotImplementedError
 
+    def get_bulk_overrides(self, course):
+        """
+        Providers that can load all of their overrides for the user in `course`
+        at once should return them here, as a dict mapping each overridden
+        block's location (see `get_bulk_override_location`) to a dict mapping
+        field names to the JSON values of the overrides.  These will then be
+        used instead of calling `get` for every field that is read.
+
+        Returns None, meaning that `get` must be used, by default.
+        """
+        return None
+
+    def get_bulk_override_location(self, block):
+        """
+        Returns the location that the overrides of `block` are keyed on in the
+        result of `get_bulk_overrides`.
+        """
+        return block.location
+
     @abstractmethod
     def enabled_for(self, course):  # pragma no cover
         """
@@ -0,0 +1,185 @@
+"""A command to compress the state of existing StudentModule rows.
+
+Rows written after STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD is set are
+compressed as they are saved.  This command walks the StudentModule (and
+optionally StudentModuleHistory) table in primary key order and compresses
+the state of older rows that are over the threshold.
+
+Rows are updated with a queryset ``update()``, so neither their ``modified``
+timestamps nor the StudentModuleHistory are affected.
+
+"""
+
+import logging
+import optparse
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError, NoArgsCommand
+from django.db import transaction
+
+from courseware.models import StudentModule, StudentModuleHistory
+from util.models import ThresholdCompressedTextField
+
+
+class Command(NoArgsCommand):
+    """The actual compress_student_module_state command."""
+
+    help = "Compresses the state of existing StudentModule rows that are over the compression threshold."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--batch',
+            type='int',
+            default=1000,
+            help="Batch size, number of rows to examine in a transaction.",
+        ),
+        optparse.make_option(
+            '--threshold',
+            type='int',
+            default=None,
+            help="Compress states longer than this. Defaults to STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD.",
+        ),
+        optparse.make_option(
+            '--start-id',
+            type='int',
+            default=0,
+            help="Only examine rows with an id greater than this, to resume an interrupted run.",
+        ),
+        optparse.make_option(
+            '--history',
+            action='store_true',
+            default=False,
+            help="Compress StudentModuleHistory rows rather than StudentModule rows.",
+        ),
+        optparse.make_option(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help="Don't change the database, just show what would be done.",
+        ),
+        optparse.make_option(
+            '--sleep',
+            type='float',
+            default=0,
+            help="Seconds to sleep between batches.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        # We don't want to see the SQL output from the db layer.
+        logging.getLogger("django.db.backends").setLevel(logging.INFO)
+
+        threshold = options["threshold"]
+        if threshold is None:
+            threshold = getattr(settings, 'STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD', None)
+        if threshold is None:
+            raise CommandError(
+                "No threshold given, and STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD is not set."
+            )
+
+        compressor = StudentModuleStateCompressor(
+            StudentModuleHistory if options["history"] else StudentModule,
+            threshold,
+            dry_run=options["dry_run"],
+        )
+        compressor.main(
+            batch_size=options["batch"],
+            start_id=options["start_id"],
+            sleep=options["sleep"],
+        )
+
+
+class StudentModuleStateCompressor(object):
+    """Logic to compress the state column of StudentModule-like tables."""
+
+    def __init__(self, model, threshold, dry_run=False):
+        self.model = model
+        self.threshold = threshold
+        self.dry_run = dry_run
+        self.rows_examined = 0
+        self.rows_compressed = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.compress_secs = 0.0
+        self.decompress_secs = 0.0
+
+    def main(self, batch_size=1000, start_id=0, sleep=0):
+        """Invoked from the management command to do all the work."""
+        last_id = start_id
+        while True:
+            with transaction.atomic():
+                batch = self.rows_to_check(last_id, batch_size)
+                if not batch:
+                    break
+                for row_id, state in batch:
+                    self.compress_one_row(row_id, state)
+                last_id = batch[-1][0]
+                if self.dry_run:
+                    transaction.set_rollback(True)
+            self.say("Processed through id {}".format(last_id))
+            if sleep:
+                time.sleep(sleep)
+
+        self.report()
+
+    def say(self, message):
+        """
+        Display a message to the user.
+
+        The message will have a trailing newline added to it.
+
+        """
+        print message
+
+    def rows_to_check(self, last_id, batch_size):
+        """
+        Return a list of (id, raw state) pairs for the next `batch_size` rows after `last_id`.
+
+        `values_list` doesn't convert the state through the model field, so the
+        states returned are exactly as stored in the database.
+
+        """
+        return list(
+            self.model.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'state')[:batch_size]
+        )
+
+    def compress_one_row(self, row_id, state):
+        """
+        Compress the state of a single row if it is over the threshold and not already compressed.
+
+        Also records the time taken to compress the state and to decompress
+        it again, as a measure of the read and write overhead of compression.
+
+        """
+        self.rows_examined += 1
+        if state is None or len(state) <= self.threshold:
+            return
+        if ThresholdCompressedTextField.is_compressed(state):
+            return
+
+        start = time.time()
+        compressed = ThresholdCompressedTextField.compress(state)
+        self.compress_secs += time.time() - start
+
+        start = time.time()
+        ThresholdCompressedTextField.decompress(compressed)
+        self.decompress_secs += time.time() - start
+
+        self.rows_compressed += 1
+        self.bytes_before += len(state)
+        self.bytes_after += len(compressed)
+        self.model.objects.filter(id=row_id).update(state=compressed)
+
+    def report(self):
+        """Summarize the space saved, and the cost of compressing and decompressing states."""
+        self.say("Examined {} rows, compressed {}".format(self.rows_examined, self.rows_compressed))
+        if not self.rows_compressed:
+            return
+        self.say("Compressed states from {} to {} characters ({:.1%})".format(
+            self.bytes_before, self.bytes_after, float(self.bytes_after) / self.bytes_before
+        ))
+        self.say("Mean compress time: {:.3f} ms, mean decompress time: {:.3f} ms".format(
+            1000 * self.compress_secs / self.rows_compressed,
+            1000 * self.decompress_secs / self.rows_compressed,
+        ))
@@ -10,11 +10,14 @@ from optparse import make_option
 
 from django.core.management.base import BaseCommand
 
-from courseware.models import StudentModule
+from courseware.models import StudentModule, state_contains
 from capa.correctmap import CorrectMap
 
 LOG = logging.getLogger(__name__)
 
+# The states of problems with some form of partial credit contain this
+PARTIAL_CREDIT_STATE = '"npoints": 0.'
+
 
 class Command(BaseCommand):
     '''
@@ -40,11 +43,14 @@ class Command(BaseCommand):
 
     def fix_studentmodules(self, save_changes):
         '''Identify the list of StudentModule objects that might need fixing, and then fix each one'''
-        modules = StudentModule.objects.filter(modified__gt='2013-03-07 20:18:00',
-                                               created__lt='2013-03-08 15:45:00',
-                                               state__contains='"npoints": 0.')
+        modules = StudentModule.objects.filter(state_contains(PARTIAL_CREDIT_STATE),
+                                               modified__gt='2013-03-07 20:18:00',
+                                               created__lt='2013-03-08 15:45:00')
 
         for module in modules:
+            # Every compressed state is matched, so check the decompressed state
+            if module.state is not None and PARTIAL_CREDIT_STATE not in module.state:
+                continue
             self.fix_studentmodule_grade(module, save_changes)
 
     def fix_studentmodule_grade(self, module, save_changes):
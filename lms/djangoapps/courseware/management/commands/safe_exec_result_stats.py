@@ -0,0 +1,79 @@
+"""A command to show how well the stored results of running problem code are reused.
+
+Each stored result was computed once, on a miss, and has since been reused
+`hits` times, so a problem's hit rate is its hits over its hits plus its
+stored results.  Hits are sampled (see courseware.safe_exec_results), so
+these are estimates.  Results that have been evicted are no longer counted.
+
+"""
+
+import optparse
+
+from django.core.management.base import NoArgsCommand
+from django.db.models import Count, Sum
+from opaque_keys.edx.keys import CourseKey
+
+from courseware.models import SafeExecResult
+from courseware.safe_exec_results import evict_safe_exec_results
+
+
+class Command(NoArgsCommand):
+    """The actual safe_exec_result_stats command."""
+
+    help = "Shows the hit rate of the stored results of running problem code, by problem."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--course',
+            default=None,
+            help="Only show the problems of this course.",
+        ),
+        optparse.make_option(
+            '--limit',
+            type='int',
+            default=20,
+            help="How many problems to show, those with the most stored results first.",
+        ),
+        optparse.make_option(
+            '--evict',
+            action='store_true',
+            default=False,
+            help="First evict the least recently used results, down to SAFE_EXEC_RESULT_STORE_MAX_ENTRIES.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        if options['evict']:
+            self.stdout.write("Evicted {} results\n".format(evict_safe_exec_results()))
+
+        results = SafeExecResult.objects.all()
+        if options['course']:
+            results = results.filter(course_id=CourseKey.from_string(options['course']))
+
+        for stats in problem_stats(results)[:options['limit']]:
+            self.stdout.write(
+                u"{course_id} {slug}: {entries} results, {hits} hits, {hit_rate:.1%} hit rate\n".format(**stats)
+            )
+
+        totals = results.aggregate(entries=Count('id'), hits=Sum('hits'))
+        self.stdout.write("Total: {} results, {} hits, {:.1%} hit rate\n".format(
+            totals['entries'], totals['hits'] or 0, hit_rate(totals['entries'], totals['hits'] or 0)
+        ))
+
+
+def problem_stats(results):
+    """
+    Return a list of the number of stored results, hits and hit rate of each
+    problem with results in `results`, those with the most results first.
+    """
+    rows = results.values('course_id', 'slug').annotate(entries=Count('id'), hits=Sum('hits')).order_by('-entries')
+    return [dict(row, hit_rate=hit_rate(row['entries'], row['hits'])) for row in rows]
+
+
+def hit_rate(entries, hits):
+    """
+    Return the proportion of lookups that were hits, given that each of the
+    `entries` results was stored after a miss.
+    """
+    lookups = entries + hits
+    return float(hits) / lookups if lookups else 0.0
@@ -0,0 +1,124 @@
+"""Test StudentModule state compression and the compress_student_module_state management command."""
+
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from opaque_keys.edx.locations import Location
+
+from courseware.models import StudentModule, StudentModuleHistory, state_contains
+from courseware.management.commands.compress_student_module_state import StudentModuleStateCompressor
+from courseware.tests.factories import StudentModuleFactory
+from util.models import ThresholdCompressedTextField
+
+LARGE_STATE = json.dumps({'done': True, 'student_answers': {'i4x-a-b-problem-c_2_1': 'x' * 500}})
+SMALL_STATE = json.dumps({'done': True})
+
+
+class StudentModuleCompressorSayStubbed(StudentModuleStateCompressor):
+    """StudentModuleStateCompressor, but with .say() stubbed for testing."""
+    def __init__(self, *args, **kwargs):
+        super(StudentModuleCompressorSayStubbed, self).__init__(*args, **kwargs)
+        self.said_lines = []
+
+    def say(self, msg):
+        self.said_lines.append(msg)
+
+
+class CompressedStateTest(TestCase):
+    """Base class for state compression tests."""
+
+    def create_module(self, state, index=0):
+        """Create a problem StudentModule with the given state."""
+        return StudentModuleFactory.create(
+            state=state,
+            module_state_key=Location('MITx', '999', 'Robot_Super_Course', 'problem', 'p{}'.format(index)),
+        )
+
+    def raw_state(self, model, row_id):
+        """Return the state of a row exactly as stored in the database."""
+        return model.objects.filter(id=row_id).values_list('state', flat=True)[0]
+
+
+class StudentModuleStateFieldTest(CompressedStateTest):
+    """Tests of the transparent compression of StudentModule.state."""
+
+    @override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=None)
+    def test_compression_disabled(self):
+        module = self.create_module(LARGE_STATE)
+        self.assertEqual(self.raw_state(StudentModule, module.id), LARGE_STATE)
+
+    @override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=100)
+    def test_large_state_compressed(self):
+        module = self.create_module(LARGE_STATE)
+        raw_state = self.raw_state(StudentModule, module.id)
+        self.assertTrue(ThresholdCompressedTextField.is_compressed(raw_state))
+        self.assertLess(len(raw_state), len(LARGE_STATE))
+        self.assertEqual(StudentModule.objects.get(id=module.id).state, LARGE_STATE)
+
+        # History rows are compressed too
+        history = StudentModuleHistory.objects.get(student_module=module)
+        self.assertTrue(ThresholdCompressedTextField.is_compressed(self.raw_state(StudentModuleHistory, history.id)))
+        self.assertEqual(history.state, LARGE_STATE)
+
+    @override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=100)
+    def test_small_state_not_compressed(self):
+        module = self.create_module(SMALL_STATE)
+        self.assertEqual(self.raw_state(StudentModule, module.id), SMALL_STATE)
+
+    @override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=100)
+    def test_state_contains(self):
+        compressed = self.create_module(LARGE_STATE, index=0)
+        uncompressed = self.create_module(SMALL_STATE, index=1)
+        self.create_module(json.dumps({'done': False}), index=2)
+
+        self.assertItemsEqual(
+            StudentModule.objects.filter(state_contains('"done": true')),
+            [compressed, uncompressed],
+        )
+
+
+class CompressStudentModuleStateTest(CompressedStateTest):
+    """Tests of the compress_student_module_state management command."""
+
+    def setUp(self):
+        super(CompressStudentModuleStateTest, self).setUp()
+        with override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=None):
+            self.large = self.create_module(LARGE_STATE, index=0)
+            self.small = self.create_module(SMALL_STATE, index=1)
+            self.empty = self.create_module(None, index=2)
+
+    def test_compress_existing_rows(self):
+        modified = StudentModule.objects.get(id=self.large.id).modified
+
+        compressor = StudentModuleCompressorSayStubbed(StudentModule, 100)
+        compressor.main(batch_size=2)
+
+        self.assertTrue(ThresholdCompressedTextField.is_compressed(self.raw_state(StudentModule, self.large.id)))
+        self.assertEqual(self.raw_state(StudentModule, self.small.id), SMALL_STATE)
+        self.assertIsNone(self.raw_state(StudentModule, self.empty.id))
+        self.assertEqual(compressor.rows_examined, 3)
+        self.assertEqual(compressor.rows_compressed, 1)
+
+        # Compressing doesn't count as a modification
+        large = StudentModule.objects.get(id=self.large.id)
+        self.assertEqual(large.modified, modified)
+        self.assertEqual(large.state, LARGE_STATE)
+
+    def test_already_compressed(self):
+        StudentModuleCompressorSayStubbed(StudentModule, 100).main()
+        compressor = StudentModuleCompressorSayStubbed(StudentModule, 100)
+        compressor.main()
+        self.assertEqual(compressor.rows_compressed, 0)
+
+    def test_dry_run(self):
+        compressor = StudentModuleCompressorSayStubbed(StudentModule, 100, dry_run=True)
+        compressor.main()
+        self.assertEqual(compressor.rows_compressed, 1)
+        self.assertEqual(self.raw_state(StudentModule, self.large.id), LARGE_STATE)
+
+    @override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=100)
+    def test_command(self):
+        call_command('compress_student_module_state', batch=10)
+        self.assertTrue(ThresholdCompressedTextField.is_compressed(self.raw_state(StudentModule, self.large.id)))
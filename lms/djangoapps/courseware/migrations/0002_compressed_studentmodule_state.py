@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import util.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseware', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentmodule',
+            name='state',
+            field=util.models.ThresholdCompressedTextField(null=True, blank=True, threshold_setting=b'STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD'),
+        ),
+        migrations.AlterField(
+            model_name='studentmodulehistory',
+            name='state',
+            field=util.models.ThresholdCompressedTextField(null=True, blank=True, threshold_setting=b'STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import xmodule_django.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseware', '0002_compressed_studentmodule_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SafeExecResult',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', xmodule_django.models.CourseKeyField(max_length=255)),
+                ('key', models.CharField(max_length=255)),
+                ('slug', models.CharField(max_length=255, db_index=True)),
+                ('result', models.TextField()),
+                ('hits', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='safeexecresult',
+            unique_together=set([('course_id', 'key')]),
+        ),
+    ]
@@ -18,12 +18,14 @@ import itertools
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.db.models.signals import post_save
 from django.dispatch import receiver, Signal
 
 from model_utils.models import TimeStampedModel
 from student.models import user_by_anonymous_id
 from submissions.models import score_set, score_reset
+from util.models import ThresholdCompressedTextField
 
 from xmodule_django.models import CourseKeyField, LocationKeyField, BlockTypeKeyField
 log = logging.getLogger(__name__)
@@ -71,6 +73,16 @@ class ChunkingManager(models.Manager):
         return res
 
 
+def state_contains(substring):
+    """
+    Return a :class:`~Q` that matches :class:`StudentModule` rows whose state contains `substring`.
+
+    Compressed states can't be searched by the database, so every compressed row is
+    matched as well. Callers must check the decompressed state of the returned rows.
+    """
+    return Q(state__contains=substring) | Q(state__startswith=ThresholdCompressedTextField.COMPRESSED_PREFIX)
+
+
 class StudentModule(models.Model):
     """
     Keeps student state for a particular module in a particular course.
@@ -100,8 +112,10 @@ class StudentModule(models.Model):
         app_label = "courseware"
         unique_together = (('student', 'module_state_key', 'course_id'),)
 
-    # Internal state of the object
-    state = models.TextField(null=True, blank=True)
+    # Internal state of the object. Large states are compressed, see `state_contains`.
+    state = ThresholdCompressedTextField(
+        null=True, blank=True, threshold_setting='STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD'
+    )
 
     # Grade, and are we done?
     grade = models.FloatField(null=True, blank=True, db_index=True)
@@ -165,7 +179,9 @@ class StudentModuleHistory(models.Model):
 
     # This should be populated from the modified field in StudentModule
     created = models.DateTimeField(db_index=True)
-    state = models.TextField(null=True, blank=True)
+    state = ThresholdCompressedTextField(
+        null=True, blank=True, threshold_setting='STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD'
+    )
     grade = models.FloatField(null=True, blank=True)
     max_grade = models.FloatField(null=True, blank=True)
 
@@ -295,6 +311,31 @@ class OfflineComputedGradeLog(models.Model):
         return "[OCGLog] %s: %s" % (self.course_id.to_deprecated_string(), self.created)  # pylint: disable=no-member
 
 
+class SafeExecResult(models.Model):
+    """
+    The result of running a problem's code with safe_exec, kept so that it can
+    be reused by everyone who runs the same code with the same globals and
+    random seed.  See `courseware.safe_exec_results`.
+    """
+    class Meta(object):
+        app_label = "courseware"
+        unique_together = (('course_id', 'key'),)
+
+    course_id = CourseKeyField(max_length=255)
+    # The key safe_exec caches the result under.
+    key = models.CharField(max_length=255)
+    # The problem that first ran the code.
+    slug = models.CharField(max_length=255, db_index=True)
+    # The exception message and resulting globals, as JSON.
+    result = models.TextField()
+    hits = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(db_index=True)
+
+    def __unicode__(self):
+        return u"[SafeExecResult] {}: {} ({} hits)".format(self.course_id, self.slug, self.hits)
+
+
 class StudentFieldOverride(TimeStampedModel):
     """
     Holds the value of a specific field overriden for a student.  This is used
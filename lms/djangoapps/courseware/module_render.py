@@ -24,6 +24,7 @@ from django.test.client import RequestFactory
 from django.views.decorators.csrf import csrf_exempt
 
 import newrelic.agent
+import request_cache
 
 from capa.xqueue_interface import XQueueInterface
 from courseware.access import has_access, get_user_role
@@ -35,6 +36,8 @@ from courseware.masquerade import (
 )
 from courseware.model_data import DjangoKeyValueStore, FieldDataCache, set_score
 from courseware.models import SCORE_CHANGED
+from courseware.safe_exec_results import get_safe_exec_cache
+from courseware.transformers.toc import TableOfContentsTransformer
 from courseware.entrance_exams import (
     get_entrance_exam_score,
     user_must_complete_entrance_exam,
@@ -42,6 +45,7 @@ from courseware.entrance_exams import (
 )
 from edxmako.shortcuts import render_to_string
 from eventtracking import tracker
+from lms.djangoapps.course_blocks.api import get_course_blocks, COURSE_BLOCK_ACCESS_TRANSFORMERS
 from lms.djangoapps.lms_xblock.field_data import LmsFieldData
 from lms.djangoapps.lms_xblock.runtime import LmsModuleSystem, unquote_slashes, quote_slashes
 from lms.djangoapps.lms_xblock.models import XBlockAsidesConfig
@@ -50,6 +54,7 @@ from opaque_keys.edx.keys import UsageKey, CourseKey
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from openedx.core.djangoapps.bookmarks.services import BookmarksService
 from openedx.core.lib.xblock_utils import (
+    cache_fragment,
     replace_course_urls,
     replace_jump_to_id_urls,
     replace_static_urls,
@@ -68,7 +73,9 @@ from xblock.runtime import KvsFieldData
 from xmodule.contentstore.django import contentstore
 from xmodule.error_module import ErrorDescriptor, NonStaffErrorDescriptor
 from xmodule.exceptions import NotFoundError, ProcessingError
+from xmodule.library_tools import LibraryToolsService
 from xmodule.modulestore.django import modulestore, ModuleI18nService
+from xmodule.services import SettingsService
 from xmodule.lti_module import LTIModule
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.x_module import XModuleDescriptor
@@ -98,6 +105,9 @@ XQUEUE_INTERFACE = XQueueInterface(
     REQUESTS_AUTH,
 )
 
+# Name of the request cache holding the module system state shared between blocks
+SHARED_MODULE_SYSTEM_CACHE = 'courseware.module_render.shared_module_system'
+
 # TODO: course_id and course_key are used interchangeably in this file, which is wrong.
 # Some brave person should make the variable names consistently someday, but the code's
 # coupled enough that it's kind of tricky--you've been warned!
@@ -122,6 +132,75 @@ def make_track_function(request):
     return function
 
 
+def _required_toc_content(request, user, course):
+    """
+    Return the locations of the chapters the user is required to complete before
+    any others are shown in the table of contents, or an empty list if there
+    are none.
+    """
+    # See if the course is gated by one or more content milestones
+    required_content = milestones_helpers.get_required_content(course, user)
+
+    # The user may not actually have to complete the entrance exam, if one is required
+    if not user_must_complete_entrance_exam(request, user, course):
+        required_content = [content for content in required_content if not content == course.entrance_exam_id]
+
+    return required_content
+
+
+def _add_timed_exam_context(user, course, section_location, section_context):
+    """
+    Add in rendering context to `section_context` if the section at
+    `section_location` is a timed exam (which includes proctored).
+    """
+    if not settings.FEATURES.get('ENABLE_SPECIAL_EXAMS', False):
+        return
+
+    # We need to import this here otherwise Lettuce test
+    # harness fails. When running in 'harvest' mode, the
+    # test service appears to get into trouble with
+    # circular references (not sure which as edx_proctoring.api
+    # doesn't import anything from edx-platform). Odd thing
+    # is that running: manage.py lms runserver --settings=acceptance
+    # works just fine, it's really a combination of Lettuce and the
+    # 'harvest' management command
+    #
+    # One idea is that there is some coupling between
+    # lettuce and the 'terrain' Djangoapps projects in /common
+    # This would need more investigation
+    from edx_proctoring.api import get_attempt_status_summary
+
+    #
+    # call into edx_proctoring subsystem
+    # to get relevant proctoring information regarding this
+    # level of the courseware
+    #
+    # This will return None, if (user, course_id, content_id)
+    # is not applicable
+    #
+    timed_exam_attempt_context = None
+    try:
+        timed_exam_attempt_context = get_attempt_status_summary(
+            user.id,
+            unicode(course.id),
+            unicode(section_location)
+        )
+    except Exception, ex:  # pylint: disable=broad-except
+        # safety net in case something blows up in edx_proctoring
+        # as this is just informational descriptions, it is better
+        # to log and continue (which is safe) than to have it be an
+        # unhandled exception
+        log.exception(ex)
+
+    if timed_exam_attempt_context:
+        # yes, user has proctoring context about
+        # this level of the courseware
+        # so add to the accordion data context
+        section_context.update({
+            'proctoring': timed_exam_attempt_context,
+        })
+
+
 def toc_for_course(user, request, course, active_chapter, active_section, field_data_cache):
     '''
     Create a table of contents from the module store
@@ -156,12 +235,7 @@ def toc_for_course(user, request, course, active_chapter, active_section, field_
         toc_chapters = list()
         chapters = course_module.get_display_items()
 
-        # See if the course is gated by one or more content milestones
-        required_content = milestones_helpers.get_required_content(course, user)
-
-        # The user may not actually have to complete the entrance exam, if one is required
-        if not user_must_complete_entrance_exam(request, user, course):
-            required_content = [content for content in required_content if not content == course.entrance_exam_id]
+        required_content = _required_toc_content(request, user, course)
 
         for chapter in chapters:
             # Only show required content, if there is required content
@@ -192,58 +266,8 @@ def toc_for_course(user, request, course, active_chapter, active_section, field_
                         'graded': section.graded,
                     }
 
-                    #
-                    # Add in rendering context if exam is a timed exam (which includes proctored)
-                    #
-
-                    section_is_time_limited = (
-                        getattr(section, 'is_time_limited', False) and
-                        settings.FEATURES.get('ENABLE_SPECIAL_EXAMS', False)
-                    )
-                    if section_is_time_limited:
-                        # We need to import this here otherwise Lettuce test
-                        # harness fails. When running in 'harvest' mode, the
-                        # test service appears to get into trouble with
-                        # circular references (not sure which as edx_proctoring.api
-                        # doesn't import anything from edx-platform). Odd thing
-                        # is that running: manage.py lms runserver --settings=acceptance
-                        # works just fine, it's really a combination of Lettuce and the
-                        # 'harvest' management command
-                        #
-                        # One idea is that there is some coupling between
-                        # lettuce and the 'terrain' Djangoapps projects in /common
-                        # This would need more investigation
-                        from edx_proctoring.api import get_attempt_status_summary
-
-                        #
-                        # call into edx_proctoring subsystem
-                        # to get relevant proctoring information regarding this
-                        # level of the courseware
-                        #
-                        # This will return None, if (user, course_id, content_id)
-                        # is not applicable
-                        #
-                        timed_exam_attempt_context = None
-                        try:
-                            timed_exam_attempt_context = get_attempt_status_summary(
-                                user.id,
-                                unicode(course.id),
-                                unicode(section.location)
-                            )
-                        except Exception, ex:  # pylint: disable=broad-except
-                            # safety net in case something blows up in edx_proctoring
-                            # as this is just informational descriptions, it is better
-                            # to log and continue (which is safe) than to have it be an
-                            # unhandled exception
-                            log.exception(ex)
-
-                        if timed_exam_attempt_context:
-                            # yes, user has proctoring context about
-                            # this level of the courseware
-                            # so add to the accordion data context
-                            section_context.update({
-                                'proctoring': timed_exam_attempt_context,
-                            })
+                    if getattr(section, 'is_time_limited', False):
+                        _add_timed_exam_context(user, course, section.location, section_context)
 
                     sections.append(section_context)
             toc_chapters.append({
@@ -256,6 +280,78 @@ def toc_for_course(user, request, course, active_chapter, active_section, field_
         return toc_chapters
 
 
+def toc_for_course_blocks(user, request, course, active_chapter, active_section):
+    """
+    Create a table of contents from the block cache.
+
+    This returns the same structure as :func:`toc_for_course`, but only reads
+    the fields it needs from the cached course block structure rather than
+    binding the course's chapters and sections through the modulestore.
+
+    Field overrides (e.g. CCX or individual due dates) aren't applied to the
+    block cache, so :func:`toc_for_course` must be used for courses with
+    field override providers enabled.
+    """
+    course_usage_key = modulestore().make_course_usage_key(course.id)
+    block_structure = get_course_blocks(
+        user,
+        course_usage_key,
+        transformers=COURSE_BLOCK_ACCESS_TRANSFORMERS + [TableOfContentsTransformer()],
+    )
+    if not block_structure.has_block(course_usage_key):
+        return None
+
+    def toc_field(block_key, field_name, default=None):
+        """ Return the value of a field collected by the TableOfContentsTransformer. """
+        return block_structure.get_xblock_field(block_key, field_name, default)
+
+    def display_name_with_default_escaped(block_key):
+        """ Equivalent of XModuleMixin.display_name_with_default_escaped, for a block key. """
+        display_name = toc_field(block_key, 'display_name')
+        if display_name is None:
+            display_name = block_key.block_id.replace('_', ' ')
+        return display_name.replace('<', '&lt;').replace('>', '&gt;')
+
+    required_content = _required_toc_content(request, user, course)
+
+    toc_chapters = list()
+    for chapter_key in block_structure.get_children(course_usage_key):
+        # Only show required content, if there is required content
+        if required_content and unicode(chapter_key) not in required_content:
+            continue
+        if toc_field(chapter_key, 'hide_from_toc', False):
+            continue
+
+        chapter_display_name = display_name_with_default_escaped(chapter_key)
+        sections = list()
+        for section_key in block_structure.get_children(chapter_key):
+            if toc_field(section_key, 'hide_from_toc', False):
+                continue
+
+            section_format = toc_field(section_key, 'format')
+            section_context = {
+                'display_name': display_name_with_default_escaped(section_key),
+                'url_name': section_key.block_id,
+                'format': section_format if section_format is not None else '',
+                'due': toc_field(section_key, 'due'),
+                'active': chapter_key.block_id == active_chapter and section_key.block_id == active_section,
+                'graded': toc_field(section_key, 'graded', False),
+            }
+
+            if toc_field(section_key, 'is_time_limited', False):
+                _add_timed_exam_context(user, course, section_key, section_context)
+
+            sections.append(section_context)
+        toc_chapters.append({
+            'display_name': chapter_display_name,
+            'display_id': slugify(chapter_display_name),
+            'url_name': chapter_key.block_id,
+            'sections': sections,
+            'active': chapter_key.block_id == active_chapter,
+        })
+    return toc_chapters
+
+
 def get_module(user, request, usage_key, field_data_cache,
                position=None, log_if_not_found=True, wrap_xmodule_display=True,
                grade_bucket_type=None, depth=0,
@@ -360,6 +456,47 @@ def get_module_for_descriptor(user, request, descriptor, field_data_cache, cours
     )
 
 
+def _shared_module_system_state(user, course_id, request_token):
+    """
+    Returns the parts of a module system that depend only on the user and the
+    course, not on the block being bound: the stateless runtime services, the
+    jump_to_id base url, and the user's global and beta tester roles.
+
+    Rendering a course page binds hundreds of blocks for the same user, so
+    within a request (identified by `request_token`) these are built once per
+    (user, course) and shared between all of the module systems. Without a
+    request token (e.g. in celery tasks) nothing is shared.
+    """
+    def build_state():
+        """Build the shared state from scratch."""
+        return {
+            'services': {
+                'i18n': ModuleI18nService(),
+                'fs': FSService(),
+                'reverification': ReverificationService(),
+                'proctoring': ProctoringService(),
+                'credit': CreditService(),
+                'bookmarks': BookmarksService(user=user),
+                'library_tools': LibraryToolsService(modulestore()),
+                'settings': SettingsService(),
+            },
+            'jump_to_id_base_url': reverse(
+                'jump_to_id', kwargs={'course_id': course_id.to_deprecated_string(), 'module_id': ''}
+            ),
+            'user_is_admin': bool(has_access(user, u'staff', 'global')),
+            'user_is_beta_tester': CourseBetaTesterRole(course_id).has_user(user),
+        }
+
+    if not request_token:
+        return build_state()
+
+    shared_states = request_cache.get_cache(SHARED_MODULE_SYSTEM_CACHE)
+    cache_key = (request_token, user.id, unicode(course_id))
+    if cache_key not in shared_states:
+        shared_states[cache_key] = build_state()
+    return shared_states[cache_key]
+
+
 def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=too-many-statements
                                # Arguments preceding this comment have user binding, those following don't
                                descriptor, course_id, track_function, xqueue_callback_url_prefix,
@@ -385,6 +522,7 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
     Returns:
         (LmsModuleSystem, KvsFieldData):  (module system, student_data) bound to, primarily, the user and descriptor
     """
+    shared_state = _shared_module_system_state(user, course_id, request_token)
 
     def make_xqueue_callback(dispatch='score_update'):
         """
@@ -628,9 +766,10 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
     block_wrappers.append(partial(
         replace_jump_to_id_urls,
         course_id,
-        reverse('jump_to_id', kwargs={'course_id': course_id.to_deprecated_string(), 'module_id': ''}),
+        shared_state['jump_to_id_base_url'],
     ))
 
+    has_staff_markup = False
     if settings.FEATURES.get('DISPLAY_DEBUG_INFO_TO_STAFF'):
         if is_masquerading_as_specific_student(user, course_id):
             # When masquerading as a specific student, we want to show the debug button
@@ -649,6 +788,7 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
             instructor_access = bool(has_access(user, 'instructor', descriptor, course_id))
         if staff_access:
             block_wrappers.append(partial(add_staff_markup, user, instructor_access, disable_staff_debug_info))
+            has_staff_markup = True
 
     # These modules store data using the anonymous_student_id as a key.
     # To prevent loss of data, we will continue to provide old modules with
@@ -664,10 +804,29 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
     else:
         anonymous_student_id = anonymous_id_for_user(user, None)
 
+    # Cache the rendered fragments of non-interactive blocks across users. The staff
+    # debug markup is specific to the user, so their fragments aren't cached.
+    render_wrappers = []
+    if (
+            descriptor.scope_ids.block_type in settings.XBLOCK_FRAGMENT_CACHE_BLOCK_TYPES and
+            settings.XBLOCK_FRAGMENT_CACHE_TIMEOUT is not None and
+            request_token and not has_staff_markup
+    ):
+        # Html blocks substitute the user's anonymous id for %%USER_ID%%
+        if '%%USER_ID%%' in getattr(descriptor, 'data', ''):
+            cache_key_extra = (anonymous_student_id,)
+        else:
+            cache_key_extra = ()
+        render_wrappers.append(partial(cache_fragment, request_token, cache_key_extra))
+
     field_data = LmsFieldData(descriptor._field_data, student_data)  # pylint: disable=protected-access
 
     user_is_staff = bool(has_access(user, u'staff', descriptor.location, course_id))
 
+    services = dict(shared_state['services'])
+    services['field-data'] = field_data
+    services['user'] = DjangoXBlockUserService(user, user_is_staff=user_is_staff)
+
     system = LmsModuleSystem(
         track_function=track_function,
         render_template=render_to_string,
@@ -695,29 +854,21 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
         replace_jump_to_id_urls=partial(
             static_replace.replace_jump_to_id_urls,
             course_id=course_id,
-            jump_to_id_base_url=reverse('jump_to_id', kwargs={'course_id': course_id.to_deprecated_string(), 'module_id': ''})
+            jump_to_id_base_url=shared_state['jump_to_id_base_url']
         ),
         node_path=settings.NODE_PATH,
         publish=publish,
         anonymous_student_id=anonymous_student_id,
         course_id=course_id,
-        cache=cache,
+        cache=get_safe_exec_cache(course_id, cache),
         can_execute_unsafe_code=(lambda: can_execute_unsafe_code(course_id)),
         get_python_lib_zip=(lambda: get_python_lib_zip(contentstore, course_id)),
         # TODO: When we merge the descriptor and module systems, we can stop reaching into the mixologist (cpennington)
         mixins=descriptor.runtime.mixologist._mixins,  # pylint: disable=protected-access
         wrappers=block_wrappers,
+        render_wrappers=render_wrappers,
         get_real_user=user_by_anonymous_id,
-        services={
-            'i18n': ModuleI18nService(),
-            'fs': FSService(),
-            'field-data': field_data,
-            'user': DjangoXBlockUserService(user, user_is_staff=user_is_staff),
-            "reverification": ReverificationService(),
-            'proctoring': ProctoringService(),
-            'credit': CreditService(),
-            'bookmarks': BookmarksService(user=user),
-        },
+        services=services,
         get_user_role=lambda: get_user_role(user, course_id),
         descriptor_runtime=descriptor._runtime,  # pylint: disable=protected-access
         rebind_noauth_module_to_user=rebind_noauth_module_to_user,
@@ -736,12 +887,12 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
     system.set('position', position)
 
     system.set(u'user_is_staff', user_is_staff)
-    system.set(u'user_is_admin', bool(has_access(user, u'staff', 'global')))
-    system.set(u'user_is_beta_tester', CourseBetaTesterRole(course_id).has_user(user))
+    system.set(u'user_is_admin', shared_state['user_is_admin'])
+    system.set(u'user_is_beta_tester', shared_state['user_is_beta_tester'])
     system.set(u'days_early_for_beta', descriptor.days_early_for_beta)
 
     # make an ErrorDescriptor -- assuming that the descriptor's system is ok
-    if has_access(user, u'staff', descriptor.location, course_id):
+    if user_is_staff:
         system.error_descriptor_class = ErrorDescriptor
     else:
         system.error_descriptor_class = NonStaffErrorDescriptor
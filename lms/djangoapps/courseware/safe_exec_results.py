@@ -0,0 +1,132 @@
+"""
+A persistent store for the results of running problem code with safe_exec.
+
+safe_exec caches its results keyed on the code, the globals and the random
+seed, so everyone who gets the same seed for a randomized problem can share
+one execution.  In the Django cache those results are soon evicted by
+everything else that is cached, so they are kept in the SafeExecResult table
+instead, namespaced by course.  The table is kept to
+SAFE_EXEC_RESULT_STORE_MAX_ENTRIES rows by the periodic
+courseware.evict_safe_exec_results task, which evicts the least recently used
+results.
+
+So that every hit isn't a write, only one in HIT_SAMPLE_RATE hits is recorded,
+adding HIT_SAMPLE_RATE to the result's hits and bumping its last_used.
+
+Everything else the runtime caches still goes to the Django cache.
+"""
+import json
+import logging
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+import dogstats_wrapper as dog_stats_api
+from courseware.models import SafeExecResult
+
+log = logging.getLogger(__name__)
+
+# The prefix of the keys safe_exec caches its results under
+SAFE_EXEC_KEY_PREFIX = "safe_exec."
+
+# One in this many hits is written to the SafeExecResult table
+HIT_SAMPLE_RATE = 10
+
+
+class SafeExecResultCache(object):
+    """
+    A cache for the runtime of a course's blocks, which keeps safe_exec
+    results in the SafeExecResult table, and everything else in `fallback`.
+    """
+    def __init__(self, course_id, fallback):
+        self.course_id = course_id
+        self.fallback = fallback
+
+    def get(self, key):
+        """
+        Get the value cached for `key`, or None.
+        """
+        if key.startswith(SAFE_EXEC_KEY_PREFIX):
+            return self.get_result(key)
+        return self.fallback.get(key)
+
+    def set(self, key, value, *args, **kwargs):
+        """
+        Cache `value` for `key`.
+        """
+        if key.startswith(SAFE_EXEC_KEY_PREFIX):
+            self.set_result(key, value)
+        else:
+            self.fallback.set(key, value, *args, **kwargs)
+
+    def get_result(self, key, slug=None):  # pylint: disable=unused-argument
+        """
+        Get the safe_exec result stored for `key`, or None, sampling the hit.
+        """
+        row = SafeExecResult.objects.filter(course_id=self.course_id, key=key).values_list('id', 'result').first()
+        if row is None:
+            dog_stats_api.increment('courseware.safe_exec_results.miss')
+            return None
+
+        dog_stats_api.increment('courseware.safe_exec_results.hit')
+        result_id, result = row
+        if random.randrange(HIT_SAMPLE_RATE) == 0:
+            SafeExecResult.objects.filter(id=result_id).update(
+                hits=F('hits') + HIT_SAMPLE_RATE,
+                last_used=timezone.now(),
+            )
+        return json.loads(result)
+
+    def set_result(self, key, value, slug=None):
+        """
+        Store the safe_exec result `value` for `key`, run for the problem `slug`.
+        """
+        try:
+            with transaction.atomic():
+                SafeExecResult.objects.create(
+                    course_id=self.course_id,
+                    key=key,
+                    slug=slug or '',
+                    result=json.dumps(value),
+                    last_used=timezone.now(),
+                )
+        except IntegrityError:
+            # The same code was run at the same time elsewhere
+            pass
+
+
+def evict_safe_exec_results(max_entries=None):
+    """
+    Delete the least recently used results until there are no more than
+    `max_entries`, by default SAFE_EXEC_RESULT_STORE_MAX_ENTRIES.  Returns the
+    number of results deleted.
+    """
+    if max_entries is None:
+        max_entries = settings.SAFE_EXEC_RESULT_STORE_MAX_ENTRIES
+
+    # The last_used of the first result to evict.  Results used at the same
+    # time as it are evicted with it.
+    by_recency = SafeExecResult.objects.order_by('-last_used').values_list('last_used', flat=True)
+    cutoff = by_recency[max_entries:max_entries + 1]
+    if not cutoff:
+        return 0
+
+    to_evict = SafeExecResult.objects.filter(last_used__lte=cutoff[0])
+    count = to_evict.count()
+    to_evict.delete()
+    log.info("Evicted %d safe_exec results", count)
+    dog_stats_api.increment('courseware.safe_exec_results.evicted', count)
+    return count
+
+
+def get_safe_exec_cache(course_id, fallback):
+    """
+    Return the cache the runtime of `course_id`'s blocks should use: the
+    persistent store if it's enabled, and otherwise just `fallback`.
+    """
+    if settings.FEATURES.get('ENABLE_SAFE_EXEC_RESULT_STORE'):
+        return SafeExecResultCache(course_id, fallback)
+    return fallback
@@ -4,7 +4,7 @@ by the individual due dates feature.
 """
 import json
 
-from .field_overrides import FieldOverrideProvider
+from .field_overrides import FieldOverrideProvider, clear_override_maps
 from .models import StudentFieldOverride
 
 
@@ -17,6 +17,15 @@ class IndividualStudentOverrideProvider(FieldOverrideProvider):
     def get(self, block, name, default):
         return get_override_for_user(self.user, block, name, default)
 
+    def get_bulk_overrides(self, course):
+        """
+        Returns all of the user's overrides in the course, which are loaded
+        with a single query, or None if the course isn't known.
+        """
+        if course is None:
+            return None
+        return get_overrides_for_user_in_course(self.user, course.id)
+
     @classmethod
     def enabled_for(cls, course):
         """This simple override provider is always enabled"""
@@ -56,6 +65,24 @@ def _get_overrides_for_user(user, block):
     return overrides
 
 
+def get_overrides_for_user_in_course(user, course_id):
+    """
+    Gets all of the individual student overrides for the given user in the
+    course.  Returns a dictionary mapping block locations to dictionaries of
+    the JSON values of the overrides of that block, keyed by field name.
+    """
+    query = StudentFieldOverride.objects.filter(
+        course_id=course_id,
+        student_id=user.id,
+    )
+    overrides = {}
+    for override in query:
+        # Old mongo locations are stored without the course run
+        location = override.location.map_into_course(course_id)
+        overrides.setdefault(location, {})[override.field] = json.loads(override.value)
+    return overrides
+
+
 def override_field_for_user(user, block, name, value):
     """
     Overrides a field for the `user`.  `block` and `name` specify the block
@@ -70,6 +97,7 @@ def override_field_for_user(user, block, name, value):
     field = block.fields[name]
     override.value = json.dumps(field.to_json(value))
     override.save()
+    clear_override_maps()
 
 
 def clear_override_for_user(user, block, name):
@@ -85,5 +113,6 @@ def clear_override_for_user(user, block, name):
             student_id=user.id,
             location=block.location,
             field=name).delete()
+        clear_override_maps()
     except StudentFieldOverride.DoesNotExist:
         pass
@@ -0,0 +1,14 @@
+"""
+Asynchronous tasks for the courseware app.
+"""
+from courseware.safe_exec_results import evict_safe_exec_results as _evict_safe_exec_results
+from lms import CELERY_APP
+
+
+@CELERY_APP.task(name='courseware.evict_safe_exec_results')
+def evict_safe_exec_results():
+    """
+    Evict the least recently used stored results of running problem code,
+    down to SAFE_EXEC_RESULT_STORE_MAX_ENTRIES.
+    """
+    _evict_safe_exec_results()
@@ -32,7 +32,7 @@ from courseware.tests.helpers import LoginEnrollmentTestCase
 from edxmako.tests import mako_middleware_process_request
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 from student.models import CourseEnrollment
-from student.roles import CourseCcxCoachRole
+from student.roles import CourseCcxCoachRole, CourseStaffRole
 from student.tests.factories import (
     AdminFactory,
     AnonymousUserFactory,
@@ -691,3 +691,45 @@ class CourseOverviewAccessTestCase(ModuleStoreTestCase):
         course_overview = CourseOverview.get_from_id(course.id)
         with self.assertNumQueries(num_queries):
             bool(access.has_access(user, action, course_overview, course_key=course.id))
+
+
+@attr('shard_1')
+class AccessMemoizationTestCase(ModuleStoreTestCase):
+    """
+    Tests that has_access results are memoized for the rest of a request.
+    """
+    def setUp(self):
+        super(AccessMemoizationTestCase, self).setUp()
+        self.course = CourseFactory.create()
+        self.user = UserFactory()
+
+    def check_load_access(self, times):
+        """
+        Checks the user's access to load the course `times` times, and returns
+        the number of times the access was actually computed.
+        """
+        with patch('courseware.access._has_access_course', wraps=access._has_access_course) as mock_check:
+            for __ in range(times):
+                self.assertTrue(access.has_access(self.user, 'load', self.course))
+        return mock_check.call_count
+
+    def test_memoized_within_request(self):
+        with patch('request_cache.get_request', return_value=RequestFactory().get('/')):
+            self.assertEqual(self.check_load_access(3), 1)
+
+    def test_not_memoized_outside_request(self):
+        self.assertEqual(self.check_load_access(3), 3)
+
+    def test_role_changes(self):
+        with patch('request_cache.get_request', return_value=RequestFactory().get('/')):
+            self.assertFalse(access.has_access(self.user, 'staff', self.course.id))
+            CourseStaffRole(self.course.id).add_users(self.user)
+            self.assertTrue(access.has_access(self.user, 'staff', self.course.id))
+
+    def test_roles_loaded_once_per_request(self):
+        # Separate user objects, as when a view loads a user that is also the request user
+        users = [User.objects.get(id=self.user.id) for __ in range(2)]
+        with patch('request_cache.get_request', return_value=RequestFactory().get('/')):
+            with self.assertNumQueries(1):
+                for user in users:
+                    self.assertFalse(CourseStaffRole(self.course.id).has_user(user))
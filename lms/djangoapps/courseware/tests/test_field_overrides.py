@@ -1,19 +1,24 @@
 """
 Tests for `field_overrides` module.
 """
+import datetime
 import unittest
+from mock import patch
 from nose.plugins.attrib import attr
+from pytz import UTC
 
 from django.test.utils import override_settings
 from xblock.field_data import DictFieldData
-from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import (
     ModuleStoreTestCase,
 )
 
 from ..field_overrides import (
+    clear_override_maps,
     disable_overrides,
     FieldOverrideProvider,
+    NOTSET,
     OverrideFieldData,
     resolve_dotted,
 )
@@ -95,6 +100,92 @@ class OverrideFieldDataTests(ModuleStoreTestCase):
         self.assertIsInstance(data, DictFieldData)
 
 
+@attr('shard_1')
+@override_settings(FIELD_OVERRIDE_PROVIDERS=(
+    'courseware.tests.test_field_overrides.TestBulkOverrideProvider',))
+class BulkOverrideFieldDataTests(ModuleStoreTestCase):
+    """
+    Tests for `OverrideFieldData` with a provider that loads its overrides in
+    bulk.
+    """
+
+    def setUp(self):
+        super(BulkOverrideFieldDataTests, self).setUp()
+        self.course = CourseFactory.create()
+        self.chapter = ItemFactory.create(parent=self.course, category='chapter')
+        self.sequential = ItemFactory.create(parent=self.chapter, category='sequential')
+        self.vertical = ItemFactory.create(parent=self.sequential, category='vertical')
+        OverrideFieldData.provider_classes = None
+        TestBulkOverrideProvider.overrides = {
+            self.chapter.location: {'due': '2015-01-01T00:00:00Z'},
+        }
+        TestBulkOverrideProvider.loads = 0
+
+    def tearDown(self):
+        super(BulkOverrideFieldDataTests, self).tearDown()
+        OverrideFieldData.provider_classes = None
+
+    def make_one(self):
+        """
+        Factory method.
+        """
+        return OverrideFieldData.wrap(TESTUSER, self.course, DictFieldData({}))
+
+    def in_request(self):
+        """
+        Returns a context manager that makes it look like a request is active.
+        """
+        return patch('courseware.field_overrides.RequestCache.get_current_request', return_value=object())
+
+    def test_get_override(self):
+        data = self.make_one()
+        due = datetime.datetime(2015, 1, 1, tzinfo=UTC)
+        self.assertEqual(data.get_override(self.chapter, 'due'), due)
+        self.assertIs(data.get_override(self.chapter, 'start'), NOTSET)
+        self.assertIs(data.get_override(self.sequential, 'due'), NOTSET)
+        with disable_overrides():
+            self.assertIs(data.get_override(self.chapter, 'due'), NOTSET)
+
+    def test_inherited_override(self):
+        data = self.make_one()
+        due = datetime.datetime(2015, 1, 1, tzinfo=UTC)
+        self.assertEqual(data.default(self.sequential, 'due'), due)
+        self.assertEqual(data.default(self.vertical, 'due'), due)
+        self.assertFalse(data.has(self.vertical, 'due'))
+        self.assertIs(data.get_inherited_override(self.vertical, 'start'), NOTSET)
+        self.assertIs(data.get_inherited_override(self.chapter, 'due'), NOTSET)
+
+    def test_loaded_once_per_request(self):
+        with self.in_request():
+            self.make_one().get_override(self.chapter, 'due')
+            self.make_one().get_override(self.chapter, 'due')
+        self.assertEqual(TestBulkOverrideProvider.loads, 1)
+
+    def test_not_shared_outside_request(self):
+        self.make_one().get_override(self.chapter, 'due')
+        self.make_one().get_override(self.chapter, 'due')
+        self.assertEqual(TestBulkOverrideProvider.loads, 2)
+
+    def test_clear_override_maps(self):
+        with self.in_request():
+            data = self.make_one()
+            self.assertIs(data.get_inherited_override(self.vertical, 'graded'), NOTSET)
+
+            TestBulkOverrideProvider.overrides[self.sequential.location] = {'graded': True}
+            clear_override_maps()
+            self.assertTrue(data.get_inherited_override(self.vertical, 'graded'))
+        self.assertEqual(TestBulkOverrideProvider.loads, 2)
+
+    def test_clear_override_maps_outside_request(self):
+        data = self.make_one()
+        self.assertIs(data.get_inherited_override(self.vertical, 'graded'), NOTSET)
+
+        TestBulkOverrideProvider.overrides[self.sequential.location] = {'graded': True}
+        clear_override_maps()
+        self.assertTrue(data.get_inherited_override(self.vertical, 'graded'))
+        self.assertEqual(TestBulkOverrideProvider.loads, 2)
+
+
 @attr('shard_1')
 class ResolveDottedTests(unittest.TestCase):
     """
@@ -134,6 +225,25 @@ class TestOverrideProvider(FieldOverrideProvider):
         return True
 
 
+class TestBulkOverrideProvider(FieldOverrideProvider):
+    """
+    A `FieldOverrideProvider` for testing that loads its overrides in bulk.
+    """
+    overrides = {}
+    loads = 0
+
+    def get(self, block, name, default):
+        raise AssertionError("get should not be called when the overrides are loaded in bulk")
+
+    def get_bulk_overrides(self, course):
+        TestBulkOverrideProvider.loads += 1
+        return self.overrides
+
+    @classmethod
+    def enabled_for(cls, course):
+        return True
+
+
 def inject_field_overrides(blocks, course, user):
     """
     Apparently the test harness doesn't use LmsFieldStorage, and I'm
@@ -0,0 +1,82 @@
+"""
+Tests of the cost of binding blocks to a user.
+
+Rendering a course page binds every block on it with get_module_for_descriptor,
+so the per-block cost of building its module system adds up quickly.
+"""
+from django.test.client import RequestFactory
+from mock import patch
+from nose.plugins.attrib import attr
+
+from courseware.model_data import FieldDataCache
+from courseware.module_render import get_module_for_descriptor
+from request_cache.middleware import RequestCache
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+from xmodule.services import SettingsService
+
+
+@attr('shard_1')
+class ModuleBindingCostTest(ModuleStoreTestCase):
+    """
+    Checks the work done to bind blocks with and without sharing module
+    system state between the blocks bound in a request.
+    """
+    NUM_BLOCKS = 50
+
+    def setUp(self):
+        super(ModuleBindingCostTest, self).setUp()
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(parent=self.course, category='chapter')
+        self.sequential = ItemFactory.create(parent=chapter, category='sequential')
+        vertical = ItemFactory.create(parent=self.sequential, category='vertical')
+        for index in range(self.NUM_BLOCKS):
+            ItemFactory.create(parent=vertical, category='html', data=u'<p>Block {}</p>'.format(index))
+
+        self.user = UserFactory.create()
+        CourseEnrollmentFactory.create(user=self.user, course_id=self.course.id)
+
+        self.descriptors = modulestore().get_item(vertical.location, depth=None).get_children()
+
+    def new_request(self):
+        """
+        Returns a fresh request for the user, and the field data cache of the blocks.
+        """
+        RequestCache.clear_request_cache()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = {}
+        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+            self.course.id, self.user, self.sequential, depth=None
+        )
+        return request, field_data_cache
+
+    def bind_all(self, request, field_data_cache):
+        """
+        Binds every block to the user in `request`.
+        """
+        for descriptor in self.descriptors:
+            get_module_for_descriptor(
+                self.user, request, descriptor, field_data_cache, self.course.id, course=self.course
+            )
+
+    def test_no_queries_per_block(self):
+        # Warm up the caches that outlive a request (configuration, the user's
+        # roles and anonymous id), after which binding needs no queries at all
+        self.bind_all(*self.new_request())
+
+        request, field_data_cache = self.new_request()
+        with self.assertNumQueries(0):
+            self.bind_all(request, field_data_cache)
+
+    def test_shared_state_built_once(self):
+        with patch('courseware.module_render.SettingsService', wraps=SettingsService) as settings_service:
+            self.bind_all(*self.new_request())
+        self.assertEqual(settings_service.call_count, 1)
+
+        with patch('courseware.module_render.xblock_request_token', return_value=None):
+            with patch('courseware.module_render.SettingsService', wraps=SettingsService) as settings_service:
+                self.bind_all(*self.new_request())
+        self.assertEqual(settings_service.call_count, self.NUM_BLOCKS)
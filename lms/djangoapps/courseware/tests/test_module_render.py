@@ -703,6 +703,39 @@ class TestTOC(ModuleStoreTestCase):
                 self.assertIn(toc_section, actual)
 
 
+@attr('shard_1')
+@ddt.ddt
+class TestTOCFromBlocks(ModuleStoreTestCase):
+    """Check the Table of Contents built from the block cache"""
+    def setUp(self):
+        super(TestTOCFromBlocks, self).setUp()
+        self.request = RequestFactory().get('/')
+        self.request.user = UserFactory()
+
+    def _toc_from_modulestore(self, course, chapter, section):
+        """
+        Return the table of contents built by loading the course through the modulestore.
+        """
+        course = self.store.get_course(course.id, depth=2)
+        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+            course.id, self.request.user, course, depth=2
+        )
+        return render.toc_for_course(self.request.user, self.request, course, chapter, section, field_data_cache)
+
+    @ddt.data(ModuleStoreEnum.Type.mongo, ModuleStoreEnum.Type.split)
+    def test_matches_modulestore_toc(self, default_ms):
+        with self.store.default_store(default_ms):
+            course = ToyCourseFactory.create()
+            expected = self._toc_from_modulestore(course, 'Overview', 'Welcome')
+
+            # Once the block cache is populated, building the toc doesn't touch the modulestore
+            render.toc_for_course_blocks(self.request.user, self.request, course, 'Overview', 'Welcome')
+            with check_mongo_calls(0):
+                actual = render.toc_for_course_blocks(self.request.user, self.request, course, 'Overview', 'Welcome')
+
+        self.assertEqual(expected, actual)
+
+
 @attr('shard_1')
 @ddt.ddt
 @patch.dict('django.conf.settings.FEATURES', {'ENABLE_SPECIAL_EXAMS': True})
@@ -1903,6 +1936,53 @@ class LMSXBlockServiceBindingTest(ModuleStoreTestCase):
         self.assertFalse(runtime.user_is_beta_tester)
         self.assertEqual(runtime.days_early_for_beta, 5)
 
+    def _get_runtime(self, descriptor, request_token):
+        """
+        Returns the runtime that `descriptor` is bound with for `request_token`.
+        """
+        runtime, _ = render.get_module_system_for_user(
+            self.user,
+            self.student_data,
+            descriptor,
+            self.course.id,
+            self.track_function,
+            self.xqueue_callback_url_prefix,
+            request_token,
+            course=self.course
+        )
+        return runtime
+
+    @XBlock.register_temp_plugin(PureXBlock, identifier='pure')
+    def test_services_shared_within_request(self):
+        """
+        Tests that blocks bound in the same request share the stateless
+        services, but not the per-block ones.
+        """
+        descriptors = [ItemFactory(category="pure", parent=self.course) for __ in range(2)]
+        runtimes = [self._get_runtime(descriptor, self.request_token) for descriptor in descriptors]
+
+        for service_name in ("i18n", "bookmarks"):
+            self.assertIs(
+                runtimes[0].service(descriptors[0], service_name),
+                runtimes[1].service(descriptors[1], service_name),
+            )
+        self.assertIsNot(
+            runtimes[0].service(descriptors[0], "field-data"),
+            runtimes[1].service(descriptors[1], "field-data"),
+        )
+
+    @XBlock.register_temp_plugin(PureXBlock, identifier='pure')
+    @ddt.data(None, 'other_request')
+    def test_services_not_shared_between_requests(self, other_request_token):
+        """
+        Tests that nothing is shared between requests, or without a request.
+        """
+        descriptor = ItemFactory(category="pure", parent=self.course)
+        self.assertIsNot(
+            self._get_runtime(descriptor, self.request_token).service(descriptor, "bookmarks"),
+            self._get_runtime(descriptor, other_request_token).service(descriptor, "bookmarks"),
+        )
+
 
 class PureXBlockWithChildren(PureXBlock):
     """
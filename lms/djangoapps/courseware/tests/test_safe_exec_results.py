@@ -0,0 +1,160 @@
+"""
+Tests of the persistent store of safe_exec results, the task that evicts from
+it, and the safe_exec_result_stats command.
+"""
+
+from datetime import timedelta
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from mock import patch
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+from capa.safe_exec import safe_exec
+from capa.safe_exec.tests.test_safe_exec import DictCache
+from courseware.models import SafeExecResult
+from courseware.safe_exec_results import SafeExecResultCache, evict_safe_exec_results, get_safe_exec_cache
+from courseware.tasks import evict_safe_exec_results as evict_safe_exec_results_task
+
+COURSE_ID = SlashSeparatedCourseKey('MITx', '999', 'Robot_Super_Course')
+OTHER_COURSE_ID = SlashSeparatedCourseKey('MITx', '999', 'Other_Course')
+
+
+class SafeExecResultCacheTest(TestCase):
+    """Tests of SafeExecResultCache."""
+
+    def setUp(self):
+        super(SafeExecResultCacheTest, self).setUp()
+        self.fallback = DictCache({})
+        self.cache = SafeExecResultCache(COURSE_ID, self.fallback)
+
+    def test_other_keys_use_fallback(self):
+        self.cache.set('xblock.key', 'value')
+        self.assertEqual(self.fallback.cache, {'xblock.key': 'value'})
+        self.assertEqual(self.cache.get('xblock.key'), 'value')
+        self.assertFalse(SafeExecResult.objects.exists())
+
+    def test_results_stored(self):
+        self.cache.set('safe_exec.1.abc', [None, {'a': 1}])
+        self.assertEqual(self.fallback.cache, {})
+        self.assertEqual(self.cache.get('safe_exec.1.abc'), [None, {'a': 1}])
+        self.assertIsNone(self.cache.get('safe_exec.2.abc'))
+
+    @patch('courseware.safe_exec_results.HIT_SAMPLE_RATE', 1)
+    def test_hits_counted(self):
+        self.cache.set_result('safe_exec.1.abc', [None, {}], slug='problem_1')
+        self.cache.get_result('safe_exec.1.abc')
+        self.cache.get_result('safe_exec.1.abc')
+        row = SafeExecResult.objects.get(key='safe_exec.1.abc')
+        self.assertEqual(row.hits, 2)
+        self.assertEqual(row.slug, 'problem_1')
+
+    @patch('courseware.safe_exec_results.random.randrange', side_effect=[3, 0, 7])
+    def test_hits_sampled(self, mock_randrange):
+        self.cache.set_result('safe_exec.1.abc', [None, {}])
+        last_used = timezone.now() - timedelta(days=1)
+        SafeExecResult.objects.update(last_used=last_used)
+        for _ in range(3):
+            self.assertEqual(self.cache.get_result('safe_exec.1.abc'), [None, {}])
+
+        # Only the second hit was written, standing for HIT_SAMPLE_RATE hits
+        mock_randrange.assert_called_with(10)
+        row = SafeExecResult.objects.get()
+        self.assertEqual(row.hits, 10)
+        self.assertGreater(row.last_used, last_used)
+
+    def test_namespaced_by_course(self):
+        self.cache.set('safe_exec.1.abc', [None, {'a': 1}])
+        other_cache = SafeExecResultCache(OTHER_COURSE_ID, self.fallback)
+        self.assertIsNone(other_cache.get('safe_exec.1.abc'))
+
+        other_cache.set('safe_exec.1.abc', [None, {'a': 2}])
+        self.assertEqual(self.cache.get('safe_exec.1.abc'), [None, {'a': 1}])
+        self.assertEqual(other_cache.get('safe_exec.1.abc'), [None, {'a': 2}])
+
+    def test_duplicate_result_ignored(self):
+        self.cache.set('safe_exec.1.abc', [None, {'a': 1}])
+        self.cache.set('safe_exec.1.abc', [None, {'a': 1}])
+        self.assertEqual(SafeExecResult.objects.count(), 1)
+
+    @patch('courseware.safe_exec_results.HIT_SAMPLE_RATE', 1)
+    def test_safe_exec_uses_store(self):
+        g = {}
+        safe_exec("a = 17", g, cache=self.cache, slug='problem_1')
+        self.assertEqual(g['a'], 17)
+        self.assertEqual(SafeExecResult.objects.get().slug, 'problem_1')
+
+        # The second execution is answered by the store
+        g = {}
+        safe_exec("a = 17", g, cache=self.cache, slug='problem_1')
+        self.assertEqual(g['a'], 17)
+        self.assertEqual(SafeExecResult.objects.get().hits, 1)
+
+    @patch('courseware.safe_exec_results.HIT_SAMPLE_RATE', 1)
+    def test_eviction(self):
+        for index in range(5):
+            self.cache.set('safe_exec.{}.abc'.format(index), [None, {}])
+        self.cache.get('safe_exec.0.abc')
+
+        self.assertEqual(evict_safe_exec_results(max_entries=2), 3)
+        self.assertEqual(SafeExecResult.objects.count(), 2)
+        # The most recently used result is kept
+        self.assertIsNotNone(self.cache.get('safe_exec.0.abc'))
+        self.assertEqual(evict_safe_exec_results(max_entries=2), 0)
+
+    @override_settings(SAFE_EXEC_RESULT_STORE_MAX_ENTRIES=1)
+    def test_storing_does_not_evict(self):
+        self.cache.set('safe_exec.1.abc', [None, {}])
+        self.cache.set('safe_exec.2.abc', [None, {}])
+        self.assertEqual(SafeExecResult.objects.count(), 2)
+
+        evict_safe_exec_results_task.apply()
+        self.assertEqual(SafeExecResult.objects.count(), 1)
+
+    def test_get_safe_exec_cache(self):
+        with patch.dict('django.conf.settings.FEATURES', {'ENABLE_SAFE_EXEC_RESULT_STORE': False}):
+            self.assertIs(get_safe_exec_cache(COURSE_ID, self.fallback), self.fallback)
+        with patch.dict('django.conf.settings.FEATURES', {'ENABLE_SAFE_EXEC_RESULT_STORE': True}):
+            cache = get_safe_exec_cache(COURSE_ID, self.fallback)
+        self.assertIsInstance(cache, SafeExecResultCache)
+        self.assertEqual(cache.course_id, COURSE_ID)
+
+
+class SafeExecResultStatsCommandTest(TestCase):
+    """Tests of the safe_exec_result_stats management command."""
+
+    def setUp(self):
+        super(SafeExecResultStatsCommandTest, self).setUp()
+        cache = SafeExecResultCache(COURSE_ID, DictCache({}))
+        cache.set_result('safe_exec.1.abc', [None, {}], slug='problem_1')
+        cache.set_result('safe_exec.2.abc', [None, {}], slug='problem_1')
+        with patch('courseware.safe_exec_results.HIT_SAMPLE_RATE', 1):
+            for _ in range(6):
+                cache.get_result('safe_exec.1.abc')
+        SafeExecResultCache(OTHER_COURSE_ID, DictCache({})).set_result('safe_exec.1.abc', [None, {}], slug='problem_2')
+
+    def call_command(self, **options):
+        """Run the command, returning its output."""
+        out = StringIO()
+        call_command('safe_exec_result_stats', stdout=out, **options)
+        return out.getvalue()
+
+    def test_stats(self):
+        output = self.call_command()
+        self.assertIn("problem_1: 2 results, 6 hits, 75.0% hit rate", output)
+        self.assertIn("problem_2: 1 results, 0 hits, 0.0% hit rate", output)
+        self.assertIn("Total: 3 results, 6 hits, 66.7% hit rate", output)
+
+    def test_course_filter(self):
+        output = self.call_command(course=COURSE_ID.to_deprecated_string())
+        self.assertIn("problem_1", output)
+        self.assertNotIn("problem_2", output)
+
+    @override_settings(SAFE_EXEC_RESULT_STORE_MAX_ENTRIES=1)
+    def test_evict(self):
+        output = self.call_command(evict=True)
+        self.assertIn("Evicted 2 results", output)
+        self.assertEqual(SafeExecResult.objects.count(), 1)
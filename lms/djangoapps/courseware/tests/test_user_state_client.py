@@ -4,7 +4,6 @@ defined in edx_user_state_client.
 """
 
 from collections import defaultdict
-from unittest import skip
 
 from django.test import TestCase
 
@@ -32,36 +31,31 @@ class TestDjangoUserStateClient(UserStateClientTestBase, TestCase):
         self.client = DjangoXBlockUserStateClient()
         self.users = defaultdict(UserFactory.create)
 
-    # We're skipping these tests because the iter_all_by_block and iter_all_by_course
-    # are not implemented in the DjangoXBlockUserStateClient
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_deleted_block(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_empty(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_many_users(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_single_user(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_deleted_block(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_empty(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_single_user(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_many_users(self):
-        pass
+    def test_iter_course_batches(self):
+        """
+        The iterator pages through the table by primary key, issuing one query per
+        batch (plus one for the final, short batch), and returns every row exactly once.
+        """
+        for user_idx in range(5):
+            self.set(user_idx, 0, {'a': user_idx})
+
+        with self.assertNumQueries(3):
+            states = list(self.client.iter_all_for_course(self._block(0).course_key, batch_size=2))
+
+        self.assertEqual(
+            [state.state['a'] for state in states],
+            range(5),
+        )
+
+    def test_iter_block_batches(self):
+        for user_idx in range(4):
+            self.set(user_idx, 0, {'a': user_idx})
+            self.set(user_idx, 1, {'b': user_idx})
+
+        with self.assertNumQueries(3):
+            states = list(self.client.iter_all_for_block(self._block(0), batch_size=2))
+
+        self.assertEqual(
+            [(state.username, state.state) for state in states],
+            [(self._user(user_idx), {'a': user_idx}) for user_idx in range(4)],
+        )
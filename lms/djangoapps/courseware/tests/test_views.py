@@ -38,6 +38,7 @@ from courseware.testutils import RenderXBlockTestMixin
 from courseware.tests.factories import StudentModuleFactory
 from courseware.user_state_client import DjangoXBlockUserStateClient
 from edxmako.tests import mako_middleware_process_request
+from lms.djangoapps.lms_xblock.runtime import quote_slashes
 from openedx.core.djangoapps.self_paced.models import SelfPacedConfiguration
 from student.models import CourseEnrollment
 from student.tests.factories import AdminFactory, UserFactory, CourseEnrollmentFactory
@@ -1262,6 +1263,56 @@ class TestIndexView(ModuleStoreTestCase):
         response = views.index(request, unicode(course.id), chapter=chapter.url_name, section=section.url_name)
         self.assertIn("Activate Block ID: test_block_id", response.content)
 
+    @patch.dict('django.conf.settings.FEATURES', {
+        'ENABLE_DEFERRED_SEQUENCE_RENDERING': True,
+        'ENABLE_XBLOCK_VIEW_ENDPOINT': True,
+    })
+    def test_deferred_sequence_rendering(self):
+        """
+        Verify that only the active unit of a sequence is rendered, and the
+        others link to the xblock_view endpoint.
+        """
+        user = UserFactory()
+
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(parent=course, category='chapter')
+        section = ItemFactory.create(parent=chapter, category='sequential', display_name="Sequence")
+        verticals = []
+        for index in range(3):
+            vertical = ItemFactory.create(parent=section, category='vertical', display_name="Unit {}".format(index))
+            ItemFactory.create(parent=vertical, category='html', data="<p>Unit content {}</p>".format(index))
+            verticals.append(vertical)
+
+        CourseEnrollmentFactory(user=user, course_id=course.id)
+
+        request = RequestFactory().get(
+            reverse(
+                'courseware_section',
+                kwargs={
+                    'course_id': unicode(course.id),
+                    'chapter': chapter.url_name,
+                    'section': section.url_name,
+                }
+            )
+        )
+        request.user = user
+        mako_middleware_process_request(request)
+
+        response = views.index(request, unicode(course.id), chapter=chapter.url_name, section=section.url_name)
+        self.assertIn("Unit content 0", response.content)
+        self.assertNotIn("Unit content 1", response.content)
+        self.assertNotIn("Unit content 2", response.content)
+
+        # The deferred units are still in the tab strip
+        self.assertIn("Unit 2", response.content)
+        for vertical in verticals[1:]:
+            content_url = reverse('xblock_view', kwargs={
+                'course_id': unicode(course.id),
+                'usage_id': quote_slashes(unicode(vertical.location)),
+                'view_name': 'student_view',
+            })
+            self.assertIn('data-content-url="{}"'.format(content_url), response.content)
+
 
 class TestRenderXBlock(RenderXBlockTestMixin, ModuleStoreTestCase):
     """
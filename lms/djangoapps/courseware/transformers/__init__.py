@@ -0,0 +1,3 @@
+"""
+Block structure transformers used by the courseware.
+"""
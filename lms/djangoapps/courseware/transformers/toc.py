@@ -0,0 +1,48 @@
+"""
+Table of Contents Transformer implementation.
+"""
+from openedx.core.lib.block_cache.transformer import BlockStructureTransformer
+
+
+class TableOfContentsTransformer(BlockStructureTransformer):
+    """
+    A transformer that collects the xblock fields needed to build the
+    courseware table of contents (see
+    `courseware.module_render.toc_for_course_blocks`), so that it can be
+    built from the block cache without loading the course from the
+    modulestore.
+
+    It doesn't modify the block structure.
+    """
+    VERSION = 1
+
+    TOC_FIELDS = (
+        'display_name',
+        'format',
+        'due',
+        'graded',
+        'hide_from_toc',
+        'is_time_limited',
+    )
+
+    @classmethod
+    def name(cls):
+        """
+        Unique identifier for the transformer's class;
+        same identifier used in setup.py.
+        """
+        return "courseware_toc"
+
+    @classmethod
+    def collect(cls, block_structure):
+        """
+        Collects any information that's necessary to execute this
+        transformer's transform method.
+        """
+        block_structure.request_xblock_fields(*cls.TOC_FIELDS)
+
+    def transform(self, usage_info, block_structure):
+        """
+        Mutates block_structure based on the given usage_info.
+        """
+        pass
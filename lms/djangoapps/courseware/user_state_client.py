@@ -42,6 +42,9 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
     # Use this sample rate for DataDog events.
     API_DATADOG_SAMPLE_RATE = 0.1
 
+    # The default number of rows fetched per query by the iter_all_* methods.
+    ITER_BATCH_SIZE = 1000
+
     class ServiceUnavailable(XBlockUserStateClient.ServiceUnavailable):
         """
         This error is raised if the service backing this client is currently unavailable.
@@ -339,22 +342,114 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
             yield XBlockUserState(username, block_key, state, history_entry.created, scope)
 
+    def _iter_student_modules(self, batch_size=None, **kwargs):
+        """
+        Yield the :class:`~StudentModule`s matching ``kwargs``, in primary key order.
+
+        Rows are fetched in batches using the last seen primary key as a cursor
+        (keyset pagination) rather than OFFSET slicing, so that the cost of each
+        batch stays constant no matter how far into the table we are.
+
+        Arguments:
+            batch_size (int): The number of rows to fetch per query. Defaults to
+                :attr:`ITER_BATCH_SIZE`.
+            kwargs: Filter arguments passed to :meth:`~QuerySet.filter`.
+        """
+        if batch_size is None:
+            batch_size = self.ITER_BATCH_SIZE
+
+        queryset = StudentModule.objects.filter(**kwargs).select_related('student').order_by('id')
+        last_id = None
+        while True:
+            batch_query = queryset if last_id is None else queryset.filter(id__gt=last_id)
+            batch = list(batch_query[:batch_size])
+            if not batch:
+                return
+
+            evt_time = time()
+            self._ddog_histogram(evt_time, 'iter_all.batch_size', len(batch))
+
+            for student_module in batch:
+                yield student_module
+
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1].id
+
+    def _iter_user_states(self, student_modules, scope):
+        """
+        Convert an iterable of :class:`~StudentModule`s into :class:`~XBlockUserState`s,
+        skipping rows that have no state or whose state has been deleted.
+        """
+        for student_module in student_modules:
+            if student_module.state is None:
+                continue
+
+            state = json.loads(student_module.state)
+
+            # If the state is the empty dict, then it has been deleted, and so
+            # conformant UserStateClients should treat it as if it doesn't exist.
+            if state == {}:
+                continue
+
+            usage_key = student_module.module_state_key.map_into_course(student_module.course_id)
+            yield XBlockUserState(
+                student_module.student.username,
+                usage_key,
+                state,
+                student_module.modified,
+                scope,
+            )
+
     def iter_all_for_block(self, block_key, scope=Scope.user_state, batch_size=None):
         """
-        You get no ordering guarantees. Fetching will happen in batch_size
-        increments. If you're using this method, you should be running in an
-        async task.
+        Return an iterator over the data stored for a single block, for all users.
+
+        Results are ordered by the primary key of the underlying :class:`~StudentModule`
+        rows, and are fetched ``batch_size`` rows at a time. If you're using this
+        method, you should be running in an async task.
+
+        Arguments:
+            block_key (UsageKey): The block to retrieve state for.
+            scope (Scope): The scope to load data from.
+            batch_size (int): The number of rows to fetch per query.
+
+        Yields:
+            XBlockUserState tuples for each user that has stored state for the block.
         """
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
-        raise NotImplementedError()
+
+        student_modules = self._iter_student_modules(
+            batch_size=batch_size,
+            course_id=block_key.course_key,
+            module_state_key=block_key,
+        )
+        return self._iter_user_states(student_modules, scope)
 
     def iter_all_for_course(self, course_key, block_type=None, scope=Scope.user_state, batch_size=None):
         """
-        You get no ordering guarantees. Fetching will happen in batch_size
-        increments. If you're using this method, you should be running in an
-        async task.
+        Return an iterator over all data stored in a course, for all users and blocks.
+
+        Results are ordered by the primary key of the underlying :class:`~StudentModule`
+        rows, and are fetched ``batch_size`` rows at a time. If you're using this
+        method, you should be running in an async task.
+
+        Arguments:
+            course_key (CourseKey): The course to retrieve state for.
+            block_type (str): If specified, only return state for blocks of this type.
+            scope (Scope): The scope to load data from.
+            batch_size (int): The number of rows to fetch per query.
+
+        Yields:
+            XBlockUserState tuples for each (user, block) pair with stored state.
         """
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
-        raise NotImplementedError()
+
+        filters = {'course_id': course_key}
+        if block_type is not None:
+            filters['module_type'] = block_type
+
+        student_modules = self._iter_student_modules(batch_size=batch_size, **filters)
+        return self._iter_user_states(student_modules, scope)
@@ -57,7 +57,14 @@ from openedx.core.djangoapps.credit.api import (
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 from courseware.models import StudentModuleHistory
 from courseware.model_data import FieldDataCache, ScoresClient
-from .module_render import toc_for_course, get_module_for_descriptor, get_module, get_module_by_usage_id
+from .module_render import (
+    toc_for_course,
+    toc_for_course_blocks,
+    get_module_for_descriptor,
+    get_module,
+    get_module_by_usage_id,
+)
+from .field_overrides import OverrideFieldData
 from .entrance_exams import (
     course_has_entrance_exam,
     get_entrance_exam_content,
@@ -170,8 +177,13 @@ def render_accordion(user, request, course, chapter, section, field_data_cache):
 
     Returns the html string
     """
-    # grab the table of contents
-    toc = toc_for_course(user, request, course, chapter, section, field_data_cache)
+    # grab the table of contents. Field overrides aren't applied to the block
+    # cache, so fall back to loading the course through the modulestore if any
+    # are enabled.
+    if OverrideFieldData.providers_enabled_for(course):
+        toc = toc_for_course(user, request, course, chapter, section, field_data_cache)
+    else:
+        toc = toc_for_course_blocks(user, request, course, chapter, section)
 
     context = dict([
         ('toc', toc),
@@ -542,7 +554,13 @@ def _index_bulk_op(request, course_key, chapter, section, position):
 
             # Save where we are in the chapter.
             save_child_position(chapter_module, section)
-            section_render_context = {'activate_block_id': request.GET.get('activate_block_id')}
+            section_render_context = {
+                'activate_block_id': request.GET.get('activate_block_id'),
+                'defer_inactive_children': (
+                    settings.FEATURES.get('ENABLE_DEFERRED_SEQUENCE_RENDERING', False) and
+                    settings.FEATURES.get('ENABLE_XBLOCK_VIEW_ENDPOINT', False)
+                ),
+            }
             context['fragment'] = section_module.render(STUDENT_VIEW, section_render_context)
             context['section_title'] = section_descriptor.display_name_with_default_escaped
         else:
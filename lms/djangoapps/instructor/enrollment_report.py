@@ -48,7 +48,13 @@ class BaseAbstractEnrollmentReportProvider(AbstractEnrollmentReportProvider):
         """
         Returns the UserProfile information.
         """
-        user_info = User.objects.select_related('profile').get(id=user_id)
+        return self.get_user_profile_info(User.objects.select_related('profile').get(id=user_id))
+
+    def get_user_profile_info(self, user_info):
+        """
+        Returns the UserProfile information of a User whose profile has been
+        selected along with it.
+        """
         # extended user profile fields are stored in the user_profile meta column
         meta = {}
         if user_info.profile.meta:
@@ -0,0 +1,113 @@
+"""A command to benchmark reading the features of the students enrolled in a course.
+
+It compares reading them from each student's User and UserProfile, as
+enrolled_students_features used to, with reading only their columns, as it
+does now, for a synthetic course.  The synthetic students and enrollments are
+created in a transaction that is rolled back when the command is done.
+
+"""
+
+import optparse
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+from instructor_analytics.basic import enrolled_students_features
+from student.models import CourseEnrollment, UserProfile
+
+BENCHMARK_STUDENT_FEATURES = ('id', 'username', 'email')
+BENCHMARK_PROFILE_FEATURES = ('name', 'gender', 'year_of_birth', 'level_of_education')
+BATCH_SIZE = 5000
+
+
+class Command(NoArgsCommand):
+    """The actual benchmark_enrolled_students_features command."""
+
+    help = "Benchmarks reading the features of the students enrolled in a synthetic course."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--students',
+            type='int',
+            default=200000,
+            help="How many students to enroll in the synthetic course.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        num_students = options['students']
+        with transaction.atomic():
+            course_key = create_course_enrollments(num_students)
+
+            start = time.time()
+            instance_userreports = read_instances(course_key)
+            instance_secs = time.time() - start
+
+            start = time.time()
+            userreports = enrolled_students_features(
+                course_key, BENCHMARK_STUDENT_FEATURES + BENCHMARK_PROFILE_FEATURES
+            )
+            column_secs = time.time() - start
+
+            transaction.set_rollback(True)
+
+        if userreports != instance_userreports:
+            self.stderr.write("The features read from columns differ from those read from instances\n")
+        self.stdout.write(
+            "Reading the features of {} students: {:.0f}/s from instances, {:.0f}/s from columns\n".format(
+                num_students, num_students / instance_secs, num_students / column_secs
+            )
+        )
+
+
+def create_course_enrollments(num_students):
+    """
+    Enroll `num_students` new students, each with a profile, in a new course,
+    and return the key of the course.
+    """
+    run = uuid.uuid4().hex[:8]
+    course_key = SlashSeparatedCourseKey('benchmark', 'students', run)
+    for start in xrange(0, num_students, BATCH_SIZE):
+        usernames = [
+            u'benchmark_{}_{}'.format(run, index) for index in xrange(start, min(start + BATCH_SIZE, num_students))
+        ]
+        User.objects.bulk_create([
+            User(username=username, email=u'{}@example.com'.format(username)) for username in usernames
+        ])
+        user_ids = User.objects.filter(username__in=usernames).values_list('id', flat=True)
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user_id=user_id,
+                name=u'Student {}'.format(user_id),
+                gender=('m', 'f', 'o')[user_id % 3],
+                year_of_birth=1950 + user_id % 50,
+                level_of_education='hs',
+            )
+            for user_id in user_ids
+        ])
+        CourseEnrollment.objects.bulk_create([
+            CourseEnrollment(user_id=user_id, course_id=course_key, mode='honor', is_active=True)
+            for user_id in user_ids
+        ])
+    return course_key
+
+
+def read_instances(course_key):
+    """
+    Read the features of the students enrolled in `course_key` from their
+    Users and UserProfiles.
+    """
+    students = User.objects.filter(
+        courseenrollment__course_id=course_key,
+        courseenrollment__is_active=1,
+    ).order_by('username').select_related('profile')
+    userreports = []
+    for student in students:
+        userreport = dict((feature, getattr(student, feature)) for feature in BENCHMARK_STUDENT_FEATURES)
+        userreport.update((feature, getattr(student.profile, feature)) for feature in BENCHMARK_PROFILE_FEATURES)
+        userreports.append(userreport)
+    return userreports
@@ -2,29 +2,115 @@
 Defines concrete class for cybersource  Enrollment Report.
 
 """
-from courseware.access import has_access
 import collections
 from django.conf import settings
 from django.utils.translation import ugettext as _
-from courseware.courses import get_course_by_id
 from instructor.enrollment_report import BaseAbstractEnrollmentReportProvider
 from microsite_configuration import microsite
 from shoppingcart.models import RegistrationCodeRedemption, PaidCourseRegistration, CouponRedemption, OrderItem, \
     InvoiceTransaction
 from student.models import CourseEnrollment, ManualEnrollmentAudit
+from student.roles import CourseInstructorRole, CourseStaffRole, OrgInstructorRole, OrgStaffRole
+
+
+class CourseEnrollmentReportData(object):
+    """
+    Everything the enrollment report needs to know about the enrollments in a
+    course and their payments, loaded with one query per table, and kept in
+    dicts keyed by user, enrollment or order id.
+    """
+    def __init__(self, course_id):
+        # The users with staff access to the course, other than global staff
+        self.staff_user_ids = set()
+        for role in (CourseStaffRole(course_id), OrgStaffRole(course_id.org),
+                     CourseInstructorRole(course_id), OrgInstructorRole(course_id.org)):
+            self.staff_user_ids.update(role.users_with_role().values_list('id', flat=True))
+
+        self.enrollments = {
+            enrollment.user_id: enrollment
+            for enrollment in CourseEnrollment.objects.filter(course_id=course_id)
+        }
+
+        # Where there's more than one of these for an enrollment, the last one is kept
+        self.registration_code_redemptions = {
+            redemption.course_enrollment_id: redemption
+            for redemption in RegistrationCodeRedemption.objects.filter(
+                course_enrollment__course_id=course_id
+            ).select_related(
+                'registration_code__invoice', 'registration_code__invoice_item'
+            ).order_by('redeemed_at')
+        }
+        self.paid_course_reg_items = {
+            (item.user_id, item.course_enrollment_id): item
+            for item in PaidCourseRegistration.objects.filter(course_id=course_id, status='purchased').order_by('id')
+        }
+        self.manual_enrollments = {
+            manual_enrollment.enrollment_id: manual_enrollment
+            for manual_enrollment in ManualEnrollmentAudit.objects.filter(
+                enrollment__course_id=course_id
+            ).select_related('enrolled_by').order_by('time_stamp')
+        }
+        self.reg_code_order_items = {
+            order_item.order_id: order_item
+            for order_item in OrderItem.objects.filter(courseregcodeitem__course_id=course_id)
+        }
+        self.invoice_transactions = {
+            invoice_transaction.invoice_id: invoice_transaction
+            for invoice_transaction in InvoiceTransaction.objects.filter(
+                invoice__course_id=course_id, status__in=('completed', 'refunded')
+            )
+        }
+
+        order_ids = set(item.order_id for item in self.paid_course_reg_items.itervalues())
+        order_ids.update(
+            redemption.registration_code.order_id
+            for redemption in self.registration_code_redemptions.itervalues()
+            if redemption.registration_code.order_id
+        )
+        self.coupon_codes = collections.defaultdict(list)
+        if order_ids:
+            for coupon_redemption in CouponRedemption.objects.filter(order_id__in=order_ids).select_related('coupon'):
+                self.coupon_codes[coupon_redemption.order_id].append(coupon_redemption.coupon.code)
+
+    def is_course_staff(self, user):
+        """
+        Does `user` have staff access to the course?
+        """
+        return user.is_staff or (user.is_active and user.id in self.staff_user_ids)
+
+    def get_paid_course_reg_item(self, user, course_enrollment):
+        """
+        Returns the PaidCourseRegistration `user` purchased `course_enrollment` with, or None.
+        """
+        return self.paid_course_reg_items.get((user.id, course_enrollment.id))
 
 
 class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
     """
     The concrete class for all CyberSource Enrollment Reports.
+
+    The data about a course's enrollments is loaded all at once, the first
+    time it's needed, so the information of each user can be had without
+    any more queries.
     """
+    def __init__(self):
+        super(PaidCourseEnrollmentReportProvider, self).__init__()
+        self._course_data = {}
+
+    def _get_course_data(self, course_id):
+        """
+        Returns the CourseEnrollmentReportData for `course_id`.
+        """
+        if course_id not in self._course_data:
+            self._course_data[course_id] = CourseEnrollmentReportData(course_id)
+        return self._course_data[course_id]
 
     def get_enrollment_info(self, user, course_id):
         """
         Returns the User Enrollment information.
         """
-        course = get_course_by_id(course_id, depth=0)
-        is_course_staff = bool(has_access(user, 'staff', course))
+        course_data = self._get_course_data(course_id)
+        is_course_staff = course_data.is_course_staff(user)
         manual_enrollment_reason = 'N/A'
 
         # check the user enrollment role
@@ -36,20 +122,15 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
         else:
             enrollment_role = _('Student')
 
-        course_enrollment = CourseEnrollment.get_enrollment(user=user, course_key=course_id)
+        course_enrollment = course_data.enrollments[user.id]
 
         if is_course_staff:
             enrollment_source = _('Staff')
         else:
             # get the registration_code_redemption object if exists
-            registration_code_redemption = RegistrationCodeRedemption.registration_code_used_for_enrollment(
-                course_enrollment)
+            registration_code_redemption = course_data.registration_code_redemptions.get(course_enrollment.id)
             # get the paid_course registration item if exists
-            paid_course_reg_item = PaidCourseRegistration.get_course_item_for_user_enrollment(
-                user=user,
-                course_id=course_id,
-                course_enrollment=course_enrollment
-            )
+            paid_course_reg_item = course_data.get_paid_course_reg_item(user, course_enrollment)
 
             # from where the user get here
             if registration_code_redemption is not None:
@@ -57,7 +138,7 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
             elif paid_course_reg_item is not None:
                 enrollment_source = _('Credit Card - Individual')
             else:
-                manual_enrollment = ManualEnrollmentAudit.get_manual_enrollment(course_enrollment)
+                manual_enrollment = course_data.manual_enrollments.get(course_enrollment.id)
                 if manual_enrollment is not None:
                     enrollment_source = _(
                         'manually enrolled by username: {username}'
@@ -82,20 +163,14 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
         """
         Returns the User Payment information.
         """
-        course_enrollment = CourseEnrollment.get_enrollment(user=user, course_key=course_id)
-        paid_course_reg_item = PaidCourseRegistration.get_course_item_for_user_enrollment(
-            user=user,
-            course_id=course_id,
-            course_enrollment=course_enrollment
-        )
+        course_data = self._get_course_data(course_id)
+        course_enrollment = course_data.enrollments[user.id]
+        paid_course_reg_item = course_data.get_paid_course_reg_item(user, course_enrollment)
         payment_data = collections.OrderedDict()
         # check if the user made a single self purchase scenario
         # for enrollment in the course.
         if paid_course_reg_item is not None:
-            coupon_redemption = CouponRedemption.objects.select_related('coupon').filter(
-                order_id=paid_course_reg_item.order_id)
-            coupon_codes = [redemption.coupon.code for redemption in coupon_redemption]
-            coupon_codes = ", ".join(coupon_codes)
+            coupon_codes = ", ".join(course_data.coupon_codes[paid_course_reg_item.order_id])
             registration_code_used = 'N/A'
 
             list_price = paid_course_reg_item.get_list_price()
@@ -106,19 +181,18 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
 
         else:
             # check if the user used a registration code for the enrollment.
-            registration_code_redemption = RegistrationCodeRedemption.registration_code_used_for_enrollment(
-                course_enrollment)
+            registration_code_redemption = course_data.registration_code_redemptions.get(course_enrollment.id)
             if registration_code_redemption is not None:
                 registration_code = registration_code_redemption.registration_code
                 registration_code_used = registration_code.code
                 if registration_code.invoice_item_id:
                     list_price, payment_amount, payment_status, transaction_reference_number =\
-                        self._get_invoice_data(registration_code_redemption)
+                        self._get_invoice_data(registration_code_redemption, course_data)
                     coupon_codes_used = 'N/A'
 
                 elif registration_code_redemption.registration_code.order_id:
                     list_price, payment_amount, coupon_codes_used, payment_status, transaction_reference_number = \
-                        self._get_order_data(registration_code_redemption, course_id)
+                        self._get_order_data(registration_code_redemption, course_data)
 
                 else:
                     # this happens when the registration code is not created via invoice or bulk purchase
@@ -145,16 +219,13 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
         payment_data['Transaction Reference Number'] = transaction_reference_number
         return payment_data
 
-    def _get_order_data(self, registration_code_redemption, course_id):
+    def _get_order_data(self, registration_code_redemption, course_data):
         """
         Returns the order data
         """
-        order_item = OrderItem.objects.get(order=registration_code_redemption.registration_code.order,
-                                           courseregcodeitem__course_id=course_id)
-        coupon_redemption = CouponRedemption.objects.select_related('coupon').filter(
-            order_id=registration_code_redemption.registration_code.order)
-        coupon_codes = [redemption.coupon.code for redemption in coupon_redemption]
-        coupon_codes = ", ".join(coupon_codes)
+        order_id = registration_code_redemption.registration_code.order_id
+        order_item = course_data.reg_code_order_items[order_id]
+        coupon_codes = ", ".join(course_data.coupon_codes[order_id])
 
         list_price = order_item.get_list_price()
         payment_amount = order_item.unit_cost
@@ -163,7 +234,7 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
         transaction_reference_number = order_item.order_id
         return list_price, payment_amount, coupon_codes_used, payment_status, transaction_reference_number
 
-    def _get_invoice_data(self, registration_code_redemption):
+    def _get_invoice_data(self, registration_code_redemption, course_data):
         """
         Returns the Invoice data
         """
@@ -172,8 +243,8 @@ class PaidCourseEnrollmentReportProvider(BaseAbstractEnrollmentReportProvider):
         total_amount = registration_code_redemption.registration_code.invoice.total_amount
         qty = registration_code_redemption.registration_code.invoice_item.qty
         payment_amount = total_amount / qty
-        invoice_transaction = InvoiceTransaction.get_invoice_transaction(
-            invoice_id=registration_code_redemption.registration_code.invoice.id)
+        invoice_transaction = course_data.invoice_transactions.get(
+            registration_code_redemption.registration_code.invoice_id)
         if invoice_transaction is not None:
             # amount greater than 0 is invoice has bee paid
             if invoice_transaction.amount > 0:
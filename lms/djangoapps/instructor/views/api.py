@@ -895,7 +895,8 @@ def list_course_role_members(request, course_id):
 def get_problem_responses(request, course_id):
     """
     Initiate generation of a CSV file containing all student answers
-    to a given problem.
+    to a given problem, or to each of several problems if
+    `problem_location` is given more than once.
 
     Responds with JSON
         {"status": "... status message ..."}
@@ -905,19 +906,25 @@ def get_problem_responses(request, course_id):
     Responds with BadRequest if problem location is faulty.
     """
     course_key = CourseKey.from_string(course_id)
-    problem_location = request.GET.get('problem_location', '')
+    problem_locations = request.GET.getlist('problem_location') or ['']
 
     try:
-        problem_key = UsageKey.from_string(problem_location)
-        # Are we dealing with an "old-style" problem location?
-        run = problem_key.run
-        if not run:
-            problem_key = course_key.make_usage_key_from_deprecated_string(problem_location)
-        if problem_key.course_key != course_key:
-            raise InvalidKeyError(type(problem_key), problem_key)
+        for problem_location in problem_locations:
+            problem_key = UsageKey.from_string(problem_location)
+            # Are we dealing with an "old-style" problem location?
+            run = problem_key.run
+            if not run:
+                problem_key = course_key.make_usage_key_from_deprecated_string(problem_location)
+            if problem_key.course_key != course_key:
+                raise InvalidKeyError(type(problem_key), problem_key)
     except InvalidKeyError:
         return JsonResponseBadRequest(_("Could not find problem with this location."))
 
+    if len(problem_locations) == 1:
+        problem_location = problem_locations[0]
+    else:
+        problem_location = problem_locations
+
     try:
         instructor_task.api.submit_calculate_problem_responses_csv(request, course_key, problem_location)
         success_status = _(
@@ -48,6 +48,7 @@ from certificates.models import (
 from certificates import api as certs_api
 from util.date_utils import get_default_time_display
 
+from class_dashboard.aggregates import get_aggregates_refreshed
 from class_dashboard.dashboard_data import get_section_display_name, get_array_section_has_problem
 from .tools import get_units_with_due_date, title_or_url, bulk_email_is_enabled_for_course
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
@@ -652,6 +653,7 @@ def _section_analytics(course, access):
 def _section_metrics(course, access):
     """Provide data for the corresponding dashboard section """
     course_key = course.id
+    metrics_refreshed = get_aggregates_refreshed(course_key)
     section_data = {
         'section_key': 'metrics',
         'section_display_name': _('Metrics'),
@@ -662,5 +664,7 @@ def _section_metrics(course, access):
         'get_students_opened_subsection_url': reverse('get_students_opened_subsection'),
         'get_students_problem_grades_url': reverse('get_students_problem_grades'),
         'post_metrics_data_csv_url': reverse('post_metrics_data_csv'),
+        'metrics_refreshed': get_default_time_display(metrics_refreshed) if metrics_refreshed else None,
+        'metrics_max_age_minutes': settings.CLASS_DASHBOARD_AGGREGATES_MAX_AGE // 60,
     }
     return section_data
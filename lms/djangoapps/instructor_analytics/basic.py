@@ -23,6 +23,8 @@ from courseware.models import StudentModule
 from certificates.models import GeneratedCertificate
 from django.db.models import Count
 from certificates.models import CertificateStatuses
+from lms.djangoapps.teams.models import CourseTeam
+from openedx.core.djangoapps.course_groups.models import CourseUserGroup
 
 
 STUDENT_FEATURES = ('id', 'username', 'first_name', 'last_name', 'is_staff', 'email')
@@ -46,6 +48,12 @@ CERTIFICATE_FEATURES = ('course_id', 'mode', 'status', 'grade', 'created_date',
 
 UNAVAILABLE = "[unavailable]"
 
+# The features of enrolled students are read this many students at a time
+STUDENTS_PER_QUERY = 5000
+
+# Responses to problems are read this many responses at a time
+RESPONSES_PER_QUERY = 5000
+
 
 def sale_order_record_features(course_id, features):
     """
@@ -208,64 +216,89 @@ def enrolled_students_features(course_key, features):
         {'username': 'username3', 'first_name': 'firstname3'}
     ]
     """
-    include_cohort_column = 'cohort' in features
-    include_team_column = 'team' in features
-
-    students = User.objects.filter(
-        courseenrollment__course_id=course_key,
-        courseenrollment__is_active=1,
-    ).order_by('username').select_related('profile')
-
-    if include_cohort_column:
-        students = students.prefetch_related('course_groups')
+    return list(iterate_enrolled_students_features(course_key, features))
 
-    if include_team_column:
-        students = students.prefetch_related('teams')
 
-    def extract_student(student, features):
-        """ convert student to dictionary """
-        student_features = [x for x in STUDENT_FEATURES if x in features]
-        profile_features = [x for x in PROFILE_FEATURES if x in features]
-
-        # For data extractions on the 'meta' field
-        # the feature name should be in the format of 'meta.foo' where
-        # 'foo' is the keyname in the meta dictionary
-        meta_features = []
-        for feature in features:
-            if 'meta.' in feature:
-                meta_key = feature.split('.')[1]
-                meta_features.append((feature, meta_key))
-
-        student_dict = dict((feature, getattr(student, feature))
-                            for feature in student_features)
-        profile = student.profile
-        if profile is not None:
-            profile_dict = dict((feature, getattr(profile, feature))
-                                for feature in profile_features)
-            student_dict.update(profile_dict)
-
-            # now featch the requested meta fields
-            meta_dict = json.loads(profile.meta) if profile.meta else {}
-            for meta_feature, meta_key in meta_features:
-                student_dict[meta_feature] = meta_dict.get(meta_key)
-
-        if include_cohort_column:
-            # Note that we use student.course_groups.all() here instead of
-            # student.course_groups.filter(). The latter creates a fresh query,
-            # therefore negating the performance gain from prefetch_related().
-            student_dict['cohort'] = next(
-                (cohort.name for cohort in student.course_groups.all() if cohort.course_id == course_key),
-                "[unassigned]"
-            )
+def iterate_enrolled_students_features(course_key, features):
+    """
+    Yield the features of each student enrolled in `course_key` as a dict,
+    ordered by username, like the dicts enrolled_students_features returns.
 
-        if include_team_column:
-            student_dict['team'] = next(
-                (team.name for team in student.teams.all() if team.course_id == course_key),
-                UNAVAILABLE
-            )
+    Only the columns of the requested features are read, rather than the
+    whole User and UserProfile of each student, and they're read
+    STUDENTS_PER_QUERY students at a time.
+    """
+    student_features = [x for x in STUDENT_FEATURES if x in features]
+    profile_features = [x for x in PROFILE_FEATURES if x in features]
+
+    # For data extractions on the 'meta' field
+    # the feature name should be in the format of 'meta.foo' where
+    # 'foo' is the keyname in the meta dictionary
+    meta_features = []
+    for feature in features:
+        if 'meta.' in feature:
+            meta_key = feature.split('.')[1]
+            meta_features.append((feature, meta_key))
+
+    # The first columns are the username to page by, and the profile's id
+    # to tell whether the student has a profile.
+    columns = ['username', 'profile__id']
+    columns.extend(feature for feature in student_features if feature != 'username')
+    columns.extend('profile__' + feature for feature in profile_features)
+    if meta_features:
+        columns.append('profile__meta')
+    if ('cohort' in features or 'team' in features) and 'id' not in columns:
+        columns.append('id')
+
+    cohorts = {}
+    if 'cohort' in features:
+        cohort_names = CourseUserGroup.objects.filter(course_id=course_key).values_list('users', 'name')
+        for user_id, name in cohort_names:
+            cohorts.setdefault(user_id, name)
+
+    teams = {}
+    if 'team' in features:
+        team_names = CourseTeam.objects.filter(course_id=course_key).values_list('users', 'name')
+        for user_id, name in team_names:
+            teams.setdefault(user_id, name)
+
+    def extract_student(row):
+        """ convert a row of the requested columns to a dictionary """
+        values = dict(zip(columns, row))
+        student_dict = dict((feature, values[feature]) for feature in student_features)
+        if values['profile__id'] is not None:
+            student_dict.update((feature, values['profile__' + feature]) for feature in profile_features)
+
+            # now fetch the requested meta fields
+            if meta_features:
+                meta = values['profile__meta']
+                meta_dict = json.loads(meta) if meta else {}
+                for meta_feature, meta_key in meta_features:
+                    student_dict[meta_feature] = meta_dict.get(meta_key)
+
+        if 'cohort' in features:
+            student_dict['cohort'] = cohorts.get(values['id'], "[unassigned]")
+
+        if 'team' in features:
+            student_dict['team'] = teams.get(values['id'], UNAVAILABLE)
         return student_dict
 
-    return [extract_student(student, features) for student in students]
+    students = User.objects.filter(
+        courseenrollment__course_id=course_key,
+        courseenrollment__is_active=1,
+    ).order_by('username').values_list(*columns)
+
+    # Page through the students by username, which is unique, rather than
+    # by offset, so that each query starts where the last one left off.
+    last_username = None
+    while True:
+        page = students if last_username is None else students.filter(username__gt=last_username)
+        rows = list(page[:STUDENTS_PER_QUERY])
+        for row in rows:
+            yield extract_student(row)
+        if len(rows) < STUDENTS_PER_QUERY:
+            return
+        last_username = rows[-1][0]
 
 
 def list_may_enroll(course_key, features):
@@ -381,24 +414,71 @@ def list_problem_responses(course_key, problem_location):
     where `state` represents a student's response to the problem
     identified by `problem_location`.
     """
-    problem_key = UsageKey.from_string(problem_location)
-    # Are we dealing with an "old-style" problem location?
-    run = problem_key.run
-    if not run:
-        problem_key = course_key.make_usage_key_from_deprecated_string(problem_location)
-    if problem_key.course_key != course_key:
-        return []
+    return [
+        {'username': response['username'], 'state': response['state']}
+        for response in iterate_problem_responses(course_key, [problem_location])
+    ]
+
+
+def iterate_problem_responses(course_key, problem_locations):
+    """
+    Yield responses to the given problems as dicts, ordered by student,
+    reading RESPONSES_PER_QUERY responses at a time from the StudentModule
+    table.
+
+    iterate_problem_responses(course_key, problem_locations)
+
+    would yield
+        {'username': u'user1', 'location': u'...', 'state': u'...'},
+        {'username': u'user1', 'location': u'...', 'state': u'...'},
+        {'username': u'user2', 'location': u'...', 'state': u'...'},
+        ...
+
+    where `state` is the student's response to the problem identified by
+    `location`, as it's stored:  it's left to the caller to decode it, if it
+    needs to.  The responses are read from the database page by page as
+    they're yielded, rather than all being loaded at once.
+    """
+    problem_keys = []
+    for problem_location in problem_locations:
+        problem_key = UsageKey.from_string(problem_location)
+        # Are we dealing with an "old-style" problem location?
+        run = problem_key.run
+        if not run:
+            problem_key = course_key.make_usage_key_from_deprecated_string(problem_location)
+        if problem_key.course_key == course_key:
+            problem_keys.append(problem_key)
+    if not problem_keys:
+        return
 
     smdat = StudentModule.objects.filter(
         course_id=course_key,
-        module_state_key=problem_key
+        module_state_key__in=problem_keys
     )
-    smdat = smdat.order_by('student')
-
-    return [
-        {'username': response.student.username, 'state': response.state}
-        for response in smdat
-    ]
+    smdat = smdat.select_related('student').order_by('student_id', 'id')
+
+    # Page through the responses by (student_id, id) rather than by offset,
+    # so that each query starts where the last one left off.  A single query
+    # wouldn't do: MySQLdb reads the whole result set into memory before
+    # returning the first row, even through QuerySet.iterator().
+    last_response = None
+    while True:
+        page = smdat
+        if last_response is not None:
+            page = smdat.filter(
+                Q(student_id__gt=last_response.student_id) |
+                Q(student_id=last_response.student_id, id__gt=last_response.id)
+            )
+        responses = list(page[:RESPONSES_PER_QUERY])
+        for response in responses:
+            yield {
+                'username': response.student.username,
+                'location': unicode(response.module_state_key),
+                'state': response.state,
+            }
+        if len(responses) < RESPONSES_PER_QUERY:
+            return
+        last_response = responses[-1]
 
 
 def course_registration_features(features, registration_codes, csv_type):
@@ -112,30 +112,21 @@ def profile_distribution(course_id, feature):
         choices = [(short, full)
                    for (short, full) in raw_choices] + [('no_data', 'No Data')]
 
-        def get_filter(feature, value):
-            """ Get the orm filter parameters for a feature. """
-            return {
-                'gender': {'user__profile__gender': value},
-                'level_of_education': {'user__profile__level_of_education': value},
-            }[feature]
-
-        def get_count(feature, value):
-            """ Get the count of enrolled students matching the feature value. """
-            return CourseEnrollment.objects.filter(
-                course_id=course_id,
-                is_active=True,
-                **get_filter(feature, value)
-            ).count()
+        # Count the enrollments of each value of the feature in one query,
+        # rather than one for each choice.
+        query_distribution = CourseEnrollment.objects.filter(
+            course_id=course_id,
+            is_active=True,
+        ).values_list('user__profile__' + feature).annotate(Count('id')).order_by()
+        counts = dict(query_distribution)
 
         distribution = {}
         for (short, full) in choices:
             # handle no data case
             if short == 'no_data':
-                distribution['no_data'] = 0
-                distribution['no_data'] += get_count(feature, None)
-                distribution['no_data'] += get_count(feature, '')
+                distribution['no_data'] = counts.get(None, 0) + counts.get('', 0)
             else:
-                distribution[short] = get_count(feature, short)
+                distribution[short] = counts.get(short, 0)
 
         prd.data = distribution
         prd.choices_display_names = dict(choices)
@@ -145,26 +136,16 @@ def profile_distribution(course_id, feature):
             user__courseenrollment__course_id=course_id,
             user__courseenrollment__is_active=True
         )
-        query_distribution = profiles.values(
-            feature).annotate(Count(feature)).order_by()
-        # query_distribution is of the form [{'featureval': 'value1', 'featureval__count': 4},
-        #    {'featureval': 'value2', 'featureval__count': 2}, ...]
+        # Count('id') rather than Count(feature), which wouldn't count the NULL values
+        query_distribution = profiles.values_list(feature).annotate(Count('id')).order_by()
+        # query_distribution is of the form [('value1', 4), ('value2', 2), ...]
 
-        distribution = dict((vald[feature], vald[feature + '__count'])
-                            for vald in query_distribution)
+        distribution = dict(query_distribution)
         # distribution is of the form {'value1': 4, 'value2': 2, ...}
 
         # change none to no_data for valid json key
         if None in distribution:
-            # django does not properly count NULL values when using annotate Count
-            # so
-            #     distribution['no_data'] = distribution.pop(None)
-            # would always be 0.
-
-            # Correctly count null values
-            distribution['no_data'] = profiles.filter(
-                **{feature: None}
-            ).count()
+            distribution['no_data'] = distribution.pop(None)
 
         prd.data = distribution
 
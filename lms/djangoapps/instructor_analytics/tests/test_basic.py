@@ -5,18 +5,17 @@ Tests for instructor.basic
 import datetime
 import json
 import pytz
-from mock import MagicMock, Mock, patch
+from mock import patch
 from django.core.urlresolvers import reverse
 from django.db.models import Q
 
 from course_modes.models import CourseMode
-from courseware.tests.factories import InstructorFactory
+from courseware.tests.factories import InstructorFactory, StudentModuleFactory
 from instructor_analytics.basic import (
-    StudentModule, sale_record_features, sale_order_record_features, enrolled_students_features,
+    sale_record_features, sale_order_record_features, enrolled_students_features,
     course_registration_features, coupon_codes_features, get_proctored_exam_results, list_may_enroll,
-    list_problem_responses, AVAILABLE_FEATURES, STUDENT_FEATURES, PROFILE_FEATURES
+    iterate_problem_responses, list_problem_responses, AVAILABLE_FEATURES, STUDENT_FEATURES, PROFILE_FEATURES
 )
-from opaque_keys.edx.locator import UsageKey
 from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory
 from student.models import CourseEnrollment, CourseEnrollmentAllowed
 from student.roles import CourseSalesAdminRole
@@ -53,47 +52,68 @@ class TestAnalyticsBasic(ModuleStoreTestCase):
                 email=student.email, course_id=self.course_key
             )
 
+    def _create_responses(self, problem_key):
+        """
+        Create a response of each of the first five users to the problem at
+        `problem_key`, and return the username and state of each.
+        """
+        responses = []
+        for user in self.users[:5]:
+            state = json.dumps({'attempts': user.id})
+            StudentModuleFactory.create(
+                student=user, course_id=self.course_key, module_state_key=problem_key, state=state
+            )
+            responses.append({'username': user.username, 'state': state})
+        return responses
+
     def test_list_problem_responses(self):
-        def result_factory(result_id):
-            """
-            Return a dummy StudentModule object that can be queried for
-            relevant info (student.username and state).
-            """
-            result = Mock(spec=['student', 'state'])
-            result.student.username.return_value = u'user{}'.format(result_id)
-            result.state.return_value = u'state{}'.format(result_id)
-            return result
-
-        # Ensure that UsageKey.from_string returns a problem key that list_problem_responses can work with
-        # (even when called with a dummy location):
-        mock_problem_key = Mock(return_value=u'')
-        mock_problem_key.course_key = self.course_key
-        with patch.object(UsageKey, 'from_string') as patched_from_string:
-            patched_from_string.return_value = mock_problem_key
-
-            # Ensure that StudentModule.objects.filter returns a result set that list_problem_responses can work with
-            # (this keeps us from having to create fixtures for this test):
-            mock_results = MagicMock(return_value=[result_factory(n) for n in range(5)])
-            with patch.object(StudentModule, 'objects') as patched_manager:
-                patched_manager.filter.return_value = mock_results
-
-                mock_problem_location = ''
-                problem_responses = list_problem_responses(self.course_key, problem_location=mock_problem_location)
-
-                # Check if list_problem_responses called UsageKey.from_string to look up problem key:
-                patched_from_string.assert_called_once_with(mock_problem_location)
-                # Check if list_problem_responses called StudentModule.objects.filter to obtain relevant records:
-                patched_manager.filter.assert_called_once_with(
-                    course_id=self.course_key, module_state_key=mock_problem_key
-                )
-
-                # Check if list_problem_responses returned expected results:
-                self.assertEqual(len(problem_responses), len(mock_results))
-                for mock_result in mock_results:
-                    self.assertTrue(
-                        {'username': mock_result.student.username, 'state': mock_result.state} in
-                        problem_responses
-                    )
+        problem_key = self.course_key.make_usage_key('problem', 'problem1')
+        expected_responses = self._create_responses(problem_key)
+        self._create_responses(self.course_key.make_usage_key('problem', 'problem2'))
+
+        problem_responses = list_problem_responses(self.course_key, problem_location=unicode(problem_key))
+        self.assertEqual(problem_responses, expected_responses)
+
+    def test_list_problem_responses_other_course(self):
+        problem_key = self.course_key.make_usage_key('problem', 'problem1')
+        self._create_responses(problem_key)
+        other_course_key = self.store.make_course_key('robot', 'course', 'other')
+        other_problem_key = other_course_key.make_usage_key('problem', 'problem1')
+
+        self.assertEqual(list_problem_responses(self.course_key, unicode(other_problem_key)), [])
+
+    def test_iterate_problem_responses(self):
+        problem_keys = [self.course_key.make_usage_key('problem', 'problem{}'.format(n)) for n in range(3)]
+        for problem_key in problem_keys:
+            self._create_responses(problem_key)
+
+        # All of the problems' responses are read in one query
+        with self.assertNumQueries(1):
+            problem_responses = list(iterate_problem_responses(
+                self.course_key, [unicode(problem_key) for problem_key in problem_keys[:2]]
+            ))
+        self.assertEqual(len(problem_responses), 10)
+        self.assertEqual(
+            set(response['location'] for response in problem_responses),
+            set(unicode(problem_key) for problem_key in problem_keys[:2])
+        )
+        # Each student's responses are listed together
+        usernames = [response['username'] for response in problem_responses]
+        self.assertEqual(usernames, sorted(usernames, key=usernames.index))
+
+    def test_iterate_problem_responses_paged(self):
+        problem_keys = [self.course_key.make_usage_key('problem', 'problem{}'.format(n)) for n in range(2)]
+        for problem_key in problem_keys:
+            self._create_responses(problem_key)
+        problem_locations = [unicode(problem_key) for problem_key in problem_keys]
+        problem_responses = list(iterate_problem_responses(self.course_key, problem_locations))
+
+        # The 10 responses are read 3 at a time, in the same order
+        with patch('instructor_analytics.basic.RESPONSES_PER_QUERY', 3):
+            with self.assertNumQueries(4):
+                paged_responses = list(iterate_problem_responses(self.course_key, problem_locations))
+        self.assertEqual(paged_responses, problem_responses)
+        self.assertEqual(len(set((response['username'], response['location']) for response in paged_responses)), 10)
 
     def test_enrolled_students_features_username(self):
         self.assertIn('username', AVAILABLE_FEATURES)
@@ -146,9 +166,8 @@ class TestAnalyticsBasic(ModuleStoreTestCase):
 
         query_features = ('username', 'cohort')
         # There should be a constant of 2 SQL queries when calling
-        # enrolled_students_features.  The first query comes from the call to
-        # User.objects.filter(...), and the second comes from
-        # prefetch_related('course_groups').
+        # enrolled_students_features.  The first reads the cohorts of the
+        # course, and the second the enrolled students.
         with self.assertNumQueries(2):
             userreports = enrolled_students_features(course.id, query_features)
         self.assertEqual(len([r for r in userreports if r['username'] in cohorted_usernames]), len(cohorted_students))
@@ -160,6 +179,32 @@ class TestAnalyticsBasic(ModuleStoreTestCase):
             else:
                 self.assertEqual(report['cohort'], '[unassigned]')
 
+    @patch('instructor_analytics.basic.STUDENTS_PER_QUERY', 7)
+    def test_enrolled_students_features_paged(self):
+        # The 30 students are read 7 at a time
+        with self.assertNumQueries(5):
+            userreports = enrolled_students_features(self.course_key, ('username', 'email'))
+        self.assertEqual(
+            [userreport['username'] for userreport in userreports],
+            sorted(user.username for user in self.users)
+        )
+        self.assertEqual(
+            [userreport['email'] for userreport in userreports],
+            [user.email for user in sorted(self.users, key=lambda user: user.username)]
+        )
+
+    def test_enrolled_students_features_match_instances(self):
+        student_features = ('id', 'username', 'email')
+        profile_features = ('name', 'gender', 'year_of_birth', 'level_of_education')
+        expected_userreports = []
+        for user in sorted(self.users, key=lambda user: user.username):
+            userreport = dict((feature, getattr(user, feature)) for feature in student_features)
+            userreport.update((feature, getattr(user.profile, feature)) for feature in profile_features)
+            expected_userreports.append(userreport)
+
+        userreports = enrolled_students_features(self.course_key, student_features + profile_features)
+        self.assertEqual(userreports, expected_userreports)
+
     def test_available_features(self):
         self.assertEqual(len(AVAILABLE_FEATURES), len(STUDENT_FEATURES + PROFILE_FEATURES))
         self.assertEqual(set(AVAILABLE_FEATURES), set(STUDENT_FEATURES + PROFILE_FEATURES))
@@ -563,3 +608,4 @@ class TestCourseRegistrationCodeAnalyticsBasic(ModuleStoreTestCase):
                 active_coupon['course_id'],
                 [coupon.course_id.to_deprecated_string() for coupon in active_coupons]
             )
+
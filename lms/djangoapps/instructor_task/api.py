@@ -289,7 +289,7 @@ def submit_bulk_course_email(request, course_key, email_id):
 def submit_calculate_problem_responses_csv(request, course_key, problem_location):  # pylint: disable=invalid-name
     """
     Submits a task to generate a CSV file containing all student
-    answers to a given problem.
+    answers to a given problem, or to a list of problems.
 
     Raises AlreadyRunningError if said file is already being updated.
     """
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instructor_task', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instructortask',
+            name='checkpoint',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instructor_task', '0002_instructortask_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstructorSubtaskResult',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('subtask_id', models.CharField(max_length=255)),
+                ('status', models.TextField()),
+                ('instructor_task', models.ForeignKey(to='instructor_task.InstructorTask')),
+            ],
+        ),
+    ]
@@ -18,8 +18,10 @@ from uuid import uuid4
 import csv
 import json
 import hashlib
+import os
 import os.path
 import urllib
+import zlib
 
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
@@ -35,6 +37,10 @@ from xmodule_django.models import CourseKeyField
 QUEUING = 'QUEUING'
 PROGRESS = 'PROGRESS'
 
+# The size of the parts in which large reports are uploaded to S3.  All but
+# the last part of a multipart upload must be at least 5MB.
+S3_MULTIPART_PART_SIZE = 5 * 1024 * 1024
+
 
 class InstructorTask(models.Model):
     """
@@ -57,6 +63,9 @@ class InstructorTask(models.Model):
     `requester` stores id of user who submitted the task
     `created` stores date that entry was first created
     `updated` stores date that entry was last modified
+
+    `checkpoint` stores how far a long-running task has got, as a JSON-serialized dict,
+        so that it can resume from there if it is run again.
     """
     task_type = models.CharField(max_length=50, db_index=True)
     course_id = CourseKeyField(max_length=255, db_index=True)
@@ -69,6 +78,7 @@ class InstructorTask(models.Model):
     created = models.DateTimeField(auto_now_add=True, null=True)
     updated = models.DateTimeField(auto_now=True)
     subtasks = models.TextField(blank=True)  # JSON dictionary
+    checkpoint = models.TextField(blank=True)  # JSON dictionary
 
     def __repr__(self):
         return 'InstructorTask<%r>' % ({
@@ -176,12 +186,27 @@ class InstructorTask(models.Model):
         return json.dumps({'message': 'Task revoked before running'})
 
 
+class InstructorSubtaskResult(models.Model):
+    """
+    Stores the final status of a subtask of an InstructorTask until it is added
+    to the InstructorTask's progress, which is done for several subtasks at a
+    time so that each subtask finishing doesn't have to lock the InstructorTask.
+
+    `instructor_task` is the InstructorTask the subtask was queued for.
+    `subtask_id` stores the id used by celery for the subtask.
+    `status` stores the subtask's status, as a JSON-serialized SubtaskStatus dict.
+    """
+    instructor_task = models.ForeignKey(InstructorTask, db_index=True)
+    subtask_id = models.CharField(max_length=255)
+    status = models.TextField()  # JSON dictionary
+
+
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download. Reports can either be stored whole, with `store_rows()`, or
+    written a row at a time as they're generated, with `open_rows()`, so that
+    the whole report never has to be kept in memory.
     """
     @classmethod
     def from_config(cls, config_name):
@@ -195,14 +220,220 @@ class ReportStore(object):
         elif storage_type.lower() == "localfs":
             return LocalFSReportStore.from_config(config_name)
 
-    def _get_utf8_encoded_rows(self, rows):
+    def open_rows(self, course_id, filename):
+        """
+        Return a ReportWriter for the CSV file `filename` of `course_id`.
+        """
+        raise NotImplementedError
+
+    def store_rows(self, course_id, filename, rows):
+        """
+        Given a `course_id`, `filename`, and `rows` (each row is an iterable of
+        strings), store the rows as a CSV file. `rows` may be a generator, in
+        which case the rows are written as they're generated.
+        """
+        with self.open_rows(course_id, filename) as writer:
+            writer.writerows(rows)
+
+    def read_chunks(self, course_id, filename):
+        """
+        Return an iterator over the contents of the CSV file `filename` of
+        `course_id`, a chunk at a time.
+        """
+        raise NotImplementedError
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` of `course_id`.
+        """
+        raise NotImplementedError
+
+    def abort_uncommitted(self, course_id, filename):
+        """
+        Discard anything written to the file `filename` of `course_id` with a
+        ReportWriter that was neither committed nor aborted, such as by a task
+        whose worker was restarted.
+        """
+        raise NotImplementedError
+
+    def concatenate(self, course_id, filename, part_filenames):
+        """
+        Store the CSV file `filename` made of the contents of each of the CSV
+        files `part_filenames` in turn, and then delete the parts.
+        """
+        with self.open_rows(course_id, filename) as writer:
+            for part_filename in part_filenames:
+                for chunk in self.read_chunks(course_id, part_filename):
+                    writer.write(chunk)
+        for part_filename in part_filenames:
+            self.delete(course_id, part_filename)
+
+
+class ReportWriter(object):
+    """
+    Writes the rows of a CSV report to a ReportStore as they're generated.
+
+    Nothing is visible in the report store until the writer is committed, and
+    nothing at all if it's aborted instead. Used as a context manager, the
+    writer is committed on leaving the block, or aborted if an exception was
+    raised in it.
+    """
+    def __init__(self, output):
         """
-        Given a list of `rows` containing unicode strings, return a
-        new list of rows with those strings encoded as utf-8 for CSV
-        compatibility.
+        Write the CSV to the file-like `output`.
+        """
+        self.output = output
+        self.csvwriter = csv.writer(output)
+        self.row_count = 0
+        self.closed = False
+
+    def writerow(self, row):
+        """
+        Write a row, an iterable of unicode strings (or anything that can be
+        converted to them), encoded as utf-8.
+        """
+        self.csvwriter.writerow([unicode(item).encode('utf-8') for item in row])
+        self.row_count += 1
+
+    def writerows(self, rows):
+        """
+        Write each of `rows`.
         """
         for row in rows:
-            yield [unicode(item).encode('utf-8') for item in row]
+            self.writerow(row)
+
+    def write(self, data):
+        """
+        Write `data`, rows that are already encoded as CSV, such as the
+        contents of another report.
+        """
+        self.output.write(data)
+
+    def commit(self):
+        """
+        Make the report visible in the report store.
+        """
+        if not self.closed:
+            self.closed = True
+            self._commit()
+
+    def abort(self):
+        """
+        Discard the report.
+        """
+        if not self.closed:
+            self.closed = True
+            self._abort()
+
+    def _commit(self):
+        """
+        Store the report. Implemented by subclasses.
+        """
+        raise NotImplementedError
+
+    def _abort(self):
+        """
+        Discard the report. Implemented by subclasses.
+        """
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class S3ReportWriter(ReportWriter):
+    """
+    Writes a gzip'd CSV report to S3.
+
+    The compressed report is buffered in memory until it reaches
+    S3_MULTIPART_PART_SIZE, and is then uploaded a part at a time with a
+    multipart upload, which only becomes visible when it's completed. Smaller
+    reports are uploaded whole when they're committed.
+    """
+    def __init__(self, report_store, course_id, filename):
+        self.report_store = report_store
+        self.course_id = course_id
+        self.filename = filename
+        self.buffer = StringIO()
+        self.gzip_file = GzipFile(fileobj=self.buffer, mode="wb")
+        self.multipart_upload = None
+        self.part_count = 0
+        super(S3ReportWriter, self).__init__(self.gzip_file)
+
+    def writerow(self, row):
+        super(S3ReportWriter, self).writerow(row)
+        if self.buffer.tell() >= S3_MULTIPART_PART_SIZE:
+            self._upload_part()
+
+    def write(self, data):
+        super(S3ReportWriter, self).write(data)
+        if self.buffer.tell() >= S3_MULTIPART_PART_SIZE:
+            self._upload_part()
+
+    def _upload_part(self):
+        """
+        Upload the buffered data as the next part of the multipart upload.
+        """
+        if self.multipart_upload is None:
+            key = self.report_store.key_for(self.course_id, self.filename)
+            self.multipart_upload = self.report_store.bucket.initiate_multipart_upload(
+                key.key,
+                headers={"Content-Encoding": "gzip", "Content-Type": "text/csv"},
+            )
+
+        self.part_count += 1
+        self.buffer.seek(0)
+        self.multipart_upload.upload_part_from_file(self.buffer, self.part_count)
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def _commit(self):
+        self.gzip_file.close()
+        if self.multipart_upload is None:
+            self.report_store.store(self.course_id, self.filename, self.buffer)
+        else:
+            self._upload_part()
+            self.multipart_upload.complete_upload()
+
+    def _abort(self):
+        self.gzip_file.close()
+        if self.multipart_upload is not None:
+            self.multipart_upload.cancel_upload()
+
+
+class LocalFSReportWriter(ReportWriter):
+    """
+    Writes a CSV report to a temporary file next to where it's to be stored,
+    and renames it into place when it's committed. The temporary file is
+    named after the report, so that it can be found if it's never committed.
+
+    The temporary file is opened like LocalFSReportStore.store opens reports,
+    rather than with tempfile, which would only let its owner read it.
+    """
+    def __init__(self, full_path):
+        self.full_path = full_path
+        temp_path = os.path.join(
+            os.path.dirname(full_path), ".{}.{}.tmp".format(os.path.basename(full_path), uuid4().hex)
+        )
+        self.temp_file = open(temp_path, "wb")
+        super(LocalFSReportWriter, self).__init__(self.temp_file)
+
+    def _commit(self):
+        self.temp_file.close()
+        # Reports are listed by modification time, which should be when
+        # they're stored.
+        os.utime(self.temp_file.name, None)
+        os.rename(self.temp_file.name, self.full_path)
+
+    def _abort(self):
+        self.temp_file.close()
+        os.remove(self.temp_file.name)
 
 
 class S3ReportStore(ReportStore):
@@ -296,22 +527,43 @@ class S3ReportStore(ReportStore):
             }
         )
 
-    def store_rows(self, course_id, filename, rows):
+    def open_rows(self, course_id, filename):
         """
-        Given a `course_id`, `filename`, and `rows` (each row is an iterable of
-        strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        Return a ReportWriter for a gzip'd csv file named `filename`, stored
+        like `store()` stores it.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
         """
-        output_buffer = StringIO()
-        gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
-        csvwriter = csv.writer(gzip_file)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        gzip_file.close()
+        return S3ReportWriter(self, course_id, filename)
 
-        self.store(course_id, filename, output_buffer)
+    def read_chunks(self, course_id, filename):
+        """
+        Return an iterator over the uncompressed contents of the gzip'd CSV
+        file `filename` of `course_id`, a chunk at a time.
+        """
+        key = self.bucket.get_key(self.key_for(course_id, filename).key)
+        # Offset the window size to accept a gzip header
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for chunk in key:
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` of `course_id`.
+        """
+        self.bucket.delete_key(self.key_for(course_id, filename).key)
+
+    def abort_uncommitted(self, course_id, filename):
+        """
+        Cancel any multipart uploads of the file `filename` of `course_id`
+        that were never completed.
+        """
+        key_name = self.key_for(course_id, filename).key
+        for upload in self.bucket.get_all_multipart_uploads(prefix=key_name):
+            if upload.key_name == key_name:
+                upload.cancel_upload()
 
     def links_for(self, course_id):
         """
@@ -319,9 +571,11 @@ class S3ReportStore(ReportStore):
         can be plugged straight into an href
         """
         course_dir = self.key_for(course_id, '')
+        # Skip the parts of reports that are still being written
+        keys = [key for key in self.bucket.list(prefix=course_dir.key) if not key.key.split("/")[-1].startswith(".")]
         return [
             (key.key.split("/")[-1], key.generate_url(expires_in=300))
-            for key in sorted(self.bucket.list(prefix=course_dir.key), reverse=True, key=lambda k: k.last_modified)
+            for key in sorted(keys, reverse=True, key=lambda k: k.last_modified)
         ]
 
 
@@ -369,24 +623,55 @@ class LocalFSReportStore(ReportStore):
         assumed to be a StringIO objecd (or anything that can flush its contents
         to string using `.getvalue()`).
         """
-        full_path = self.path_to(course_id, filename)
-        directory = os.path.dirname(full_path)
-        if not os.path.exists(directory):
-            os.mkdir(directory)
-
+        full_path = self._make_path_to(course_id, filename)
         with open(full_path, "wb") as f:
             f.write(buff.getvalue())
 
-    def store_rows(self, course_id, filename, rows):
+    def open_rows(self, course_id, filename):
         """
-        Given a course_id, filename, and rows (each row is an iterable of strings),
-        write this data out.
+        Return a ReportWriter for the file `filename` of `course_id`, which
+        overwrites anything that was there previously once it's committed.
         """
-        output_buffer = StringIO()
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+        return LocalFSReportWriter(self._make_path_to(course_id, filename))
 
-        self.store(course_id, filename, output_buffer)
+    def read_chunks(self, course_id, filename, chunk_size=64 * 1024):
+        """
+        Return an iterator over the contents of the file `filename` of
+        `course_id`, `chunk_size` bytes at a time.
+        """
+        with open(self.path_to(course_id, filename), "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), ""):
+                yield chunk
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` of `course_id`.
+        """
+        os.remove(self.path_to(course_id, filename))
+
+    def abort_uncommitted(self, course_id, filename):
+        """
+        Remove any temporary files of the file `filename` of `course_id` that
+        were never committed.
+        """
+        course_dir = self.path_to(course_id, '')
+        if not os.path.exists(course_dir):
+            return
+        prefix = ".{}.".format(filename)
+        for temp_filename in os.listdir(course_dir):
+            if temp_filename.startswith(prefix) and temp_filename.endswith(".tmp"):
+                os.remove(os.path.join(course_dir, temp_filename))
+
+    def _make_path_to(self, course_id, filename):
+        """
+        Return the full path to a given file for a given course, creating the
+        course's directory if needed.
+        """
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+        return full_path
 
     def links_for(self, course_id):
         """
@@ -399,7 +684,13 @@ class LocalFSReportStore(ReportStore):
         course_dir = self.path_to(course_id, '')
         if not os.path.exists(course_dir):
             return []
-        files = [(filename, os.path.join(course_dir, filename)) for filename in os.listdir(course_dir)]
+        # Skip the temporary files and parts of reports that are still being
+        # written
+        files = [
+            (filename, os.path.join(course_dir, filename))
+            for filename in os.listdir(course_dir)
+            if not filename.startswith(".")
+        ]
         files.sort(key=lambda (filename, full_path): os.path.getmtime(full_path), reverse=True)
 
         return [
@@ -4,6 +4,7 @@ This module contains celery task functions for handling the management of subtas
 from time import time
 import json
 from uuid import uuid4
+import operator
 import psutil
 from contextlib import contextmanager
 import logging
@@ -11,10 +12,12 @@ import logging
 from celery.states import SUCCESS, READY_STATES, RETRY
 import dogstats_wrapper as dog_stats_api
 
+from django.conf import settings
 from django.db import transaction, DatabaseError
+from django.db.models import Q
 from django.core.cache import cache
 
-from instructor_task.models import InstructorTask, PROGRESS, QUEUING
+from instructor_task.models import InstructorSubtaskResult, InstructorTask, PROGRESS, QUEUING
 from util.db import outer_atomic
 
 TASK_LOG = logging.getLogger('edx.celery.task')
@@ -24,6 +27,10 @@ SUBTASK_LOCK_EXPIRE = 60 * 10  # Lock expires in 10 minutes
 # Number of times to retry if a subtask update encounters a lock on the InstructorTask.
 # (These are recursive retries, so don't make this number too large.)
 MAX_DATABASE_LOCK_RETRIES = 5
+# Number of items fetched by each query when generating the items for subtasks.
+ITEMS_PER_QUERY = 1000
+# Number of the most recent tasks of a type whose subtasks' throughput is used to size new subtasks.
+THROUGHPUT_HISTORY_TASKS = 5
 
 
 class DuplicateTaskException(Exception):
@@ -47,6 +54,53 @@ def _get_number_of_subtasks(total_num_items, items_per_task):
     return num_subtasks
 
 
+def get_items_per_subtask(task_type, items_per_task):
+    """
+    Returns how many items each subtask of a new task of `task_type` should
+    process, so that it takes about INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS.
+
+    The time per item is measured from the subtasks of the last few tasks of
+    `task_type` to have finished, and the number of items is kept between
+    INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK and INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK.
+    The items a subtask processed are those it attempted and those it skipped,
+    as SubtaskStatus counts them for every type of task.
+    If there are no such tasks, or no target is set, `items_per_task` is returned.
+    """
+    target_seconds = settings.INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS
+    if not target_seconds:
+        return items_per_task
+
+    num_items = 0
+    duration_ms = 0
+    recent_outputs = InstructorTask.objects.filter(
+        task_type=task_type,
+        task_state=SUCCESS,
+    ).exclude(subtasks='').order_by('-id').values_list('task_output', flat=True)
+    for task_output in recent_outputs[:THROUGHPUT_HISTORY_TASKS]:
+        task_progress = json.loads(task_output)
+        if task_progress.get('subtask_duration_ms'):
+            num_items += task_progress['attempted'] + task_progress['skipped']
+            duration_ms += task_progress['subtask_duration_ms']
+    if num_items == 0 or duration_ms == 0:
+        return items_per_task
+
+    items_for_target = int(target_seconds * 1000.0 * num_items / duration_ms)
+    return max(
+        settings.INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK,
+        min(items_for_target, settings.INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK),
+    )
+
+
+def get_throughput(num_attempted, duration_ms):
+    """
+    Returns the number of items attempted per second, given the number
+    attempted in `duration_ms`.
+    """
+    if duration_ms <= 0:
+        return 0.0
+    return round(num_attempted * 1000.0 / duration_ms, 1)
+
+
 @contextmanager
 def track_memory_usage(metric, course_id):
     """
@@ -70,6 +124,51 @@ def track_memory_usage(metric, course_id):
         )
 
 
+def _get_keyset_fields(queryset):
+    """
+    Returns the fields by which the items of `queryset` are paged through:  the
+    fields it's ordered by, which must be ascending and end with its primary key,
+    or just its primary key if it isn't ordered.
+    """
+    key_fields = list(queryset.query.order_by) or ['pk']
+    if any(field.startswith('-') for field in key_fields) or key_fields[-1] not in ('pk', 'id'):
+        raise ValueError("Items can only be paged by ascending fields ending with the primary key, not {}".format(
+            key_fields
+        ))
+    return key_fields
+
+
+def _iterate_by_keyset(queryset, item_fields, items_per_query):
+    """
+    Yields the values of `item_fields` of each item of `queryset`, fetching
+    `items_per_query` of them at a time.
+
+    Each query starts after the last item of the previous one, by filtering on
+    the fields the items are ordered by, rather than by offset, so that it can
+    use the index on them however far through the items it is.  The fields are
+    also included in each item.
+    """
+    key_fields = _get_keyset_fields(queryset)
+    queryset = queryset.order_by(*key_fields)
+    fields = list(item_fields) + [field for field in key_fields if field not in item_fields]
+    last_key = None
+    while True:
+        page = queryset
+        if last_key is not None:
+            # Items after last_key in the ordering:  those that match it on the
+            # first few fields, and come after it on the next.
+            page = page.filter(reduce(operator.or_, [
+                Q(**dict(zip(key_fields[:index], last_key[:index]), **{key_fields[index] + '__gt': last_key[index]}))
+                for index in range(len(key_fields))
+            ]))
+        items = list(page.values(*fields)[:items_per_query])
+        for item in items:
+            yield item
+        if len(items) < items_per_query:
+            return
+        last_key = [items[-1][field] for field in key_fields]
+
+
 def _generate_items_for_subtask(
     item_querysets,  # pylint: disable=bad-continuation
     item_fields,
@@ -86,7 +185,6 @@ def _generate_items_for_subtask(
         `item_fields` : the fields that should be included in the dict that is returned.
             These are in addition to the 'pk' field.
         `total_num_items` : the result of summing the count of each queryset in `item_querysets`.
-        `items_per_query` : size of chunks to break the query operation into.
         `items_per_task` : maximum size of chunks to break each query chunk into for use by a subtask.
         `course_id` : course_id of the course. Only needed for the track_memory_usage context manager.
 
@@ -103,7 +201,7 @@ def _generate_items_for_subtask(
 
     with track_memory_usage('course_email.subtask_generation.memory', course_id):
         for queryset in item_querysets:
-            for item in queryset.values(*all_item_fields).iterator():
+            for item in _iterate_by_keyset(queryset, all_item_fields, ITEMS_PER_QUERY):
                 if len(items_for_task) == items_per_task and num_subtasks < total_num_subtasks - 1:
                     yield items_for_task
                     num_items_queued += items_per_task
@@ -142,6 +240,7 @@ class SubtaskStatus(object):
       'retried_withmax' : number of times the subtask has been retried for conditions that
           should have a maximum count applied
       'state' : celery state of the subtask (e.g. QUEUING, PROGRESS, RETRY, FAILURE, SUCCESS)
+      'duration_ms' : time spent running the subtask, over all of its attempts
 
     Object is not JSON-serializable, so to_dict and from_dict methods are provided so that
     it can be passed as a serializable argument to tasks (and be reconstituted within such tasks).
@@ -151,7 +250,10 @@ class SubtaskStatus(object):
     Also, we should count up "not attempted" separately from attempted/failed.
     """
 
-    def __init__(self, task_id, attempted=None, succeeded=0, failed=0, skipped=0, retried_nomax=0, retried_withmax=0, state=None):
+    def __init__(
+        self, task_id, attempted=None, succeeded=0, failed=0, skipped=0, retried_nomax=0, retried_withmax=0,
+        state=None, duration_ms=0
+    ):
         """Construct a SubtaskStatus object."""
         self.task_id = task_id
         if attempted is not None:
@@ -164,6 +266,7 @@ class SubtaskStatus(object):
         self.retried_nomax = retried_nomax
         self.retried_withmax = retried_withmax
         self.state = state if state is not None else QUEUING
+        self.duration_ms = duration_ms
 
     @classmethod
     def from_dict(cls, d):
@@ -186,7 +289,9 @@ class SubtaskStatus(object):
         """
         return self.__dict__
 
-    def increment(self, succeeded=0, failed=0, skipped=0, retried_nomax=0, retried_withmax=0, state=None):
+    def increment(
+        self, succeeded=0, failed=0, skipped=0, retried_nomax=0, retried_withmax=0, state=None, duration_ms=0
+    ):
         """
         Update the result of a subtask with additional results.
 
@@ -199,6 +304,7 @@ class SubtaskStatus(object):
         self.skipped += skipped
         self.retried_nomax += retried_nomax
         self.retried_withmax += retried_withmax
+        self.duration_ms += duration_ms
         if state is not None:
             self.state = state
 
@@ -296,15 +402,18 @@ def queue_subtasks_for_query(
             Arguments are the list of items to be processed by this subtask, and a SubtaskStatus
             object reflecting initial status (and containing the subtask's id).
         `item_querysets` : a list of query sets that define the "items" that should be passed to subtasks.
+            Each is either unordered, or ordered by ascending fields ending with its primary key.
         `item_fields` : the fields that should be included in the dict that is returned.
             These are in addition to the 'pk' field.
-        `items_per_task` : maximum size of chunks to break each query chunk into for use by a subtask.
+        `items_per_task` : maximum size of chunks to break each query chunk into for use by a subtask,
+            unless it can be adapted to the throughput of earlier tasks by get_items_per_subtask().
         `total_num_items` : total amount of items that will be put into subtasks
 
     Returns:  the task progress as stored in the InstructorTask object.
 
     """
     task_id = entry.task_id
+    items_per_task = get_items_per_subtask(entry.task_type, items_per_task)
 
     # Calculate the number of tasks that will be created, and create a list of ids for each task.
     total_num_subtasks = _get_number_of_subtasks(total_num_items, items_per_task)
@@ -312,11 +421,12 @@ def queue_subtasks_for_query(
 
     # Update the InstructorTask  with information about the subtasks we've defined.
     TASK_LOG.info(
-        "Task %s: updating InstructorTask %s with subtask info for %s subtasks to process %s items.",
+        "Task %s: updating InstructorTask %s with subtask info for %s subtasks to process %s items, %s each.",
         task_id,
         entry.id,
         total_num_subtasks,
         total_num_items,
+        items_per_task,
     )
     # Make sure this is committed to database before handing off subtasks to celery.
     with outer_atomic():
@@ -437,6 +547,15 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
         TASK_LOG.warning(msg)
         dog_stats_api.increment('instructor_task.subtask.duplicate.completed', tags=[entry.course_id])
         raise DuplicateTaskException(msg)
+    if InstructorSubtaskResult.objects.filter(instructor_task_id=entry_id, subtask_id=current_task_id).exists():
+        format_str = (
+            "Unexpected task_id '{}': already completed - status waiting to be added "
+            "to instructor task '{}': rejecting task {}"
+        )
+        msg = format_str.format(current_task_id, entry, new_subtask_status)
+        TASK_LOG.warning(msg)
+        dog_stats_api.increment('instructor_task.subtask.duplicate.completed', tags=[entry.course_id])
+        raise DuplicateTaskException(msg)
 
     # Confirm that the InstructorTask doesn't think that this subtask is already being
     # retried by another task.
@@ -474,8 +593,14 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
 
     The subtask lock acquired in the call to check_subtask_is_valid() is released here, only when
     the attempting of retries has concluded.
+
+    To lock the InstructorTask less often, the final statuses of subtasks are added to it
+    INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE at a time.  Until then, they are stored as
+    InstructorSubtaskResults.  The last subtask to finish adds any that are still waiting.
     """
     try:
+        if retry_count == 0 and _defer_subtask_status(entry_id, current_task_id, new_subtask_status):
+            return
         _update_subtask_status(entry_id, current_task_id, new_subtask_status)
     except DatabaseError:
         # If we fail, try again recursively.
@@ -497,6 +622,43 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
         _release_subtask_lock(current_task_id)
 
 
+def _defer_subtask_status(entry_id, current_task_id, new_subtask_status):
+    """
+    Stores the final status of a subtask as an InstructorSubtaskResult, to be added to the
+    InstructorTask's progress with those of other subtasks.
+
+    Returns whether adding it can be left until later:  it can't if the status isn't final,
+    if batching is turned off, or if there are now INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE
+    statuses waiting or no subtasks still to finish.
+    """
+    batch_size = settings.INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE
+    if batch_size <= 1 or new_subtask_status.state not in READY_STATES:
+        return False
+
+    subtask_status_info = json.loads(InstructorTask.objects.get(pk=entry_id).subtasks)['status']
+    if current_task_id not in subtask_status_info:
+        # Let _update_subtask_status() report the unexpected task_id.
+        return False
+
+    InstructorSubtaskResult.objects.create(
+        instructor_task_id=entry_id,
+        subtask_id=current_task_id,
+        status=json.dumps(new_subtask_status.to_dict()),
+    )
+
+    # The subtasks still to finish are only counted once this one's status has been
+    # stored, so that when the last subtasks finish together, at least one of them sees
+    # that they all have.
+    num_waiting = InstructorSubtaskResult.objects.filter(instructor_task_id=entry_id).count()
+    subtask_dict = json.loads(InstructorTask.objects.get(pk=entry_id).subtasks)
+    num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed'] - num_waiting
+    if num_waiting < batch_size and num_remaining > 0:
+        TASK_LOG.info("Deferred update of status for subtask %s of instructor task %d with status %s",
+                      current_task_id, entry_id, new_subtask_status)
+        return True
+    return False
+
+
 @transaction.atomic
 def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     """
@@ -509,9 +671,11 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     The InstructorTask's "task_output" field is updated.  This is a JSON-serialized dict.
     Accumulates values for 'attempted', 'succeeded', 'failed', 'skipped' from `new_subtask_status`
     into the corresponding values in the InstructorTask's task_output.  Also updates the 'duration_ms'
-    value with the current interval since the original InstructorTask started.  Note that this
+    value with the current interval since the original InstructorTask started, and the 'throughput',
+    the number of items attempted per second over that interval.  Note that this
     value is only approximate, since the subtask may be running on a different server than the
-    original task, so is subject to clock skew.
+    original task, so is subject to clock skew.  The 'subtask_duration_ms' value accumulates
+    the time that subtasks took to run, for get_items_per_subtask() to measure their throughput by.
 
     The InstructorTask's "subtasks" field is also updated.  This is also a JSON-serialized dict.
     Keys include 'total', 'succeeded', 'retried', 'failed', which are counters for the number of
@@ -524,6 +688,9 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
     is the value of the SubtaskStatus.to_dict(), but could be expanded in future to store information
     about failure messages, progress made, etc.
+
+    The statuses of any other subtasks that are waiting as InstructorSubtaskResults are added
+    at the same time, and their InstructorSubtaskResults deleted.
     """
     TASK_LOG.info("Preparing to update status for subtask %s for instructor task %d with status %s",
                   current_task_id, entry_id, new_subtask_status)
@@ -532,43 +699,68 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
         entry = InstructorTask.objects.select_for_update().get(pk=entry_id)
         subtask_dict = json.loads(entry.subtasks)
         subtask_status_info = subtask_dict['status']
-        if current_task_id not in subtask_status_info:
-            # unexpected error -- raise an exception
-            format_str = "Unexpected task_id '{}': unable to update status for subtask of instructor task '{}'"
-            msg = format_str.format(current_task_id, entry_id)
-            TASK_LOG.warning(msg)
-            raise ValueError(msg)
 
-        # Update status:
-        subtask_status_info[current_task_id] = new_subtask_status.to_dict()
+        # Add the statuses of the subtasks that are waiting to be added, along with this one.
+        waiting_results = list(
+            InstructorSubtaskResult.objects.select_for_update().filter(instructor_task_id=entry_id)
+        )
+        new_statuses = [
+            (result.subtask_id, SubtaskStatus.from_dict(json.loads(result.status)))
+            for result in waiting_results if result.subtask_id != current_task_id
+        ]
+        new_statuses.append((current_task_id, new_subtask_status))
+
+        task_progress = json.loads(entry.task_output)
+        added_subtask_ids = []
+        for subtask_id, subtask_status in new_statuses:
+            if subtask_id not in subtask_status_info:
+                # unexpected error -- raise an exception
+                format_str = "Unexpected task_id '{}': unable to update status for subtask of instructor task '{}'"
+                msg = format_str.format(subtask_id, entry_id)
+                TASK_LOG.warning(msg)
+                raise ValueError(msg)
+
+            # When two subtasks flush the waiting statuses at the same time, the first
+            # adds the status of the second along with its own.  Don't add it again.
+            if subtask_status_info[subtask_id]['state'] in READY_STATES:
+                TASK_LOG.info("Status of subtask %s of instructor task %d was already added",
+                              subtask_id, entry_id)
+                continue
+            added_subtask_ids.append(subtask_id)
+
+            # Update status:
+            subtask_status_info[subtask_id] = subtask_status.to_dict()
+
+            # Update counts only when subtask is done.
+            # In future, we can make this more responsive by updating status
+            # between retries, by comparing counts that change from previous
+            # retry.
+            new_state = subtask_status.state
+            if new_state in READY_STATES:
+                for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
+                    task_progress[statname] += getattr(subtask_status, statname)
+                task_progress['subtask_duration_ms'] = (
+                    task_progress.get('subtask_duration_ms', 0) + subtask_status.duration_ms
+                )
+
+            # Figure out if we're actually done (i.e. this is the last task to complete).
+            # This is easier if we just maintain a counter, rather than scanning the
+            # entire new_subtask_status dict.
+            if new_state == SUCCESS:
+                subtask_dict['succeeded'] += 1
+            elif new_state in READY_STATES:
+                subtask_dict['failed'] += 1
+        num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed']
 
         # Update the parent task progress.
         # Set the estimate of duration, but only if it
         # increases.  Clock skew between time() returned by different machines
         # may result in non-monotonic values for duration.
-        task_progress = json.loads(entry.task_output)
         start_time = task_progress['start_time']
         prev_duration = task_progress['duration_ms']
         new_duration = int((time() - start_time) * 1000)
         task_progress['duration_ms'] = max(prev_duration, new_duration)
-
-        # Update counts only when subtask is done.
-        # In future, we can make this more responsive by updating status
-        # between retries, by comparing counts that change from previous
-        # retry.
-        new_state = new_subtask_status.state
-        if new_subtask_status is not None and new_state in READY_STATES:
-            for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
-                task_progress[statname] += getattr(new_subtask_status, statname)
-
-        # Figure out if we're actually done (i.e. this is the last task to complete).
-        # This is easier if we just maintain a counter, rather than scanning the
-        # entire new_subtask_status dict.
-        if new_state == SUCCESS:
-            subtask_dict['succeeded'] += 1
-        elif new_state in READY_STATES:
-            subtask_dict['failed'] += 1
-        num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed']
+        task_progress['throughput'] = get_throughput(task_progress['attempted'], task_progress['duration_ms'])
 
         # If we're done with the last task, update the parent status to indicate that.
         # At present, we mark the task as having succeeded.  In future, we should see
@@ -581,8 +773,9 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
 
         TASK_LOG.debug("about to save....")
         entry.save()
-        TASK_LOG.info("Task output updated to %s for subtask %s of instructor task %d",
-                      entry.task_output, current_task_id, entry_id)
+        InstructorSubtaskResult.objects.filter(id__in=[result.id for result in waiting_results]).delete()
+        TASK_LOG.info("Task output updated to %s for subtasks %s of instructor task %d",
+                      entry.task_output, added_subtask_ids, entry_id)
     except Exception:
         TASK_LOG.exception("Unexpected error while updating InstructorTask.")
         dog_stats_api.increment('instructor_task.subtask.update_exception')
@@ -27,10 +27,13 @@ from django.utils.translation import ugettext_noop
 
 from celery import task
 from bulk_email.tasks import perform_delegate_email_batches
+from courseware.models import state_contains
 from instructor_task.tasks_helper import (
     run_main_task,
     BaseInstructorTask,
     perform_module_state_update,
+    perform_module_state_update_in_subtasks,
+    perform_rescoring_subtask,
     rescore_problem_module_state,
     reset_attempts_module_state,
     delete_problem_module_state,
@@ -51,7 +54,7 @@ from instructor_task.tasks_helper import (
 TASK_LOG = logging.getLogger('edx.celery.task')
 
 
-@task(base=BaseInstructorTask)  # pylint: disable=not-callable
+@task(base=BaseInstructorTask, acks_late=True)  # pylint: disable=not-callable
 def rescore_problem(entry_id, xmodule_instance_args):
     """Rescores a problem in a course, for all students or one specific student.
 
@@ -69,20 +72,54 @@ def rescore_problem(entry_id, xmodule_instance_args):
 
     `xmodule_instance_args` provides information needed by _get_module_instance_for_task()
     to instantiate an xmodule instance.
+
+    When all students' submissions are rescored, and there are more than
+    INSTRUCTOR_TASK_MODULES_PER_SUBTASK of them, they're rescored in parallel by
+    `rescore_problem_for_students` subtasks, each for a range of students.
     """
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('rescored')
     update_fcn = partial(rescore_problem_module_state, xmodule_instance_args)
 
-    def filter_fcn(modules_to_update):
-        """Filter that matches problems which are marked as being done"""
-        return modules_to_update.filter(state__contains='"done": true')
-
-    visit_fcn = partial(perform_module_state_update, update_fcn, filter_fcn)
+    def create_subtask_fcn(student_range, initial_subtask_status):
+        """Creates a subtask to rescore the problem for a range of students."""
+        return rescore_problem_for_students.subtask(
+            (
+                entry_id,
+                xmodule_instance_args,
+                student_range,
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+        )
+
+    visit_fcn = partial(perform_module_state_update_in_subtasks, create_subtask_fcn, update_fcn, _filter_done_modules)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
-@task(base=BaseInstructorTask)  # pylint: disable=not-callable
+@task  # pylint: disable=not-callable
+def rescore_problem_for_students(entry_id, xmodule_instance_args, student_range, subtask_status_dict):
+    """Rescores a problem for a range of students, as a subtask of `rescore_problem`.
+
+    `student_range` is a list of the id after which the students' ids start, or None,
+    and the id of the last student.  `subtask_status_dict` is the subtask's initial
+    status, as a dict.  Progress is recorded in the InstructorTask entry `entry_id`.
+    """
+    return perform_rescoring_subtask(
+        _filter_done_modules, xmodule_instance_args, entry_id, student_range, subtask_status_dict
+    )
+
+
+def _filter_done_modules(modules_to_update):
+    """
+    Filter that matches problems which are marked as being done.
+
+    Compressed states are also matched, and are checked when they are rescored.
+    """
+    return modules_to_update.filter(state_contains('"done": true'))
+
+
+@task(base=BaseInstructorTask, acks_late=True)  # pylint: disable=not-callable
 def reset_problem_attempts(entry_id, xmodule_instance_args):
     """Resets problem attempts to zero for a particular problem for all students in a course.
 
@@ -104,7 +141,7 @@ def reset_problem_attempts(entry_id, xmodule_instance_args):
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
-@task(base=BaseInstructorTask)  # pylint: disable=not-callable
+@task(base=BaseInstructorTask, acks_late=True)  # pylint: disable=not-callable
 def delete_problem_state(entry_id, xmodule_instance_args):
     """Deletes problem state entirely for all students on a particular problem in a course.
 
@@ -159,7 +196,9 @@ def calculate_problem_responses_csv(entry_id, xmodule_instance_args):
     return run_main_task(entry_id, task_fn, action_name)
 
 
-@task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=not-callable
+@task(  # pylint: disable=not-callable
+    base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY, acks_late=True
+)
 def calculate_grades_csv(entry_id, xmodule_instance_args):
     """
     Grade a course and push the results to an S3 bucket for download.
@@ -27,7 +27,7 @@ from edxmako.shortcuts import render_to_string
 from instructor.paidcourse_enrollment_report import PaidCourseEnrollmentReportProvider
 from shoppingcart.models import (
     PaidCourseRegistration, CourseRegCodeItem, InvoiceTransaction,
-    Invoice, CouponRedemption, RegistrationCodeRedemption, CourseRegistrationCode
+    Invoice, CouponRedemption, CourseRegistrationCode
 )
 from survey.models import SurveyAnswer
 
@@ -53,11 +53,18 @@ from courseware.module_render import get_module_for_descriptor_internal
 from instructor_analytics.basic import (
     enrolled_students_features,
     get_proctored_exam_results,
+    iterate_problem_responses,
     list_may_enroll,
-    list_problem_responses
 )
 from instructor_analytics.csvs import format_dictlist
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    check_subtask_is_valid,
+    get_throughput,
+    queue_subtasks_for_query,
+    update_subtask_status,
+)
 from lms.djangoapps.lms_xblock.runtime import LmsPartitionService
 from openedx.core.djangoapps.course_groups.cohorts import get_cohort
 from openedx.core.djangoapps.course_groups.models import CourseUserGroup
@@ -79,6 +86,12 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# Rescoring subtasks save the modules they've rescored this many at a time
+RESCORE_BATCH_SIZE = 10
+
+# The format of the report timestamps saved in checkpoints
+CHECKPOINT_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
 # The setting name used for events when "settings" (account settings, preferences, profile information) change.
 REPORT_REQUESTED_EVENT_NAME = u'edx.instructor.report.requested'
 
@@ -96,6 +109,11 @@ class BaseInstructorTask(Task):
     for task_state based on what Celery would set it to once the task returns to Celery:
     FAILURE if an exception is encountered, and SUCCESS if it returns normally.
     Other arguments are pass-throughs to perform_module_state_update, and documented there.
+
+    Long-running tasks that save a TaskCheckpoint as they go set acks_late, so that they are
+    only acknowledged once they return.  If such a task was running when its worker was
+    restarted, it is run again, and resumes from its checkpoint rather than starting over.
+    Other tasks aren't safe to run again, so they are acknowledged when they start.
     """
     abstract = True
 
@@ -134,6 +152,7 @@ class BaseInstructorTask(Task):
         if len(entry.subtasks) == 0:
             entry.task_output = InstructorTask.create_output_for_success(task_progress)
             entry.task_state = SUCCESS
+            entry.checkpoint = ''
             entry.save_now()
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
@@ -165,6 +184,7 @@ class BaseInstructorTask(Task):
             TASK_LOG.warning(u"Task (%s) failed", task_id, exc_info=True)
             entry.task_output = InstructorTask.create_output_for_failure(einfo.exception, einfo.traceback)
             entry.task_state = FAILURE
+            entry.checkpoint = ''
             entry.save_now()
 
 
@@ -195,7 +215,9 @@ class TaskProgress(object):
     """
     Encapsulates the current task's progress by keeping track of
     'attempted', 'succeeded', 'skipped', 'failed', 'total',
-    'action_name', and 'duration_ms' values.
+    'action_name', and 'duration_ms' values, and of 'resumed',
+    the number of times the task has been resumed from a checkpoint,
+    if it has been.
     """
     def __init__(self, action_name, total, start_time):
         self.action_name = action_name
@@ -205,6 +227,7 @@ class TaskProgress(object):
         self.succeeded = 0
         self.skipped = 0
         self.failed = 0
+        self.resumed = 0
 
     def update_task_state(self, extra_meta=None):
         """
@@ -228,12 +251,104 @@ class TaskProgress(object):
             'total': self.total,
             'duration_ms': int((time() - self.start_time) * 1000),
         }
+        if self.resumed:
+            progress_dict['resumed'] = self.resumed
         if extra_meta is not None:
             progress_dict.update(extra_meta)
         _get_current_task().update_state(state=PROGRESS, meta=progress_dict)
         return progress_dict
 
 
+class TaskCheckpoint(object):
+    """
+    How far a long-running task has got, saved on its InstructorTask entry
+    every INSTRUCTOR_TASK_CHECKPOINT_INTERVAL attempts, so that if the task is
+    run again after its worker was restarted, it can resume from there rather
+    than starting over.
+
+    The task must work through its students or modules in order of their ids.
+    A checkpoint records the id of the last one that was processed, the task's
+    progress, including the total it was working towards, and whatever
+    `output` the task needs to carry on, such as where its partial output is
+    stored.  Tasks that don't have an InstructorTask
+    entry, with an `entry_id` of None, don't save checkpoints.
+    """
+    def __init__(self, entry_id):
+        self.entry_id = entry_id
+        self.saved = {}
+        if entry_id is not None:
+            checkpoint = InstructorTask.objects.filter(pk=entry_id).values_list('checkpoint', flat=True).first()
+            if checkpoint:
+                self.saved = json.loads(checkpoint)
+        self.saved_attempts = self.saved.get('progress', {}).get('attempted', 0)
+
+    @property
+    def last_id(self):
+        """
+        The id of the last student or module processed when the checkpoint was
+        saved, or None if there is no checkpoint.
+        """
+        return self.saved.get('last_id')
+
+    @property
+    def output(self):
+        """
+        The output saved with the checkpoint.
+        """
+        return self.saved.get('output', {})
+
+    def resume(self, task_progress):
+        """
+        If there is a checkpoint, restore `task_progress` to its progress then,
+        counting the resumption.  Returns whether there was a checkpoint.
+        """
+        if self.last_id is None:
+            return False
+
+        for name, value in self.saved['progress'].iteritems():
+            setattr(task_progress, name, value)
+        task_progress.resumed += 1
+        TASK_LOG.info(
+            u'InstructorTask ID: %s, Task type: %s, Resuming after id %s with %s attempted',
+            self.entry_id,
+            task_progress.action_name,
+            self.last_id,
+            task_progress.attempted
+        )
+        return True
+
+    def is_due(self, task_progress):
+        """
+        Should a checkpoint be saved, given the task's progress?
+        """
+        attempts = task_progress.attempted - self.saved_attempts
+        return self.entry_id is not None and attempts >= settings.INSTRUCTOR_TASK_CHECKPOINT_INTERVAL
+
+    def save(self, task_progress, last_id, output=None):
+        """
+        Save a checkpoint after processing the student or module with id
+        `last_id`, with the task's progress and any `output`.
+        """
+        if self.entry_id is None:
+            return
+        self.saved = {
+            'last_id': last_id,
+            'progress': {
+                'attempted': task_progress.attempted,
+                'succeeded': task_progress.succeeded,
+                'skipped': task_progress.skipped,
+                'failed': task_progress.failed,
+                'total': task_progress.total,
+                'resumed': task_progress.resumed,
+            },
+            'output': output or {},
+        }
+        self.saved_attempts = task_progress.attempted
+        # Only the checkpoint is updated, so that nothing else on the entry is
+        # overwritten.
+        InstructorTask.objects.filter(pk=self.entry_id).update(checkpoint=json.dumps(self.saved))
+
+
 def run_main_task(entry_id, task_fcn, action_name):
     """
     Applies the `task_fcn` to the arguments defined in `entry_id` InstructorTask.
@@ -297,7 +412,7 @@ def run_main_task(entry_id, task_fcn, action_name):
     return task_progress
 
 
-def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name):
+def perform_module_state_update(update_fcn, filter_fcn, entry_id, course_id, task_input, action_name):
     """
     Performs generic update by visiting StudentModule instances with the update_fcn provided.
 
@@ -315,6 +430,9 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     the update is successful; False indicates the update on the particular student module failed.
     A raised exception indicates a fatal condition -- that no other student modules should be considered.
 
+    The modules are updated in order of their ids, with a TaskCheckpoint saved periodically, so that
+    if the task is run again after being interrupted, it resumes after the last module of the checkpoint.
+
     The return value is a dict containing the task's results, with the following keys:
 
           'attempted': number of attempts made
@@ -325,6 +443,7 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
           'action_name': user-visible verb to use in status messages.  Should be past-tense.
               Pass-through of input `action_name`.
           'duration_ms': how long the task has (or had) been running.
+          'throughput': how many updates were attempted per second.
 
     Because this is run internal to a task, it does not catch exceptions.  These are allowed to pass up to the
     next level, so that it can set the failure modes and capture the error trace in the InstructorTask and the
@@ -332,6 +451,168 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
 
     """
     start_time = time()
+    problems, modules_to_update = _get_modules_to_update(course_id, task_input, filter_fcn)
+
+    task_progress = TaskProgress(action_name, modules_to_update.count(), start_time)
+    checkpoint = TaskCheckpoint(entry_id)
+    if checkpoint.resume(task_progress):
+        modules_to_update = modules_to_update.filter(id__gt=checkpoint.last_id)
+    previously_attempted = task_progress.attempted
+    task_progress.update_task_state()
+
+    for module_to_update in modules_to_update.order_by('id'):
+        task_progress.attempted += 1
+        module_descriptor = problems[unicode(module_to_update.module_state_key)]
+        # There is no try here:  if there's an error, we let it throw, and the task will
+        # be marked as FAILED, with a stack trace.
+        with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]):
+            update_status = update_fcn(module_descriptor, module_to_update)
+            if update_status == UPDATE_STATUS_SUCCEEDED:
+                # If the update_fcn returns true, then it performed some kind of work.
+                # Logging of failures is left to the update_fcn itself.
+                task_progress.succeeded += 1
+            elif update_status == UPDATE_STATUS_FAILED:
+                task_progress.failed += 1
+            elif update_status == UPDATE_STATUS_SKIPPED:
+                task_progress.skipped += 1
+            else:
+                raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+
+        if checkpoint.is_due(task_progress):
+            checkpoint.save(task_progress, last_id=module_to_update.id)
+
+    throughput = get_throughput(task_progress.attempted - previously_attempted, int((time() - start_time) * 1000))
+    return task_progress.update_task_state(extra_meta={'throughput': throughput})
+
+
+def perform_module_state_update_in_subtasks(
+        create_subtask_fcn, update_fcn, filter_fcn, entry_id, course_id, task_input, action_name
+):
+    """
+    Performs the update of `perform_module_state_update`, but if it's for all students and
+    there are more than INSTRUCTOR_TASK_MODULES_PER_SUBTASK modules to update, the modules
+    are divided by student into ranges, and a subtask is queued to update each range.
+
+    `create_subtask_fcn` is a function of two arguments that constructs a subtask:  the range
+    of students whose modules it should update, and a SubtaskStatus object reflecting its
+    initial status.  The range is a list of the id after which the student ids start, or None
+    for the first range, and the last id in the range.
+
+    Returns the task progress, as `perform_module_state_update` does, or as stored in the
+    InstructorTask object once subtasks have been queued.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    # If the task is run again once its subtasks have been queued, they're
+    # left to finish rather than being queued again.
+    if len(entry.subtasks) > 0:
+        TASK_LOG.warning(u"Task %s has already queued its subtasks!  InstructorTask = %s", entry.task_id, entry)
+        return json.loads(entry.task_output)
+
+    _problems, modules_to_update = _get_modules_to_update(course_id, task_input, filter_fcn)
+    total_num_modules = modules_to_update.count()
+    if task_input.get('student') is not None or total_num_modules <= settings.INSTRUCTOR_TASK_MODULES_PER_SUBTASK:
+        return perform_module_state_update(update_fcn, filter_fcn, entry_id, course_id, task_input, action_name)
+
+    # Each range of students follows on from the last student of the previous one.
+    # A student with modules in two subtasks' chunks is included in the first range.
+    previous_student_ids = [None]
+
+    def _create_subtask_for_students(module_list, initial_subtask_status):
+        """Creates a subtask to update the modules of the students of a chunk of modules."""
+        student_range = [previous_student_ids[-1], module_list[-1]['student_id']]
+        previous_student_ids.append(student_range[1])
+        return create_subtask_fcn(student_range, initial_subtask_status)
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_subtask_for_students,
+        [modules_to_update.order_by('student_id', 'id')],
+        ['student_id'],
+        settings.INSTRUCTOR_TASK_MODULES_PER_SUBTASK,
+        total_num_modules,
+    )
+
+
+def perform_rescoring_subtask(filter_fcn, xmodule_instance_args, entry_id, student_range, subtask_status_dict):
+    """
+    Rescores the problem of the InstructorTask `entry_id` for the students in `student_range`,
+    as a subtask queued by `perform_module_state_update_in_subtasks`, and records the
+    subtask's status in the InstructorTask.
+
+    The course and the problems are loaded once for all of the subtask's modules, and the
+    rescored modules are saved RESCORE_BATCH_SIZE at a time, each batch in one transaction.
+    If rescoring a module raises an exception, the modules that haven't been saved yet are
+    counted as failed, and the exception is raised.
+
+    Returns the subtask's status, as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    # Check that the subtask is known to the InstructorTask and hasn't already been run.
+    # If it isn't, this raises an exception, which fails the subtask immediately.
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    start_time = time()
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    problems, modules_to_update = _get_modules_to_update(course_id, json.loads(entry.task_input), filter_fcn)
+    after_student_id, last_student_id = student_range
+    modules_to_update = modules_to_update.filter(student_id__lte=last_student_id)
+    if after_student_id is not None:
+        modules_to_update = modules_to_update.filter(student_id__gt=after_student_id)
+    modules_to_update = list(modules_to_update.select_related('student').order_by('id'))
+    TASK_LOG.info(
+        u"Rescoring %d modules as subtask %s of instructor task %d, for students %s",
+        len(modules_to_update), current_task_id, entry_id, student_range
+    )
+
+    try:
+        course = get_course_by_id(course_id)
+        for start in xrange(0, len(modules_to_update), RESCORE_BATCH_SIZE):
+            update_statuses = []
+            with outer_atomic():
+                for student_module in modules_to_update[start:start + RESCORE_BATCH_SIZE]:
+                    with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:rescored']):
+                        update_statuses.append(_rescore_problem_module_state(
+                            xmodule_instance_args,
+                            problems[unicode(student_module.module_state_key)],
+                            student_module,
+                            course=course,
+                        ))
+
+            # The batch is only counted once it has been saved.  Skipped modules aren't
+            # counted as attempted, as no subtask counts them so.
+            for update_status in update_statuses:
+                if update_status == UPDATE_STATUS_SUCCEEDED:
+                    subtask_status.increment(succeeded=1)
+                elif update_status == UPDATE_STATUS_FAILED:
+                    subtask_status.increment(failed=1)
+                else:
+                    subtask_status.increment(skipped=1)
+    except Exception:
+        TASK_LOG.exception(
+            u"Rescoring subtask %s of instructor task %d failed unexpectedly!", current_task_id, entry_id
+        )
+        subtask_status.increment(
+            failed=len(modules_to_update) - subtask_status.attempted - subtask_status.skipped,
+            state=FAILURE,
+            duration_ms=int((time() - start_time) * 1000),
+        )
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        raise
+
+    subtask_status.increment(state=SUCCESS, duration_ms=int((time() - start_time) * 1000))
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    return subtask_status.to_dict()
+
+
+def _get_modules_to_update(course_id, task_input, filter_fcn):
+    """
+    Returns the problems that `task_input` specifies, as a dict of their
+    descriptors keyed by their locations, and a queryset of the StudentModules
+    to update, as described for `perform_module_state_update`.
+    """
     usage_keys = []
     problem_url = task_input.get('problem_url')
     entrance_exam_url = task_input.get('entrance_exam_url')
@@ -372,28 +653,7 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     if filter_fcn is not None:
         modules_to_update = filter_fcn(modules_to_update)
 
-    task_progress = TaskProgress(action_name, modules_to_update.count(), start_time)
-    task_progress.update_task_state()
-
-    for module_to_update in modules_to_update:
-        task_progress.attempted += 1
-        module_descriptor = problems[unicode(module_to_update.module_state_key)]
-        # There is no try here:  if there's an error, we let it throw, and the task will
-        # be marked as FAILED, with a stack trace.
-        with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]):
-            update_status = update_fcn(module_descriptor, module_to_update)
-            if update_status == UPDATE_STATUS_SUCCEEDED:
-                # If the update_fcn returns true, then it performed some kind of work.
-                # Logging of failures is left to the update_fcn itself.
-                task_progress.succeeded += 1
-            elif update_status == UPDATE_STATUS_FAILED:
-                task_progress.failed += 1
-            elif update_status == UPDATE_STATUS_SKIPPED:
-                task_progress.skipped += 1
-            else:
-                raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
-
-    return task_progress.update_task_state()
+    return problems, modules_to_update
 
 
 def _get_task_id_from_xmodule_args(xmodule_instance_args):
@@ -481,13 +741,27 @@ def rescore_problem_module_state(xmodule_instance_args, module_descriptor, stude
     Returns True if problem was successfully rescored for the given student, and False
     if problem encountered some kind of error in rescoring.
     '''
+    return _rescore_problem_module_state(xmodule_instance_args, module_descriptor, student_module)
+
+
+def _rescore_problem_module_state(xmodule_instance_args, module_descriptor, student_module, course=None):
+    '''
+    Rescores the student's problem submission as `rescore_problem_module_state` does, but
+    within the caller's transaction.  `course` is the loaded course, if the caller has it.
+    '''
     # unpack the StudentModule:
     course_id = student_module.course_id
     student = student_module.student
     usage_key = student_module.module_state_key
 
+    # Compressed states aren't filtered by the database query, so
+    # skip any that haven't been answered.
+    if not json.loads(student_module.state or '{}').get('done'):
+        return UPDATE_STATUS_SKIPPED
+
     with modulestore().bulk_operations(course_id):
-        course = get_course_by_id(course_id)
+        if course is None:
+            course = get_course_by_id(course_id)
         # TODO: Here is a call site where we could pass in a loaded course.  I
         # think we certainly need it since grading is happening here, and field
         # overrides would be important in handling that correctly
@@ -610,22 +884,135 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
                 [row1_colum1, row1_colum2, ...],
                 ...
             ]
+            This may be a generator, in which case the rows are written as
+            they're generated.
         csv_name: Name of the resulting CSV
         course_id: ID of the course
     """
+    writer = open_csv_in_report_store(csv_name, course_id, timestamp, config_name)
+    try:
+        writer.writerows(rows)
+    except Exception:
+        abort_csvs_in_report_store(writer)
+        raise
+    commit_csv_to_report_store(writer, csv_name)
+
+
+def open_csv_in_report_store(csv_name, course_id, timestamp, config_name='GRADES_DOWNLOAD'):
+    """
+    Open a CSV in the ReportStore, named as `upload_csv_to_report_store`
+    names it, and return a ReportWriter to write its rows to as they're
+    generated. The CSV is only stored once it's committed with
+    `commit_csv_to_report_store`, and should be aborted otherwise.
+    """
     report_store = ReportStore.from_config(config_name)
-    report_store.store_rows(
-        course_id,
-        u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
-            course_prefix=course_filename_prefix_generator(course_id),
-            csv_name=csv_name,
-            timestamp_str=timestamp.strftime("%Y-%m-%d-%H%M")
-        ),
-        rows
+    return report_store.open_rows(course_id, _csv_filename(csv_name, course_id, timestamp))
+
+
+def _csv_filename(csv_name, course_id, timestamp):
+    """
+    Return the filename to store the CSV `csv_name` of `course_id` under.
+    """
+    return u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
+        course_prefix=course_filename_prefix_generator(course_id),
+        csv_name=csv_name,
+        timestamp_str=timestamp.strftime("%Y-%m-%d-%H%M")
     )
+
+
+def commit_csv_to_report_store(writer, csv_name):
+    """
+    Store a CSV opened with `open_csv_in_report_store`.
+    """
+    writer.commit()
     tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": csv_name, })
 
 
+def abort_csvs_in_report_store(*writers):
+    """
+    Discard the CSVs opened with `open_csv_in_report_store`, ignoring any
+    writers that are None.
+    """
+    for writer in writers:
+        if writer is not None:
+            writer.abort()
+
+
+class CheckpointedCSV(object):
+    """
+    A CSV in the ReportStore, named as `upload_csv_to_report_store` names it,
+    that's written by a task that saves TaskCheckpoints.
+
+    The rows written since the last checkpoint are stored as a hidden part of
+    the CSV at each checkpoint, with the names of the parts stored so far kept
+    in the checkpoint's output.  When the task is resumed, it carries on with
+    those parts, discarding whatever was written of the part that was being
+    written when it was interrupted, and once it's done, the parts are joined
+    into the CSV.
+    """
+    def __init__(self, csv_name, course_id, timestamp, parts=(), config_name='GRADES_DOWNLOAD'):
+        self.csv_name = csv_name
+        self.course_id = course_id
+        self.filename = _csv_filename(csv_name, course_id, timestamp)
+        self.report_store = ReportStore.from_config(config_name)
+        self.parts = list(parts)
+        self.writer = None
+        self.part_filename = self._next_part_filename()
+        self.report_store.abort_uncommitted(self.course_id, self.part_filename)
+
+    @property
+    def is_empty(self):
+        """
+        Have no rows been written yet?
+        """
+        return not self.parts and self.writer is None
+
+    def _next_part_filename(self):
+        """
+        The name of the part after the parts stored so far.
+        """
+        return u".{}.part{}".format(self.filename, len(self.parts))
+
+    def writerow(self, row):
+        """
+        Write a row to the current part.
+        """
+        if self.writer is None:
+            self.writer = self.report_store.open_rows(self.course_id, self.part_filename)
+        self.writer.writerow(row)
+
+    def checkpoint(self):
+        """
+        Store the rows written since the last checkpoint as a part, and return
+        the names of all of the parts stored so far.
+        """
+        if self.writer is not None:
+            self.writer.commit()
+            self.parts.append(self.part_filename)
+            self.part_filename = self._next_part_filename()
+            self.writer = None
+        return self.parts
+
+    def commit(self):
+        """
+        Store the CSV, made of all of its parts.
+        """
+        self.report_store.concatenate(self.course_id, self.filename, self.checkpoint())
+        tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": self.csv_name, })
+
+    def abort(self):
+        """
+        Discard the CSV and all of its parts.
+        """
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+        for part_filename in self.parts:
+            self.report_store.delete(self.course_id, part_filename)
+        self.parts = []
+        self.part_filename = self._next_part_filename()
+
+
 def upload_exec_summary_to_store(data_dict, report_name, course_id, generated_at, config_name='FINANCIAL_REPORTS'):
     """
     Upload Executive Summary Html file using ReportStore.
@@ -656,29 +1043,36 @@ def upload_exec_summary_to_store(data_dict, report_name, course_id, generated_at
     tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": report_name})
 
 
-def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):  # pylint: disable=too-many-statements
+def upload_grades_csv(_xmodule_instance_args, entry_id, course_id, _task_input, action_name):  # pylint: disable=too-many-statements
     """
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `ReportStore`. Once created, the files can
     be accessed by instantiating another `ReportStore` (via
-    `ReportStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in ReportStore will be complete ones.
-
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    `ReportStore.from_config()`) and calling `link_for()` on it. Rows are
+    written as each student is graded, but the files are only stored when
+    they're committed, so any files that are visible in ReportStore will be
+    complete ones.
+
+    Students are graded in order of their ids, with a TaskCheckpoint saved
+    periodically, so that if the task is run again after being interrupted,
+    it resumes with the student after the last one of the checkpoint.
     """
     start_time = time()
     start_date = datetime.now(UTC)
     status_interval = 100
-    enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id)
+    enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id).order_by('id')
     task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
 
+    # Carry on from the checkpoint, if there is one
+    checkpoint = TaskCheckpoint(entry_id)
+    if checkpoint.resume(task_progress):
+        enrolled_students = enrolled_students.filter(id__gt=checkpoint.last_id)
+        start_date = datetime.strptime(checkpoint.output['timestamp'], CHECKPOINT_TIMESTAMP_FORMAT).replace(tzinfo=UTC)
+
     fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Input: {task_input}'
     task_info_string = fmt.format(
         task_id=_xmodule_instance_args.get('task_id') if _xmodule_instance_args is not None else None,
-        entry_id=_entry_id,
+        entry_id=entry_id,
         course_id=course_id,
         task_input=_task_input
     )
@@ -697,14 +1091,28 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     certificate_whitelist = CertificateWhitelist.objects.filter(course_id=course_id, whitelist=True)
     whitelisted_user_ids = [entry.user_id for entry in certificate_whitelist]
 
-    # Loop over all our students and build our CSV lists in memory
-    header = None
-    rows = []
-    err_rows = [["id", "username", "error_msg"]]
+    # Loop over all our students and write their rows to the CSV files
+    header = checkpoint.output.get('header')
+    grade_writer = CheckpointedCSV(
+        'grade_report', course_id, start_date, parts=checkpoint.output.get('grade_report', ())
+    )
+    err_writer = CheckpointedCSV(
+        'grade_report_err', course_id, start_date, parts=checkpoint.output.get('grade_report_err', ())
+    )
     current_step = {'step': 'Calculating Grades'}
 
-    total_enrolled_students = enrolled_students.count()
-    student_counter = 0
+    # Save a checkpoint before the first student, so that if the task is
+    # interrupted before its next checkpoint, it carries on with the same CSVs.
+    if checkpoint.last_id is None:
+        checkpoint.save(task_progress, last_id=0, output={
+            'timestamp': start_date.strftime(CHECKPOINT_TIMESTAMP_FORMAT),
+            'header': header,
+            'grade_report': [],
+            'grade_report_err': [],
+        })
+
+    total_enrolled_students = task_progress.total
+    student_counter = task_progress.attempted
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Starting grade calculation for total students: %s',
         task_info_string,
@@ -713,88 +1121,103 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
 
         total_enrolled_students
     )
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
-        task_progress.attempted += 1
-
-        # Now add a log entry after each student is graded to get a sense
-        # of the task's progress
-        student_counter += 1
-        TASK_LOG.info(
-            u'%s, Task type: %s, Current step: %s, Grade calculation in-progress for students: %s/%s',
-            task_info_string,
-            action_name,
-            current_step,
-            student_counter,
-            total_enrolled_students
-        )
-
-        if gradeset:
-            # We were able to successfully grade this student for this course.
-            task_progress.succeeded += 1
-            if not header:
-                header = [section['label'] for section in gradeset[u'section_breakdown']]
-                rows.append(
-                    ["id", "email", "username", "grade"] + header + cohorts_header +
-                    group_configs_header + teams_header +
-                    ['Enrollment Track', 'Verification Status'] + certificate_info_header
-                )
+    try:
+        for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
+            # Periodically update task status (this is a cache write)
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            task_progress.attempted += 1
 
-            percents = {
-                section['label']: section.get('percent', 0.0)
-                for section in gradeset[u'section_breakdown']
-                if 'label' in section
-            }
+            # Now add a log entry after each student is graded to get a sense
+            # of the task's progress
+            student_counter += 1
+            TASK_LOG.info(
+                u'%s, Task type: %s, Current step: %s, Grade calculation in-progress for students: %s/%s',
+                task_info_string,
+                action_name,
+                current_step,
+                student_counter,
+                total_enrolled_students
+            )
 
-            cohorts_group_name = []
-            if course_is_cohorted:
-                group = get_cohort(student, course_id, assign=False)
-                cohorts_group_name.append(group.name if group else '')
+            if gradeset:
+                # We were able to successfully grade this student for this course.
+                task_progress.succeeded += 1
+                if not header:
+                    header = [section['label'] for section in gradeset[u'section_breakdown']]
+                    grade_writer.writerow(
+                        ["id", "email", "username", "grade"] + header + cohorts_header +
+                        group_configs_header + teams_header +
+                        ['Enrollment Track', 'Verification Status'] + certificate_info_header
+                    )
 
-            group_configs_group_names = []
-            for partition in experiment_partitions:
-                group = LmsPartitionService(student, course_id).get_group(partition, assign=False)
-                group_configs_group_names.append(group.name if group else '')
+                percents = {
+                    section['label']: section.get('percent', 0.0)
+                    for section in gradeset[u'section_breakdown']
+                    if 'label' in section
+                }
 
-            team_name = []
-            if teams_enabled:
-                try:
-                    membership = CourseTeamMembership.objects.get(user=student, team__course_id=course_id)
-                    team_name.append(membership.team.name)
-                except CourseTeamMembership.DoesNotExist:
-                    team_name.append('')
-
-            enrollment_mode = CourseEnrollment.enrollment_mode_for_user(student, course_id)[0]
-            verification_status = SoftwareSecurePhotoVerification.verification_status_for_user(
-                student,
-                course_id,
-                enrollment_mode
-            )
-            certificate_info = certificate_info_for_user(
-                student,
-                course_id,
-                gradeset['grade'],
-                student.id in whitelisted_user_ids
-            )
+                cohorts_group_name = []
+                if course_is_cohorted:
+                    group = get_cohort(student, course_id, assign=False)
+                    cohorts_group_name.append(group.name if group else '')
+
+                group_configs_group_names = []
+                for partition in experiment_partitions:
+                    group = LmsPartitionService(student, course_id).get_group(partition, assign=False)
+                    group_configs_group_names.append(group.name if group else '')
+
+                team_name = []
+                if teams_enabled:
+                    try:
+                        membership = CourseTeamMembership.objects.get(user=student, team__course_id=course_id)
+                        team_name.append(membership.team.name)
+                    except CourseTeamMembership.DoesNotExist:
+                        team_name.append('')
+
+                enrollment_mode = CourseEnrollment.enrollment_mode_for_user(student, course_id)[0]
+                verification_status = SoftwareSecurePhotoVerification.verification_status_for_user(
+                    student,
+                    course_id,
+                    enrollment_mode
+                )
+                certificate_info = certificate_info_for_user(
+                    student,
+                    course_id,
+                    gradeset['grade'],
+                    student.id in whitelisted_user_ids
+                )
 
-            # Not everybody has the same gradable items. If the item is not
-            # found in the user's gradeset, just assume it's a 0. The aggregated
-            # grades for their sections and overall course will be calculated
-            # without regard for the item they didn't have access to, so it's
-            # possible for a student to have a 0.0 show up in their row but
-            # still have 100% for the course.
-            row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append(
-                [student.id, student.email, student.username, gradeset['percent']] +
-                row_percents + cohorts_group_name + group_configs_group_names + team_name +
-                [enrollment_mode] + [verification_status] + certificate_info
-            )
-        else:
-            # An empty gradeset means we failed to grade a student.
-            task_progress.failed += 1
-            err_rows.append([student.id, student.username, err_msg])
+                # Not everybody has the same gradable items. If the item is not
+                # found in the user's gradeset, just assume it's a 0. The aggregated
+                # grades for their sections and overall course will be calculated
+                # without regard for the item they didn't have access to, so it's
+                # possible for a student to have a 0.0 show up in their row but
+                # still have 100% for the course.
+                row_percents = [percents.get(label, 0.0) for label in header]
+                grade_writer.writerow(
+                    [student.id, student.email, student.username, gradeset['percent']] +
+                    row_percents + cohorts_group_name + group_configs_group_names + team_name +
+                    [enrollment_mode] + [verification_status] + certificate_info
+                )
+            else:
+                # An empty gradeset means we failed to grade a student.
+                task_progress.failed += 1
+                if err_writer.is_empty:
+                    err_writer.writerow(["id", "username", "error_msg"])
+                err_writer.writerow([student.id, student.username, err_msg])
+
+            if checkpoint.is_due(task_progress):
+                checkpoint.save(task_progress, last_id=student.id, output={
+                    'timestamp': start_date.strftime(CHECKPOINT_TIMESTAMP_FORMAT),
+                    'header': header,
+                    'grade_report': grade_writer.checkpoint(),
+                    'grade_report_err': err_writer.checkpoint(),
+                })
+    except Exception:
+        grade_writer.abort()
+        err_writer.abort()
+        raise
 
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Grade calculation completed for students: %s/%s',
@@ -805,17 +1228,17 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
         total_enrolled_students
     )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
+    # By this point, we've written all the rows of our CSV files.
     current_step = {'step': 'Uploading CSVs'}
     task_progress.update_task_state(extra_meta=current_step)
     TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
 
     # Perform the actual upload
-    upload_csv_to_report_store(rows, 'grade_report', course_id, start_date)
+    grade_writer.commit()
 
-    # If there are any error rows (don't count the header), write them out as well
-    if len(err_rows) > 1:
-        upload_csv_to_report_store(err_rows, 'grade_report_err', course_id, start_date)
+    # If there are any error rows, write them out as well
+    if not err_writer.is_empty:
+        err_writer.commit()
 
     # One last update before we close out...
     TASK_LOG.info(u'%s, Task type: %s, Finalizing grade task', task_info_string, action_name)
@@ -876,6 +1299,11 @@ def upload_problem_responses_csv(_xmodule_instance_args, _entry_id, course_id, t
     """
     For a given `course_id`, generate a CSV file containing
     all student answers to a given problem, and store using a `ReportStore`.
+
+    `task_input['problem_location']` may also be a list of problem locations,
+    in which case the answers to all of them are listed, in one pass over the
+    students' module state, with a column for the location of each problem.
+    The rows are written to the report as they're read from the database.
     """
     start_time = time()
     start_date = datetime.now(UTC)
@@ -884,25 +1312,33 @@ def upload_problem_responses_csv(_xmodule_instance_args, _entry_id, course_id, t
     current_step = {'step': 'Calculating students answers to problem'}
     task_progress.update_task_state(extra_meta=current_step)
 
-    # Compute result table and format it
-    problem_location = task_input.get('problem_location')
-    student_data = list_problem_responses(course_id, problem_location)
-    features = ['username', 'state']
-    header, rows = format_dictlist(student_data, features)
-
-    task_progress.attempted = task_progress.succeeded = len(rows)
-    task_progress.skipped = task_progress.total - task_progress.attempted
-
-    rows.insert(0, header)
+    problem_locations = task_input.get('problem_location')
+    if isinstance(problem_locations, basestring):
+        problem_locations = [problem_locations]
+    if len(problem_locations) == 1:
+        features = ['username', 'state']
+    else:
+        features = ['username', 'location', 'state']
 
-    current_step = {'step': 'Uploading CSV'}
-    task_progress.update_task_state(extra_meta=current_step)
+    def _rows():
+        """
+        Yields the header, and then the row of each response, counting them.
+        """
+        yield features
+        for response in iterate_problem_responses(course_id, problem_locations):
+            task_progress.attempted += 1
+            task_progress.succeeded += 1
+            yield [response[feature] for feature in features]
 
     # Perform the upload
-    problem_location = re.sub(r'[:/]', '_', problem_location)
-    csv_name = 'student_state_from_{}'.format(problem_location)
-    upload_csv_to_report_store(rows, csv_name, course_id, start_date)
+    if len(problem_locations) == 1:
+        csv_name = 'student_state_from_{}'.format(re.sub(r'[:/]', '_', problem_locations[0]))
+    else:
+        csv_name = 'student_state_from_{}_problems'.format(len(problem_locations))
+    upload_csv_to_report_store(_rows(), csv_name, course_id, start_date)
 
+    task_progress.skipped = task_progress.total - task_progress.attempted
+    current_step = {'step': 'Uploading CSV'}
     return task_progress.update_task_state(extra_meta=current_step)
 
 
@@ -932,50 +1368,60 @@ def upload_problem_grade_report(_xmodule_instance_args, _entry_id, course_id, _t
         )
 
     # Just generate the static fields for now.
-    rows = [list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))]
-    error_rows = [list(header_row.values()) + ['error_msg']]
+    grade_writer = open_csv_in_report_store('problem_grade_report', course_id, start_date)
+    grade_writer.writerow(list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values())))
+    error_writer = None
     current_step = {'step': 'Calculating Grades'}
 
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, keep_raw_scores=True):
-        student_fields = [getattr(student, field_name) for field_name in header_row]
-        task_progress.attempted += 1
+    try:
+        for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, keep_raw_scores=True):
+            student_fields = [getattr(student, field_name) for field_name in header_row]
+            task_progress.attempted += 1
 
-        if 'percent' not in gradeset or 'raw_scores' not in gradeset:
-            # There was an error grading this student.
-            # Generally there will be a non-empty err_msg, but that is not always the case.
-            if not err_msg:
-                err_msg = u"Unknown error"
-            error_rows.append(student_fields + [err_msg])
-            task_progress.failed += 1
-            continue
+            if 'percent' not in gradeset or 'raw_scores' not in gradeset:
+                # There was an error grading this student.
+                # Generally there will be a non-empty err_msg, but that is not always the case.
+                if not err_msg:
+                    err_msg = u"Unknown error"
+                if error_writer is None:
+                    error_writer = open_csv_in_report_store('problem_grade_report_err', course_id, start_date)
+                    error_writer.writerow(list(header_row.values()) + ['error_msg'])
+                error_writer.writerow(student_fields + [err_msg])
+                task_progress.failed += 1
+                continue
 
-        final_grade = gradeset['percent']
-        # Only consider graded problems
-        problem_scores = {unicode(score.module_id): score for score in gradeset['raw_scores'] if score.graded}
-        earned_possible_values = list()
-        for problem_id in problems:
-            try:
-                problem_score = problem_scores[problem_id]
-                earned_possible_values.append([problem_score.earned, problem_score.possible])
-            except KeyError:
-                # The student has not been graded on this problem.  For example,
-                # iterate_grades_for skips problems that students have never
-                # seen in order to speed up report generation.  It could also be
-                # the case that the student does not have access to it (e.g. A/B
-                # test or cohorted courseware).
-                earned_possible_values.append(['N/A', 'N/A'])
-        rows.append(student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values)))
-
-        task_progress.succeeded += 1
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
+            final_grade = gradeset['percent']
+            # Only consider graded problems
+            problem_scores = {unicode(score.module_id): score for score in gradeset['raw_scores'] if score.graded}
+            earned_possible_values = list()
+            for problem_id in problems:
+                try:
+                    problem_score = problem_scores[problem_id]
+                    earned_possible_values.append([problem_score.earned, problem_score.possible])
+                except KeyError:
+                    # The student has not been graded on this problem.  For example,
+                    # iterate_grades_for skips problems that students have never
+                    # seen in order to speed up report generation.  It could also be
+                    # the case that the student does not have access to it (e.g. A/B
+                    # test or cohorted courseware).
+                    earned_possible_values.append(['N/A', 'N/A'])
+            grade_writer.writerow(student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values)))
+
+            task_progress.succeeded += 1
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+    except Exception:
+        abort_csvs_in_report_store(grade_writer, error_writer)
+        raise
 
     # Perform the upload if any students have been successfully graded
-    if len(rows) > 1:
-        upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
+    if grade_writer.row_count > 1:
+        commit_csv_to_report_store(grade_writer, 'problem_grade_report')
+    else:
+        abort_csvs_in_report_store(grade_writer)
     # If there are any error rows, write them out as well
-    if len(error_rows) > 1:
-        upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
+    if error_writer is not None:
+        commit_csv_to_report_store(error_writer, 'problem_grade_report_err')
 
     return task_progress.update_task_state(extra_meta={'step': 'Uploading CSV'})
 
@@ -1022,7 +1468,9 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
     start_time = time()
     start_date = datetime.now(UTC)
     status_interval = 100
-    students_in_course = CourseEnrollment.objects.enrolled_and_dropped_out_users(course_id)
+    # The profiles are selected along with the students, and the provider loads
+    # the rest of the data about their enrollments once for the whole course.
+    students_in_course = CourseEnrollment.objects.enrolled_and_dropped_out_users(course_id).select_related('profile')
     task_progress = TaskProgress(action_name, students_in_course.count(), start_time)
 
     fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Input: {task_input}'
@@ -1034,8 +1482,8 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
     )
     TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
 
-    # Loop over all our students and build our CSV lists in memory
-    rows = []
+    # Loop over all our students and write their rows to the CSV file
+    writer = open_csv_in_report_store('enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS')
     header = None
     current_step = {'step': 'Gathering Profile Information'}
     enrollment_report_provider = PaidCourseEnrollmentReportProvider()
@@ -1049,68 +1497,73 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         total_students
     )
 
-    for student in students_in_course:
-        # Periodically update task status (this is a cache write)
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
-        task_progress.attempted += 1
-
-        # Now add a log entry after certain intervals to get a hint that task is in progress
-        student_counter += 1
-        if student_counter % 100 == 0:
-            TASK_LOG.info(
-                u'%s, Task type: %s, Current step: %s, gathering enrollment profile for students in progress: %s/%s',
-                task_info_string,
-                action_name,
-                current_step,
-                student_counter,
-                total_students
-            )
+    try:
+        for student in students_in_course:
+            # Periodically update task status (this is a cache write)
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            task_progress.attempted += 1
 
-        user_data = enrollment_report_provider.get_user_profile(student.id)
-        course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
-        payment_data = enrollment_report_provider.get_payment_info(student, course_id)
-
-        # display name map for the column headers
-        enrollment_report_headers = {
-            'User ID': _('User ID'),
-            'Username': _('Username'),
-            'Full Name': _('Full Name'),
-            'First Name': _('First Name'),
-            'Last Name': _('Last Name'),
-            'Company Name': _('Company Name'),
-            'Title': _('Title'),
-            'Language': _('Language'),
-            'Year of Birth': _('Year of Birth'),
-            'Gender': _('Gender'),
-            'Level of Education': _('Level of Education'),
-            'Mailing Address': _('Mailing Address'),
-            'Goals': _('Goals'),
-            'City': _('City'),
-            'Country': _('Country'),
-            'Enrollment Date': _('Enrollment Date'),
-            'Currently Enrolled': _('Currently Enrolled'),
-            'Enrollment Source': _('Enrollment Source'),
-            'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
-            'Enrollment Role': _('Enrollment Role'),
-            'List Price': _('List Price'),
-            'Payment Amount': _('Payment Amount'),
-            'Coupon Codes Used': _('Coupon Codes Used'),
-            'Registration Code Used': _('Registration Code Used'),
-            'Payment Status': _('Payment Status'),
-            'Transaction Reference Number': _('Transaction Reference Number')
-        }
+            # Now add a log entry after certain intervals to get a hint that task is in progress
+            student_counter += 1
+            if student_counter % 100 == 0:
+                TASK_LOG.info(
+                    u'%s, Task type: %s, Current step: %s, '
+                    u'gathering enrollment profile for students in progress: %s/%s',
+                    task_info_string,
+                    action_name,
+                    current_step,
+                    student_counter,
+                    total_students
+                )
 
-        if not header:
-            header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
-            display_headers = []
-            for header_element in header:
-                # translate header into a localizable display string
-                display_headers.append(enrollment_report_headers.get(header_element, header_element))
-            rows.append(display_headers)
+            user_data = enrollment_report_provider.get_user_profile_info(student)
+            course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
+            payment_data = enrollment_report_provider.get_payment_info(student, course_id)
+
+            # display name map for the column headers
+            enrollment_report_headers = {
+                'User ID': _('User ID'),
+                'Username': _('Username'),
+                'Full Name': _('Full Name'),
+                'First Name': _('First Name'),
+                'Last Name': _('Last Name'),
+                'Company Name': _('Company Name'),
+                'Title': _('Title'),
+                'Language': _('Language'),
+                'Year of Birth': _('Year of Birth'),
+                'Gender': _('Gender'),
+                'Level of Education': _('Level of Education'),
+                'Mailing Address': _('Mailing Address'),
+                'Goals': _('Goals'),
+                'City': _('City'),
+                'Country': _('Country'),
+                'Enrollment Date': _('Enrollment Date'),
+                'Currently Enrolled': _('Currently Enrolled'),
+                'Enrollment Source': _('Enrollment Source'),
+                'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
+                'Enrollment Role': _('Enrollment Role'),
+                'List Price': _('List Price'),
+                'Payment Amount': _('Payment Amount'),
+                'Coupon Codes Used': _('Coupon Codes Used'),
+                'Registration Code Used': _('Registration Code Used'),
+                'Payment Status': _('Payment Status'),
+                'Transaction Reference Number': _('Transaction Reference Number')
+            }
 
-        rows.append(user_data.values() + course_enrollment_data.values() + payment_data.values())
-        task_progress.succeeded += 1
+            if not header:
+                header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
+                display_headers = []
+                for header_element in header:
+                    # translate header into a localizable display string
+                    display_headers.append(enrollment_report_headers.get(header_element, header_element))
+                writer.writerow(display_headers)
+
+            writer.writerow(user_data.values() + course_enrollment_data.values() + payment_data.values())
+            task_progress.succeeded += 1
+    except Exception:
+        abort_csvs_in_report_store(writer)
+        raise
 
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Detailed enrollment report generated for students: %s/%s',
@@ -1121,13 +1574,13 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         total_students
     )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
+    # By this point, we've written all the rows of our CSV file.
     current_step = {'step': 'Uploading CSVs'}
     task_progress.update_task_state(extra_meta=current_step)
     TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
 
     # Perform the actual upload
-    upload_csv_to_report_store(rows, 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS')
+    commit_csv_to_report_store(writer, 'enrollment_report')
 
     # One last update before we close out...
     TASK_LOG.info(u'%s, Task type: %s, Finalizing detailed enrollment task', task_info_string, action_name)
@@ -1199,11 +1652,7 @@ def get_executive_report(course_id):
     total_coupon_codes_purchases = CouponRedemption.get_total_coupon_code_purchases(course_id)
 
     bulk_purchased_codes = CourseRegistrationCode.order_generated_registration_codes(course_id)
-
-    unused_registration_codes = 0
-    for registration_code in bulk_purchased_codes:
-        if not RegistrationCodeRedemption.is_registration_code_redeemed(registration_code.code):
-            unused_registration_codes += 1
+    unused_registration_codes = bulk_purchased_codes.filter(registrationcoderedemption__isnull=True).count()
 
     self_purchased_seat_count = PaidCourseRegistration.get_self_purchased_seat_count(course_id)
     bulk_purchased_seat_count = CourseRegCodeItem.get_bulk_purchased_seat_count(course_id)
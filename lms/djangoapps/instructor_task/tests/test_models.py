@@ -3,7 +3,10 @@ Tests for instructor_task/models.py.
 """
 
 from cStringIO import StringIO
+import gzip
 import mock
+import os
+import stat
 import time
 from datetime import datetime
 from unittest import TestCase
@@ -23,17 +26,51 @@ class MockKey(object):
 
     def set_contents_from_string(self, contents, headers):  # pylint: disable=unused-argument
         """ Expected method on a Key object. """
+        self.contents = contents
         self.bucket.store_key(self)
 
     def generate_url(self, expires_in):  # pylint: disable=unused-argument
         """ Expected method on a Key object. """
         return "http://fake-edx-s3.edx.org/"
 
+    def __iter__(self):
+        """ Keys are read a chunk at a time by iterating over them. """
+        return iter([self.contents[index:index + 100] for index in range(0, len(self.contents), 100)])
+
+
+class MockMultiPartUpload(object):
+    """
+    Mocking a boto S3 MultiPartUpload object.
+    """
+    def __init__(self, bucket, key_name):
+        self.bucket = bucket
+        self.key_name = key_name
+        self.parts = []
+        self.in_progress = True
+
+    def upload_part_from_file(self, fp, part_num):
+        """ Expected method on a MultiPartUpload object. """
+        self.parts.append((part_num, fp.read()))
+
+    def complete_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        key = MockKey(self.bucket)
+        key.key = self.key_name
+        key.contents = ''.join(data for _, data in sorted(self.parts))
+        self.bucket.store_key(key)
+        self.in_progress = False
+
+    def cancel_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        self.parts = []
+        self.in_progress = False
+
 
 class MockBucket(object):
     """ Mocking a boto S3 Bucket object. """
     def __init__(self, _name):
         self.keys = []
+        self.multipart_uploads = []
 
     def store_key(self, key):
         """ Not a Bucket method, created just to store the keys in the Bucket for testing purposes. """
@@ -43,6 +80,26 @@ class MockBucket(object):
         """ Expected method on a Bucket object. """
         return self.keys
 
+    def get_key(self, key_name):
+        """ Expected method on a Bucket object. """
+        return next((key for key in reversed(self.keys) if key.key == key_name), None)
+
+    def delete_key(self, key_name):
+        """ Expected method on a Bucket object. """
+        self.keys = [key for key in self.keys if key.key != key_name]
+
+    def initiate_multipart_upload(self, key_name, headers):  # pylint: disable=unused-argument
+        """ Expected method on a Bucket object. """
+        upload = MockMultiPartUpload(self, key_name)
+        self.multipart_uploads.append(upload)
+        return upload
+
+    def get_all_multipart_uploads(self, prefix):
+        """ Expected method on a Bucket object. """
+        return [
+            upload for upload in self.multipart_uploads if upload.in_progress and upload.key_name.startswith(prefix)
+        ]
+
 
 class MockS3Connection(object):
     """ Mocking a boto S3 Connection """
@@ -93,6 +150,93 @@ class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase
         """ Create and return a LocalFSReportStore. """
         return LocalFSReportStore.from_config(config_name='GRADES_DOWNLOAD')
 
+    def read_report(self, report_store, filename):
+        """ Return the contents of a stored report. """
+        with open(report_store.path_to(self.course_id, filename)) as report_file:
+            return report_file.read()
+
+    def test_store_rows(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', ([index, u'caf\xe9'] for index in range(2)))
+        self.assertEqual(self.read_report(report_store, 'report.csv'), '0,caf\xc3\xa9\r\n1,caf\xc3\xa9\r\n')
+
+    def test_not_visible_until_committed(self):
+        report_store = self.create_report_store()
+        writer = report_store.open_rows(self.course_id, 'report.csv')
+        writer.writerow(['a', 'b'])
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
+        writer.commit()
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['report.csv'])
+        self.assertEqual(self.read_report(report_store, 'report.csv'), 'a,b\r\n')
+
+    def test_abort(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', [['old']])
+        with self.assertRaises(ValueError):
+            with report_store.open_rows(self.course_id, 'report.csv') as writer:
+                writer.writerow(['new'])
+                raise ValueError()
+
+        # The previous report is untouched, and nothing is left behind
+        self.assertEqual(self.read_report(report_store, 'report.csv'), 'old\r\n')
+        course_dir = os.path.dirname(report_store.path_to(self.course_id, 'report.csv'))
+        self.assertEqual(os.listdir(course_dir), ['report.csv'])
+
+    def test_abort_uncommitted(self):
+        report_store = self.create_report_store()
+        report_store.open_rows(self.course_id, 'report.csv').writerow(['a', 'b'])
+        other_writer = report_store.open_rows(self.course_id, 'report.csv.2')
+        other_writer.writerow(['c', 'd'])
+
+        # Only the temporary files of the report are removed
+        report_store.abort_uncommitted(self.course_id, 'report.csv')
+        other_writer.commit()
+        course_dir = os.path.dirname(report_store.path_to(self.course_id, 'report.csv'))
+        self.assertEqual(os.listdir(course_dir), ['report.csv.2'])
+
+    def test_concatenate(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, '.report.csv.part0', [['a', 1]])
+        report_store.store_rows(self.course_id, '.report.csv.part1', [['b', 2]])
+        # Parts aren't listed as reports
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
+        report_store.concatenate(self.course_id, 'report.csv', ['.report.csv.part0', '.report.csv.part1'])
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['report.csv'])
+        self.assertEqual(self.read_report(report_store, 'report.csv'), 'a,1\r\nb,2\r\n')
+        course_dir = os.path.dirname(report_store.path_to(self.course_id, 'report.csv'))
+        self.assertEqual(os.listdir(course_dir), ['report.csv'])
+
+    def test_rows_written_through(self):
+        """
+        Check that rows are written to the file as they're generated, rather
+        than being held in memory until the report is committed.
+        """
+        report_store = self.create_report_store()
+        with report_store.open_rows(self.course_id, 'report.csv') as writer:
+            writer.writerows(
+                [index, u'user{}@example.com'.format(index), 0.75] + [0.5] * 20 for index in xrange(20000)
+            )
+            written = writer.temp_file.tell()
+            buffered = written - os.path.getsize(writer.temp_file.name)
+        self.assertGreater(written, 1024 * 1024)
+        self.assertLess(buffered, 64 * 1024)
+
+    def test_file_mode(self):
+        """
+        Check that reports written a row at a time get the same permissions
+        as reports that are stored whole.
+        """
+        report_store = self.create_report_store()
+        report_store.store(self.course_id, 'stored.csv', StringIO('a,b\r\n'))
+        report_store.store_rows(self.course_id, 'written.csv', [['a', 'b']])
+
+        def mode(filename):
+            """ Return the permission bits of a stored report. """
+            return stat.S_IMODE(os.stat(report_store.path_to(self.course_id, filename)).st_mode)
+        self.assertEqual(mode('written.csv'), mode('stored.csv'))
+
 
 @mock.patch('instructor_task.models.S3Connection', new=MockS3Connection)
 @mock.patch('instructor_task.models.Key', new=MockKey)
@@ -105,3 +249,68 @@ class S3ReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase):
     def create_report_store(self):
         """ Create and return a S3ReportStore. """
         return S3ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+
+    def test_store_rows(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', ([index, u'caf\xe9'] for index in range(2)))
+        key = report_store.bucket.keys[0]
+        self.assertTrue(key.key.endswith('/report.csv'))
+        self.assertEqual(gunzip(key.contents), '0,caf\xc3\xa9\r\n1,caf\xc3\xa9\r\n')
+        self.assertEqual(report_store.bucket.multipart_uploads, [])
+
+    @mock.patch('instructor_task.models.S3_MULTIPART_PART_SIZE', 1000)
+    def test_multipart_upload(self):
+        report_store = self.create_report_store()
+        # Random data, so that the compressed report is big enough to need
+        # more than one part.
+        rows = [[index, os.urandom(1000).encode('hex')] for index in range(100)]
+        with report_store.open_rows(self.course_id, 'report.csv') as writer:
+            writer.writerows(rows)
+            self.assertEqual(report_store.bucket.keys, [])
+
+        upload = report_store.bucket.multipart_uploads[0]
+        self.assertGreater(len(upload.parts), 1)
+        key = report_store.bucket.keys[0]
+        self.assertEqual(gunzip(key.contents), ''.join('{},{}\r\n'.format(*row) for row in rows))
+
+    @mock.patch('instructor_task.models.S3_MULTIPART_PART_SIZE', 1000)
+    def test_multipart_upload_aborted(self):
+        report_store = self.create_report_store()
+        writer = report_store.open_rows(self.course_id, 'report.csv')
+        writer.writerows([index, os.urandom(1000).encode('hex')] for index in range(100))
+        writer.abort()
+
+        self.assertEqual(report_store.bucket.keys, [])
+        self.assertEqual(report_store.bucket.multipart_uploads[0].parts, [])
+
+    @mock.patch('instructor_task.models.S3_MULTIPART_PART_SIZE', 1000)
+    def test_abort_uncommitted(self):
+        report_store = self.create_report_store()
+        for filename in ('report.csv', 'report.csv.2'):
+            writer = report_store.open_rows(self.course_id, filename)
+            writer.writerows([index, os.urandom(1000).encode('hex')] for index in range(10))
+
+        # Only the upload of the report is cancelled
+        report_store.abort_uncommitted(self.course_id, 'report.csv')
+        self.assertEqual(
+            [upload.in_progress for upload in report_store.bucket.multipart_uploads],
+            [False, True]
+        )
+
+    def test_concatenate(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, '.report.csv.part0', [['a', os.urandom(200).encode('hex')]])
+        report_store.store_rows(self.course_id, '.report.csv.part1', [['b', 2]])
+        # Parts aren't listed as reports
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
+        report_store.concatenate(self.course_id, 'report.csv', ['.report.csv.part0', '.report.csv.part1'])
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['report.csv'])
+        key = report_store.bucket.keys[0]
+        self.assertEqual(len(report_store.bucket.keys), 1)
+        self.assertRegexpMatches(gunzip(key.contents), r'^a,[0-9a-f]{400}\r\nb,2\r\n$')
+
+
+def gunzip(data):
+    """ Return the decompressed contents of gzip'd `data`. """
+    return gzip.GzipFile(fileobj=StringIO(data)).read()
@@ -1,13 +1,28 @@
 """
 Unit tests for instructor_task subtasks.
 """
+import json
 from uuid import uuid4
 
+from celery.states import RETRY, SUCCESS
+from django.test import TestCase
+from django.test.utils import override_settings
 from mock import Mock, patch
 
 from student.models import CourseEnrollment
 
-from instructor_task.subtasks import queue_subtasks_for_query
+from instructor_task.models import InstructorSubtaskResult, InstructorTask
+from instructor_task.subtasks import (
+    DuplicateTaskException,
+    SubtaskStatus,
+    check_subtask_is_valid,
+    get_items_per_subtask,
+    initialize_subtask_info,
+    queue_subtasks_for_query,
+    update_subtask_status,
+    _iterate_by_keyset,
+    _update_subtask_status,
+)
 from instructor_task.tests.factories import InstructorTaskFactory
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase
 
@@ -26,7 +41,7 @@ class TestSubtasks(InstructorTaskCourseTestCase):
             random_id = uuid4().hex[:8]
             self.create_student(username='student{0}'.format(random_id))
 
-    def _queue_subtasks(self, create_subtask_fcn, items_per_task, initial_count, extra_count):
+    def _queue_subtasks(self, create_subtask_fcn, items_per_task, initial_count, extra_count, item_fields=()):
         """Queue subtasks while enrolling more students into course in the middle of the process."""
 
         task_id = str(uuid4())
@@ -52,7 +67,7 @@ class TestSubtasks(InstructorTaskCourseTestCase):
                 action_name='action_name',
                 create_subtask_fcn=create_subtask_fcn,
                 item_querysets=task_querysets,
-                item_fields=[],
+                item_fields=list(item_fields),
                 items_per_task=items_per_task,
                 total_num_items=initial_count,
             )
@@ -80,3 +95,166 @@ class TestSubtasks(InstructorTaskCourseTestCase):
         self.assertEqual(len(mock_create_subtask_fcn_args[0][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[1][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[2][0][0]), 5)
+
+    def test_items_paged_by_keyset(self):
+        """Test that the items for subtasks are fetched a few at a time, in order of their primary key."""
+
+        mock_create_subtask_fcn = Mock()
+        with patch('instructor_task.subtasks.ITEMS_PER_QUERY', 2):
+            self._queue_subtasks(mock_create_subtask_fcn, 3, 7, 1, item_fields=['user_id'])
+
+        items = [item for call_args in mock_create_subtask_fcn.call_args_list for item in call_args[0][0]]
+        enrollments = CourseEnrollment.objects.filter(course_id=self.course.id).order_by('pk')
+        self.assertEqual([item['pk'] for item in items], [enrollment.pk for enrollment in enrollments])
+        self.assertEqual([item['user_id'] for item in items], [enrollment.user_id for enrollment in enrollments])
+
+    def test_iterate_by_keyset_ordering(self):
+        """Test that items are paged through in the order of their queryset, if it's ordered."""
+
+        self._enroll_students_in_course(self.course.id, 5)
+        enrollments = CourseEnrollment.objects.filter(course_id=self.course.id)
+        ordered = enrollments.order_by('is_active', 'user_id', 'id')
+        # Two pages of two enrollments, and a last page of one
+        with self.assertNumQueries(3):
+            items = list(_iterate_by_keyset(ordered, ['user_id'], 2))
+        self.assertEqual([item['id'] for item in items], [enrollment.id for enrollment in ordered])
+
+        with self.assertRaises(ValueError):
+            list(_iterate_by_keyset(enrollments.order_by('-id'), [], 2))
+        with self.assertRaises(ValueError):
+            list(_iterate_by_keyset(enrollments.order_by('user_id'), [], 2))
+
+
+@override_settings(
+    INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS=60,
+    INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK=20,
+    INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK=2000,
+)
+class TestItemsPerSubtask(TestCase):
+    """Tests for adapting the number of items in each subtask to the throughput of earlier subtasks."""
+
+    def _create_finished_task(self, attempted, skipped, subtask_duration_ms, task_type='bulk_course_email'):
+        """Create a finished task whose subtasks took `subtask_duration_ms` in all."""
+        task_output = {'attempted': attempted, 'skipped': skipped}
+        if subtask_duration_ms is not None:
+            task_output['subtask_duration_ms'] = subtask_duration_ms
+        InstructorTaskFactory.create(
+            task_type=task_type,
+            task_state=SUCCESS,
+            task_output=json.dumps(task_output),
+            subtasks=json.dumps({'total': 1}),
+        )
+
+    def test_no_earlier_tasks(self):
+        self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 100)
+        # Tasks of other types, and tasks from before durations were recorded, aren't used
+        self._create_finished_task(100, 0, 1000, task_type='rescore_problem')
+        self._create_finished_task(100, 0, None)
+        self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 100)
+
+    def test_sized_by_throughput(self):
+        # 5 items a second, including skipped items
+        self._create_finished_task(90, 10, 20000)
+        self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 300)
+        # 2 items a second, over both tasks
+        self._create_finished_task(100, 0, 80000)
+        self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 120)
+
+    def test_bounds(self):
+        self._create_finished_task(10, 0, 100000)
+        self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 20)
+        with override_settings(INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS=3600):
+            self._create_finished_task(100000, 0, 1000)
+            self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 2000)
+
+    @override_settings(INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS=0)
+    def test_turned_off(self):
+        self._create_finished_task(90, 10, 20000)
+        self.assertEqual(get_items_per_subtask('bulk_course_email', 100), 100)
+
+
+@override_settings(INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE=2)
+class TestBatchedSubtaskStatus(TestCase):
+    """Tests for adding the final statuses of subtasks to their InstructorTask a few at a time."""
+
+    def setUp(self):
+        super(TestBatchedSubtaskStatus, self).setUp()
+        self.entry = InstructorTaskFactory.create(task_type='bulk_course_email', task_id=str(uuid4()))
+        self.subtask_ids = [str(uuid4()) for _ in range(3)]
+        initialize_subtask_info(self.entry, 'emailed', 30, self.subtask_ids)
+
+    def _finish_subtask(self, subtask_id, succeeded=10):
+        """Record that the subtask `subtask_id` has finished."""
+        subtask_status = SubtaskStatus.create(subtask_id)
+        subtask_status.increment(succeeded=succeeded, state=SUCCESS, duration_ms=500)
+        update_subtask_status(self.entry.id, subtask_id, subtask_status)
+
+    def _get_progress(self):
+        """Returns the task progress and the subtask info stored in the InstructorTask."""
+        entry = InstructorTask.objects.get(id=self.entry.id)
+        return json.loads(entry.task_output), json.loads(entry.subtasks), entry.task_state
+
+    def test_statuses_added_in_batches(self):
+        self._finish_subtask(self.subtask_ids[0])
+        task_progress, subtask_dict, _task_state = self._get_progress()
+        self.assertEqual(task_progress['succeeded'], 0)
+        self.assertEqual(subtask_dict['succeeded'], 0)
+        self.assertEqual(InstructorSubtaskResult.objects.count(), 1)
+
+        self._finish_subtask(self.subtask_ids[1])
+        task_progress, subtask_dict, _task_state = self._get_progress()
+        self.assertEqual(task_progress['succeeded'], 20)
+        self.assertEqual(task_progress['subtask_duration_ms'], 1000)
+        self.assertEqual(subtask_dict['succeeded'], 2)
+        self.assertEqual(subtask_dict['status'][self.subtask_ids[0]]['state'], SUCCESS)
+        self.assertEqual(InstructorSubtaskResult.objects.count(), 0)
+
+        # The last subtask to finish adds its status straight away
+        self._finish_subtask(self.subtask_ids[2])
+        task_progress, subtask_dict, task_state = self._get_progress()
+        self.assertEqual(task_progress['succeeded'], 30)
+        self.assertEqual(subtask_dict['succeeded'], 3)
+        self.assertEqual(task_state, SUCCESS)
+
+    def test_other_updates_add_waiting_statuses(self):
+        self._finish_subtask(self.subtask_ids[0])
+        retried_status = SubtaskStatus.create(self.subtask_ids[1], state=RETRY, retried_nomax=1)
+        update_subtask_status(self.entry.id, self.subtask_ids[1], retried_status)
+        task_progress, subtask_dict, _task_state = self._get_progress()
+        self.assertEqual(task_progress['succeeded'], 10)
+        self.assertEqual(subtask_dict['succeeded'], 1)
+        self.assertEqual(subtask_dict['status'][self.subtask_ids[1]]['state'], RETRY)
+        self.assertFalse(InstructorSubtaskResult.objects.exists())
+
+    def test_concurrent_flushes(self):
+        # Both subtasks store their statuses, and both see a full batch to flush
+        statuses = []
+        for subtask_id in self.subtask_ids[:2]:
+            subtask_status = SubtaskStatus.create(subtask_id)
+            subtask_status.increment(succeeded=10, state=SUCCESS, duration_ms=500)
+            InstructorSubtaskResult.objects.create(
+                instructor_task_id=self.entry.id, subtask_id=subtask_id, status=json.dumps(subtask_status.to_dict())
+            )
+            statuses.append((subtask_id, subtask_status))
+
+        # The first flush adds both statuses, so the second adds nothing more
+        for subtask_id, subtask_status in statuses:
+            _update_subtask_status(self.entry.id, subtask_id, subtask_status)
+        task_progress, subtask_dict, task_state = self._get_progress()
+        self.assertEqual(task_progress['succeeded'], 20)
+        self.assertEqual(task_progress['subtask_duration_ms'], 1000)
+        self.assertEqual(subtask_dict['succeeded'], 2)
+        self.assertNotEqual(task_state, SUCCESS)
+        self.assertFalse(InstructorSubtaskResult.objects.exists())
+
+    def test_waiting_subtask_not_run_again(self):
+        self._finish_subtask(self.subtask_ids[0])
+        with self.assertRaisesRegexp(DuplicateTaskException, 'already completed'):
+            check_subtask_is_valid(self.entry.id, self.subtask_ids[0], SubtaskStatus.create(self.subtask_ids[0]))
+
+    @override_settings(INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE=1)
+    def test_not_batched(self):
+        self._finish_subtask(self.subtask_ids[0])
+        task_progress, _subtask_dict, _task_state = self._get_progress()
+        self.assertEqual(task_progress['succeeded'], 10)
+        self.assertFalse(InstructorSubtaskResult.objects.exists())
@@ -11,6 +11,7 @@ from uuid import uuid4
 from mock import Mock, MagicMock, patch
 
 from celery.states import SUCCESS, FAILURE
+from django.test.utils import override_settings
 
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from opaque_keys.edx.locations import i4xEncoder
@@ -27,8 +28,11 @@ from instructor_task.tasks import (
     reset_problem_attempts,
     delete_problem_state,
     generate_certificates,
+    calculate_grades_csv,
+    send_bulk_course_email,
+    cohort_students,
 )
-from instructor_task.tasks_helper import UpdateProblemModuleStateError
+from instructor_task.tasks_helper import TaskCheckpoint, UpdateProblemModuleStateError, UPDATE_STATUS_SKIPPED
 
 PROBLEM_URL_NAME = "test_urlname"
 
@@ -206,6 +210,12 @@ class TestInstructorTasks(InstructorTaskModuleTestCase):
         self.assertEquals(output['message'], expected_message)
         self.assertEquals(output['traceback'][-3:], "...")
 
+    def test_only_checkpointed_tasks_acknowledged_late(self):
+        for task_class in (rescore_problem, reset_problem_attempts, delete_problem_state, calculate_grades_csv):
+            self.assertTrue(task_class.acks_late)
+        for task_class in (generate_certificates, send_bulk_course_email, cohort_students):
+            self.assertFalse(task_class.acks_late)
+
 
 class TestRescoreInstructorTask(TestInstructorTasks):
     """Tests problem-rescoring instructor task."""
@@ -267,6 +277,59 @@ class TestRescoreInstructorTask(TestInstructorTasks):
         self.assertEquals(output.get('total'), num_students)
         self.assertEquals(output.get('action_name'), 'rescored')
         self.assertGreater(output.get('duration_ms'), 0)
+        self.assertGreater(output.get('throughput'), 0)
+
+    @override_settings(INSTRUCTOR_TASK_MODULES_PER_SUBTASK=3)
+    def test_rescoring_in_subtasks(self):
+        input_state = json.dumps({'done': True})
+        num_students = 8
+        self._create_students_with_state(num_students, input_state)
+        task_entry = self._create_input_entry()
+        mock_instance = Mock()
+        mock_instance.rescore_problem = Mock(return_value={'success': 'correct'})
+        with patch('instructor_task.tasks_helper.get_module_for_descriptor_internal') as mock_get_module:
+            mock_get_module.return_value = mock_instance
+            self._run_task_with_mock_celery(rescore_problem, task_entry.id, task_entry.task_id)
+        # each student was rescored once, by one of three subtasks
+        self.assertEquals(mock_instance.rescore_problem.call_count, num_students)
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        subtasks = json.loads(entry.subtasks)
+        self.assertEquals(subtasks['total'], 3)
+        self.assertEquals(subtasks['succeeded'], 3)
+        output = json.loads(entry.task_output)
+        self.assertEquals(output.get('attempted'), num_students)
+        self.assertEquals(output.get('succeeded'), num_students)
+        self.assertEquals(output.get('total'), num_students)
+        self.assertEquals(output.get('action_name'), 'rescored')
+        self.assertGreater(output.get('throughput'), 0)
+
+    @override_settings(INSTRUCTOR_TASK_MODULES_PER_SUBTASK=3)
+    def test_rescoring_skipped_in_subtasks(self):
+        input_state = json.dumps({'done': True})
+        num_students = 8
+        self._create_students_with_state(num_students, input_state)
+        task_entry = self._create_input_entry()
+        with patch('instructor_task.tasks_helper._rescore_problem_module_state', return_value=UPDATE_STATUS_SKIPPED):
+            self._run_task_with_mock_celery(rescore_problem, task_entry.id, task_entry.task_id)
+        # Skipped modules aren't counted as attempted, as in every other subtask
+        output = json.loads(InstructorTask.objects.get(id=task_entry.id).task_output)
+        self.assertEquals(output.get('attempted'), 0)
+        self.assertEquals(output.get('skipped'), num_students)
+        self.assertEquals(output.get('total'), num_students)
+
+    @override_settings(INSTRUCTOR_TASK_MODULES_PER_SUBTASK=3)
+    def test_rescoring_student_not_in_subtasks(self):
+        input_state = json.dumps({'done': True})
+        students = self._create_students_with_state(8, input_state)
+        task_entry = self._create_input_entry(student_ident=students[0].username)
+        mock_instance = Mock()
+        mock_instance.rescore_problem = Mock(return_value={'success': 'correct'})
+        with patch('instructor_task.tasks_helper.get_module_for_descriptor_internal') as mock_get_module:
+            mock_get_module.return_value = mock_instance
+            status = self._run_task_with_mock_celery(rescore_problem, task_entry.id, task_entry.task_id)
+        self.assertDictContainsSubset({'attempted': 1, 'succeeded': 1, 'total': 1}, status)
+        self.assertEquals(InstructorTask.objects.get(id=task_entry.id).subtasks, '')
 
     def test_rescoring_bad_result(self):
         # Confirm that rescoring does not succeed if "success" key is not an expected value.
@@ -357,6 +420,45 @@ class TestResetAttemptsInstructorTask(TestInstructorTasks):
         # check that entries were reset
         self._assert_num_attempts(students, 0)
 
+    @override_settings(INSTRUCTOR_TASK_CHECKPOINT_INTERVAL=3)
+    def test_reset_saves_checkpoints(self):
+        input_state = json.dumps({'attempts': 3})
+        students = self._create_students_with_state(10, input_state)
+        modules = StudentModule.objects.filter(student__in=students).order_by('id')
+        module_ids = list(modules.values_list('id', flat=True))
+        with patch.object(TaskCheckpoint, 'save', autospec=True, side_effect=TaskCheckpoint.save) as mock_save:
+            self._test_run_with_task(reset_problem_attempts, 'reset', 10)
+
+        self.assertEqual(
+            [call[1]['last_id'] for call in mock_save.call_args_list],
+            [module_ids[2], module_ids[5], module_ids[8]]
+        )
+        # The checkpoint is cleared once the task is done
+        self.assertEqual(InstructorTask.objects.get().checkpoint, '')
+
+    def test_reset_resumed_from_checkpoint(self):
+        input_state = json.dumps({'attempts': 3})
+        students = self._create_students_with_state(10, input_state)
+        modules = list(StudentModule.objects.filter(student__in=students).order_by('id'))
+        task_entry = self._create_input_entry()
+        # The task had reset the first four modules when it was interrupted
+        task_entry.checkpoint = json.dumps({
+            'last_id': modules[3].id,
+            'progress': {'attempted': 4, 'succeeded': 4, 'skipped': 0, 'failed': 0, 'resumed': 0},
+            'output': {},
+        })
+        task_entry.save()
+
+        status = self._run_task_with_mock_celery(reset_problem_attempts, task_entry.id, task_entry.task_id)
+        self.assertDictContainsSubset({'attempted': 10, 'succeeded': 10, 'total': 10, 'resumed': 1}, status)
+        # Only the modules after the checkpoint were updated this time
+        for index, module in enumerate(modules):
+            module = StudentModule.objects.get(id=module.id)
+            self.assertEquals(json.loads(module.state)['attempts'], 3 if index < 4 else 0)
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(entry.checkpoint, '')
+
     def _test_reset_with_student(self, use_email):
         """Run a reset task for one student, with several StudentModules for the problem defined."""
         num_students = 10
@@ -449,6 +551,24 @@ class TestDeleteStateInstructorTask(TestInstructorTasks):
                                           student=student,
                                           module_state_key=self.location)
 
+    def test_delete_resumed_from_checkpoint(self):
+        students = self._create_students_with_state(10)
+        modules = list(StudentModule.objects.filter(student__in=students).order_by('id'))
+        task_entry = self._create_input_entry()
+        # The task had deleted the first four modules when it was interrupted
+        StudentModule.objects.filter(id__in=[module.id for module in modules[:4]]).delete()
+        task_entry.checkpoint = json.dumps({
+            'last_id': modules[3].id,
+            'progress': {'attempted': 4, 'succeeded': 4, 'skipped': 0, 'failed': 0, 'total': 10, 'resumed': 0},
+            'output': {},
+        })
+        task_entry.save()
+
+        status = self._run_task_with_mock_celery(delete_problem_state, task_entry.id, task_entry.task_id)
+        # The total is the one the task started with, not what's left to delete
+        self.assertDictContainsSubset({'attempted': 10, 'succeeded': 10, 'total': 10, 'resumed': 1}, status)
+        self.assertFalse(StudentModule.objects.filter(student__in=students).exists())
+
 
 class TestCertificateGenerationnstructorTask(TestInstructorTasks):
     """Tests instructor task that generates student certificates."""
@@ -8,31 +8,35 @@ Tests that CSV grade report generation works with unicode emails.
 """
 import ddt
 from mock import Mock, patch
+import os
 import tempfile
 import json
 from openedx.core.djangoapps.course_groups import cohorts
 import unicodecsv
 from django.core.urlresolvers import reverse
-from django.test.utils import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from capa.tests.response_xml_factory import MultipleChoiceResponseXMLFactory
 from certificates.models import CertificateStatuses, GeneratedCertificate
 from certificates.tests.factories import GeneratedCertificateFactory, CertificateWhitelistFactory
 from course_modes.models import CourseMode
-from courseware.tests.factories import InstructorFactory
+from courseware.grades import iterate_grades_for
+from courseware.tests.factories import InstructorFactory, StudentModuleFactory
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase, TestReportMixin, InstructorTaskModuleTestCase
 from openedx.core.djangoapps.course_groups.models import CourseUserGroupPartitionGroup, CohortMembership
 from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory
 import openedx.core.djangoapps.user_api.course_tag.api as course_tag_api
 from openedx.core.djangoapps.user_api.partition_schemes import RandomUserPartitionScheme
 from shoppingcart.models import Order, PaidCourseRegistration, CourseRegistrationCode, Invoice, \
-    CourseRegistrationCodeInvoiceItem, InvoiceTransaction, Coupon
+    CourseRegistrationCodeInvoiceItem, InvoiceTransaction, Coupon, RegistrationCodeRedemption
 from student.tests.factories import UserFactory, CourseModeFactory
 from student.models import CourseEnrollment, CourseEnrollmentAllowed, ManualEnrollmentAudit, ALLOWEDTOENROLL_TO_ENROLLED
 from lms.djangoapps.verify_student.tests.factories import SoftwareSecurePhotoVerificationFactory
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.partitions.partitions import Group, UserPartition
-from instructor_task.models import ReportStore
+from instructor_task.models import InstructorTask, ReportStore
+from instructor_task.tests.factories import InstructorTaskFactory
 from survey.models import SurveyForm, SurveyAnswer
 from instructor_task.tasks_helper import (
     cohort_students_and_upload,
@@ -289,6 +293,79 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         result = upload_grades_csv(None, None, self.course.id, None, 'graded')
         self.assertDictContainsSubset({'attempted': 1, 'succeeded': 1, 'failed': 0}, result)
 
+    @override_settings(INSTRUCTOR_TASK_CHECKPOINT_INTERVAL=2)
+    @patch('instructor_task.tasks_helper._get_current_task')
+    def test_resumed_from_checkpoint(self, _mock_current_task):
+        """
+        Test that a grade report that's interrupted after a checkpoint
+        carries on from there when it's run again.
+        """
+        students = [self.create_student('student{}'.format(index)) for index in range(4)]
+        entry = InstructorTaskFactory.create(course_id=self.course.id)
+
+        def interrupted(course_id, students):
+            """ Grade three students, and then stop as if the worker had been restarted. """
+            for index, graded in enumerate(iterate_grades_for(course_id, students)):
+                if index == 3:
+                    raise WorkerRestarted()
+                yield graded
+
+        with patch('instructor_task.tasks_helper.iterate_grades_for', side_effect=interrupted):
+            with self.assertRaises(WorkerRestarted):
+                upload_grades_csv(None, entry.id, self.course.id, None, 'graded')
+        checkpoint = json.loads(InstructorTask.objects.get(id=entry.id).checkpoint)
+        self.assertEqual(checkpoint['last_id'], students[1].id)
+
+        result = upload_grades_csv(None, entry.id, self.course.id, None, 'graded')
+        self.assertDictContainsSubset({'attempted': 4, 'succeeded': 4, 'failed': 0, 'resumed': 1}, result)
+
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        links = report_store.links_for(self.course.id)
+        self.assertEqual(len(links), 1)
+        with open(report_store.path_to(self.course.id, links[0][0])) as csv_file:
+            self.assertEqual(
+                [row['username'] for row in unicodecsv.DictReader(csv_file)],
+                [student.username for student in students]
+            )
+
+
+    @patch('instructor_task.tasks_helper._get_current_task')
+    def test_resumed_before_first_checkpoint(self, _mock_current_task):
+        """
+        Test that a grade report that's interrupted before its first
+        checkpoint carries on with the same report when it's run again, and
+        discards the rows it had written.
+        """
+        students = [self.create_student('student{}'.format(index)) for index in range(2)]
+        entry = InstructorTaskFactory.create(course_id=self.course.id)
+
+        def interrupted(course_id, students):
+            """ Grade one student, and then stop as if the worker had been restarted. """
+            for index, graded in enumerate(iterate_grades_for(course_id, students)):
+                if index == 1:
+                    raise WorkerRestarted()
+                yield graded
+
+        with patch('instructor_task.tasks_helper.iterate_grades_for', side_effect=interrupted):
+            with self.assertRaises(WorkerRestarted):
+                upload_grades_csv(None, entry.id, self.course.id, None, 'graded')
+        checkpoint = json.loads(InstructorTask.objects.get(id=entry.id).checkpoint)
+        self.assertEqual(checkpoint['last_id'], 0)
+
+        result = upload_grades_csv(None, entry.id, self.course.id, None, 'graded')
+        self.assertDictContainsSubset({'attempted': 2, 'succeeded': 2, 'total': 2, 'resumed': 1}, result)
+
+        # Only the report is left, without the temporary file of the interrupted part
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        links = report_store.links_for(self.course.id)
+        course_dir = os.path.dirname(report_store.path_to(self.course.id, links[0][0]))
+        self.assertEqual(os.listdir(course_dir), [links[0][0]])
+
+
+class WorkerRestarted(BaseException):
+    """ Raised to interrupt a task, as if its worker were restarted. """
+    pass
+
 
 class TestTeamGradeReport(InstructorGradeReportTestCase):
     """ Test that teams appear correctly in the grade report when it is enabled for the course. """
@@ -339,18 +416,41 @@ class TestProblemResponsesReport(TestReportMixin, InstructorTaskCourseTestCase):
     def test_success(self):
         task_input = {'problem_location': ''}
         with patch('instructor_task.tasks_helper._get_current_task'):
-            with patch('instructor_task.tasks_helper.list_problem_responses') as patched_data_source:
-                patched_data_source.return_value = [
-                    {'username': 'user0', 'state': u'state0'},
-                    {'username': 'user1', 'state': u'state1'},
-                    {'username': 'user2', 'state': u'state2'},
-                ]
+            with patch('instructor_task.tasks_helper.iterate_problem_responses') as patched_data_source:
+                patched_data_source.return_value = iter([
+                    {'username': 'user0', 'location': u'', 'state': u'state0'},
+                    {'username': 'user1', 'location': u'', 'state': u'state1'},
+                    {'username': 'user2', 'location': u'', 'state': u'state2'},
+                ])
                 result = upload_problem_responses_csv(None, None, self.course.id, task_input, 'calculated')
         report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
         links = report_store.links_for(self.course.id)
 
         self.assertEquals(len(links), 1)
         self.assertDictContainsSubset({'attempted': 3, 'succeeded': 3, 'failed': 0}, result)
+        self.verify_rows_in_csv([
+            {'username': 'user0', 'state': u'state0'},
+            {'username': 'user1', 'state': u'state1'},
+            {'username': 'user2', 'state': u'state2'},
+        ])
+
+    def test_several_problems(self):
+        problem_keys = [self.course.id.make_usage_key('problem', name) for name in ('p1', 'p2')]
+        problem_locations = [unicode(problem_key) for problem_key in problem_keys]
+        student = self.create_student('student')
+        for problem_key in problem_keys:
+            StudentModuleFactory.create(
+                student=student, course_id=self.course.id, module_state_key=problem_key, state=u'{"attempts": 1}'
+            )
+
+        task_input = {'problem_location': problem_locations}
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            result = upload_problem_responses_csv(None, None, self.course.id, task_input, 'calculated')
+        self.assertDictContainsSubset({'attempted': 2, 'succeeded': 2, 'failed': 0}, result)
+        self.verify_rows_in_csv([
+            {'username': 'student', 'location': problem_location, 'state': u'{"attempts": 1}'}
+            for problem_location in problem_locations
+        ])
 
 
 @ddt.ddt
@@ -542,6 +642,67 @@ class TestInstructorDetailedEnrollmentReport(TestReportMixin, InstructorTaskCour
         self._verify_cell_data_in_csv(student.username, 'Enrollment Source', 'Used Registration Code')
         self._verify_cell_data_in_csv(student.username, 'Payment Status', 'Invoice Paid')
 
+    def _enroll_students(self, number):
+        """
+        Enroll `number` students each by purchasing the course, by being
+        manually enrolled, and by redeeming an invoiced registration code.
+        Returns the last student enrolled each way.
+        """
+        for _ in range(number):
+            paid_student = UserFactory()
+            student_cart = Order.get_cart_for_user(paid_student)
+            PaidCourseRegistration.add_to_order(student_cart, self.course.id)
+            student_cart.purchase()
+
+            manual_student = UserFactory()
+            enrollment = CourseEnrollment.enroll(manual_student, self.course.id)
+            ManualEnrollmentAudit.create_manual_enrollment_audit(
+                self.instructor, manual_student.email, ALLOWEDTOENROLL_TO_ENROLLED,
+                'manually enrolling unenrolled user', enrollment
+            )
+
+            code_student = UserFactory()
+            course_registration_code = CourseRegistrationCode.objects.create(
+                code=code_student.username[-32:],
+                course_id=self.course.id.to_deprecated_string(),
+                created_by=self.instructor,
+                invoice=self.sale_invoice_1,
+                invoice_item=self.invoice_item,
+                mode_slug=CourseMode.DEFAULT_SHOPPINGCART_MODE_SLUG
+            )
+            RegistrationCodeRedemption.objects.create(
+                registration_code=course_registration_code,
+                redeemed_by=code_student,
+                course_enrollment=CourseEnrollment.enroll(code_student, self.course.id),
+            )
+        return paid_student, manual_student, code_student
+
+    def _count_report_queries(self):
+        """
+        Generate the report, returning the number of queries it took.
+        """
+        task_input = {'features': []}
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            with CaptureQueriesContext(connection) as queries:
+                upload_enrollment_report(None, None, self.course.id, task_input, 'generating_enrollment_report')
+        return len(queries)
+
+    def test_query_count_independent_of_enrollments(self):
+        self._enroll_students(1)
+        num_queries = self._count_report_queries()
+
+        paid_student, manual_student, code_student = self._enroll_students(4)
+        self.assertEqual(self._count_report_queries(), num_queries)
+        self._verify_cell_data_in_csv(paid_student.username, 'Enrollment Source', 'Credit Card - Individual')
+        self._verify_cell_data_in_csv(paid_student.username, 'Payment Status', 'purchased')
+        self._verify_cell_data_in_csv(
+            manual_student.username,
+            'Enrollment Source',
+            u'manually enrolled by username: {username}'.format(username=self.instructor.username)
+        )
+        self._verify_cell_data_in_csv(code_student.username, 'Enrollment Source', 'Used Registration Code')
+        self._verify_cell_data_in_csv(code_student.username, 'Payment Status', 'Invoice Outstanding')
+
     def _verify_cell_data_in_csv(self, username, column_header, expected_cell_content):
         """
         Verify that the last ReportStore CSV contains the expected content.
@@ -229,6 +229,8 @@ BULK_EMAIL_MAX_RETRIES = ENV_TOKENS.get('BULK_EMAIL_MAX_RETRIES', BULK_EMAIL_MAX
 BULK_EMAIL_INFINITE_RETRY_CAP = ENV_TOKENS.get('BULK_EMAIL_INFINITE_RETRY_CAP', BULK_EMAIL_INFINITE_RETRY_CAP)
 BULK_EMAIL_LOG_SENT_EMAILS = ENV_TOKENS.get('BULK_EMAIL_LOG_SENT_EMAILS', BULK_EMAIL_LOG_SENT_EMAILS)
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = ENV_TOKENS.get('BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS', BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
+BULK_EMAIL_CONNECTION_POOL_SIZE = ENV_TOKENS.get('BULK_EMAIL_CONNECTION_POOL_SIZE', BULK_EMAIL_CONNECTION_POOL_SIZE)
+BULK_EMAIL_CONNECTION_MAX_IDLE = ENV_TOKENS.get('BULK_EMAIL_CONNECTION_MAX_IDLE', BULK_EMAIL_CONNECTION_MAX_IDLE)
 # We want Bulk Email running on the high-priority queue, so we define the
 # routing key that points to it. At the moment, the name is the same.
 # We have to reset the value here, since we have changed the value of the queue name.
@@ -300,6 +302,15 @@ for name, value in ENV_TOKENS.get("CODE_JAIL", {}).items():
         CODE_JAIL[name] = value
 
 COURSES_WITH_UNSAFE_CODE = ENV_TOKENS.get("COURSES_WITH_UNSAFE_CODE", [])
+SAFE_EXEC_RESULT_STORE_MAX_ENTRIES = ENV_TOKENS.get(
+    'SAFE_EXEC_RESULT_STORE_MAX_ENTRIES',
+    SAFE_EXEC_RESULT_STORE_MAX_ENTRIES
+)
+if FEATURES.get('ENABLE_SAFE_EXEC_RESULT_STORE'):
+    CELERYBEAT_SCHEDULE['evict-safe-exec-results'] = {
+        'task': 'courseware.evict_safe_exec_results',
+        'schedule': datetime.timedelta(hours=ENV_TOKENS.get('SAFE_EXEC_RESULT_STORE_EVICTION_PERIOD_HOURS', 1)),
+    }
 
 ASSET_IGNORE_REGEX = ENV_TOKENS.get('ASSET_IGNORE_REGEX', ASSET_IGNORE_REGEX)
 
@@ -527,6 +538,28 @@ GRADES_DOWNLOAD = ENV_TOKENS.get("GRADES_DOWNLOAD", GRADES_DOWNLOAD)
 # financial reports
 FINANCIAL_REPORTS = ENV_TOKENS.get("FINANCIAL_REPORTS", FINANCIAL_REPORTS)
 
+INSTRUCTOR_TASK_CHECKPOINT_INTERVAL = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_CHECKPOINT_INTERVAL', INSTRUCTOR_TASK_CHECKPOINT_INTERVAL
+)
+INSTRUCTOR_TASK_MODULES_PER_SUBTASK = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_MODULES_PER_SUBTASK', INSTRUCTOR_TASK_MODULES_PER_SUBTASK
+)
+INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS', INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS
+)
+INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK', INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK
+)
+INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK', INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK
+)
+INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE', INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE
+)
+CLASS_DASHBOARD_AGGREGATES_MAX_AGE = ENV_TOKENS.get(
+    'CLASS_DASHBOARD_AGGREGATES_MAX_AGE', CLASS_DASHBOARD_AGGREGATES_MAX_AGE
+)
+
 ##### ORA2 ######
 # Prefix for uploads of example-based assessment AI classifiers
 # This can be used to separate uploads for different environments
@@ -631,6 +664,13 @@ COURSE_ABOUT_VISIBILITY_PERMISSION = ENV_TOKENS.get(
 )
 
 
+STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD = ENV_TOKENS.get(
+    'STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD',
+    STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD
+)
+STATIC_REPLACE_CACHE_TIMEOUT = ENV_TOKENS.get('STATIC_REPLACE_CACHE_TIMEOUT', STATIC_REPLACE_CACHE_TIMEOUT)
+XBLOCK_FRAGMENT_CACHE_TIMEOUT = ENV_TOKENS.get('XBLOCK_FRAGMENT_CACHE_TIMEOUT', XBLOCK_FRAGMENT_CACHE_TIMEOUT)
+
 # Enrollment API Cache Timeout
 ENROLLMENT_COURSE_DETAILS_CACHE_TIMEOUT = ENV_TOKENS.get('ENROLLMENT_COURSE_DETAILS_CACHE_TIMEOUT', 60)
 
@@ -682,7 +722,9 @@ if FEATURES.get('CUSTOM_COURSES_EDX'):
     FIELD_OVERRIDE_PROVIDERS += (
         'lms.djangoapps.ccx.overrides.CustomCoursesForEdxOverrideProvider',
     )
+    MIDDLEWARE_CLASSES += ('lms.djangoapps.ccx.middleware.CcxOverridesVersionMiddleware',)
 CCX_MAX_STUDENTS_ALLOWED = ENV_TOKENS.get('CCX_MAX_STUDENTS_ALLOWED', CCX_MAX_STUDENTS_ALLOWED)
+CCX_OVERRIDES_CACHE_TIMEOUT = ENV_TOKENS.get('CCX_OVERRIDES_CACHE_TIMEOUT', CCX_OVERRIDES_CACHE_TIMEOUT)
 
 ##### Individual Due Date Extensions #####
 if FEATURES.get('INDIVIDUAL_DUE_DATES'):
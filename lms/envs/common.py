@@ -121,6 +121,16 @@ FEATURES = {
     # See jquey-xblock: https://github.com/edx-solutions/jquery-xblock
     'ENABLE_XBLOCK_VIEW_ENDPOINT': False,
 
+    # Only render the active unit of a sequence server-side; the other units are
+    # fetched from the XBlock view endpoint when they are selected. Requires
+    # ENABLE_XBLOCK_VIEW_ENDPOINT.
+    'ENABLE_DEFERRED_SEQUENCE_RENDERING': False,
+
+    # Keep the results of running problem code in a database table rather than
+    # the Django cache, so they can be shared by everyone who gets the same seed
+    # (see courseware.safe_exec_results).
+    'ENABLE_SAFE_EXEC_RESULT_STORE': False,
+
     # Allows to configure the LMS to provide CORS headers to serve requests from other domains
     'ENABLE_CORS_HEADERS': False,
 
@@ -521,6 +531,23 @@ AUTHENTICATION_BACKENDS = (
 STUDENT_FILEUPLOAD_MAX_SIZE = 4 * 1000 * 1000  # 4 MB
 MAX_FILEUPLOADS_PER_INPUT = 20
 
+# StudentModule states longer than this many characters are stored compressed.
+# None disables compression. Existing rows can be (re)compressed with the
+# compress_student_module_state management command.
+STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD = None
+
+# Seconds to cache the result of rewriting /static/ urls in a piece of content
+# (see static_replace.replace_static_urls), or None to not cache it. This bounds
+# how long it takes for locking or unlocking a course asset to take effect.
+STATIC_REPLACE_CACHE_TIMEOUT = 5 * 60
+
+# Block types whose rendered fragments depend only on their content, so can be
+# cached across users (see xblock_utils.cache_fragment), and the seconds to cache
+# them for, or None to not cache them. Like STATIC_REPLACE_CACHE_TIMEOUT, this
+# bounds how long it takes for locking or unlocking a course asset to take effect.
+XBLOCK_FRAGMENT_CACHE_BLOCK_TYPES = ('html',)
+XBLOCK_FRAGMENT_CACHE_TIMEOUT = 5 * 60
+
 # Dev machines shouldn't need the book
 # BOOK_URL = '/static/book/'
 BOOK_URL = 'https://mitxstatic.s3.amazonaws.com/book_images/'  # For AWS deploys
@@ -751,6 +778,23 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # A pool of sandboxed Pythons, started ahead of time, to run jailed code
+    # in without waiting for a Python to start up (see
+    # capa.safe_exec.worker_pool).
+    'worker_pool': {
+        # How many idle workers to keep started in each process.  0 means
+        # don't use a pool.
+        'size': 0,
+        # Wall-clock seconds an execution can take before its worker is
+        # stopped.
+        'exec_timeout': 10,
+        # Seconds to wait for an idle worker before starting a new sandboxed
+        # Python instead.
+        'queue_timeout': 1,
+        # Run the workers unsandboxed, as the current user.  For testing only.
+        'local': False,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -763,6 +807,11 @@ CODE_JAIL = {
 #   ]
 COURSES_WITH_UNSAFE_CODE = []
 
+# The most results of running problem code to keep when
+# ENABLE_SAFE_EXEC_RESULT_STORE is on. The least recently used are evicted
+# by the periodic courseware.evict_safe_exec_results task.
+SAFE_EXEC_RESULT_STORE_MAX_ENTRIES = 100000
+
 ############################### DJANGO BUILT-INS ###############################
 # Change DEBUG in your environment settings files, not here
 DEBUG = False
@@ -1698,6 +1747,16 @@ BULK_EMAIL_LOG_SENT_EMAILS = False
 # parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# Number of connections to the email backend each process keeps open between
+# bulk email subtasks, to reuse for the next ones.  Set this to the number of
+# subtasks a process runs at once (the concurrency of a threaded or eventlet
+# worker, or 1 for a prefork worker).  0 closes each subtask's connection.
+BULK_EMAIL_CONNECTION_POOL_SIZE = 1
+
+# Connections that have been kept open longer than this many seconds without
+# being used are checked with NOOP before they're reused.
+BULK_EMAIL_CONNECTION_MAX_IDLE = 60
+
 ############################# Email Opt In ####################################
 
 # Minimum age for organization-wide email opt in
@@ -2087,8 +2146,13 @@ VERIFY_STUDENT = {
 
 ### This enables the Metrics tab for the Instructor dashboard ###########
 FEATURES['CLASS_DASHBOARD'] = False
-if FEATURES.get('CLASS_DASHBOARD'):
-    INSTALLED_APPS += ('class_dashboard',)
+# The app is installed whether or not the tab is enabled, so that the tables
+# the tab is drawn from exist wherever it is turned on.
+INSTALLED_APPS += ('class_dashboard',)
+
+# The Metrics tab is drawn from counts of students' progress that are brought
+# up to date when they are more than this many seconds old.
+CLASS_DASHBOARD_AGGREGATES_MAX_AGE = 15 * 60
 
 ################ Enable credit eligibility feature ####################
 ENABLE_CREDIT_ELIGIBILITY = True
@@ -2162,6 +2226,28 @@ FINANCIAL_REPORTS = {
     'ROOT_PATH': '/tmp/edx-s3/financial_reports',
 }
 
+# Long-running instructor tasks, such as rescoring a problem or generating
+# the grade report, save a checkpoint after this many students or modules, so
+# that they can resume from it if their worker is restarted.
+INSTRUCTOR_TASK_CHECKPOINT_INTERVAL = 1000
+
+# Rescoring a problem for all students is divided into subtasks that each
+# rescore the submissions of a range of students, this many at most.
+INSTRUCTOR_TASK_MODULES_PER_SUBTASK = 100
+
+# The number of items each subtask of an instructor task processes, such as
+# INSTRUCTOR_TASK_MODULES_PER_SUBTASK or BULK_EMAIL_EMAILS_PER_TASK, is adapted
+# so that each subtask takes about this many seconds, going by how long the
+# subtasks of the last few tasks of the same type took.  Set to 0 to always
+# use the configured number.
+INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS = 60
+INSTRUCTOR_TASK_MIN_ITEMS_PER_SUBTASK = 20
+INSTRUCTOR_TASK_MAX_ITEMS_PER_SUBTASK = 2000
+
+# The final statuses of subtasks are added to their instructor task this many
+# at a time, so that the task isn't locked every time one of them finishes.
+INSTRUCTOR_TASK_SUBTASK_STATUS_BATCH_SIZE = 10
+
 
 #### PASSWORD POLICY SETTINGS #####
 PASSWORD_MIN_LENGTH = 8
@@ -2656,6 +2742,12 @@ PROCTORING_SETTINGS = {}
 # to compete with the MOOC.
 CCX_MAX_STUDENTS_ALLOWED = 200
 
+# Seconds to cache the field overrides of a CCX between requests, or None to
+# only cache them for the rest of a request. The cached overrides are replaced
+# whenever they are changed, so this only bounds how long overrides read while
+# they were being changed can be used.
+CCX_OVERRIDES_CACHE_TIMEOUT = 60 * 60
+
 # Financial assistance settings
 
 # Maximum and minimum length of answers, in characters, for the
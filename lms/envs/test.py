@@ -235,6 +235,15 @@ CACHES = {
     },
 }
 
+# Rewritten content would otherwise be cached between tests with different assets
+STATIC_REPLACE_CACHE_TIMEOUT = None
+
+# Rendered fragments would otherwise be cached between tests with the same usage keys
+XBLOCK_FRAGMENT_CACHE_TIMEOUT = None
+
+# Overrides would otherwise be cached between tests with the same ccx ids
+CCX_OVERRIDES_CACHE_TIMEOUT = None
+
 # Dummy secret key for dev
 SECRET_KEY = '85920908f28904ed733fe576320db18cabd7b6cd'
 
@@ -336,6 +345,11 @@ GIT_REPO_DIR = TEST_ROOT / "course_repos"
 CELERY_ALWAYS_EAGER = True
 CELERY_RESULT_BACKEND = 'djcelery.backends.cache:CacheBackend'
 
+# Each test gets its own (usually mocked) bulk email connection
+BULK_EMAIL_CONNECTION_POOL_SIZE = 0
+# Subtasks are the size each test gives them, rather than adapted to earlier tests' throughput
+INSTRUCTOR_TASK_SUBTASK_TARGET_SECONDS = 0
+
 ######################### MARKETING SITE ###############################
 
 MKTG_URL_LINK_MAP = {
@@ -536,6 +550,7 @@ FACEBOOK_API_VERSION = "v2.2"
 ######### custom courses #########
 INSTALLED_APPS += ('lms.djangoapps.ccx',)
 FEATURES['CUSTOM_COURSES_EDX'] = True
+MIDDLEWARE_CLASSES += ('lms.djangoapps.ccx.middleware.CcxOverridesVersionMiddleware',)
 
 # Set dummy values for profile image settings.
 PROFILE_IMAGE_BACKEND = {
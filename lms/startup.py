@@ -40,6 +40,8 @@ def run():
 
     add_mimetypes()
 
+    configure_safe_exec_worker_pool()
+
     if settings.FEATURES.get('USE_CUSTOM_THEME', False):
         enable_stanford_theme()
 
@@ -71,6 +73,24 @@ def run():
     xmodule.x_module.descriptor_global_local_resource_url = lms_xblock.runtime.local_resource_url
 
 
+def configure_safe_exec_worker_pool():
+    """
+    Configure capa's pool of pre-started sandbox workers from CODE_JAIL.
+
+    The workers themselves are only started when code is first run in each
+    process.
+    """
+    from capa.safe_exec import worker_pool
+
+    pool_settings = settings.CODE_JAIL.get('worker_pool', {})
+    worker_pool.configure(
+        python_bin=settings.CODE_JAIL.get('python_bin'),
+        user=settings.CODE_JAIL.get('user'),
+        limits=settings.CODE_JAIL.get('limits'),
+        **pool_settings
+    )
+
+
 def add_mimetypes():
     """
     Add extra mimetypes. Used in xblock_resource.
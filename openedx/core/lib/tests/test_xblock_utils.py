@@ -7,6 +7,8 @@ import ddt
 import uuid
 
 from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mock import Mock, patch
 
 from courseware.models import StudentModule  # pylint: disable=import-error
 from lms.djangoapps.lms_xblock.runtime import quote_slashes
@@ -16,6 +18,7 @@ from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
 from openedx.core.lib.xblock_utils import (
+    cache_fragment,
     wrap_fragment,
     request_token,
     wrap_xblock,
@@ -173,6 +176,34 @@ class TestXblockUtils(SharedModuleStoreTestCase):
         self.assertIsInstance(test_replace, Fragment)
         self.assertEqual(test_replace.content, anchor_tag)
 
+    @ddt.data('course_mongo', 'course_split')
+    @override_settings(XBLOCK_FRAGMENT_CACHE_TIMEOUT=60)
+    @patch('openedx.core.lib.xblock_utils.dog_stats_api')
+    def test_cache_fragment(self, course_id, mock_dog_stats):
+        """
+        Verify that a rendered fragment is cached, and that a cache hit doesn't render the view again.
+        """
+        course = getattr(self, course_id)
+        content = '<p data-request-token="{}">' + unicode(uuid.uuid4()) + '</p>'
+        render = Mock(side_effect=lambda block, view, context: self.create_fragment(content.format('token1')))
+
+        test_rendered = cache_fragment('token1', (), render, course, 'baseview', None)
+        self.assertEqual(test_rendered.content, content.format('token1'))
+        self.assertEqual(render.call_count, 1)
+        mock_dog_stats.increment.assert_called_with('xblock_fragment_cache.miss', tags=['block_type:course'])
+
+        # The cached fragment has the token of the request it is used in
+        test_cached = cache_fragment('token2', (), render, course, 'baseview', None)
+        self.assertEqual(test_cached.content, content.format('token2'))
+        self.assertEqual(test_cached.resources[0].data, 'body {background-color:red;}')
+        self.assertEqual(render.call_count, 1)
+        mock_dog_stats.increment.assert_called_with('xblock_fragment_cache.hit', tags=['block_type:course'])
+
+        # A different view, or something else the fragment depends on, is a cache miss
+        cache_fragment('token1', (), render, course, 'otherview', None)
+        cache_fragment('token1', ('anonymous_id',), render, course, 'baseview', None)
+        self.assertEqual(render.call_count, 3)
+
     @ddt.data('course_mongo', 'course_split')
     def test_grade_histogram(self, course_id):
         """
@@ -2,7 +2,9 @@
 Functions that can are used to modify XBlock fragments for use in the LMS and Studio
 """
 
+import copy
 import datetime
+import hashlib
 import json
 import logging
 import markupsafe
@@ -13,9 +15,12 @@ from lxml import html, etree
 from contracts import contract
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.timezone import UTC
+from django.utils.translation import get_language
 from django.utils.html import escape
 from django.contrib.auth.models import User
+import dogstats_wrapper as dog_stats_api
 from edxmako.shortcuts import render_to_string
 from xblock.core import XBlock
 from xblock.exceptions import InvalidScopeError
@@ -185,6 +190,80 @@ def replace_static_urls(data_dir, block, view, frag, context, course_id=None, st
     ))
 
 
+# Stands in for the request token in cached fragments (see cache_fragment)
+FRAGMENT_CACHE_REQUEST_TOKEN = u'xblock-fragment-cache-request-token'
+
+
+def _fragment_cache_content_version(block):
+    """
+    Return the version of the content of `block`: the split `update_version`
+    if there is one, otherwise its published date.
+    """
+    version = getattr(block, 'update_version', None)
+    if version is None:
+        version = getattr(block, 'published_on', None)
+    return unicode(version)
+
+
+def _fragment_cache_partition_groups(block):
+    """
+    Return the groups the current user is in for the user partitions that restrict access to `block`.
+    """
+    group_access = getattr(block, 'merged_group_access', None)
+    if not group_access:
+        return ()
+
+    partitions_service = block.runtime.service(block, 'partitions')
+    groups = []
+    for user_partition in partitions_service.course_partitions:
+        if user_partition.id in group_access:
+            group = partitions_service.get_group(user_partition, assign=False)
+            groups.append((user_partition.id, group.id if group else None))
+    return tuple(sorted(groups))
+
+
+def cache_fragment(request_token, cache_key_extra, render, block, view, context):
+    """
+    A render wrapper (see :class:`~xmodule.x_module.ConfigurableFragmentWrapper`) that
+    caches the fragment that `render` produces for the `view` of `block`, and returns
+    the cached fragment instead of rendering the view again.
+
+    The cache is keyed on the block's usage key, content version, the user's
+    partition groups, the active language and the view, so this must only be
+    used for blocks whose rendered fragment depends on nothing else, such as
+    the student_view of html blocks. `request_token` is substituted into the
+    cached fragment, so that it matches the rest of the page.
+
+    request_token: The token of the current request (see :func:`request_token`)
+    cache_key_extra: A tuple of any other values that the fragment depends on.
+
+    output: the :class:`~xblock.fragment.Fragment` for the view
+    """
+    key_parts = (
+        unicode(block.scope_ids.usage_id),
+        _fragment_cache_content_version(block),
+        view,
+        _fragment_cache_partition_groups(block),
+        get_language(),
+        cache_key_extra,
+    )
+    cache_key = u'xblock_fragment.{}'.format(hashlib.md5(repr(key_parts)).hexdigest())
+    tags = [u'block_type:{}'.format(block.scope_ids.block_type)]
+
+    frag = cache.get(cache_key)
+    if frag is not None:
+        dog_stats_api.increment('xblock_fragment_cache.hit', tags=tags)
+        frag.content = frag.content.replace(FRAGMENT_CACHE_REQUEST_TOKEN, request_token)
+        return frag
+
+    dog_stats_api.increment('xblock_fragment_cache.miss', tags=tags)
+    frag = render(block, view, context)
+    cached_frag = copy.copy(frag)
+    cached_frag.content = frag.content.replace(request_token, FRAGMENT_CACHE_REQUEST_TOKEN)
+    cache.set(cache_key, cached_frag, settings.XBLOCK_FRAGMENT_CACHE_TIMEOUT)
+    return frag
+
+
 def grade_histogram(module_id):
     '''
     Print out a histogram of grades on a given problem in staff member debug info.